@@ -1,77 +1,147 @@
-# Copyright (C) 2019 NRL
-# Author: Angeline Burrell
-# Disclaimer: This code is under the MIT license, whose details can be found at
-# the root in the LICENSE file
-#
-# -*- coding: utf-8 -*-
-"""Conversion functions between geo-graphic/detic and AACGM-V2 magnetic coords.
-
-Attributes
-----------
-logger : (logger)
-    Logger handle
-high_alt_coeff : (float)
-    Upper altitude limit for using coefficients in km
-high_alt_trace : (float)
-    Upper altitude limit for using field-line tracing in km
-AACGM_V2_DAT_PREFIX : (str)
-    Location of AACGM-V2 coefficient files with the file prefix
-IGRF_COEFFS : (str)
-    Filename, with directory, of IGRF coefficients
-
-"""
-# Imports
-from importlib import metadata
-from importlib import resources
-import logging
-import os as _os
-from sys import stderr
-
-from aacgmv2.wrapper import convert_bool_to_bit  # noqa F401
-from aacgmv2.wrapper import convert_latlon  # noqa F401
-from aacgmv2.wrapper import convert_latlon_arr  # noqa F401
-from aacgmv2.wrapper import convert_mlt  # noqa F401
-from aacgmv2.wrapper import convert_str_to_bit  # noqa F401
-from aacgmv2.wrapper import get_aacgm_coord  # noqa F401
-from aacgmv2.wrapper import get_aacgm_coord_arr  # noqa F401
-from aacgmv2 import _aacgmv2  # noqa F401
-from aacgmv2 import utils  # noqa F401
-
-# Define global variables
-__version__ = metadata.version('aacgmv2')
-
-# Define a logger object to allow easier log handling
-logger = logging.getLogger('aacgmv2_logger')
-
-# Altitude constraints
-high_alt_coeff = 2000.0  # Tested and published in Shepherd (2014)
-high_alt_trace = 6378.0  # 1 RE, these are ionospheric coordinates
-
-# Path and filename prefix for the IGRF coefficients
-AACGM_v2_DAT_PREFIX = _os.path.join(str(resources.files(__package__)),
-                                    'aacgm_coeffs', 'aacgm_coeffs-14-')
-IGRF_COEFFS = _os.path.join(str(resources.files(__package__)),
-                            'magmodel_1590-2025.txt')
-
-# If not defined, set the IGRF and AACGM environment variables
-__reset_warn__ = False
-if 'IGRF_COEFFS' in _os.environ.keys():
-    # Check and see if this environment variable is the same or different
-    if not _os.environ['IGRF_COEFFS'] == IGRF_COEFFS:
-        stderr.write("".join(["resetting environment variable IGRF_COEFFS in ",
-                              "python script\n"]))
-        __reset_warn__ = True
-_os.environ['IGRF_COEFFS'] = IGRF_COEFFS
-
-if 'AACGM_v2_DAT_PREFIX' in _os.environ.keys():
-    # Check and see if this environment variable is the same or different
-    if not _os.environ['AACGM_v2_DAT_PREFIX'] == AACGM_v2_DAT_PREFIX:
-        stderr.write("".join(["resetting environment variable ",
-                              "AACGM_v2_DAT_PREFIX in python script\n"]))
-        __reset_warn__ = True
-_os.environ['AACGM_v2_DAT_PREFIX'] = AACGM_v2_DAT_PREFIX
-
-if __reset_warn__:
-    stderr.write("".join(["non-default coefficient files may be specified by ",
-                          "running aacgmv2.wrapper.set_coeff_path before any ",
-                          "other functions\n"]))
+# Copyright (C) 2019 NRL
+# Author: Angeline Burrell
+# Disclaimer: This code is under the MIT license, whose details can be found at
+# the root in the LICENSE file
+#
+# -*- coding: utf-8 -*-
+"""Conversion functions between geo-graphic/detic and AACGM-V2 magnetic coords.
+
+Attributes
+----------
+logger : (logger)
+    Logger handle
+high_alt_coeff : (float)
+    Upper altitude limit for using coefficients in km
+high_alt_trace : (float)
+    Upper altitude limit for using field-line tracing in km
+AACGM_V2_DAT_PREFIX : (str)
+    Location of AACGM-V2 coefficient files with the file prefix
+IGRF_COEFFS : (str)
+    Filename, with directory, of IGRF coefficients
+
+"""
+# Imports
+import importlib as _importlib
+import logging
+import os as _os
+from sys import stderr
+
+# The functions, classes, and submodules are imported when first used, so
+# that importing the package does not load NumPy or the C extension
+_wrapper_attrs = ['Converter', 'MLTReference', 'WorkerPool',
+                  'convert_bool_to_bit', 'convert_latlon',
+                  'convert_latlon_arr', 'convert_mlt', 'convert_str_to_bit',
+                  'get_aacgm_coord', 'get_aacgm_coord_arr', 'get_cache_stats',
+                  'model_time', 'profile', 'set_cache_size', 'set_coeffs',
+                  'stats', 'warmup']
+_submodules = ['_aacgmv2', 'coeff_store', 'numpy_engine', 'trace_table',
+               'ufunc', 'utils', 'wrapper']
+
+# Names exported by `from aacgmv2 import *`, which imports the lazy attributes
+__all__ = _wrapper_attrs + [name for name in _submodules
+                            if not name.startswith('_')] + [
+                                'logger', 'high_alt_coeff', 'high_alt_trace',
+                                'AACGM_v2_DAT_PREFIX', 'IGRF_COEFFS']
+
+
+def __getattr__(name):
+    """Import the functions, classes, and submodules when first used.
+
+    Parameters
+    ----------
+    name : str
+        Attribute name
+
+    Returns
+    -------
+    value : object
+        Attribute value, which is stored in the package namespace
+
+    Raises
+    ------
+    AttributeError
+        If the package has no such attribute.
+
+    """
+    # The C library reads the coefficient files from the environment
+    if name in _wrapper_attrs or name in _submodules:
+        _set_environ()
+
+    if name == '__version__':
+        from importlib import metadata
+        value = metadata.version('aacgmv2')
+    elif name in _wrapper_attrs:
+        value = getattr(_importlib.import_module('aacgmv2.wrapper'), name)
+    elif name in _submodules:
+        value = _importlib.import_module('.'.join(['aacgmv2', name]))
+    else:
+        raise AttributeError("module 'aacgmv2' has no attribute '{:}'".format(
+            name))
+
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """List the package attributes, including those not yet imported.
+
+    Returns
+    -------
+    names : list
+        Sorted attribute names
+
+    """
+    return sorted(set(list(globals().keys()) + _wrapper_attrs + _submodules
+                      + ['__version__']))
+
+
+# Define a logger object to allow easier log handling
+logger = logging.getLogger('aacgmv2_logger')
+
+# Altitude constraints
+high_alt_coeff = 2000.0  # Tested and published in Shepherd (2014)
+high_alt_trace = 6378.0  # 1 RE, these are ionospheric coordinates
+
+# Path and filename prefix for the AACGM-v2 coefficients, and path and filename
+# of the IGRF coefficients, found relative to this file rather than with
+# `importlib.resources`, which is slow to import
+AACGM_v2_DAT_PREFIX = _os.path.join(_os.path.dirname(
+    _os.path.abspath(__file__)), 'aacgm_coeffs', 'aacgm_coeffs-14-')
+IGRF_COEFFS = _os.path.join(_os.path.dirname(_os.path.abspath(__file__)),
+                            'magmodel_1590-2025.txt')
+
+# True if the coefficient environment variables were reset from other values
+__reset_warn__ = False
+_environ_set = False
+
+
+def _set_environ():
+    """Set the IGRF and AACGM environment variables read by the C library.
+
+    Notes
+    -----
+    Called when the submodules are first loaded, rather than on import, so
+    that importing the package does not change the environment.  Values that
+    differ from the package coefficient files are reset, with a warning.
+
+    """
+    global __reset_warn__, _environ_set
+
+    if _environ_set:
+        return
+    _environ_set = True
+
+    for evar, value in [('IGRF_COEFFS', IGRF_COEFFS),
+                        ('AACGM_v2_DAT_PREFIX', AACGM_v2_DAT_PREFIX)]:
+        # Check and see if this environment variable is the same or different
+        if evar in _os.environ.keys() and _os.environ[evar] != value:
+            stderr.write("".join(["resetting environment variable ", evar,
+                                  " in python script\n"]))
+            __reset_warn__ = True
+        _os.environ[evar] = value
+
+    if __reset_warn__:
+        stderr.write("".join(["non-default coefficient files may be ",
+                              "specified by running ",
+                              "aacgmv2.wrapper.set_coeff_path before any ",
+                              "other functions\n"]))
@@ -8,13 +8,359 @@
 
 
 import argparse
+from concurrent import futures
 import datetime as dt
+import itertools
 import numpy as np
+import os
+import struct
 import sys
+import warnings
 
 import aacgmv2
 
 
+def _parse_times(values):
+    """Cast a column of text times as seconds since 1970.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Times as seconds since 1970 or ISO 8601 date and time strings (e.g.,
+        2015-02-24T14:00:15.5)
+
+    Returns
+    -------
+    epoch : np.ndarray
+        Seconds since 1970
+
+    Raises
+    ------
+    ValueError
+        If the times cannot be parsed
+
+    """
+    # ISO dates have two hyphens after the year, unlike numbers
+    iso = np.char.count(values, '-', 1) >= 2
+    epoch = np.empty(shape=values.shape, dtype=np.float64)
+    epoch[~iso] = values[~iso].astype(np.float64)
+
+    times = np.array(np.char.rstrip(values[iso], 'Z'), dtype='datetime64[us]')
+    epoch[iso] = (times - np.datetime64(0, 'us')) / np.timedelta64(1, 's')
+
+    return epoch
+
+
+def _read_chunk(file_in, chunk_size, time_column=False):
+    """Read a chunk of lines from the input.
+
+    Parameters
+    ----------
+    file_in : file-like
+        Input file or stream
+    chunk_size : int or NoneType
+        Number of lines to read, or None to read all remaining lines
+    time_column : bool
+        If True, the last value on each line is a time, which is cast as
+        seconds since 1970 (default=False)
+
+    Returns
+    -------
+    array : np.ndarray or NoneType
+        Two-dimensional array of the values on the lines, or None at the end
+        of the input
+
+    """
+    lines = list(itertools.islice(file_in, chunk_size))
+    if len(lines) == 0:
+        return None
+
+    # Chunks holding only comments or blank lines are empty, not an error
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        if not time_column:
+            return np.loadtxt(lines, ndmin=2)
+
+        values = np.loadtxt(lines, dtype=str, ndmin=2)
+
+    array = np.empty(shape=values.shape, dtype=np.float64)
+    if values.size > 0:
+        array[:, :-1] = values[:, :-1].astype(np.float64)
+        array[:, -1] = _parse_times(values[:, -1])
+
+    return array
+
+
+def _read_raw_chunk(file_in, chunk_size, ncols, dtype='<f8'):
+    """Read a chunk of rows from a binary stream.
+
+    Parameters
+    ----------
+    file_in : file-like
+        Binary input file or stream
+    chunk_size : int or NoneType
+        Number of rows to read, or None to read all remaining rows
+    ncols : int
+        Number of values in each row
+    dtype : str or np.dtype
+        Type of the values (default='<f8')
+
+    Returns
+    -------
+    array : np.ndarray or NoneType
+        Two-dimensional float64 array of the rows, or None at the end of the
+        input
+
+    Raises
+    ------
+    ValueError
+        If the input ends within a row
+
+    """
+    row_size = ncols * np.dtype(dtype).itemsize
+    data = file_in.read(-1 if chunk_size is None else chunk_size * row_size)
+    if len(data) == 0:
+        return None
+    elif len(data) % row_size != 0:
+        raise ValueError('binary input ends within a row')
+
+    return np.frombuffer(data, dtype=dtype).reshape(-1, ncols).astype(
+        np.float64)
+
+
+def _open_input(file_in, in_format, ncols, time_column=False):
+    """Prepare to read rows from the input.
+
+    Parameters
+    ----------
+    file_in : file-like
+        Binary input file or stream
+    in_format : str
+        Input format: 'text' for whitespace-separated lines, 'npy' for a NumPy
+        array file, or 'raw' for little-endian float64 values
+    ncols : int
+        Number of values in each row of binary input
+    time_column : bool
+        If True, the last value in each row is a time, as seconds since 1970
+        or (for text input) an ISO 8601 string (default=False)
+
+    Returns
+    -------
+    read : function
+        Function that takes a number of rows (or None for all remaining rows)
+        and returns a two-dimensional array, or None at the end of the input
+    nrows : int or NoneType
+        Number of rows in the input, if known
+
+    Raises
+    ------
+    ValueError
+        If the NumPy array is not one- or two-dimensional or is stored in
+        Fortran order
+
+    """
+    if in_format == 'text':
+        return lambda num: _read_chunk(file_in, num, time_column), None
+    elif in_format == 'raw':
+        return lambda num: _read_raw_chunk(file_in, num, ncols), None
+
+    # Memory-map NumPy files, or read the array header of a stream
+    filename = getattr(file_in, 'name', None)
+    if isinstance(filename, str) and os.path.isfile(filename):
+        array = np.load(filename, mmap_mode='r')
+        shape, fortran_order, dtype = array.shape, False, array.dtype
+    else:
+        if np.lib.format.read_magic(file_in) == (1, 0):
+            header = np.lib.format.read_array_header_1_0(file_in)
+        else:
+            header = np.lib.format.read_array_header_2_0(file_in)
+        shape, fortran_order, dtype = header
+        array = None
+
+    if len(shape) not in (1, 2) or (fortran_order and len(shape) == 2):
+        raise ValueError('NumPy input must be a C-ordered one- or '
+                         'two-dimensional array')
+    nrows = shape[0]
+
+    if array is None:
+        ncols = 1 if len(shape) == 1 else shape[1]
+        return lambda num: _read_raw_chunk(file_in, num, ncols, dtype), nrows
+
+    array = array.reshape(nrows, -1)
+    start = [0]
+
+    def read(num):
+        if start[0] >= nrows:
+            return None
+        stop = nrows if num is None else min(nrows, start[0] + num)
+        chunk = np.asarray(array[start[0]:stop], dtype=np.float64)
+        start[0] = stop
+        return chunk
+
+    return read, nrows
+
+
+def _read_chunks(read, chunk_size=None, read_ahead=False):
+    """Read the input in chunks of rows.
+
+    Parameters
+    ----------
+    read : function
+        Function returning the next chunk of rows, see `_open_input`
+    chunk_size : int or NoneType
+        Number of rows in each chunk, or None to read the whole input at
+        once (default=None)
+    read_ahead : bool
+        If True, the next chunk is read by a background thread while the
+        current chunk is used (default=False)
+
+    Yields
+    ------
+    array : np.ndarray
+        Two-dimensional array of the values in the rows of a chunk
+
+    Notes
+    -----
+    At most two chunks are held at once, so memory use does not depend on the
+    size of the input.
+
+    """
+    if chunk_size is None or not read_ahead:
+        array = read(chunk_size)
+        while array is not None:
+            if array.size > 0:
+                yield array
+            array = None if chunk_size is None else read(chunk_size)
+        return
+
+    with futures.ThreadPoolExecutor(max_workers=1) as pool:
+        job = pool.submit(read, chunk_size)
+        array = job.result()
+        while array is not None:
+            job = pool.submit(read, chunk_size)
+            if array.size > 0:
+                yield array
+            array = job.result()
+
+
+def _npy_header(nrows, ncols):
+    """Create a NumPy array file header of fixed length for float64 rows.
+
+    Parameters
+    ----------
+    nrows : int
+        Number of rows
+    ncols : int
+        Number of values in each row, or 1 for a one-dimensional array
+
+    Returns
+    -------
+    header : bytes
+        Version 1.0 header, 128 bytes long for any number of rows
+
+    """
+    shape = "({:20d},)".format(nrows) if ncols == 1 else \
+        "({:20d}, {:d})".format(nrows, ncols)
+    header = "".join(["{'descr': '<f8', 'fortran_order': False, 'shape': ",
+                      shape, ", }"])
+    header = header.ljust(128 - 11) + "\n"
+
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) \
+        + header.encode("latin1")
+
+
+class _Writer(object):
+    """Write rows to the output in the desired format.
+
+    Parameters
+    ----------
+    file_out : file-like
+        Binary output file or stream
+    out_format : str
+        Output format: 'text', 'npy', or 'raw'
+    ncols : int
+        Number of values in each row, or 1 for a single column
+    nrows : int or NoneType
+        Number of rows that will be written, if known
+
+    Raises
+    ------
+    ValueError
+        If writing a NumPy array of unknown length to an output that cannot be
+        rewound
+
+    """
+
+    def __init__(self, file_out, out_format, ncols, nrows=None):
+        self.file_out = file_out
+        self.out_format = out_format
+        self.ncols = ncols
+        self.nrows = nrows
+        self.count = 0
+
+        if out_format == 'npy':
+            if nrows is None and not file_out.seekable():
+                raise ValueError('NumPy output needs the number of rows: use '
+                                 'NumPy input, an output file, or raw output')
+            file_out.write(_npy_header(0 if nrows is None else nrows, ncols))
+
+    def write(self, array):
+        """Write a chunk of rows.
+
+        Parameters
+        ----------
+        array : np.ndarray
+            Float64 values with one row per input row
+
+        """
+        if self.out_format == 'text':
+            np.savetxt(self.file_out, array, fmt='%.8f')
+        else:
+            self.file_out.write(np.ascontiguousarray(array,
+                                                     dtype='<f8').tobytes())
+        self.count += array.shape[0]
+        self.file_out.flush()
+
+    def close(self):
+        """Finish the output, recording the number of NumPy array rows."""
+        if self.out_format == 'npy' and self.count != self.nrows:
+            self.file_out.seek(0)
+            self.file_out.write(_npy_header(self.count, self.ncols))
+            self.file_out.seek(0, os.SEEK_END)
+        self.file_out.flush()
+
+
+def _positive_int(value):
+    """Cast a command line argument as a positive integer.
+
+    Parameters
+    ----------
+    value : str
+        Command line argument
+
+    Returns
+    -------
+    num : int
+        Positive integer
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        If the value is not a positive integer
+
+    """
+    try:
+        num = int(value)
+    except ValueError:
+        num = 0
+
+    if num < 1:
+        raise argparse.ArgumentTypeError(
+            "{:} is not a positive integer".format(value))
+
+    return num
+
+
 def main():
     """Entry point for the script."""
     desc = 'Converts between geographical coordinates, AACGM-v2, and MLT'
@@ -26,23 +372,56 @@ def main():
     subparsers.required = True
 
     desc = 'convert to/from geomagnetic coordinates. Input file must have lines'
-    desc += 'of the form "LAT LON ALT".'
+    desc += 'of the form "LAT LON ALT" (or "LAT LON ALT TIME").'
     parser_convert = subparsers.add_parser('convert', help=(desc))
 
     desc = 'convert between magnetic local time (MLT) and AACGM-v2 longitude. '
-    desc += 'Input file must have a single number on each line.'
+    desc += 'Input file must have a single number on each line (or a number '
+    desc += 'and a time).'
     parser_convert_mlt = subparsers.add_parser('convert_mlt', help=(desc))
 
     desc = 'input file (stdin if none specified)'
     for pp in [parser_convert, parser_convert_mlt]:
         pp.add_argument('-i', '--input', dest='file_in', metavar='FILE_IN',
-                        type=argparse.FileType('r'), default=sys.stdin.buffer,
+                        type=argparse.FileType('rb'), default=sys.stdin.buffer,
                         help=desc)
         pp.add_argument('-o', '--output', dest='file_out', metavar='FILE_OUT',
-                        type=argparse.FileType('w'), default=sys.stdout.buffer,
+                        type=argparse.FileType('wb'),
+                        default=sys.stdout.buffer,
                         help='output file (stdout if none specified)')
+        pp.add_argument('--input-format', dest='in_format',
+                        choices=['text', 'npy', 'raw'], default='text',
+                        help=''.join(['input format: whitespace-separated ',
+                                      'text lines, a NumPy array file ',
+                                      '(memory-mapped if not stdin), or raw ',
+                                      'little-endian float64 rows ',
+                                      '(default: text)']))
+        pp.add_argument('--output-format', dest='out_format',
+                        choices=['text', 'npy', 'raw'], default='text',
+                        help=''.join(['output format, as for the input; ',
+                                      'NumPy output to a pipe needs NumPy ',
+                                      'input (default: text)']))
+        pp.add_argument('-c', '--chunk-size', dest='chunk_size',
+                        metavar='ROWS', type=_positive_int, default=None,
+                        help=''.join(['convert and write the input in chunks ',
+                                      'of this many rows, using memory that ',
+                                      'does not depend on the input size ',
+                                      '(default: read the whole input)']))
+        pp.add_argument('-T', '--time-column', dest='time_column',
+                        action='store_true', default=False,
+                        help=''.join(['rows end with a time, as seconds ',
+                                      'since 1970 or (for text input) an ISO ',
+                                      '8601 date and time such as ',
+                                      '2015-02-24T14:00:15; rows are grouped ',
+                                      'by time and written in input order']))
+        pp.add_argument('-r', '--read-ahead', dest='read_ahead',
+                        action='store_true', default=False,
+                        help=''.join(['read the next chunk in a background ',
+                                      'thread while converting (with ',
+                                      '--chunk-size)']))
 
-    desc = 'date for magnetic field model (1900-2020, default: today)'
+    desc = ''.join(['date for magnetic field model (1900-2020, default: ',
+                    'today, not used with --time-column)'])
     parser_convert.add_argument('-d', '--date', dest='date', metavar='YYYYMMDD',
                                 help=desc)
 
@@ -66,8 +445,17 @@ def main():
     parser_convert.add_argument('-g', '--geocentric', dest='geocentric',
                                 action='store_true', default=False, help=desc)
 
+    desc = ''.join(['number of worker processes that convert the rows, ',
+                    'started once and used for every chunk (default: none; ',
+                    'not offered by convert_mlt, whose conversions take one ',
+                    'reference longitude per time and are faster than ',
+                    'sending the rows to other processes)'])
+    parser_convert.add_argument('-w', '--workers', dest='workers', metavar='N',
+                                type=_positive_int, default=None, help=desc)
+
+    desc = 'date and time for conversion (not used with --time-column)'
     parser_convert_mlt.add_argument('datetime', metavar='YYYYMMDDHHMMSS',
-                                    help='date and time for conversion')
+                                    nargs='?', default=None, help=desc)
 
     desc = 'invert - convert MLT to AACGM longitude instead of AACGM longitude'
     desc += ' to MLT'
@@ -76,7 +464,6 @@ def main():
                                     help=desc)
 
     args = parser.parse_args()
-    array = np.loadtxt(args.file_in, ndmin=2)
 
     if args.subcommand == 'convert':
         if args.date is None:
@@ -88,20 +475,55 @@ def main():
                                            allowtrace=args.allowtrace,
                                            badidea=args.badidea,
                                            geocentric=args.geocentric)
-        lats, lons, alts = aacgmv2.convert_latlon_arr(array[:, 0], array[:, 1],
-                                                      array[:, 2], dtime=date,
-                                                      method_code=code)
-
-        np.savetxt(args.file_out, np.column_stack((lats, lons, alts)),
-                   fmt='%.8f')
-    elif args.subcommand == 'convert_mlt':
+    elif args.time_column:
+        dtime = None
+    elif args.datetime is None:
+        parser_convert_mlt.error('the date and time are required without '
+                                 '--time-column')
+    else:
         dtime = dt.datetime.strptime(args.datetime, '%Y%m%d%H%M%S')
-        out = np.array(aacgmv2.convert_mlt(array[:, 0], dtime, m2a=args.m2a))
 
-        if len(out.shape) == 0:
-            out = np.array([out])
+    # Convert and write the input one chunk at a time
+    ncols = 3 if args.subcommand == 'convert' else 1
+    try:
+        read, nrows = _open_input(args.file_in, args.in_format,
+                                  ncols + args.time_column, args.time_column)
+        writer = _Writer(args.file_out, args.out_format, ncols, nrows)
+    except ValueError as verr:
+        subparsers.choices[args.subcommand].error(str(verr))
+
+    # Start the worker processes once, so that they keep their coefficients
+    # for all of the chunks
+    workers = None
+    if args.subcommand == 'convert' and args.workers is not None:
+        workers = aacgmv2.WorkerPool(args.workers) if args.workers > 1 \
+            else args.workers
+
+    try:
+        for array in _read_chunks(read, args.chunk_size, args.read_ahead):
+            # Rows with times are grouped by time by the conversion functions
+            if args.time_column:
+                date = dtime = array[:, -1]
+
+            if args.subcommand == 'convert':
+                lats, lons, alts = aacgmv2.convert_latlon_arr(
+                    array[:, 0], array[:, 1], array[:, 2], dtime=date,
+                    method_code=code, workers=workers)
+
+                writer.write(np.column_stack((lats, lons, alts)))
+            elif args.subcommand == 'convert_mlt':
+                out = np.array(aacgmv2.convert_mlt(array[:, 0], dtime,
+                                                   m2a=args.m2a))
+
+                if len(out.shape) == 0:
+                    out = np.array([out])
+
+                writer.write(out)
+    finally:
+        if isinstance(workers, aacgmv2.WorkerPool):
+            workers.shutdown()
 
-        np.savetxt(args.file_out, out, fmt='%.8f')
+    writer.close()
 
     # If not a pipe to STDOUT or STDERR, ensure the file is closed
     not_pipe = ((args.file_out.name.find('stdout') < 0)
@@ -20,7 +20,14 @@
 
 #include <Python.h>
 
+#define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION
+#include <numpy/arrayobject.h>
+#include <numpy/ufuncobject.h>
+
+#include <math.h>
+
 #include "aacgmlib_v2.h"
+#include "igrflib.h"
 #include "mlt_v2.h"
 
 PyObject *module;
@@ -29,6 +36,203 @@ PyObject *module;
 #define PyInt_AsLong PyLong_AsLong
 #endif
 
+/* Option for the g2a and a2g ufuncs to convert locations one at a time with */
+/* AACGM_v2_Convert, rather than in batches with AACGM_v2_ConvertBatch      */
+#define SCALAR 1024
+
+/* Number of locations gathered by the g2a and a2g ufuncs for each call to   */
+/* AACGM_v2_ConvertBatch, several of its coefficient batches so that field- */
+/* line tracing keeps many field lines in progress at once                   */
+#define UFUNC_BATCH (16 * AACGM_BATCH)
+
+/* Flag for the g2a_iter and a2g_iter ufuncs, passed to the conversion loop */
+/* with the direction, which adds the number of tracing iterations to the    */
+/* outputs                                                                   */
+#define UFUNC_ITER 256
+
+/* Flag for the ufuncs that hold the model lock while converting, so that */
+/* calls from several threads do not interleave their model times.  The    */
+/* unlocked ufuncs are used by callers that already hold the lock          */
+#define UFUNC_LOCK 512
+
+/* Lock serializing the use of the default model, shared with the wrapper */
+static PyObject *model_lock = NULL;
+
+/* Access element i of a one-dimensional (possibly strided) buffer view */
+#define BUF_ITEM(view, type, i) \
+  (*(type *)((char *)(view).buf + (i) * (view).strides[0]))
+
+/*****************************************************************************
+ * get_buffer: Request a one-dimensional buffer of doubles ('d') or C integers
+ *             ('i') from an object that supports the buffer protocol, such
+ *             as a numpy array.  Strided (including zero-stride, broadcast)
+ *             views are accepted so that no copies are required.
+ *
+ * Returns 0 on success and -1 (with a Python exception set) on failure.  The
+ * view must be released with PyBuffer_Release after a successful call.
+ *****************************************************************************/
+static int get_buffer(PyObject *obj, Py_buffer *view, char type, int writable,
+		      const char *name)
+{
+  int flags, good_fmt;
+  const char *fmt;
+
+  flags = PyBUF_STRIDES | PyBUF_FORMAT;
+  if(writable)
+    flags |= PyBUF_WRITABLE;
+
+  if(PyObject_GetBuffer(obj, view, flags) != 0)
+    {
+      PyErr_Clear();
+      PyErr_Format(PyExc_TypeError,
+		   "%s must be a %sone-dimensional buffer of type '%c'", name,
+		   writable ? "writable " : "", type);
+      return(-1);
+    }
+
+  /* Only native-order formats map directly onto C types */
+  fmt = (view->format == NULL) ? "B" : view->format;
+  if(fmt[0] == '@' || fmt[0] == '=')
+    fmt++;
+
+  if(type == 'd')
+    good_fmt = (fmt[0] == 'd' && fmt[1] == '\0'
+		&& view->itemsize == (Py_ssize_t)sizeof(double));
+  else
+    /* A 32-bit integer is labeled 'l' on platforms with a 32-bit long */
+    good_fmt = ((fmt[0] == 'i' || fmt[0] == 'l') && fmt[1] == '\0'
+		&& view->itemsize == (Py_ssize_t)sizeof(int));
+
+  if(view->ndim != 1 || !good_fmt)
+    {
+      PyErr_Format(PyExc_TypeError,
+		   "%s must be a one-dimensional buffer of type '%c', got "
+		   "format '%s' with %d dimensions", name, type,
+		   view->format == NULL ? "B" : view->format, view->ndim);
+      PyBuffer_Release(view);
+      return(-1);
+    }
+
+  return(0);
+}
+
+/*****************************************************************************
+ * get_buffers: Request a list of buffers that must all share the length of
+ *              the first buffer.  On failure, all views that were obtained
+ *              are released.
+ *****************************************************************************/
+static int get_buffers(int num, PyObject **objs, Py_buffer *views,
+		       const char *types, const int *writable,
+		       const char **names)
+{
+  int i, j;
+
+  for(i=0; i<num; i++)
+    {
+      if(get_buffer(objs[i], &views[i], types[i], writable[i], names[i]) < 0
+	 || (i > 0 && views[i].shape[0] != views[0].shape[0]))
+	{
+	  if(!PyErr_Occurred())
+	    {
+	      PyErr_Format(PyExc_ValueError,
+			   "%s has length %zd, expected %zd", names[i],
+			   views[i].shape[0], views[0].shape[0]);
+	      PyBuffer_Release(&views[i]);
+	    }
+
+	  for(j=0; j<i; j++)
+	    PyBuffer_Release(&views[j]);
+	  return(-1);
+	}
+    }
+
+  return(0);
+}
+
+static void release_buffers(int num, Py_buffer *views)
+{
+  int i;
+
+  for(i=0; i<num; i++)
+    PyBuffer_Release(&views[i]);
+}
+
+/*****************************************************************************
+ * prime_igrf_datetime: Bring the IGRF model time in line with the AACGM model
+ *                      time.  Field-line tracing sets the IGRF time for each
+ *                      location, which only updates the IGRF model when the
+ *                      time differs.
+ *****************************************************************************/
+static void prime_igrf_datetime(void)
+{
+  int yr, mo, dy, hr, mt, sc, dayno;
+
+  AACGM_v2_GetDateTime(&yr, &mo, &dy, &hr, &mt, &sc, &dayno);
+  if(yr >= 0)
+    IGRF_SetDateTime(yr, mo, dy, hr, mt, sc);
+}
+
+/*****************************************************************************
+ * epoch_to_ymdhms: Split seconds since 1970-01-01 00:00:00 UT into the date
+ *                  and (whole second) time of day.  Unlike gmtime, this is
+ *                  thread-safe and supports times before 1970 on all
+ *                  platforms.
+ *****************************************************************************/
+static void epoch_to_ymdhms(double epoch, int *yr, int *mo, int *dy, int *hr,
+			    int *mt, int *sc)
+{
+  long long secs, days, era, doe, yoe, doy, mp;
+
+  secs = (long long)floor(epoch);
+  days = secs / 86400;
+  secs = secs % 86400;
+  if(secs < 0)
+    {
+      secs += 86400;
+      days--;
+    }
+
+  *hr = (int)(secs / 3600);
+  *mt = (int)((secs % 3600) / 60);
+  *sc = (int)(secs % 60);
+
+  /* Convert days since 1970 to a civil date in the proleptic Gregorian */
+  /* calendar, using eras of 400 years that start on March 1             */
+  days += 719468;
+  era   = ((days >= 0) ? days : days - 146096) / 146097;
+  doe   = days - era * 146097;
+  yoe   = (doe - doe / 1460 + doe / 36524 - doe / 146096) / 365;
+  doy   = doe - (365 * yoe + yoe / 4 - yoe / 100);
+  mp    = (5 * doy + 2) / 153;
+  *dy   = (int)(doy - (153 * mp + 2) / 5 + 1);
+  *mo   = (int)((mp < 10) ? mp + 3 : mp - 9);
+  *yr   = (int)(yoe + era * 400 + ((*mo <= 2) ? 1 : 0));
+}
+
+/*****************************************************************************
+ * set_epoch_datetime: Set the AACGM model time from seconds since 1970, only
+ *                     updating the model if the (whole second) time differs
+ *                     from the current model time.
+ *
+ * Returns 0 on success or the AACGM_v2_SetDateTime error code on failure
+ *****************************************************************************/
+static int set_epoch_datetime(double epoch)
+{
+  int yr, mo, dy, hr, mt, sc, ayr, amo, ady, ahr, amt, asc, adayno;
+
+  if(!isfinite(epoch))
+    return(-1);
+
+  epoch_to_ymdhms(epoch, &yr, &mo, &dy, &hr, &mt, &sc);
+  AACGM_v2_GetDateTime(&ayr, &amo, &ady, &ahr, &amt, &asc, &adayno);
+
+  if(yr != ayr || mo != amo || dy != ady || hr != ahr || mt != amt
+     || sc != asc)
+    return(AACGM_v2_SetDateTime(yr, mo, dy, hr, mt, sc));
+
+  return(0);
+}
+
 static PyObject *aacgm_v2_setdatetime(PyObject *self, PyObject *args)
 {
   int year, month, day, hour, minute, second, err;
@@ -51,6 +255,408 @@ static PyObject *aacgm_v2_setdatetime(PyObject *self, PyObject *args)
   Py_RETURN_NONE;
 }
 
+/*****************************************************************************
+ * Model state: each model is held by a capsule, which frees the model when
+ *              it is garbage collected.  A model is selected for the calling
+ *              thread, and is used by all conversions in that thread until
+ *              the default model is restored.
+ *****************************************************************************/
+#define MODEL_CAPSULE "aacgmv2._aacgmv2.model"
+
+static void free_model_capsule(PyObject *capsule)
+{
+  AACGM_v2_FreeModel((AACGM_v2_Model *)PyCapsule_GetPointer(capsule,
+							    MODEL_CAPSULE));
+}
+
+static PyObject *aacgm_v2_new_model(PyObject *self, PyObject *args)
+{
+  const char *prefix, *igrf_file;
+  AACGM_v2_Model *model;
+  PyObject *capsule;
+
+  /* Parse the input as a tupple, allowing None for the default files */
+  if(!PyArg_ParseTuple(args, "zz", &prefix, &igrf_file))
+    return(NULL);
+
+  /* Allocate the model */
+  model = AACGM_v2_NewModel(prefix, igrf_file);
+  if(model == NULL)
+    {
+      PyErr_SetString(PyExc_RuntimeError,
+		      "unable to create model, check coefficient file names");
+      return(NULL);
+    }
+
+  capsule = PyCapsule_New(model, MODEL_CAPSULE, free_model_capsule);
+  if(capsule == NULL)
+    AACGM_v2_FreeModel(model);
+
+  return(capsule);
+}
+
+static PyObject *aacgm_v2_set_model(PyObject *self, PyObject *args)
+{
+  PyObject *capsule;
+  AACGM_v2_Model *model = NULL;
+
+  /* Parse the input as a tupple */
+  if(!PyArg_ParseTuple(args, "O", &capsule))
+    return(NULL);
+
+  if(capsule != Py_None)
+    {
+      model = (AACGM_v2_Model *)PyCapsule_GetPointer(capsule, MODEL_CAPSULE);
+      if(model == NULL)
+	return(NULL);
+    }
+
+  AACGM_v2_SetModel(model);
+
+  Py_RETURN_NONE;
+}
+
+/*****************************************************************************
+ * get_coeffs: Request a contiguous one-dimensional buffer of doubles, whose
+ *             length is a positive multiple of size.  Returns the number of
+ *             blocks of size doubles, or -1 (with a Python exception set) on
+ *             failure.  The view must be released with PyBuffer_Release
+ *             after a successful call.
+ *****************************************************************************/
+static Py_ssize_t get_coeffs(PyObject *obj, Py_buffer *view, Py_ssize_t size,
+			     const char *name)
+{
+  if(get_buffer(obj, view, 'd', 0, name) < 0)
+    return(-1);
+
+  if(!PyBuffer_IsContiguous(view, 'C') || view->shape[0] == 0
+     || view->shape[0] % size != 0)
+    {
+      PyErr_Format(PyExc_ValueError,
+		   "%s must be contiguous with a length that is a positive "
+		   "multiple of %zd, got %zd", name, size, view->shape[0]);
+      PyBuffer_Release(view);
+      return(-1);
+    }
+
+  return(view->shape[0] / size);
+}
+
+static PyObject *aacgm_v2_set_coeffs(PyObject *self, PyObject *args)
+{
+  int first_epoch, err;
+  Py_ssize_t nepoch;
+  PyObject *obj;
+  Py_buffer view;
+
+  /* Parse the input as a tupple */
+  if(!PyArg_ParseTuple(args, "iO", &first_epoch, &obj))
+    return(NULL);
+
+  if(obj == Py_None)
+    {
+      AACGM_v2_SetCoefs(0, 0, NULL);
+      Py_RETURN_NONE;
+    }
+
+  nepoch = get_coeffs(obj, &view, (Py_ssize_t)(sizeof(AACGM_v2_EpochCoefs)
+					       / sizeof(double)), "coeffs");
+  if(nepoch < 0)
+    return(NULL);
+
+  err = AACGM_v2_SetCoefs(first_epoch, (int)nepoch,
+			  (const AACGM_v2_EpochCoefs *)view.buf);
+  PyBuffer_Release(&view);
+
+  if(err == -4)
+    return(PyErr_NoMemory());
+  if(err != 0)
+    {
+      PyErr_Format(PyExc_ValueError,
+		   "first epoch must be a positive multiple of 5, got %d",
+		   first_epoch);
+      return(NULL);
+    }
+
+  Py_RETURN_NONE;
+}
+
+static PyObject *igrf_set_coeffs(PyObject *self, PyObject *args)
+{
+  int err;
+  Py_ssize_t nyear;
+  PyObject *coeff_obj, *sv_obj;
+  Py_buffer coeff_view, sv_view;
+
+  /* Parse the input as a tupple */
+  if(!PyArg_ParseTuple(args, "OO", &coeff_obj, &sv_obj))
+    return(NULL);
+
+  if(coeff_obj == Py_None)
+    {
+      IGRF_SetCoefs(0, NULL, NULL);
+      Py_RETURN_NONE;
+    }
+
+  nyear = get_coeffs(coeff_obj, &coeff_view, IGRF_MAXK, "coeffs");
+  if(nyear < 0)
+    return(NULL);
+
+  if(sv_obj != Py_None)
+    {
+      if(get_coeffs(sv_obj, &sv_view, IGRF_MAXK, "sv") < 0)
+	{
+	  PyBuffer_Release(&coeff_view);
+	  return(NULL);
+	}
+      if(sv_view.shape[0] != IGRF_MAXK)
+	{
+	  PyErr_Format(PyExc_ValueError, "sv has length %zd, expected %d",
+		       sv_view.shape[0], IGRF_MAXK);
+	  PyBuffer_Release(&sv_view);
+	  PyBuffer_Release(&coeff_view);
+	  return(NULL);
+	}
+    }
+
+  err = IGRF_SetCoefs((int)nyear, (const double *)coeff_view.buf,
+		      (sv_obj == Py_None) ? NULL : (const double *)sv_view.buf);
+  PyBuffer_Release(&coeff_view);
+  if(sv_obj != Py_None)
+    PyBuffer_Release(&sv_view);
+
+  if(err != 0)
+    {
+      PyErr_Format(PyExc_ValueError,
+		   "coeffs has %zd epochs, expected %d from %d to %d", nyear,
+		   (IGRF_LAST_EPOCH - IGRF_FIRST_EPOCH) / 5 + 1,
+		   IGRF_FIRST_EPOCH, IGRF_LAST_EPOCH);
+      return(NULL);
+    }
+
+  Py_RETURN_NONE;
+}
+
+static PyObject *memory_coeffs(PyObject *self, PyObject *args)
+{
+  return(Py_BuildValue("{s:N,s:N}", "aacgm",
+		       PyBool_FromLong(AACGM_v2_MemoryCoefs()), "igrf",
+		       PyBool_FromLong(IGRF_MemoryCoefs())));
+}
+
+static PyObject *aacgm_v2_set_cache_size(PyObject *self, PyObject *args)
+{
+  int size;
+
+  /* Parse the input as a tupple */
+  if(!PyArg_ParseTuple(args, "i", &size))
+    return(NULL);
+
+  if(AACGM_v2_SetCacheSize(size) != 0)
+    {
+      PyErr_Format(PyExc_ValueError,
+		   "cache size must be from 2 to %d epochs, or 0 for the default",
+		   AACGM_CACHE_MAX);
+      return(NULL);
+    }
+
+  Py_RETURN_NONE;
+}
+
+static PyObject *aacgm_v2_cache_stats(PyObject *self, PyObject *args)
+{
+  unsigned long hits, misses, loads;
+  int count, size;
+
+  AACGM_v2_GetCacheStats(&hits, &misses, &loads, &count, &size);
+
+  return(Py_BuildValue("{s:k,s:k,s:k,s:i,s:i}", "hits", hits, "misses",
+		       misses, "loads", loads, "cached", count, "size", size));
+}
+
+static PyObject *mlt_v2_cache_stats(PyObject *self, PyObject *args)
+{
+  unsigned long hits, misses, avoided;
+  int count, size;
+
+  MLT_v2_GetCacheStats(&hits, &misses, &count, &size, &avoided);
+
+  return(Py_BuildValue("{s:k,s:k,s:i,s:i,s:k}", "hits", hits, "misses", misses,
+		       "cached", count, "size", size, "avoided", avoided));
+}
+
+static PyObject *aacgm_v2_stats(PyObject *self, PyObject *args)
+{
+  AACGM_v2_Stats stats;
+
+  AACGM_v2_GetStats(&stats);
+
+  return(Py_BuildValue("{s:k,s:d,s:k,s:d,s:k,s:d,s:k,s:d,s:k,s:k,s:k,s:d}",
+		       "coef_loads", stats.coef_loads, "coef_load_time",
+		       stats.coef_load_time, "time_interps",
+		       stats.time_interps, "time_interp_time",
+		       stats.time_interp_time, "height_interps",
+		       stats.height_interps, "height_interp_time",
+		       stats.height_interp_time, "mlon_refs", stats.mlon_refs,
+		       "mlon_ref_time", stats.mlon_ref_time, "traces",
+		       stats.traces, "trace_steps", stats.trace_steps,
+		       "trace_bisections", stats.trace_bisections, "trace_time",
+		       stats.trace_time));
+}
+
+static PyObject *aacgm_v2_reset_stats(PyObject *self, PyObject *args)
+{
+  AACGM_v2_ResetStats();
+
+  Py_RETURN_NONE;
+}
+
+static PyObject *aacgm_v2_lock(PyObject *self, PyObject *args)
+{
+  AACGM_v2_Lock();
+
+  Py_RETURN_NONE;
+}
+
+static PyObject *aacgm_v2_unlock(PyObject *self, PyObject *args)
+{
+  AACGM_v2_Unlock();
+
+  Py_RETURN_NONE;
+}
+
+static PyObject *aacgm_v2_locked(PyObject *self, PyObject *args)
+{
+  return(PyBool_FromLong(AACGM_v2_Locked()));
+}
+
+static PyObject *aacgm_v2_next_epoch(PyObject *self, PyObject *args)
+{
+  return(PyLong_FromLong(AACGM_v2_NextEpoch()));
+}
+
+/*****************************************************************************
+ * Staged coefficients: the coefficients for an epoch read from an ASCII
+ *                      coefficient file without using a model, held by a
+ *                      capsule until prefetch puts them in the model cache.
+ *****************************************************************************/
+#define STAGED_CAPSULE "aacgmv2._aacgmv2.staged"
+
+typedef struct {
+  char fname[256];
+  AACGM_v2_EpochCoefs *coefs;
+} StagedCoefs;
+
+static void free_staged_capsule(PyObject *capsule)
+{
+  StagedCoefs *staged;
+
+  staged = (StagedCoefs *)PyCapsule_GetPointer(capsule, STAGED_CAPSULE);
+  if(staged != NULL)
+    {
+      free(staged->coefs);
+      free(staged);
+    }
+}
+
+static PyObject *aacgm_v2_stage_file(PyObject *self, PyObject *args)
+{
+  int year;
+  char fname[256];
+
+  /* Parse the input as a tupple */
+  if(!PyArg_ParseTuple(args, "i", &year))
+    return(NULL);
+
+  if(AACGM_v2_StageFile(year, fname) != 1)
+    Py_RETURN_NONE;
+
+  return(PyUnicode_DecodeFSDefault(fname));
+}
+
+static PyObject *aacgm_v2_load_coeffs(PyObject *self, PyObject *args)
+{
+  int err;
+  const char *fname;
+  StagedCoefs *staged;
+  PyObject *capsule;
+
+  /* Parse the input as a tupple */
+  if(!PyArg_ParseTuple(args, "s", &fname))
+    return(NULL);
+
+  if(strlen(fname) >= sizeof(staged->fname))
+    {
+      PyErr_SetString(PyExc_ValueError, "coefficient file name is too long");
+      return(NULL);
+    }
+
+  staged = (StagedCoefs *)malloc(sizeof(StagedCoefs));
+  if(staged == NULL)
+    return(PyErr_NoMemory());
+  staged->coefs = (AACGM_v2_EpochCoefs *)malloc(sizeof(AACGM_v2_EpochCoefs));
+  if(staged->coefs == NULL)
+    {
+      free(staged);
+      return(PyErr_NoMemory());
+    }
+  strcpy(staged->fname, fname);
+
+  /* Read the coefficients without holding the GIL */
+  Py_BEGIN_ALLOW_THREADS
+  err = AACGM_v2_LoadCoef(staged->fname, staged->coefs);
+  Py_END_ALLOW_THREADS
+
+  if(err != 0)
+    {
+      free(staged->coefs);
+      free(staged);
+      Py_RETURN_NONE;
+    }
+
+  capsule = PyCapsule_New(staged, STAGED_CAPSULE, free_staged_capsule);
+  if(capsule == NULL)
+    {
+      free(staged->coefs);
+      free(staged);
+    }
+
+  return(capsule);
+}
+
+static PyObject *aacgm_v2_prefetch(PyObject *self, PyObject *args)
+{
+  int year, err;
+  PyObject *capsule = Py_None;
+  StagedCoefs *staged = NULL;
+  AACGM_v2_EpochCoefs *coefs = NULL;
+
+  /* Parse the input as a tupple */
+  if(!PyArg_ParseTuple(args, "i|O", &year, &capsule))
+    return(NULL);
+
+  if(capsule != Py_None)
+    {
+      staged = (StagedCoefs *)PyCapsule_GetPointer(capsule, STAGED_CAPSULE);
+      if(staged == NULL)
+	return(NULL);
+
+      /* The cache takes ownership of the staged coefficients */
+      coefs = staged->coefs;
+      staged->coefs = NULL;
+    }
+
+  /* Read any coefficients that were not staged without holding the GIL */
+  Py_BEGIN_ALLOW_THREADS
+  if(coefs != NULL)
+    err = AACGM_v2_AdoptCoefs(year, staged->fname, coefs);
+  else
+    err = AACGM_v2_PrefetchCoefs(year);
+  Py_END_ALLOW_THREADS
+
+  return(PyBool_FromLong(err == 0));
+}
+
 static PyObject *aacgm_v2_convert_arr(PyObject *self, PyObject *args)
 {
   int code, err;
@@ -116,6 +722,70 @@ static PyObject *aacgm_v2_convert_arr(PyObject *self, PyObject *args)
   return allOut;
 }
 
+static PyObject *aacgm_v2_convert_buf(PyObject *self, PyObject *args)
+{
+  int code, err;
+
+  long int nbad;
+
+  Py_ssize_t i, in_num;
+
+  double out_lat, out_lon, out_r;
+
+  PyObject *objs[7];
+
+  Py_buffer views[7];
+
+  static const char types[7] = {'d', 'd', 'd', 'd', 'd', 'd', 'i'};
+  static const int writable[7] = {0, 0, 0, 1, 1, 1, 1};
+  static const char *names[7] = {"in_lat", "in_lon", "height", "out_lat",
+				 "out_lon", "out_r", "err"};
+
+  /* Parse the input as a tuple */
+  if(!PyArg_ParseTuple(args, "OOOiOOOO", &objs[0], &objs[1], &objs[2], &code,
+		       &objs[3], &objs[4], &objs[5], &objs[6]))
+    return(NULL);
+
+  /* Access the array data without copying */
+  if(get_buffers(7, objs, views, types, writable, names) < 0)
+    return(NULL);
+
+  /* Set the IGRF time used for tracing now, so that it is only read within */
+  /* the loop and multiple threads may trace concurrently                   */
+  if(code & (TRACE | ALLOWTRACE))
+    prime_igrf_datetime();
+
+  /* Cycle through all of the inputs without holding the GIL */
+  in_num = views[0].shape[0];
+  nbad   = 0;
+  Py_BEGIN_ALLOW_THREADS
+  for(i=0; i<in_num; i++)
+    {
+      /* Call the AACGM routine */
+      err = AACGM_v2_Convert(BUF_ITEM(views[0], double, i),
+			     BUF_ITEM(views[1], double, i),
+			     BUF_ITEM(views[2], double, i), &out_lat, &out_lon,
+			     &out_r, code);
+
+      /* Set the output, using NaN as the fill value */
+      if(err < 0)
+	{
+	  nbad++;
+	  out_lat = out_lon = out_r = Py_NAN;
+	}
+
+      BUF_ITEM(views[3], double, i) = out_lat;
+      BUF_ITEM(views[4], double, i) = out_lon;
+      BUF_ITEM(views[5], double, i) = out_r;
+      BUF_ITEM(views[6], int, i)    = (err < 0) ? err : 0;
+    }
+  Py_END_ALLOW_THREADS
+
+  release_buffers(7, views);
+
+  return PyLong_FromLong(nbad);
+}
+
 static PyObject *aacgm_v2_convert(PyObject *self, PyObject *args)
 {
   int code, err;
@@ -183,6 +853,74 @@ static PyObject *mltconvert_v2_arr(PyObject *self, PyObject *args)
   return mltOut;
 }
 
+/*****************************************************************************
+ * mlt_buf: Shared driver for the forward and inverse MLT buffer routines,
+ *          which accept the same arguments
+ *****************************************************************************/
+static PyObject *mlt_buf(PyObject *args, int inverse)
+{
+  int yr, mo, dy, hr, mt, sc;
+
+  Py_ssize_t i, in_num;
+
+  double in_val;
+
+  PyObject *objs[8];
+
+  Py_buffer views[8];
+
+  static const char types[8] = {'i', 'i', 'i', 'i', 'i', 'i', 'd', 'd'};
+  static const int writable[8] = {0, 0, 0, 0, 0, 0, 0, 1};
+  static const char *mlt_names[8] = {"yr", "mo", "dy", "hr", "mt", "sc",
+				     "mlon", "out"};
+  static const char *inv_names[8] = {"yr", "mo", "dy", "hr", "mt", "sc",
+				     "mlt", "out"};
+
+  /* Parse the input as a tuple */
+  if(!PyArg_ParseTuple(args, "OOOOOOOO", &objs[0], &objs[1], &objs[2],
+		       &objs[3], &objs[4], &objs[5], &objs[6], &objs[7]))
+    return(NULL);
+
+  /* Access the array data without copying */
+  if(get_buffers(8, objs, views, types, writable,
+		 inverse ? inv_names : mlt_names) < 0)
+    return(NULL);
+
+  /* Cycle through all of the inputs without holding the GIL */
+  in_num = views[0].shape[0];
+  Py_BEGIN_ALLOW_THREADS
+  for(i=0; i<in_num; i++)
+    {
+      yr     = BUF_ITEM(views[0], int, i);
+      mo     = BUF_ITEM(views[1], int, i);
+      dy     = BUF_ITEM(views[2], int, i);
+      hr     = BUF_ITEM(views[3], int, i);
+      mt     = BUF_ITEM(views[4], int, i);
+      sc     = BUF_ITEM(views[5], int, i);
+      in_val = BUF_ITEM(views[6], double, i);
+
+      /* Call the AACGM routine */
+      BUF_ITEM(views[7], double, i) = inverse
+	? inv_MLTConvertYMDHMS_v2(yr, mo, dy, hr, mt, sc, in_val)
+	: MLTConvertYMDHMS_v2(yr, mo, dy, hr, mt, sc, in_val);
+    }
+  Py_END_ALLOW_THREADS
+
+  release_buffers(8, views);
+
+  Py_RETURN_NONE;
+}
+
+static PyObject *mltconvert_v2_buf(PyObject *self, PyObject *args)
+{
+  return mlt_buf(args, 0);
+}
+
+static PyObject *inv_mltconvert_v2_buf(PyObject *self, PyObject *args)
+{
+  return mlt_buf(args, 1);
+}
+
 static PyObject *mltconvert_v2(PyObject *self, PyObject *args)
 { 
   int yr, mo, dy, hr, mt, sc;
@@ -236,58 +974,506 @@ static PyObject *inv_mltconvert_v2_arr(PyObject *self, PyObject *args)
   in_num  = PyList_Size(mltIn);
   lonOut = PyList_New(in_num);
 
-  /* Cycle through all of the inputs */
-  for(i=0; i<in_num; i++)
-    {
-      /* Read in the input */
-      in_yr = (int) PyInt_AsLong(PyList_GetItem(yrIn, i));
-      in_mo = (int) PyInt_AsLong(PyList_GetItem(moIn, i));
-      in_dy = (int) PyInt_AsLong(PyList_GetItem(dyIn, i));
-      in_hr = (int) PyInt_AsLong(PyList_GetItem(hrIn, i));
-      in_mt = (int) PyInt_AsLong(PyList_GetItem(mtIn, i));
-      in_sc = (int) PyInt_AsLong(PyList_GetItem(scIn, i));
-      in_mlt = PyFloat_AsDouble(PyList_GetItem(mltIn, i));
-	       
-      /* Call the AACGM routine */
-      out_lon = inv_MLTConvertYMDHMS_v2(in_yr, in_mo, in_dy, in_hr, in_mt,
-					in_sc, in_mlt);
-      
-      PyList_SetItem(lonOut, i, PyFloat_FromDouble(out_lon));
-    }
+  /* Cycle through all of the inputs */
+  for(i=0; i<in_num; i++)
+    {
+      /* Read in the input */
+      in_yr = (int) PyInt_AsLong(PyList_GetItem(yrIn, i));
+      in_mo = (int) PyInt_AsLong(PyList_GetItem(moIn, i));
+      in_dy = (int) PyInt_AsLong(PyList_GetItem(dyIn, i));
+      in_hr = (int) PyInt_AsLong(PyList_GetItem(hrIn, i));
+      in_mt = (int) PyInt_AsLong(PyList_GetItem(mtIn, i));
+      in_sc = (int) PyInt_AsLong(PyList_GetItem(scIn, i));
+      in_mlt = PyFloat_AsDouble(PyList_GetItem(mltIn, i));
+	       
+      /* Call the AACGM routine */
+      out_lon = inv_MLTConvertYMDHMS_v2(in_yr, in_mo, in_dy, in_hr, in_mt,
+					in_sc, in_mlt);
+      
+      PyList_SetItem(lonOut, i, PyFloat_FromDouble(out_lon));
+    }
+
+  return lonOut;
+}
+
+static PyObject *inv_mltconvert_v2(PyObject *self, PyObject *args)
+{ 
+  int yr, mo, dy, hr, mt, sc;
+
+  double mlon, mlt;
+
+  /* Parse the input as a tupple */
+  if(!PyArg_ParseTuple(args, "iiiiiid", &yr, &mo, &dy, &hr, &mt, &sc, &mlt))
+    return(NULL);
+
+  /* Call the AACGM routine */
+  mlon = inv_MLTConvertYMDHMS_v2(yr, mo, dy, hr, mt, sc, mlt);
+    
+  return Py_BuildValue("d", mlon);
+}
+
+static PyObject *inv_mltconvert_yrsec_v2(PyObject *self, PyObject *args)
+{
+  int yr, yr_sec;
+
+  double mlon, mlt;
+
+  /* Parse the input as a tupple */
+  if(!PyArg_ParseTuple(args, "iid", &yr, &yr_sec, &mlt))
+    return(NULL);
+
+  /* Call the AACGM routine */
+  mlon = inv_MLTConvertYrsec_v2(yr, yr_sec, mlt);
+
+  return Py_BuildValue("d", mlon);
+}
+
+/*****************************************************************************
+ * NumPy ufunc inner loops
+ *****************************************************************************/
+
+/*****************************************************************************
+ * call_model_lock: Acquire or release the model lock from an inner loop,
+ *                  which may run without the GIL
+ *
+ * Returns 0 on success and -1 on failure, leaving the Python error set
+ *****************************************************************************/
+static int call_model_lock(const char *method)
+{
+  int ret;
+
+  PyObject *res;
+
+  PyGILState_STATE state;
+
+  state = PyGILState_Ensure();
+  res   = PyObject_CallMethod(model_lock, method, NULL);
+  ret   = (res == NULL) ? -1 : 0;
+  Py_XDECREF(res);
+  PyGILState_Release(state);
+
+  return(ret);
+}
+
+/*****************************************************************************
+ * convert_ufunc_loop: Inner loop for the g2a and a2g ufuncs, with inputs lat,
+ *                     lon, height, time (seconds since 1970), and code and
+ *                     outputs lat, lon, and r.  The conversion direction is
+ *                     passed through `data`, with the UFUNC_ITER flag for the
+ *                     g2a_iter and a2g_iter ufuncs, which also output the
+ *                     number of tracing iterations, and the UFUNC_LOCK flag
+ *                     to hold the model lock.
+ *****************************************************************************/
+static void convert_ufunc_loop(char **args, const npy_intp *dimensions,
+			       const npy_intp *steps, void *data)
+{
+  int code, err, primed, direction, iter, locked, nb, j;
+
+  int batch_err[UFUNC_BATCH];
+
+  unsigned long batch_iter[UFUNC_BATCH];
+
+  npy_intp i, n, start;
+
+  double epoch;
+
+  double batch_lat[UFUNC_BATCH], batch_lon[UFUNC_BATCH];
+  double batch_h[UFUNC_BATCH], batch_out_lat[UFUNC_BATCH];
+  double batch_out_lon[UFUNC_BATCH], batch_out_r[UFUNC_BATCH];
+
+  char *in_lat = args[0], *in_lon = args[1], *in_h = args[2];
+  char *in_time = args[3], *in_code = args[4];
+  char *lat_out = args[5], *lon_out = args[6], *r_out = args[7];
+
+  n         = dimensions[0];
+  direction = (int)(Py_intptr_t)data & A2G;
+  iter      = (int)(Py_intptr_t)data & UFUNC_ITER;
+  locked    = (int)(Py_intptr_t)data & UFUNC_LOCK;
+  primed    = 0;
+  epoch     = Py_NAN;
+
+  /* Without the lock, the outputs are NaN and the Python error is raised */
+  if(locked && call_model_lock("acquire") < 0)
+    {
+      for(i=0; i<n; i++)
+	{
+	  *(double *)(lat_out + i * steps[5]) = Py_NAN;
+	  *(double *)(lon_out + i * steps[6]) = Py_NAN;
+	  *(double *)(r_out + i * steps[7])   = Py_NAN;
+	  if(iter)
+	    *(npy_int64 *)(args[8] + i * steps[8]) = 0;
+	}
+      return;
+    }
+
+  i = 0;
+  while(i < n)
+    {
+      code = ((int)(*(npy_int64 *)(in_code + i * steps[4])) & ~A2G)
+	| direction;
+
+      /* Only update the model if the time has changed */
+      err = 0;
+      if(*(double *)(in_time + i * steps[3]) != epoch)
+	{
+	  epoch  = *(double *)(in_time + i * steps[3]);
+	  err    = set_epoch_datetime(epoch);
+	  primed = 0;
+	}
+
+      /* Set the IGRF time before tracing, see prime_igrf_datetime */
+      if(err == 0 && !primed && (code & (TRACE | ALLOWTRACE)))
+	{
+	  prime_igrf_datetime();
+	  primed = 1;
+	}
+
+      /* Gather a batch of locations with this time and code */
+      start = i;
+      nb    = 0;
+      do
+	{
+	  batch_lat[nb] = *(double *)(in_lat + i * steps[0]);
+	  batch_lon[nb] = *(double *)(in_lon + i * steps[1]);
+	  batch_h[nb]   = *(double *)(in_h + i * steps[2]);
+	  nb++;
+	  i++;
+	}
+      while(nb < UFUNC_BATCH && i < n
+	    && *(double *)(in_time + i * steps[3]) == epoch
+	    && (((int)(*(npy_int64 *)(in_code + i * steps[4])) & ~A2G)
+		| direction) == code);
+
+      /* Convert the batch, or each location for the scalar engine */
+      if(err != 0)
+	for(j=0; j<nb; j++)
+	  {
+	    batch_err[j]  = err;
+	    batch_iter[j] = 0;
+	  }
+      else if(code & SCALAR)
+	for(j=0; j<nb; j++)
+	  {
+	    batch_err[j] = AACGM_v2_Convert(batch_lat[j], batch_lon[j],
+					    batch_h[j], &batch_out_lat[j],
+					    &batch_out_lon[j], &batch_out_r[j],
+					    code & ~SCALAR);
+	    batch_iter[j] = AACGM_v2_TraceIter();
+	  }
+      else
+	AACGM_v2_ConvertBatchIter(nb, batch_lat, batch_lon, batch_h,
+				  batch_out_lat, batch_out_lon, batch_out_r,
+				  batch_err, iter ? batch_iter : NULL, code);
+
+      /* Set the output, using NaN as the fill value */
+      for(j=0; j<nb; j++)
+	{
+	  if(batch_err[j] < 0)
+	    batch_out_lat[j] = batch_out_lon[j] = batch_out_r[j] = Py_NAN;
+
+	  *(double *)(lat_out + (start + j) * steps[5]) = batch_out_lat[j];
+	  *(double *)(lon_out + (start + j) * steps[6]) = batch_out_lon[j];
+	  *(double *)(r_out + (start + j) * steps[7])   = batch_out_r[j];
+	  if(iter)
+	    *(npy_int64 *)(args[8] + (start + j) * steps[8])
+	      = (npy_int64)batch_iter[j];
+	}
+    }
+
+  if(locked)
+    call_model_lock("release");
+}
+
+/*****************************************************************************
+ * mlt_ufunc_loop: Inner loop for the mlt and inv_mlt ufuncs, with inputs
+ *                 magnetic longitude or MLT and time (seconds since 1970) and
+ *                 a single output.  The direction is passed through `data`,
+ *                 with the UFUNC_LOCK flag to hold the model lock.
+ *****************************************************************************/
+static void mlt_ufunc_loop(char **args, const npy_intp *dimensions,
+			   const npy_intp *steps, void *data)
+{
+  int yr, mo, dy, hr, mt, sc, inverse, locked;
+
+  npy_intp i, n;
+
+  double epoch;
+
+  char *in_val = args[0], *in_time = args[1], *out = args[2];
+
+  n       = dimensions[0];
+  inverse = (int)(Py_intptr_t)data & 1;
+  locked  = (int)(Py_intptr_t)data & UFUNC_LOCK;
+
+  /* Without the lock, the outputs are NaN and the Python error is raised */
+  if(locked && call_model_lock("acquire") < 0)
+    {
+      for(i=0; i<n; i++)
+	*(double *)(out + i * steps[2]) = Py_NAN;
+      return;
+    }
+
+  for(i=0; i<n; i++)
+    {
+      epoch = *(double *)in_time;
+
+      if(!isfinite(epoch))
+	*(double *)out = Py_NAN;
+      else
+	{
+	  epoch_to_ymdhms(epoch, &yr, &mo, &dy, &hr, &mt, &sc);
+	  *(double *)out = inverse
+	    ? inv_MLTConvertYMDHMS_v2(yr, mo, dy, hr, mt, sc,
+				      *(double *)in_val)
+	    : MLTConvertYMDHMS_v2(yr, mo, dy, hr, mt, sc, *(double *)in_val);
+	}
+
+      in_val  += steps[0];
+      in_time += steps[1];
+      out     += steps[2];
+    }
+
+  if(locked)
+    call_model_lock("release");
+}
+
+static PyUFuncGenericFunction convert_ufunc_funcs[] = {&convert_ufunc_loop};
+static PyUFuncGenericFunction mlt_ufunc_funcs[] = {&mlt_ufunc_loop};
+
+static void *g2a_ufunc_data[] = {(void *)(G2A | UFUNC_LOCK)};
+static void *a2g_ufunc_data[] = {(void *)(A2G | UFUNC_LOCK)};
+static void *g2a_iter_ufunc_data[] = {(void *)(G2A | UFUNC_ITER | UFUNC_LOCK)};
+static void *a2g_iter_ufunc_data[] = {(void *)(A2G | UFUNC_ITER | UFUNC_LOCK)};
+static void *mlt_ufunc_data[] = {(void *)(0 | UFUNC_LOCK)};
+static void *inv_mlt_ufunc_data[] = {(void *)(1 | UFUNC_LOCK)};
+static void *g2a_nolock_ufunc_data[] = {(void *)G2A};
+static void *a2g_nolock_ufunc_data[] = {(void *)A2G};
+static void *g2a_iter_nolock_ufunc_data[] = {(void *)(G2A | UFUNC_ITER)};
+static void *a2g_iter_nolock_ufunc_data[] = {(void *)(A2G | UFUNC_ITER)};
+
+static char convert_ufunc_types[] = {NPY_DOUBLE, NPY_DOUBLE, NPY_DOUBLE,
+				     NPY_DOUBLE, NPY_INT64, NPY_DOUBLE,
+				     NPY_DOUBLE, NPY_DOUBLE, NPY_INT64};
+static char mlt_ufunc_types[] = {NPY_DOUBLE, NPY_DOUBLE, NPY_DOUBLE};
+
+static const char g2a_doc[] = "\
+Converts from geographic/detic to AACGM-v2 coordinates.\n\
+\n\
+Parameters\n\
+-------------\n\
+in_lat : array_like\n\
+    Input latitudes in degrees N (code specifies type of latitude)\n\
+in_lon : array_like\n\
+    Input longitudes in degrees E (code specifies type of longitude)\n\
+height : array_like\n\
+    Altitudes above the surface of the earth in km\n\
+time : array_like\n\
+    Universal Time in seconds since 1970-01-01 00:00:00\n\
+code : array_like\n\
+    Bitwise code for passing options into converter, as for `convert`.  The\n\
+    A2G bit is ignored.  If the SCALAR bit is set, locations are converted\n\
+    one at a time rather than in batches.\n\
+\n\
+Returns\n\
+-------\n\
+out_lat : ndarray\n\
+    Output latitudes in degrees\n\
+out_lon : ndarray\n\
+    Output longitudes in degrees\n\
+out_r : ndarray\n\
+    Geocentric radial distances in Re\n\
+\n\
+Notes \n\
+-----\n\
+Locations that could not be converted are set to NaN.  The model time is set\n\
+to the whole second, and is only updated when the time changes between\n\
+successive elements, so sorting by time is most efficient.  The model time\n\
+is global, so this should not be run concurrently with conversions at a\n\
+different time.\n\
+\n\
+Successive locations with the same time and code are converted in batches,\n\
+evaluating the spherical harmonic expansion for the batch at once.  Batches\n\
+with more than one height may differ from `convert` by rounding.  Field lines\n\
+in a batch are traced together, and may differ from `convert` within the\n\
+accuracy of the trace.\n";
+
+static const char a2g_doc[] = "\
+Converts from AACGM-v2 to geographic/detic coordinates.\n\
+\n\
+Parameters\n\
+-------------\n\
+in_lat : array_like\n\
+    Input AACGM-v2 latitudes in degrees N\n\
+in_lon : array_like\n\
+    Input AACGM-v2 longitudes in degrees E\n\
+height : array_like\n\
+    Altitudes above the surface of the earth in km\n\
+time : array_like\n\
+    Universal Time in seconds since 1970-01-01 00:00:00\n\
+code : array_like\n\
+    Bitwise code for passing options into converter, as for `convert`.  The\n\
+    A2G bit is always set, and the SCALAR bit is as for `g2a`.\n\
+\n\
+Returns\n\
+-------\n\
+out_lat : ndarray\n\
+    Output latitudes in degrees (code specifies type of latitude)\n\
+out_lon : ndarray\n\
+    Output longitudes in degrees\n\
+out_r : ndarray\n\
+    Altitudes above the surface of the earth in km, or geocentric radial\n\
+    distance in km if GEOCENTRIC is set\n\
+\n\
+Notes \n\
+-----\n\
+Locations that could not be converted are set to NaN.  The model time is set\n\
+and locations are batched as for `g2a`.\n";
+
+static const char g2a_iter_doc[] = "\
+Converts from geographic/detic to AACGM-v2 coordinates, as `g2a`, also\n\
+returning the number of field-line tracing iterations.\n\
+\n\
+Parameters\n\
+-------------\n\
+in_lat, in_lon, height, time, code : array_like\n\
+    See `g2a`\n\
+\n\
+Returns\n\
+-------\n\
+out_lat, out_lon, out_r : ndarray\n\
+    See `g2a`\n\
+niter : ndarray\n\
+    Number of RK45 steps and bisection steps used to trace each location, or\n\
+    0 for locations converted with the coefficients\n";
+
+static const char a2g_iter_doc[] = "\
+Converts from AACGM-v2 to geographic/detic coordinates, as `a2g`, also\n\
+returning the number of field-line tracing iterations.\n\
+\n\
+Parameters\n\
+-------------\n\
+in_lat, in_lon, height, time, code : array_like\n\
+    See `a2g`\n\
+\n\
+Returns\n\
+-------\n\
+out_lat, out_lon, out_r : ndarray\n\
+    See `a2g`\n\
+niter : ndarray\n\
+    Number of RK45 steps and bisection steps used to trace each location, or\n\
+    0 for locations converted with the coefficients\n";
+
+static const char g2a_nolock_doc[] = "\
+Converts as `g2a`, without holding the model lock.  The caller must hold\n\
+the lock, or use a model of its own, while converting.\n\
+\n\
+Parameters\n\
+-------------\n\
+in_lat, in_lon, height, time, code : array_like\n\
+    See `g2a`\n\
+\n\
+Returns\n\
+-------\n\
+out_lat, out_lon, out_r : ndarray\n\
+    See `g2a`\n";
 
-  return lonOut;
-}
+static const char a2g_nolock_doc[] = "\
+Converts as `a2g`, without holding the model lock.  The caller must hold\n\
+the lock, or use a model of its own, while converting.\n\
+\n\
+Parameters\n\
+-------------\n\
+in_lat, in_lon, height, time, code : array_like\n\
+    See `a2g`\n\
+\n\
+Returns\n\
+-------\n\
+out_lat, out_lon, out_r : ndarray\n\
+    See `a2g`\n";
 
-static PyObject *inv_mltconvert_v2(PyObject *self, PyObject *args)
-{ 
-  int yr, mo, dy, hr, mt, sc;
+static const char g2a_iter_nolock_doc[] = "\
+Converts as `g2a_iter`, without holding the model lock.  The caller must hold\n\
+the lock, or use a model of its own, while converting.\n\
+\n\
+Parameters\n\
+-------------\n\
+in_lat, in_lon, height, time, code : array_like\n\
+    See `g2a_iter`\n\
+\n\
+Returns\n\
+-------\n\
+out_lat, out_lon, out_r, niter : ndarray\n\
+    See `g2a_iter`\n";
 
-  double mlon, mlt;
+static const char a2g_iter_nolock_doc[] = "\
+Converts as `a2g_iter`, without holding the model lock.  The caller must hold\n\
+the lock, or use a model of its own, while converting.\n\
+\n\
+Parameters\n\
+-------------\n\
+in_lat, in_lon, height, time, code : array_like\n\
+    See `a2g_iter`\n\
+\n\
+Returns\n\
+-------\n\
+out_lat, out_lon, out_r, niter : ndarray\n\
+    See `a2g_iter`\n";
 
-  /* Parse the input as a tupple */
-  if(!PyArg_ParseTuple(args, "iiiiiid", &yr, &mo, &dy, &hr, &mt, &sc, &mlt))
-    return(NULL);
+static const char mlt_doc[] = "\
+Converts from universal time and magnetic longitude to magnetic local time.\n\
+\n\
+Parameters\n\
+-------------\n\
+mlon : array_like\n\
+    Magnetic longitude in degrees E\n\
+time : array_like\n\
+    Universal Time in seconds since 1970-01-01 00:00:00, used to the whole\n\
+    second\n\
+\n\
+Returns\n\
+-------\n\
+mlt : ndarray\n\
+    Magnetic local time (hours)\n";
 
-  /* Call the AACGM routine */
-  mlon = inv_MLTConvertYMDHMS_v2(yr, mo, dy, hr, mt, sc, mlt);
-    
-  return Py_BuildValue("d", mlon);
-}
+static const char inv_mlt_doc[] = "\
+Converts from universal time and magnetic local time to magnetic longitude.\n\
+\n\
+Parameters\n\
+-------------\n\
+mlt : array_like\n\
+    Magnetic local time in hours\n\
+time : array_like\n\
+    Universal Time in seconds since 1970-01-01 00:00:00, used to the whole\n\
+    second\n\
+\n\
+Returns\n\
+-------\n\
+mlon : ndarray\n\
+    Magnetic longitude (degrees)\n";
 
-static PyObject *inv_mltconvert_yrsec_v2(PyObject *self, PyObject *args)
+/*****************************************************************************
+ * add_ufunc: Create a ufunc with a single loop and add it to the module
+ *
+ * Returns 0 on success and -1 on failure
+ *****************************************************************************/
+static int add_ufunc(PyObject *mod, PyUFuncGenericFunction *funcs,
+		     void **data, char *types, int nin, int nout,
+		     const char *name, const char *doc)
 {
-  int yr, yr_sec;
-
-  double mlon, mlt;
+  PyObject *ufunc;
 
-  /* Parse the input as a tupple */
-  if(!PyArg_ParseTuple(args, "iid", &yr, &yr_sec, &mlt))
-    return(NULL);
+  ufunc = PyUFunc_FromFuncAndData(funcs, data, types, 1, nin, nout,
+				  PyUFunc_None, name, doc, 0);
+  if(ufunc == NULL)
+    return(-1);
 
-  /* Call the AACGM routine */
-  mlon = inv_MLTConvertYrsec_v2(yr, yr_sec, mlt);
+  if(PyModule_AddObject(mod, name, ufunc) < 0)
+    {
+      Py_DECREF(ufunc);
+      return(-1);
+    }
 
-  return Py_BuildValue("d", mlon);
+  return(0);
 }
 
 static PyMethodDef aacgm_v2_methods[] = {
@@ -314,6 +1500,264 @@ second : int\n\
 Returns\n\
 -------------\n\
 Void\n" },
+  { "new_model", aacgm_v2_new_model, METH_VARARGS,
+    "new_model(coeff_prefix, igrf_file)\n\
+\n\
+Create a model state with its own coefficients, date and time.\n\
+\n\
+Parameters\n\
+-------------\n\
+coeff_prefix : str or NoneType\n\
+    AACGM-v2 coefficient file prefix, or None to use the\n\
+    AACGM_v2_DAT_PREFIX environment variable\n\
+igrf_file : str or NoneType\n\
+    IGRF coefficient file, or None to use the IGRF_COEFFS environment\n\
+    variable\n\
+\n\
+Returns\n\
+-------------\n\
+model : PyCapsule\n\
+    Model state, freed when garbage collected\n\
+\n\
+Notes\n\
+-------------\n\
+The coefficients are loaded when the model date and time are first set.\n" },
+  { "set_model", aacgm_v2_set_model, METH_VARARGS,
+    "set_model(model)\n\
+\n\
+Select the model state used by conversions in the calling thread.\n\
+\n\
+Parameters\n\
+-------------\n\
+model : PyCapsule or NoneType\n\
+    Model state from new_model, or None to select the default model\n\
+\n\
+Returns\n\
+-------------\n\
+Void\n\
+\n\
+Notes\n\
+-------------\n\
+The model must stay selected by at most one thread at a time, and must be\n\
+deselected before it is garbage collected.\n" },
+  { "set_coeffs", aacgm_v2_set_coeffs, METH_VARARGS,
+    "set_coeffs(first_epoch, coeffs)\n\
+\n\
+Set the AACGM-v2 coefficients of the current model from memory.\n\
+\n\
+Parameters\n\
+-------------\n\
+first_epoch : int\n\
+    Year of the first 5-year epoch\n\
+coeffs : buffer or NoneType\n\
+    Contiguous float64 coefficients for consecutive 5-year epochs, each\n\
+    ordered as in the ASCII coefficient files, or None to use the\n\
+    coefficient files\n\
+\n\
+Returns\n\
+-------------\n\
+Void\n\
+\n\
+Notes\n\
+-------------\n\
+The coefficients are copied, and the coefficient files are not read for\n\
+any epoch.  The model date and time are reset and must be set again.\n" },
+  { "set_igrf_coeffs", igrf_set_coeffs, METH_VARARGS,
+    "set_igrf_coeffs(coeffs, sv)\n\
+\n\
+Set the IGRF coefficients of the current model from memory.\n\
+\n\
+Parameters\n\
+-------------\n\
+coeffs : buffer or NoneType\n\
+    Contiguous float64 Schmidt semi-normalised coefficients in nT for each\n\
+    5-year epoch from IGRF_FIRST_EPOCH to IGRF_LAST_EPOCH, with IGRF_MAXK\n\
+    values per epoch indexed by l * (l + 1) + m, where m < 0 for h, or None\n\
+    to use the IGRF coefficient file\n\
+sv : buffer or NoneType\n\
+    Secular variation in nT/yr for the last epoch, indexed as the\n\
+    coefficients, or None for no secular variation\n\
+\n\
+Returns\n\
+-------------\n\
+Void\n\
+\n\
+Notes\n\
+-------------\n\
+The coefficients are copied, and the IGRF coefficient file is not read.\n" },
+  { "memory_coeffs", memory_coeffs, METH_NOARGS,
+    "memory_coeffs()\n\
+\n\
+Determine which coefficients of the current model were set from memory.\n\
+\n\
+Returns\n\
+-------------\n\
+memory : dict\n\
+    True for the AACGM-v2 ('aacgm') and IGRF ('igrf') coefficients that\n\
+    were set from memory, False for those read from the coefficient files\n" },
+  { "set_cache_size", aacgm_v2_set_cache_size, METH_VARARGS,
+    "set_cache_size(size)\n\
+\n\
+Set the number of 5-year coefficient epochs cached by the current model.\n\
+\n\
+Parameters\n\
+-------------\n\
+size : int\n\
+    Maximum number of cached epochs, at least 2, or 0 for the default\n\
+\n\
+Returns\n\
+-------------\n\
+Void\n\
+\n\
+Notes\n\
+-------------\n\
+The least recently used epochs are evicted first, except for the two\n\
+epochs bracketing the model time.\n" },
+  { "cache_stats", aacgm_v2_cache_stats, METH_NOARGS,
+    "cache_stats()\n\
+\n\
+Get the coefficient cache counters of the current model.\n\
+\n\
+Returns\n\
+-------------\n\
+stats : dict\n\
+    Number of epochs found in the cache ('hits') and not found ('misses'),\n\
+    number read from the coefficient files ('loads', including prefetches),\n\
+    number currently cached ('cached'), and the cache capacity ('size')\n" },
+  { "mlt_cache_stats", mlt_v2_cache_stats, METH_NOARGS,
+    "mlt_cache_stats()\n\
+\n\
+Get the MLT reference longitude cache counters of the calling thread.\n\
+\n\
+Returns\n\
+-------------\n\
+stats : dict\n\
+    Number of times found in the cache ('hits') and not found ('misses'),\n\
+    for which the reference longitude was calculated, number currently\n\
+    cached ('cached'), the cache capacity ('size'), and number of\n\
+    calculations more than 30 days from the locked model time, which did\n\
+    not reset it ('avoided')\n" },
+  { "stats", aacgm_v2_stats, METH_NOARGS,
+    "stats()\n\
+\n\
+Get the performance counters and timers, summed over all threads.\n\
+\n\
+Returns\n\
+-------------\n\
+stats : dict\n\
+    Number of coefficient loads ('coef_loads'), time interpolations of the\n\
+    coefficients ('time_interps'), height interpolations of the coefficients\n\
+    ('height_interps'), MLT reference longitude calculations ('mlon_refs'),\n\
+    traced field lines ('traces'), adaptive RK45 steps ('trace_steps'), and\n\
+    bisection steps ('trace_bisections'), with the cumulative wall time of\n\
+    each stage in seconds ('coef_load_time', 'time_interp_time',\n\
+    'height_interp_time', 'mlon_ref_time', and 'trace_time')\n\
+\n\
+Notes\n\
+-------------\n\
+The timers of nested stages overlap, e.g., the MLT reference longitude time\n\
+includes any coefficient interpolation it needs.\n" },
+  { "reset_stats", aacgm_v2_reset_stats, METH_NOARGS,
+    "reset_stats()\n\
+\n\
+Set the performance counters and timers of all threads to zero.\n\
+\n\
+Returns\n\
+-------------\n\
+Void\n" },
+  { "lock", aacgm_v2_lock, METH_NOARGS,
+    "lock()\n\
+\n\
+Lock the date and time of the current model for MLT conversions.\n\
+\n\
+Returns\n\
+-------------\n\
+Void\n\
+\n\
+Notes\n\
+-------------\n\
+While locked, MLT conversions use the coefficients for the model time when\n\
+locked, restoring it if it has since been set for location conversions.\n\
+MLT conversions more than 30 days from it do not reset it, and are only\n\
+cached while it is locked.\n" },
+  { "unlock", aacgm_v2_unlock, METH_NOARGS,
+    "unlock()\n\
+\n\
+Unlock the date and time of the current model for MLT conversions.\n\
+\n\
+Returns\n\
+-------------\n\
+Void\n" },
+  { "locked", aacgm_v2_locked, METH_NOARGS,
+    "locked()\n\
+\n\
+Get the lock status of the current model.\n\
+\n\
+Returns\n\
+-------------\n\
+locked : bool\n\
+    True if the model date and time are locked for MLT conversions\n" },
+  { "next_epoch", aacgm_v2_next_epoch, METH_NOARGS,
+    "next_epoch()\n\
+\n\
+Get the 5-year epoch to prefetch for the current model time.\n\
+\n\
+Returns\n\
+-------------\n\
+year : int\n\
+    Epoch year that is not yet cached, if the model time is close to the end\n\
+    of its epoch, or 0 otherwise\n" },
+  { "stage_file", aacgm_v2_stage_file, METH_VARARGS,
+    "stage_file(year)\n\
+\n\
+Get the ASCII coefficient file to read for a 5-year epoch of the current\n\
+model, so that it may be read with load_coeffs without using the model.\n\
+\n\
+Parameters\n\
+-------------\n\
+year : int\n\
+    Epoch year\n\
+\n\
+Returns\n\
+-------------\n\
+fname : str or NoneType\n\
+    Coefficient file name, or None if the epoch is cached, is available\n\
+    from the binary coefficient store or memory, or is not valid\n" },
+  { "load_coeffs", aacgm_v2_load_coeffs, METH_VARARGS,
+    "load_coeffs(fname)\n\
+\n\
+Read the coefficients for a 5-year epoch from an ASCII coefficient file,\n\
+without using or changing any model.\n\
+\n\
+Parameters\n\
+-------------\n\
+fname : str\n\
+    Coefficient file name from stage_file\n\
+\n\
+Returns\n\
+-------------\n\
+staged : PyCapsule or NoneType\n\
+    Staged coefficients to pass to prefetch, or None if the file could not\n\
+    be read\n" },
+  { "prefetch", aacgm_v2_prefetch, METH_VARARGS,
+    "prefetch(year, staged=None)\n\
+\n\
+Load the coefficients for a 5-year epoch into the cache of the current\n\
+model, without changing the model time.\n\
+\n\
+Parameters\n\
+-------------\n\
+year : int\n\
+    Epoch year\n\
+staged : PyCapsule or NoneType\n\
+    Coefficients from load_coeffs, which are used instead of reading the\n\
+    coefficient file if the model still uses the file they were read from\n\
+    (default=None)\n\
+\n\
+Returns\n\
+-------------\n\
+cached : bool\n\
+    True if the epoch is cached, False if it could not be loaded\n" },
   { "convert", aacgm_v2_convert, METH_VARARGS,
     "convert(in_lat, in_lon, height, code)\n\
 \n\
@@ -395,6 +1839,109 @@ Notes \n\
 -----\n\
 Return values of -666 are used as filler values for lat/lon/r, while filler\n\
 values of -1 are used in out_bad if the output in out_lat/lon/r is good\n", },
+  { "convert_buf", aacgm_v2_convert_buf, METH_VARARGS,
+    "convert_buf(in_lat, in_lon, height, code, out_lat, out_lon, out_r, err)\n\
+\n\
+Converts between geographic/dedic and magnetic coordinates, reading from and\n\
+writing to existing buffers without copying.\n\
+\n\
+Parameters\n\
+-------------\n\
+in_lat : buffer\n\
+    One-dimensional float64 input latitudes in degrees N (code specifies type\n\
+    of latitude)\n\
+in_lon : buffer\n\
+    One-dimensional float64 input longitudes in degrees E (code specifies\n\
+    type of longitude)\n\
+height : buffer\n\
+    One-dimensional float64 altitudes above the surface of the earth in km\n\
+code : int	\n\
+    Bitwise code for passing options into converter, as for `convert`\n\
+out_lat : buffer\n\
+    Writable one-dimensional float64 buffer for the output latitudes\n\
+out_lon : buffer\n\
+    Writable one-dimensional float64 buffer for the output longitudes\n\
+out_r : buffer\n\
+    Writable one-dimensional float64 buffer for the geocentric radial\n\
+    distances in Re\n\
+err : buffer\n\
+    Writable one-dimensional int32 buffer for the error codes\n\
+\n\
+Returns	\n\
+-------\n\
+nbad : int\n\
+    Number of locations that could not be converted\n\
+\n\
+Notes \n\
+-----\n\
+All buffers must have the same length, but may be strided (e.g., columns of\n\
+an (N, 3) array or broadcast views).  Locations that could not be converted\n\
+are set to NaN in the outputs and have a negative error code in `err`, while\n\
+successful conversions have an error code of zero.\n\
+\n\
+The GIL is released during the conversion, so several threads may convert\n\
+locations at the same model time concurrently.  The model time must not be\n\
+changed while a conversion is running.\n" },
+  {"mlt_convert_buf", mltconvert_v2_buf, METH_VARARGS,
+    "mlt_convert_buf(yr, mo, dy, hr, mt, sc, mlon, out)\n\
+\n\
+Converts from universal time to magnetic local time, reading from and\n\
+writing to existing buffers without copying.\n\
+\n\
+Parameters\n\
+-------------\n\
+yr : buffer\n\
+    One-dimensional int32 4 digit year (1590-2025)\n\
+mo : buffer\n\
+    One-dimensional int32 month of year (1-12)\n\
+dy : buffer\n\
+    One-dimensional int32 day of month (1-31)\n\
+hr : buffer\n\
+    One-dimensional int32 hours of day (0-23)\n\
+mt : buffer\n\
+    One-dimensional int32 minutes of hour (0-59)\n\
+sc : buffer\n\
+    One-dimensional int32 seconds of minute (0-59)\n\
+mlon : buffer\n\
+    One-dimensional float64 magnetic longitude\n\
+out : buffer\n\
+    Writable one-dimensional float64 buffer for the magnetic local time\n\
+    (hours)\n\
+\n\
+Notes \n\
+-----\n\
+The GIL is released during the conversion.  These routines update the model\n\
+time and so should not be run concurrently with other conversions.\n" },
+  {"inv_mlt_convert_buf", inv_mltconvert_v2_buf, METH_VARARGS,
+    "inv_mlt_convert_buf(yr, mo, dy, hr, mt, sc, mlt, out)\n\
+\n\
+Converts from universal time and magnetic local time to magnetic longitude,\n\
+reading from and writing to existing buffers without copying.\n\
+\n\
+Parameters\n\
+-------------\n\
+yr : buffer\n\
+    One-dimensional int32 4 digit year (1590-2025)\n\
+mo : buffer\n\
+    One-dimensional int32 month of year (1-12)\n\
+dy : buffer\n\
+    One-dimensional int32 day of month (1-31)\n\
+hr : buffer\n\
+    One-dimensional int32 hours of day (0-23)\n\
+mt : buffer\n\
+    One-dimensional int32 minutes of hour (0-59)\n\
+sc : buffer\n\
+    One-dimensional int32 seconds of minute (0-59)\n\
+mlt : buffer\n\
+    One-dimensional float64 magnetic local time\n\
+out : buffer\n\
+    Writable one-dimensional float64 buffer for the magnetic longitude\n\
+    (degrees)\n\
+\n\
+Notes \n\
+-----\n\
+The GIL is released during the conversion.  These routines update the model\n\
+time and so should not be run concurrently with other conversions.\n" },
   {"mlt_convert_arr", mltconvert_v2_arr, METH_VARARGS,
     "mlt_convert_arr(yr, mo, dy, hr, mt, sc, mlon)\n\
 \n\
@@ -554,12 +2101,73 @@ static struct PyModuleDef aacgmv2module = {
 
 PyMODINIT_FUNC PyInit__aacgmv2(void)
 {
+  PyObject *threading;
+
+  import_array();
+  import_umath();
+
   module = PyModule_Create(&aacgmv2module);
+  if(module == NULL)
+    return(NULL);
+
+  if(add_ufunc(module, convert_ufunc_funcs, g2a_ufunc_data,
+	       convert_ufunc_types, 5, 3, "g2a", g2a_doc) < 0
+     || add_ufunc(module, convert_ufunc_funcs, a2g_ufunc_data,
+		  convert_ufunc_types, 5, 3, "a2g", a2g_doc) < 0
+     || add_ufunc(module, convert_ufunc_funcs, g2a_iter_ufunc_data,
+		  convert_ufunc_types, 5, 4, "g2a_iter", g2a_iter_doc) < 0
+     || add_ufunc(module, convert_ufunc_funcs, a2g_iter_ufunc_data,
+		  convert_ufunc_types, 5, 4, "a2g_iter", a2g_iter_doc) < 0
+     || add_ufunc(module, mlt_ufunc_funcs, mlt_ufunc_data, mlt_ufunc_types,
+		  2, 1, "mlt", mlt_doc) < 0
+     || add_ufunc(module, mlt_ufunc_funcs, inv_mlt_ufunc_data,
+		  mlt_ufunc_types, 2, 1, "inv_mlt", inv_mlt_doc) < 0
+     || add_ufunc(module, convert_ufunc_funcs, g2a_nolock_ufunc_data,
+		  convert_ufunc_types, 5, 3, "g2a_nolock", g2a_nolock_doc) < 0
+     || add_ufunc(module, convert_ufunc_funcs, a2g_nolock_ufunc_data,
+		  convert_ufunc_types, 5, 3, "a2g_nolock", a2g_nolock_doc) < 0
+     || add_ufunc(module, convert_ufunc_funcs, g2a_iter_nolock_ufunc_data,
+		  convert_ufunc_types, 5, 4, "g2a_iter_nolock",
+		  g2a_iter_nolock_doc) < 0
+     || add_ufunc(module, convert_ufunc_funcs, a2g_iter_nolock_ufunc_data,
+		  convert_ufunc_types, 5, 4, "a2g_iter_nolock",
+		  a2g_iter_nolock_doc) < 0)
+    {
+      Py_DECREF(module);
+      return(NULL);
+    }
+
+  /* Create the model lock, used by the wrapper as well as the ufuncs */
+  threading = PyImport_ImportModule("threading");
+  if(threading == NULL)
+    {
+      Py_DECREF(module);
+      return(NULL);
+    }
+  model_lock = PyObject_CallMethod(threading, "RLock", NULL);
+  Py_DECREF(threading);
+  if(model_lock == NULL)
+    {
+      Py_DECREF(module);
+      return(NULL);
+    }
+  Py_INCREF(model_lock);
+  if(PyModule_AddObject(module, "model_lock", model_lock) < 0)
+    {
+      Py_DECREF(model_lock);
+      Py_DECREF(module);
+      return(NULL);
+    }
+
   PyModule_AddIntConstant(module, "G2A", G2A);
   PyModule_AddIntConstant(module, "A2G", A2G);
   PyModule_AddIntConstant(module, "TRACE", TRACE);
   PyModule_AddIntConstant(module, "ALLOWTRACE", ALLOWTRACE);
   PyModule_AddIntConstant(module, "BADIDEA", BADIDEA);
   PyModule_AddIntConstant(module, "GEOCENTRIC", GEOCENTRIC);
+  PyModule_AddIntConstant(module, "SCALAR", SCALAR);
+  PyModule_AddIntConstant(module, "IGRF_FIRST_EPOCH", IGRF_FIRST_EPOCH);
+  PyModule_AddIntConstant(module, "IGRF_LAST_EPOCH", IGRF_LAST_EPOCH);
+  PyModule_AddIntConstant(module, "IGRF_MAXK", IGRF_MAXK);
   return module;
 }
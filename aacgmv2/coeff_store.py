@@ -0,0 +1,373 @@
+# Copyright (C) 2019 NRL
+# Author: Angeline Burrell
+# Disclaimer: This code is under the MIT license, whose details can be found at
+# the root in the LICENSE file
+#
+# -*- coding: utf-8 -*-
+"""Binary store for the AACGM-V2 coefficients.
+
+Attributes
+----------
+STORE_MAGIC : bytes
+    Identifier at the start of a coefficient store
+STORE_VERSION : int
+    Version of the coefficient store format
+STORE_SUFFIX : str
+    Suffix added to the coefficient file prefix to name the coefficient store
+EPOCH_SHAPE : tuple
+    Shape of the coefficients for one epoch, ordered as in the ASCII files
+    (flag, polynomial order, coordinate, spherical harmonic)
+IGRF_MAXK : int
+    Number of IGRF spherical harmonic coefficients for each epoch, indexed by
+    l * (l + 1) + m, where m < 0 for the h coefficients
+
+Notes
+-----
+The C library memory-maps the store, if present, instead of reading two ASCII
+files each time the 5-year epoch changes.  The store is little-endian, with a
+48 byte header, a CRC-32 checksum for each epoch, and the float64 coefficients
+for each epoch starting at the next multiple of eight bytes.
+
+The store contents, or the text of an IGRF coefficient file, may also be
+unpacked into arrays that are set as the model coefficients from memory, see
+`aacgmv2.wrapper.set_coeffs`.
+
+This module only depends on NumPy and the standard library, so that it may be
+used to build the store before the C extension is available.
+
+"""
+
+import glob
+import numpy as np
+import os
+import struct
+import zlib
+
+STORE_MAGIC = b"AACGMCF\0"
+STORE_VERSION = 1
+STORE_SUFFIX = "all.bin"
+EPOCH_SHAPE = (2, 5, 3, 121)
+IGRF_MAXK = 196
+
+_HEADER = struct.Struct("<8s10I")
+
+
+def store_filename(coeff_prefix):
+    """Get the coefficient store filename for a coefficient file prefix.
+
+    Parameters
+    ----------
+    coeff_prefix : str
+        Location and file prefix for AACGM coefficient files
+
+    Returns
+    -------
+    filename : str
+        Coefficient store filename
+
+    """
+    return coeff_prefix + STORE_SUFFIX
+
+
+def read_coeff_files(coeff_prefix):
+    """Read the ASCII coefficient files for all epochs.
+
+    Parameters
+    ----------
+    coeff_prefix : str
+        Location and file prefix for AACGM coefficient files, followed by the
+        four digit epoch year and '.asc' in each filename
+
+    Returns
+    -------
+    epochs : np.ndarray
+        Epoch years
+    coeffs : np.ndarray
+        Coefficients with shape (epoch, flag, polynomial order, coordinate,
+        spherical harmonic)
+
+    Raises
+    ------
+    ValueError
+        If the coefficient files are missing, irregularly spaced in time, or
+        have an unexpected number of coefficients.
+
+    """
+    # Find the coefficient files for each epoch
+    asc_files = dict()
+    for asc_file in glob.glob(coeff_prefix + "[0-9][0-9][0-9][0-9].asc"):
+        asc_files[int(asc_file[-8:-4])] = asc_file
+
+    epochs = sorted(asc_files.keys())
+    if len(epochs) == 0:
+        raise ValueError("no coefficient files found for {:}".format(
+            coeff_prefix))
+
+    steps = np.unique(np.diff(epochs))
+    if len(steps) > 1:
+        raise ValueError("coefficient files are irregularly spaced in time")
+
+    # Read the coefficients
+    coeffs = np.empty(shape=(len(epochs),) + EPOCH_SHAPE, dtype=np.float64)
+    for i, epoch in enumerate(epochs):
+        with open(asc_files[epoch], "r") as fin:
+            values = np.array(fin.read().split(), dtype=np.float64)
+
+        if values.size != np.prod(EPOCH_SHAPE):
+            raise ValueError("unexpected number of coefficients in {:}".format(
+                asc_files[epoch]))
+        coeffs[i] = values.reshape(EPOCH_SHAPE)
+
+    return np.array(epochs), coeffs
+
+
+def write_coeff_store(coeff_prefix, filename=None):
+    """Write a binary coefficient store from the ASCII coefficient files.
+
+    Parameters
+    ----------
+    coeff_prefix : str
+        Location and file prefix for AACGM coefficient files, followed by the
+        four digit epoch year and '.asc' in each filename
+    filename : str or NoneType
+        Output filename, or None to use the name expected by the C library
+        (default=None)
+
+    Returns
+    -------
+    filename : str
+        Coefficient store filename
+
+    Raises
+    ------
+    ValueError
+        If the coefficient files are missing, irregularly spaced in time, or
+        have an unexpected number of coefficients.
+
+    """
+    if filename is None:
+        filename = store_filename(coeff_prefix)
+
+    epochs, coeffs = read_coeff_files(coeff_prefix)
+    step = int(epochs[1] - epochs[0]) if len(epochs) > 1 else 5
+    coeffs = coeffs.astype('<f8')
+
+    # Build the header, padding it to a multiple of eight bytes
+    crcs = np.array([zlib.crc32(coeff.tobytes()) for coeff in coeffs],
+                    dtype='<u4')
+    header_size = _HEADER.size + crcs.nbytes
+    header_size += -header_size % 8
+    header = _HEADER.pack(STORE_MAGIC, STORE_VERSION, header_size, epochs[0],
+                          step, len(epochs), *EPOCH_SHAPE[::-1], 0)
+
+    # Write to a temporary file first, so that a store that is in use is
+    # replaced rather than modified
+    tmp_file = "{:}.{:d}.tmp".format(filename, os.getpid())
+    with open(tmp_file, "wb") as fout:
+        fout.write(header)
+        fout.write(crcs.tobytes())
+        fout.write(b"\0" * (header_size - len(header) - crcs.nbytes))
+        fout.write(coeffs.tobytes())
+    os.replace(tmp_file, filename)
+
+    return filename
+
+
+def _unpack_header(header, size):
+    """Unpack and test the header of a coefficient store.
+
+    Parameters
+    ----------
+    header : bytes
+        Start of the coefficient store
+    size : int
+        Size of the coefficient store in bytes
+
+    Returns
+    -------
+    header_size : int
+        Number of bytes before the coefficients
+    epochs : np.ndarray
+        Epoch years
+
+    Raises
+    ------
+    ValueError
+        If the header is not for a valid coefficient store of this size.
+
+    """
+    if len(header) < _HEADER.size:
+        raise ValueError("file too short for a coefficient store")
+
+    (magic, version, header_size, first_epoch, step, nepoch,
+     *shape, _) = _HEADER.unpack(header[:_HEADER.size])
+    if magic != STORE_MAGIC or version != STORE_VERSION:
+        raise ValueError("not a version {:d} coefficient store".format(
+            STORE_VERSION))
+
+    if tuple(shape[::-1]) != EPOCH_SHAPE:
+        raise ValueError("unexpected coefficient shape {:}".format(
+            tuple(shape[::-1])))
+
+    if size != header_size + nepoch * np.prod(EPOCH_SHAPE) * 8:
+        raise ValueError("unexpected coefficient store size")
+
+    return header_size, first_epoch + step * np.arange(nepoch)
+
+
+def _check_crcs(epochs, coeffs, crcs):
+    """Test the checksum of the coefficients for each epoch.
+
+    Parameters
+    ----------
+    epochs : np.ndarray
+        Epoch years
+    coeffs : np.ndarray
+        Coefficients with shape (epoch, flag, polynomial order, coordinate,
+        spherical harmonic)
+    crcs : np.ndarray
+        CRC-32 checksum for each epoch
+
+    Raises
+    ------
+    ValueError
+        If a checksum fails.
+
+    """
+    for i, coeff in enumerate(coeffs):
+        if zlib.crc32(coeff.tobytes()) != crcs[i]:
+            raise ValueError("checksum mismatch for epoch {:d}".format(
+                epochs[i]))
+
+
+def read_coeff_store(filename):
+    """Read and verify a binary coefficient store.
+
+    Parameters
+    ----------
+    filename : str
+        Coefficient store filename
+
+    Returns
+    -------
+    epochs : np.ndarray
+        Epoch years
+    coeffs : np.memmap
+        Read-only, memory-mapped coefficients with shape (epoch, flag,
+        polynomial order, coordinate, spherical harmonic)
+
+    Raises
+    ------
+    ValueError
+        If the file is not a valid coefficient store or a checksum fails.
+
+    """
+    with open(filename, "rb") as fin:
+        header = fin.read(_HEADER.size)
+
+    header_size, epochs = _unpack_header(header, os.path.getsize(filename))
+
+    crcs = np.fromfile(filename, dtype='<u4', count=len(epochs),
+                       offset=_HEADER.size)
+    coeffs = np.memmap(filename, dtype='<f8', mode='r', offset=header_size,
+                       shape=(len(epochs),) + EPOCH_SHAPE)
+    _check_crcs(epochs, coeffs, crcs)
+
+    return epochs, coeffs
+
+
+def unpack_coeff_store(data):
+    """Unpack and verify the contents of a binary coefficient store.
+
+    Parameters
+    ----------
+    data : bytes-like
+        Contents of a coefficient store, e.g., from a package resource
+
+    Returns
+    -------
+    epochs : np.ndarray
+        Epoch years
+    coeffs : np.ndarray
+        Read-only coefficients that share memory with `data`, with shape
+        (epoch, flag, polynomial order, coordinate, spherical harmonic)
+
+    Raises
+    ------
+    ValueError
+        If the data are not a valid coefficient store or a checksum fails.
+
+    """
+    data = memoryview(data).cast('B')
+    header_size, epochs = _unpack_header(bytes(data[:_HEADER.size]),
+                                         data.nbytes)
+
+    crcs = np.frombuffer(data, dtype='<u4', count=len(epochs),
+                         offset=_HEADER.size)
+    coeffs = np.frombuffer(data, dtype='<f8', offset=header_size).reshape(
+        (len(epochs),) + EPOCH_SHAPE)
+    coeffs.flags.writeable = False
+    _check_crcs(epochs, coeffs, crcs)
+
+    return epochs, coeffs
+
+
+def parse_igrf_coeffs(text):
+    """Parse the text of an IGRF coefficient file.
+
+    Parameters
+    ----------
+    text : str or bytes
+        Contents of an IGRF coefficient file, with a 'g/h n m' line giving
+        the epoch years, followed by a line for each coefficient with its
+        value at each epoch and its secular variation
+
+    Returns
+    -------
+    epochs : np.ndarray
+        Epoch years
+    coeffs : np.ndarray
+        Schmidt semi-normalised coefficients in nT with shape (epoch,
+        IGRF_MAXK), indexed by l * (l + 1) + m, where m < 0 for h
+    sv : np.ndarray
+        Secular variation in nT/yr for the last epoch, indexed as `coeffs`
+
+    Raises
+    ------
+    ValueError
+        If the text is not an IGRF coefficient file, or has too many terms.
+
+    """
+    if isinstance(text, bytes):
+        text = text.decode('ascii')
+
+    epochs = None
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) == 0 or line.startswith("#"):
+            continue
+
+        if fields[0] == "g/h":
+            # The last column holds the secular variation
+            epochs = np.array([int(float(epoch)) for epoch in fields[3:-1]])
+            coeffs = np.zeros(shape=(len(epochs), IGRF_MAXK),
+                              dtype=np.float64)
+            sv = np.zeros(shape=(IGRF_MAXK,), dtype=np.float64)
+        elif epochs is not None and fields[0] in ("g", "h"):
+            if len(fields) != len(epochs) + 4:
+                raise ValueError("unexpected number of values for {:}".format(
+                    " ".join(fields[:3])))
+
+            ll, mm = int(fields[1]), int(fields[2])
+            k = ll * (ll + 1) + (mm if fields[0] == "g" else -mm)
+            if ll < 1 or mm > ll or k >= IGRF_MAXK:
+                raise ValueError("unexpected term {:}".format(
+                    " ".join(fields[:3])))
+
+            coeffs[:, k] = np.array(fields[3:-1], dtype=np.float64)
+            sv[k] = float(fields[-1])
+
+    if epochs is None:
+        raise ValueError("not an IGRF coefficient file")
+
+    return epochs, coeffs, sv
@@ -0,0 +1,573 @@
+# Copyright (C) 2019 NRL
+# Author: Angeline Burrell
+# Disclaimer: This code is under the MIT license, whose details can be found at
+# the root in the LICENSE file
+#
+# -*- coding: utf-8 -*-
+"""Pure NumPy implementation of the AACGM-V2 coefficient conversions.
+
+Attributes
+----------
+RE : float
+    Earth radius in km used by the AACGM-V2 coefficients
+MAXALT : float
+    Maximum altitude in km for which the coefficients are valid
+SHORDER : int
+    Order of the spherical harmonic expansion
+TRACE_CODE : int
+    Positive error code for locations that must be converted by field-line
+    tracing, which this module does not support
+
+Notes
+-----
+This module follows the coefficient path of the C library routine
+`AACGM_v2_Convert`: conversion of geodetic to geocentric coordinates, time and
+altitude interpolation of the coefficients, the spherical harmonic expansion,
+the test for the forbidden region, and the at-altitude coordinates used for
+the inverse transformation.  It holds no global state, so that `CoeffModel`
+objects may be shared between threads and pickled, and it may be used to
+cross-check the C library.
+
+Like `coeff_store`, this module only depends on NumPy and the standard library.
+
+"""
+
+import calendar
+import numpy as np
+import os
+import threading
+
+import aacgmv2
+from aacgmv2 import coeff_store
+
+# Set the coefficient environment variables, if imported directly
+aacgmv2._set_environ()
+
+RE = 6371.2
+MAXALT = 2000.0
+SHORDER = 10
+TRACE_CODE = 1
+
+# Bit codes, as in the C library
+_A2G = 1
+_TRACE = 2
+_ALLOWTRACE = 4
+_BADIDEA = 8
+_GEOCENTRIC = 16
+
+# WGS-84 ellipsoid, as in the C library
+_WGS84_A = 6378.1370
+_WGS84_F = 1.0 / 298.257223563
+_WGS84_B = _WGS84_A * (1.0 - _WGS84_F)
+
+# Number of locations converted together, limiting the memory used for the
+# spherical harmonic functions
+_CHUNK = 65536
+
+_models = dict()
+_models_lock = threading.Lock()
+
+
+def _rylm_norm():
+    """Get the normalization of the real spherical harmonic functions.
+
+    Returns
+    -------
+    norm : np.ndarray
+        Normalization for each 1D index k = l * (l + 1) + m
+
+    """
+    fact = np.ones(shape=(2 * SHORDER + 2,), dtype=np.float64)
+    for k in range(2, 2 * SHORDER + 2):
+        fact[k] = k * fact[k - 1]
+
+    norm = np.empty(shape=((SHORDER + 1)**2,), dtype=np.float64)
+    for ll in range(SHORDER + 1):
+        for mm in range(ll + 1):
+            norm[ll * (ll + 1) + mm] = np.sqrt((2 * ll + 1) / (4 * np.pi)
+                                               * fact[ll - mm] / fact[ll + mm])
+        for mm in range(-ll, 0):
+            norm[ll * (ll + 1) + mm] = norm[ll * (ll + 1) - mm] * (
+                -1 if -mm % 2 else 1)
+
+    return norm
+
+
+_NORM = _rylm_norm()
+
+
+def rylm(colat, lon):
+    """Compute the real spherical harmonic functions used by AACGM-V2.
+
+    Parameters
+    ----------
+    colat : np.ndarray
+        One-dimensional colatitudes in radians
+    lon : np.ndarray
+        One-dimensional longitudes in radians
+
+    Returns
+    -------
+    ylm : np.ndarray
+        Orthonormal spherical harmonic functions with shape (k, location),
+        where k = l * (l + 1) + m
+
+    Notes
+    -----
+    Uses the same recurrence relations as `AACGM_v2_Rylm` in the C library.
+
+    """
+    ylm = np.empty(shape=((SHORDER + 1)**2, len(colat)), dtype=np.float64)
+
+    cos_theta = np.cos(colat)
+    d1 = -np.sin(colat)
+    q_fac_x = d1 * np.cos(lon)
+    q_fac_y = d1 * np.sin(lon)
+    q_val_x = q_fac_x.copy()
+    q_val_y = q_fac_y.copy()
+
+    ylm[0] = 1.0
+    ylm[2] = cos_theta
+    ylm[3] = q_val_x
+    ylm[1] = -q_val_y
+
+    # Zonal harmonics, P_l^(m=0)
+    for ll in range(2, SHORDER + 1):
+        ylm[ll * (ll + 1)] = (cos_theta * (2 * ll - 1) * ylm[(ll - 1) * ll]
+                              - (ll - 1) * ylm[(ll - 2) * (ll - 1)]) / ll
+
+    # P_l^l, including the longitude dependence
+    for ll in range(2, SHORDER + 1):
+        z2x = (ll * 2 - 1.0) * q_fac_x
+        z2y = (ll * 2 - 1.0) * q_fac_y
+        q_val_x, q_val_y = (z2x * q_val_x - z2y * q_val_y,
+                            z2x * q_val_y + z2y * q_val_x)
+        ylm[ll * (ll + 2)] = q_val_x
+        ylm[ll * ll] = -q_val_y
+
+    # P_l,l-1
+    for ll in range(2, SHORDER + 1):
+        l2 = ll * ll
+        fac = 2.0 * ll - 1.0
+        ylm[l2 + 2 * ll - 1] = fac * cos_theta * ylm[l2 - 1]
+        ylm[l2 + 1] = fac * cos_theta * ylm[l2 - 2 * ll + 1]
+
+    # Remaining P_l,m for each m = 1 to order-2
+    for mm in range(1, SHORDER - 1):
+        for ll in range(mm + 2, SHORDER + 1):
+            ca = (2.0 * ll - 1.0) / (ll - mm)
+            cb = (ll + mm - 1.0) / (ll - mm)
+
+            l2 = ll * ll
+            ic = l2 + ll + mm
+            ib = l2 - ll + mm
+            ia = l2 - 3 * ll + 2 + mm
+            ylm[ic] = ca * cos_theta * ylm[ib] - cb * ylm[ia]
+            ylm[ic - 2 * mm] = (ca * cos_theta * ylm[ib - 2 * mm]
+                                - cb * ylm[ia - 2 * mm])
+
+    ylm *= _NORM[:, np.newaxis]
+
+    return ylm
+
+
+def geod2geoc(lat, lon, alt):
+    """Convert geodetic to geocentric coordinates.
+
+    Parameters
+    ----------
+    lat : np.ndarray
+        Geodetic latitude in degrees N
+    lon : np.ndarray
+        Longitude in degrees E
+    alt : np.ndarray
+        Altitude above the WGS-84 ellipsoid in km
+
+    Returns
+    -------
+    r : np.ndarray
+        Geocentric radial distance in Re
+    theta : np.ndarray
+        Geocentric colatitude in radians
+    phi : np.ndarray
+        Longitude in radians
+
+    """
+    a2 = _WGS84_A * _WGS84_A
+    b2 = _WGS84_B * _WGS84_B
+    theta = np.radians(90.0 - lat)
+    st = np.sin(theta)
+    ct = np.cos(theta)
+    one = a2 * st * st
+    two = b2 * ct * ct
+    three = one + two
+    rho = np.sqrt(three)
+    r = np.sqrt(alt * (alt + 2 * rho) + (a2 * one + b2 * two) / three)
+    cd = (alt + rho) / r
+    sd = (a2 - b2) / rho * ct * st / r
+
+    return r / RE, np.arccos(ct * cd - st * sd), np.radians(lon)
+
+
+def geoc2geod(lat, lon, r):
+    """Convert geocentric to geodetic coordinates.
+
+    Parameters
+    ----------
+    lat : np.ndarray
+        Geocentric latitude in degrees N
+    lon : np.ndarray
+        Longitude in degrees E
+    r : np.ndarray
+        Geocentric radial distance in Re
+
+    Returns
+    -------
+    lat : np.ndarray
+        Geodetic latitude in degrees N
+    lon : np.ndarray
+        Longitude in degrees E
+    alt : np.ndarray
+        Altitude above the WGS-84 ellipsoid in km
+
+    """
+    ee = (2.0 - _WGS84_F) * _WGS84_F
+    e4 = ee * ee
+    aa = _WGS84_A * _WGS84_A
+
+    theta = np.radians(90.0 - lat)
+    phi = np.radians(lon)
+    st = np.sin(theta)
+
+    x = r * RE * st * np.cos(phi)
+    y = r * RE * st * np.sin(phi)
+    z = r * RE * np.cos(theta)
+
+    k0i = 1.0 - ee
+    pp = x * x + y * y
+    zeta = k0i * z * z / aa
+    rho = (pp / aa + zeta - e4) / 6.0
+    s = e4 * zeta * pp / (4.0 * aa)
+    rho3 = rho * rho * rho
+    t = np.power(rho3 + s + np.sqrt(s * (s + 2 * rho3)), 1.0 / 3.0)
+    u = rho + t + rho * rho / t
+    v = np.sqrt(u * u + e4 * zeta)
+    w = ee * (u + v - zeta) / (2.0 * v)
+    kappa = 1.0 + ee * (np.sqrt(u + v + w * w) + w) / (u + v)
+
+    return (np.degrees(np.arctan2(z * kappa, np.sqrt(pp))), lon,
+            np.sqrt(pp + z * z * kappa * kappa) / ee * (1.0 / kappa - k0i))
+
+
+def cgm2alt(height, lat):
+    """Convert AACGM-V2 to at-altitude latitudes.
+
+    Parameters
+    ----------
+    height : np.ndarray
+        Geocentric altitude in km
+    lat : np.ndarray
+        AACGM-V2 latitude in degrees N
+
+    Returns
+    -------
+    lat_adj : np.ndarray
+        At-altitude latitude in degrees N
+    bad : np.ndarray
+        True where the AACGM-V2 latitude does not reach this altitude
+
+    """
+    r1 = np.cos(np.radians(lat))
+    ra = (height / RE + 1) * r1 * r1
+    bad = ra > 1.0
+    ra[bad] = 1.0
+
+    lat_adj = np.degrees(np.arccos(np.sqrt(ra)))
+    lat_adj = np.where(lat >= 0, lat_adj, -lat_adj)
+
+    return lat_adj, bad
+
+
+def _fractional_year(dtime):
+    """Get the fractional year used for the time interpolation.
+
+    Parameters
+    ----------
+    dtime : dt.datetime
+        Date and time
+
+    Returns
+    -------
+    fyear : float
+        Fractional year, calculated as in the C library
+
+    """
+    ndays = 366 if calendar.isleap(dtime.year) else 365
+    doy = dtime.timetuple().tm_yday
+
+    return dtime.year + ((doy - 1) + (dtime.hour + (
+        dtime.minute + dtime.second / 60.0) / 60.0) / 24.0) / ndays
+
+
+class CoeffModel(object):
+    """AACGM-V2 coefficients that are interpolated in NumPy.
+
+    Parameters
+    ----------
+    coeff_prefix : str or NoneType
+        Location and file prefix for the AACGM-V2 coefficient files, or None
+        to use the AACGM_v2_DAT_PREFIX environment variable (default=None)
+
+    Attributes
+    ----------
+    coeff_prefix : str
+        Location and file prefix for the AACGM-V2 coefficient files
+
+    Notes
+    -----
+    The coefficients are read from the binary coefficient store, if present
+    and valid, or from the ASCII coefficient files when first needed.  Only
+    the prefix is pickled.
+
+    """
+
+    def __init__(self, coeff_prefix=None):
+        self.coeff_prefix = os.environ['AACGM_v2_DAT_PREFIX'] \
+            if coeff_prefix is None else coeff_prefix
+        self._epochs = None
+        self._coeffs = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "".join(["aacgmv2.numpy_engine.CoeffModel(coeff_prefix=",
+                        repr(self.coeff_prefix), ")"])
+
+    def __getstate__(self):
+        return {'coeff_prefix': self.coeff_prefix}
+
+    def __setstate__(self, state):
+        self.__init__(state['coeff_prefix'])
+
+    def _load(self):
+        """Load the coefficients for all epochs, if not yet loaded."""
+        with self._lock:
+            if self._coeffs is None:
+                try:
+                    epochs, coeffs = coeff_store.read_coeff_store(
+                        coeff_store.store_filename(self.coeff_prefix))
+                except (OSError, ValueError):
+                    epochs, coeffs = coeff_store.read_coeff_files(
+                        self.coeff_prefix)
+                self._epochs = epochs
+                self._coeffs = coeffs
+
+    def time_coeffs(self, dtime):
+        """Interpolate the coefficients to a time.
+
+        Parameters
+        ----------
+        dtime : dt.datetime
+            Date and time, only the whole seconds are used
+
+        Returns
+        -------
+        coeffs : np.ndarray
+            Coefficients with shape (flag, polynomial order, coordinate,
+            spherical harmonic)
+
+        Raises
+        ------
+        ValueError
+            If the coefficients do not cover this time
+
+        """
+        self._load()
+
+        fyear = _fractional_year(dtime)
+        myear = dtime.year // 5 * 5
+        i = np.searchsorted(self._epochs, myear)
+        if (i + 1 >= len(self._epochs) or self._epochs[i] != myear
+                or self._epochs[i + 1] != myear + 5):
+            raise ValueError("no coefficients for {:}".format(dtime))
+
+        coef0 = np.asarray(self._coeffs[i], dtype=np.float64)
+        coef1 = np.asarray(self._coeffs[i + 1], dtype=np.float64)
+
+        return coef0 + (fyear - myear) * (coef1 - coef0) / 5
+
+    def convert(self, in_lat, in_lon, height, dtime, code=0):
+        """Convert between geographic/detic and AACGM-V2 coordinates.
+
+        Parameters
+        ----------
+        in_lat, in_lon, height : array-like
+            Input latitudes and longitudes in degrees and altitudes in km,
+            which must broadcast to the same shape
+        dtime : dt.datetime
+            Date and time
+        code : int
+            Bit code, as described in `aacgmv2.convert_str_to_bit` (default=0)
+
+        Returns
+        -------
+        out_lat, out_lon, out_r : np.ndarray
+            Output latitudes and longitudes in degrees, and the geocentric
+            radial distance in Re (G2A) or altitude in km (A2G)
+        err : np.ndarray
+            Error codes, as for `convert_buf`, with `TRACE_CODE` for
+            locations that must be traced
+
+        Raises
+        ------
+        ValueError
+            If the coefficients do not cover this time
+
+        """
+        return convert_coeffs(in_lat, in_lon, height,
+                              self.time_coeffs(dtime), code)
+
+
+def get_model(coeff_prefix=None):
+    """Get a shared coefficient model for a coefficient file prefix.
+
+    Parameters
+    ----------
+    coeff_prefix : str or NoneType
+        Location and file prefix for the AACGM-V2 coefficient files, or None
+        to use the AACGM_v2_DAT_PREFIX environment variable (default=None)
+
+    Returns
+    -------
+    model : CoeffModel
+        Coefficient model, which is created once for each prefix
+
+    """
+    if coeff_prefix is None:
+        coeff_prefix = os.environ['AACGM_v2_DAT_PREFIX']
+
+    with _models_lock:
+        if coeff_prefix not in _models:
+            _models[coeff_prefix] = CoeffModel(coeff_prefix)
+        return _models[coeff_prefix]
+
+
+def convert_coeffs(in_lat, in_lon, height, coeffs, code=0):
+    """Convert locations using time-interpolated coefficients.
+
+    Parameters
+    ----------
+    in_lat, in_lon, height : array-like
+        Input latitudes and longitudes in degrees and altitudes in km, which
+        must broadcast to the same shape
+    coeffs : np.ndarray
+        Coefficients from `CoeffModel.time_coeffs`
+    code : int
+        Bit code, as described in `aacgmv2.convert_str_to_bit` (default=0)
+
+    Returns
+    -------
+    out_lat, out_lon, out_r : np.ndarray
+        Output latitudes and longitudes in degrees, and the geocentric radial
+        distance in Re (G2A) or altitude in km (A2G), NaN where the conversion
+        failed
+    err : np.ndarray
+        Error codes, as for `convert_buf`, with `TRACE_CODE` for locations
+        that must be traced
+
+    """
+    in_lat, in_lon, height = np.broadcast_arrays(*[
+        np.asarray(arr, dtype=np.float64) for arr in [in_lat, in_lon, height]])
+    shape = in_lat.shape
+    lat, lon, hgt = [arr.ravel() for arr in [in_lat, in_lon, height]]
+
+    out = [np.full(shape=lat.shape, fill_value=np.nan) for i in range(3)]
+    err = np.zeros(shape=lat.shape, dtype=np.int32)
+
+    for i in range(0, lat.size, _CHUNK):
+        _convert_chunk(lat[i:i + _CHUNK], lon[i:i + _CHUNK],
+                       hgt[i:i + _CHUNK], coeffs, code,
+                       [arr[i:i + _CHUNK] for arr in out], err[i:i + _CHUNK])
+
+    return tuple([arr.reshape(shape) for arr in out] + [err.reshape(shape)])
+
+
+def _convert_chunk(lat, lon, hgt, coeffs, code, out, err):
+    """Convert one-dimensional locations, see `convert_coeffs`."""
+    flag = 1 if code & _A2G else 0
+
+    # Latitude out of bounds
+    err[~(np.abs(lat) <= 90.0)] = -8
+
+    # Geodetic inputs to geocentric coordinates for the forward transformation
+    if not code & (_GEOCENTRIC | _A2G):
+        rr, theta, phi = geod2geoc(lat, lon, hgt)
+        lat = 90.0 - np.degrees(theta)
+        lon = np.degrees(phi)
+        hgt = (rr - 1.0) * RE
+
+    # Heights above the coefficient limit, which may need tracing
+    high = hgt > MAXALT
+    if code & _TRACE:
+        err[err == 0] = TRACE_CODE
+    elif code & _ALLOWTRACE:
+        err[(err == 0) & high] = TRACE_CODE
+    elif not code & _BADIDEA:
+        err[(err == 0) & high] = -4
+
+    # Colatitude of the inputs, using the at-altitude coordinates for the
+    # inverse transformation
+    if flag == 0:
+        colat = np.radians(90.0 - lat)
+    else:
+        lat_adj, bad = cgm2alt(hgt, lat)
+        err[(err == 0) & bad] = -1
+        colat = np.radians(90.0 - lat_adj)
+
+    good = np.flatnonzero(err == 0)
+    if good.size == 0:
+        return
+
+    # Spherical harmonic expansion, evaluating each term of the polynomial
+    # in altitude
+    ylm = rylm(colat[good], np.radians(lon[good]))
+    alt_var = hgt[good] / MAXALT
+    acc = np.einsum('lck,kp->lcp', coeffs[flag], ylm)
+    xyz = np.zeros(shape=(3, good.size), dtype=np.float64)
+    alt_pow = np.ones(shape=good.shape, dtype=np.float64)
+    for acc_l in acc:
+        xyz += acc_l * alt_pow
+        alt_pow = alt_pow * alt_var
+    x, y, z = xyz
+
+    if flag == 0:
+        # Forbidden region, where the solution is undefined
+        fac = x * x + y * y
+        bad = fac > 1.0
+        ztmp = np.sqrt(np.where(bad, 0.0, 1.0 - fac))
+        colat_out = np.arccos(np.where(z < 0, -ztmp, ztmp))
+    else:
+        r = np.sqrt(x * x + y * y + z * z)
+        bad = (r < 0.9) | (r > 1.1)
+        x = x / r
+        y = y / r
+        colat_out = np.arccos(np.clip(z / r, -1.0, 1.0))
+
+    lon_out = np.where((np.abs(x) < 1e-8) & (np.abs(y) < 1e-8), 0.0,
+                       np.arctan2(y, x))
+    lat_out = 90.0 - np.degrees(colat_out)
+    lon_out = np.degrees(lon_out)
+
+    if flag == 0:
+        r_out = (hgt[good] + RE) / RE
+    elif code & _GEOCENTRIC:
+        r_out = hgt[good]
+    else:
+        lat_out, _, r_out = geoc2geod(lat_out, lon_out,
+                                      (RE + hgt[good]) / RE)
+
+    err[good[bad]] = -1
+    good = good[~bad]
+    for out_arr, val in zip(out, [lat_out, lon_out, r_out]):
+        out_arr[good] = val[~bad]
+
+    return
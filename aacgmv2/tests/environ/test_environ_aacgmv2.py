@@ -77,6 +77,9 @@ class TestPyEnviron(object):
 
         self.test_good_coeff(aacgmv2.AACGM_v2_DAT_PREFIX, aacgmv2.IGRF_COEFFS)
 
+        # The environment is set when the submodules are first used
+        assert aacgmv2.wrapper.set_coeff_path is not None
+
         assert not aacgmv2.__reset_warn__
 
     @pytest.mark.parametrize("evars", [(["AACGM_v2_DAT_PREFIX"]),
@@ -99,6 +102,9 @@ class TestPyEnviron(object):
 
         self.test_good_coeff(aacgmv2.AACGM_v2_DAT_PREFIX, aacgmv2.IGRF_COEFFS)
 
+        # The environment is set when the submodules are first used
+        assert aacgmv2.wrapper.set_coeff_path is not None
+
         assert aacgmv2.__reset_warn__
 
     def test_top_parameters_set_same(self):
@@ -114,4 +120,7 @@ class TestPyEnviron(object):
 
         self.test_good_coeff(aacgmv2.AACGM_v2_DAT_PREFIX, aacgmv2.IGRF_COEFFS)
 
+        # The environment is set when the submodules are first used
+        assert aacgmv2.wrapper.set_coeff_path is not None
+
         assert not aacgmv2.__reset_warn__
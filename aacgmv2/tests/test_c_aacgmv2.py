@@ -1,4 +1,5 @@
 """Unit tests for the AACGMV2 wrapped C code."""
+from concurrent import futures
 import datetime as dt
 import numpy as np
 import pytest
@@ -43,7 +44,12 @@ class TestCAACGMV2(object):
                                            (aacgmv2._aacgmv2.TRACE, 2),
                                            (aacgmv2._aacgmv2.ALLOWTRACE, 4),
                                            (aacgmv2._aacgmv2.BADIDEA, 8),
-                                           (aacgmv2._aacgmv2.GEOCENTRIC, 16)])
+                                           (aacgmv2._aacgmv2.GEOCENTRIC, 16),
+                                           (aacgmv2._aacgmv2.IGRF_FIRST_EPOCH,
+                                            1590),
+                                           (aacgmv2._aacgmv2.IGRF_LAST_EPOCH,
+                                            2025),
+                                           (aacgmv2._aacgmv2.IGRF_MAXK, 196)])
     def test_constants(self, mattr, val):
         """Test module constants.
 
@@ -132,6 +138,129 @@ class TestCAACGMV2(object):
                                        decimal=4)
         np.testing.assert_equal(self.bad_ind[0], -1)
 
+    @pytest.mark.parametrize('ckey', ['G2A', 'A2G', 'TG2A', 'TA2G'])
+    def test_convert_buf(self, ckey):
+        """Test convert_buf writes into supplied arrays.
+
+        Parameters
+        ----------
+        ckey : str
+            Transforming string combination
+
+        """
+        aacgmv2._aacgmv2.set_datetime(*self.date_args[0])
+        out = np.full(shape=(len(self.lat_in), 3), fill_value=-1.0)
+        self.bad_ind = np.full(shape=len(self.lat_in), fill_value=-1,
+                               dtype=np.int32)
+        nbad = aacgmv2._aacgmv2.convert_buf(
+            np.array(self.lat_in, dtype=float),
+            np.array(self.lon_in, dtype=float),
+            np.array(self.alt_in, dtype=float), self.code[ckey], out[:, 0],
+            out[:, 1], out[:, 2], self.bad_ind)
+
+        np.testing.assert_equal(nbad, 0)
+        np.testing.assert_equal(self.bad_ind, 0)
+        np.testing.assert_almost_equal(out[0], [self.lat_comp[ckey][0],
+                                                self.lon_comp[ckey][0],
+                                                self.r_comp[ckey][0]],
+                                       decimal=4)
+
+    def test_convert_buf_threads(self):
+        """Test convert_buf in concurrent threads with different heights."""
+        aacgmv2._aacgmv2.set_datetime(*self.date_args[0])
+        lat = np.tile(np.array(self.lat_in), 500)
+        lon = np.tile(np.array(self.lon_in, dtype=float), 500)
+        alt = np.tile(np.array(self.alt_in, dtype=float), 500)
+
+        def run_convert(ind):
+            out = [np.zeros(shape=lat.shape) for i in range(3)]
+            aacgmv2._aacgmv2.convert_buf(lat, lon, alt + ind, self.code['G2A'],
+                                         *out, np.zeros(shape=lat.shape,
+                                                        dtype=np.int32))
+            return out
+
+        with futures.ThreadPoolExecutor(max_workers=4) as pool:
+            self.mlat = list(pool.map(run_convert, range(8)))
+
+        for ind, out in enumerate(self.mlat):
+            np.testing.assert_array_equal(out, run_convert(ind))
+
+    def test_convert_buf_many_heights(self):
+        """Test convert_buf with more distinct heights than cache slots."""
+        aacgmv2._aacgmv2.set_datetime(*self.date_args[0])
+        alt = np.tile(np.arange(0.0, 1000.0, 25.0), 3)
+        lat = np.full(shape=alt.shape, fill_value=float(self.lat_in[1]))
+        lon = np.full(shape=alt.shape, fill_value=float(self.lon_in[1]))
+        self.mlat = [np.zeros(shape=alt.shape) for i in range(3)]
+
+        for ckey in ['G2A', 'A2G']:
+            aacgmv2._aacgmv2.convert_buf(lat, lon, alt, self.code[ckey],
+                                         *self.mlat, np.zeros(shape=alt.shape,
+                                                              dtype=np.int32))
+            self.mlon = [aacgmv2._aacgmv2.convert(lat[0], lon[0], hh,
+                                                  self.code[ckey])
+                         for hh in alt[::-1]]
+            np.testing.assert_array_equal(np.transpose(self.mlat),
+                                          self.mlon[::-1])
+
+    def test_convert_buf_bad(self):
+        """Test convert_buf flags failed conversions with error codes."""
+        aacgmv2._aacgmv2.set_datetime(*self.date_args[0])
+        self.lat_in[0] = 7
+        self.alt_in[0] = 0
+        self.mlat, self.mlon, self.rshell = [np.zeros(shape=2)
+                                             for i in range(3)]
+        self.bad_ind = np.zeros(shape=2, dtype=np.int32)
+        nbad = aacgmv2._aacgmv2.convert_buf(
+            np.array(self.lat_in, dtype=float),
+            np.array(self.lon_in, dtype=float),
+            np.array(self.alt_in, dtype=float), aacgmv2._aacgmv2.G2A,
+            self.mlat, self.mlon, self.rshell, self.bad_ind)
+
+        np.testing.assert_equal(nbad, 1)
+        np.testing.assert_equal(self.bad_ind, [-1, 0])
+        assert np.isnan(self.mlat[0]) and np.isfinite(self.mlat[1])
+        assert np.isnan(self.mlon[0]) and np.isnan(self.rshell[0])
+
+    @pytest.mark.parametrize('bad_arg,estr', [
+        (2, 'must be a one-dimensional buffer'),
+        (np.zeros(shape=2, dtype=np.float32), "type 'd'"),
+        (np.zeros(shape=(2, 1)), 'with 2 dimensions'),
+        (np.zeros(shape=3), 'has length 3, expected 2')])
+    def test_convert_buf_bad_input(self, bad_arg, estr):
+        """Test convert_buf rejects inputs it cannot read without copying.
+
+        Parameters
+        ----------
+        bad_arg : any
+            Bad value for the height buffer
+        estr : str
+            Expected error message
+
+        """
+        self.mlat, self.mlon, self.rshell = [np.zeros(shape=2)
+                                             for i in range(3)]
+        self.bad_ind = np.zeros(shape=2, dtype=np.int32)
+        with pytest.raises((TypeError, ValueError), match=estr):
+            aacgmv2._aacgmv2.convert_buf(
+                np.array(self.lat_in, dtype=float),
+                np.array(self.lon_in, dtype=float), bad_arg,
+                aacgmv2._aacgmv2.G2A, self.mlat, self.mlon, self.rshell,
+                self.bad_ind)
+
+    def test_convert_buf_readonly_output(self):
+        """Test convert_buf rejects read-only output buffers."""
+        self.mlat, self.mlon, self.rshell = [np.zeros(shape=2)
+                                             for i in range(3)]
+        self.mlat.flags.writeable = False
+        self.bad_ind = np.zeros(shape=2, dtype=np.int32)
+        with pytest.raises(TypeError, match='out_lat must be a writable'):
+            aacgmv2._aacgmv2.convert_buf(
+                np.array(self.lat_in, dtype=float),
+                np.array(self.lon_in, dtype=float),
+                np.array(self.alt_in, dtype=float), aacgmv2._aacgmv2.G2A,
+                self.mlat, self.mlon, self.rshell, self.bad_ind)
+
     def test_forbidden(self):
         """Test convert failure."""
         self.lat_in[0] = 7
@@ -250,6 +379,17 @@ class TestCAACGMV2(object):
                                                          self.mlt)
         np.testing.assert_almost_equal(self.mlon, self.lon_in, decimal=4)
 
+    def test_inv_mlt_convert_buf(self):
+        """Test array MLT inversion using buffers."""
+        self.date_args = [np.broadcast_to(np.int32(ldate), (3,))
+                          for ldate in self.long_date]
+        self.mlt = np.array([12.0, 25.0, -1.0])
+        self.mlon = np.zeros(shape=3)
+        aacgmv2._aacgmv2.inv_mlt_convert_buf(*self.date_args, self.mlt,
+                                             self.mlon)
+        np.testing.assert_almost_equal(self.mlon, [-153.6033, 41.3967,
+                                                   11.3967], decimal=4)
+
     @pytest.mark.parametrize('marg,mlt_comp',
                              [(12.0, -153.6033), (25.0, 41.3967),
                               (-1.0, 11.3967)])
@@ -302,6 +442,15 @@ class TestCAACGMV2(object):
         self.mlt = aacgmv2._aacgmv2.mlt_convert_arr(*self.date_args, self.mlon)
         np.testing.assert_almost_equal(self.mlt, self.lon_in, decimal=4)
 
+    def test_mlt_convert_buf(self):
+        """Test array MLT conversion using buffers."""
+        self.date_args = [np.full(shape=3, fill_value=ldate, dtype=np.int32)
+                          for ldate in self.long_date]
+        self.mlon = np.array([-153.6033, 41.3967, 11.3967])
+        self.mlt = np.zeros(shape=3)
+        aacgmv2._aacgmv2.mlt_convert_buf(*self.date_args, self.mlon, self.mlt)
+        np.testing.assert_almost_equal(self.mlt, [12.0, 1.0, 23.0], decimal=4)
+
     @pytest.mark.parametrize('marg,mlt_comp',
                              [(270.0, 16.2402), (80.0, 3.5736),
                               (-90.0, 16.2402)])
@@ -325,3 +474,45 @@ class TestCAACGMV2(object):
         np.testing.assert_almost_equal(self.mlt, mlt_comp, decimal=4)
 
         del dtime, soy
+
+    def test_memory_coeffs(self):
+        """Test the coefficients are read from the files by default."""
+        assert aacgmv2._aacgmv2.memory_coeffs() == {'aacgm': False,
+                                                    'igrf': False}
+
+    @pytest.mark.parametrize('func,args,estr',
+                             [('set_coeffs', (2015, np.zeros(5)),
+                               'positive multiple of 3630'),
+                              ('set_coeffs', (2012, np.zeros(3630)),
+                               'positive multiple of 5'),
+                              ('set_coeffs', (2015, [0.0]),
+                               'one-dimensional buffer'),
+                              ('set_igrf_coeffs', (np.zeros(196), None),
+                               'coeffs has 1 epochs'),
+                              ('set_igrf_coeffs',
+                               (np.zeros(88 * 196), np.zeros(392)),
+                               'sv has length 392')])
+    def test_set_coeffs_bad(self, func, args, estr):
+        """Test setting coefficients from memory with bad input.
+
+        Parameters
+        ----------
+        func : str
+            Name of the C function
+        args : tuple
+            Input arguments
+        estr : str
+            Expected error message
+
+        """
+        with pytest.raises((TypeError, ValueError), match=estr):
+            getattr(aacgmv2._aacgmv2, func)(*args)
+
+        assert not any(aacgmv2._aacgmv2.memory_coeffs().values())
+
+    def test_docstrings(self):
+        """Test the C function docstrings hold newlines, not escapes."""
+        for name in dir(aacgmv2._aacgmv2):
+            doc = getattr(getattr(aacgmv2._aacgmv2, name), "__doc__", None)
+            if callable(getattr(aacgmv2._aacgmv2, name)) and doc is not None:
+                assert "\\n" not in doc, name
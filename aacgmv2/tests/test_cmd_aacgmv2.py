@@ -3,6 +3,7 @@ import subprocess
 import numpy as np
 import os
 import pytest
+import tempfile
 
 import aacgmv2
 
@@ -158,3 +159,282 @@ class TestCmdAACGMV2(object):
         stdout, _ = pin.communicate()
         pin.wait()
         assert b'44.63120804' in stdout
+
+    @pytest.mark.parametrize('pin', [['-c', '1'], ['-c', '2'],
+                                     ['--chunk-size', '2', '--read-ahead']])
+    def test_convert_chunks(self, pin):
+        """Test converting the input in chunks.
+
+        Parameters
+        ----------
+        pin : list
+            List of input flags
+
+        """
+        p_commands = ['python', '-m', 'aacgmv2', 'convert', '-i',
+                      self.convert, '-d', '20150224', '-o', self.output]
+        p_commands.extend(pin)
+        pin = subprocess.Popen(p_commands)
+        pin.communicate()
+        pin.wait()
+        assert os.path.isfile(self.output)
+        data = np.loadtxt(self.output)
+        np.testing.assert_allclose(data, [[57.4810, 93.5290, 1.04566],
+                                          [58.5380, 93.9324, 1.0456],
+                                          [59.5900, 94.3614, 1.04556]],
+                                   rtol=self.rtol)
+
+    @pytest.mark.parametrize('pin', [['-c', '2'], ['-c', '2', '-r']])
+    def test_convert_mlt_chunks(self, pin):
+        """Test converting MLT in chunks.
+
+        Parameters
+        ----------
+        pin : list
+            List of input flags
+
+        """
+        p_command = ['python', '-m', 'aacgmv2', 'convert_mlt', '-i',
+                     self.mlt, '20150224140015', '-o', self.output]
+        p_command.extend(pin)
+        pin = subprocess.Popen(p_command)
+        pin.communicate()
+        pin.wait()
+        assert os.path.isfile(self.output)
+        data = np.loadtxt(self.output)
+        np.testing.assert_allclose(data, [9.0912, 9.8246, 10.5579],
+                                   rtol=self.rtol)
+
+    def test_convert_chunks_stdin_stdout(self):
+        """Test piping input with comment and blank lines in chunks."""
+        pin = subprocess.Popen(
+            'printf "60 15 300\\n# comment\\n\\n60 15 300\\n" | '
+            'python -m aacgmv2 convert -d 20150224 -c 1 -r', shell=True,
+            stdout=subprocess.PIPE)
+        stdout, _ = pin.communicate()
+        pin.wait()
+        assert stdout.count(b'57.48099346 93.52899517') == 2
+
+    def test_bad_chunk_size(self):
+        """Test the command line rejects chunk sizes below one."""
+        pin = subprocess.Popen(
+            'echo 60 15 300 | python -m aacgmv2 convert -c 0', shell=True,
+            stderr=subprocess.PIPE)
+        _, stderr = pin.communicate()
+        assert pin.wait() != 0
+        assert b'not a positive integer' in stderr
+
+
+class TestCmdBinary(object):
+    """Unit tests for the binary formats of the command line interface."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.in_arr = np.array([[60.0, 15.0, 300.0], [61.0, 15.0, 300.0],
+                                [62.0, 15.0, 300.0]])
+        self.ref = np.array([[57.4810, 93.5290, 1.04566],
+                             [58.5380, 93.9324, 1.0456],
+                             [59.5900, 94.3614, 1.04556]])
+        self.output = os.path.join(self.tmp_dir.name, "output.bin")
+        self.rtol = 1.0e-4
+
+    def teardown_method(self):
+        """Clean up the test environment."""
+        self.tmp_dir.cleanup()
+        del self.tmp_dir, self.in_arr, self.ref, self.output, self.rtol
+
+    def write_input(self, in_format, arr):
+        """Write the input file.
+
+        Parameters
+        ----------
+        in_format : str
+            Input format
+        arr : np.ndarray
+            Input values
+
+        Returns
+        -------
+        filename : str
+            Input file name
+
+        """
+        filename = os.path.join(self.tmp_dir.name, "input." + in_format)
+        if in_format == 'npy':
+            np.save(filename, arr)
+        elif in_format == 'raw':
+            arr.astype('<f8').tofile(filename)
+        else:
+            np.savetxt(filename, arr)
+
+        return filename
+
+    def read_output(self, out_format, ncols):
+        """Read the output file.
+
+        Parameters
+        ----------
+        out_format : str
+            Output format
+        ncols : int
+            Number of output columns
+
+        Returns
+        -------
+        data : np.ndarray
+            Output values
+
+        """
+        if out_format == 'npy':
+            return np.load(self.output)
+        elif out_format == 'raw':
+            return np.fromfile(self.output, dtype='<f8').reshape(-1, ncols)
+
+        return np.loadtxt(self.output, ndmin=2)
+
+    @pytest.mark.parametrize('in_format', ['text', 'npy', 'raw'])
+    @pytest.mark.parametrize('out_format', ['text', 'npy', 'raw'])
+    @pytest.mark.parametrize('pin', [[], ['-c', '2'], ['-c', '1', '-w', '2']])
+    def test_convert_formats(self, in_format, out_format, pin):
+        """Test converting each input format to each output format.
+
+        Parameters
+        ----------
+        in_format : str
+            Input format
+        out_format : str
+            Output format
+        pin : list
+            List of input flags
+
+        """
+        p_commands = ['python', '-m', 'aacgmv2', 'convert', '-i',
+                      self.write_input(in_format, self.in_arr), '-d',
+                      '20150224', '-o', self.output, '--input-format',
+                      in_format, '--output-format', out_format]
+        p_commands.extend(pin)
+        subprocess.run(p_commands, check=True)
+        np.testing.assert_allclose(self.read_output(out_format, 3), self.ref,
+                                   rtol=self.rtol)
+
+    @pytest.mark.parametrize('in_format', ['npy', 'raw'])
+    def test_convert_mlt_formats(self, in_format):
+        """Test converting MLT from and to binary formats.
+
+        Parameters
+        ----------
+        in_format : str
+            Input format
+
+        """
+        mlt = np.array([12.0, 1.0, 23.0])
+        subprocess.run(['python', '-m', 'aacgmv2', 'convert_mlt', '-i',
+                        self.write_input(in_format, mlt),
+                        '20150224140015', '-o', self.output, '-v', '-c', '2',
+                        '--input-format', in_format, '--output-format', 'npy'],
+                       check=True)
+        np.testing.assert_allclose(np.load(self.output),
+                                   [44.6313, -120.3687, -150.3687],
+                                   rtol=self.rtol)
+
+    def test_npy_pipe(self):
+        """Test piping NumPy input to NumPy output."""
+        pin = subprocess.run(
+            ['python', '-m', 'aacgmv2', 'convert', '-d', '20150224',
+             '--input-format', 'npy', '--output-format', 'npy', '-c', '2'],
+            input=open(self.write_input('npy', self.in_arr), 'rb').read(),
+            stdout=subprocess.PIPE, check=True)
+        with open(self.output, 'wb') as fout:
+            fout.write(pin.stdout)
+
+        np.testing.assert_allclose(np.load(self.output), self.ref,
+                                   rtol=self.rtol)
+
+    def test_npy_pipe_failure(self):
+        """Test NumPy output of unknown length to a pipe is rejected."""
+        pin = subprocess.run(
+            'echo 60 15 300 | python -m aacgmv2 convert --output-format npy '
+            '| cat', shell=True, stderr=subprocess.PIPE)
+        assert b'NumPy output needs the number of rows' in pin.stderr
+
+    def test_raw_partial_row(self):
+        """Test raw input that ends within a row is rejected."""
+        filename = self.write_input('raw', self.in_arr.ravel()[:-1])
+        pin = subprocess.run(['python', '-m', 'aacgmv2', 'convert', '-i',
+                              filename, '--input-format', 'raw'],
+                             stderr=subprocess.PIPE)
+        assert pin.returncode != 0
+        assert b'binary input ends within a row' in pin.stderr
+
+
+class TestCmdTimeColumn(object):
+    """Unit tests for command line input with one time per row."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dtimes = np.array(['2015-02-24T14:00:15', '2010-06-01T00:00:00',
+                                '2015-02-24T14:00:15.5'],
+                               dtype='datetime64[ms]')
+        self.epoch = (self.dtimes - np.datetime64(0, 'ms')) \
+            / np.timedelta64(1, 's')
+        self.output = os.path.join(self.tmp_dir.name, "output.bin")
+
+    def teardown_method(self):
+        """Clean up the test environment."""
+        self.tmp_dir.cleanup()
+        del self.tmp_dir, self.dtimes, self.epoch, self.output
+
+    @pytest.mark.parametrize('pin', [[], ['-c', '2', '-r']])
+    def test_convert_times(self, pin):
+        """Test converting text rows with ISO and epoch times.
+
+        Parameters
+        ----------
+        pin : list
+            List of input flags
+
+        """
+        lines = ["60 15 300 {:}".format(self.dtimes[0]),
+                 "61 15 300 {:f}".format(self.epoch[1]),
+                 "62 15 300 {:}Z".format(self.dtimes[2])]
+        subprocess.run(['python', '-m', 'aacgmv2', 'convert', '-T', '-o',
+                        self.output] + pin, input="\n".join(lines).encode(),
+                       check=True)
+
+        ref = aacgmv2.convert_latlon_arr([60, 61, 62], 15, 300, self.dtimes)
+        np.testing.assert_allclose(np.loadtxt(self.output),
+                                   np.column_stack(ref), rtol=1.0e-7)
+
+    def test_convert_raw_times(self):
+        """Test converting raw rows with epoch times."""
+        filename = os.path.join(self.tmp_dir.name, "input.raw")
+        np.column_stack([[60, 61, 62], [15, 15, 15], [300, 300, 300],
+                         self.epoch]).astype('<f8').tofile(filename)
+        subprocess.run(['python', '-m', 'aacgmv2', 'convert', '-T', '-i',
+                        filename, '--input-format', 'raw', '-o', self.output,
+                        '--output-format', 'npy'], check=True)
+
+        ref = aacgmv2.convert_latlon_arr([60, 61, 62], 15, 300, self.dtimes)
+        np.testing.assert_allclose(np.load(self.output), np.column_stack(ref))
+
+    def test_convert_mlt_times(self):
+        """Test converting MLT with one time per row."""
+        lines = ["12 {:}".format(self.dtimes[0]),
+                 "12 {:}".format(self.epoch[1])]
+        pin = subprocess.run(['python', '-m', 'aacgmv2', 'convert_mlt', '-T',
+                              '-v'], input="\n".join(lines).encode(),
+                             stdout=subprocess.PIPE, check=True)
+
+        np.testing.assert_allclose(np.loadtxt(pin.stdout.splitlines()),
+                                   aacgmv2.convert_mlt([12.0, 12.0],
+                                                       self.dtimes[:2],
+                                                       m2a=True), rtol=1.0e-7)
+
+    def test_convert_mlt_no_time(self):
+        """Test MLT conversion fails without a date and time."""
+        pin = subprocess.run('echo 12 | python -m aacgmv2 convert_mlt -v',
+                             shell=True, stderr=subprocess.PIPE)
+        assert pin.returncode != 0
+        assert b'the date and time are required' in pin.stderr
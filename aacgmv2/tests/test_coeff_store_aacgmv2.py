@@ -0,0 +1,201 @@
+"""Unit tests for the AACGMV2 binary coefficient store."""
+import datetime as dt
+import numpy as np
+import os
+import pytest
+import shutil
+import tempfile
+
+import aacgmv2
+from aacgmv2 import coeff_store
+
+
+class TestCoeffStore(object):
+    """Unit tests for writing, reading, and using the coefficient store."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.prefix = os.path.join(self.tmp_dir.name, "aacgm_coeffs-14-")
+        self.dtime = dt.datetime(2015, 1, 1)
+        self.in_args = [[60.0, 61.0], [0.0, 0.0], [300.0, 300.0]]
+        self.ref = aacgmv2.convert_latlon_arr(*self.in_args, self.dtime)
+        self.out = None
+
+    def teardown_method(self):
+        """Clean up the test envrionment."""
+        self.tmp_dir.cleanup()
+        del self.tmp_dir, self.prefix, self.dtime, self.in_args, self.ref
+        del self.out
+
+    def copy_asc(self, years):
+        """Copy ASCII coefficient files into the temporary directory.
+
+        Parameters
+        ----------
+        years : list-like
+            Epoch years to copy
+
+        """
+        for year in years:
+            shutil.copy("{:}{:04d}.asc".format(aacgmv2.AACGM_v2_DAT_PREFIX,
+                                               year), self.tmp_dir.name)
+
+    def evaluate_conversion(self):
+        """Evaluate a conversion using the temporary coefficient files."""
+        conv = aacgmv2.Converter(self.dtime, coeff_prefix=self.prefix)
+        self.out = conv.convert_latlon_arr(*self.in_args)
+        np.testing.assert_array_equal(self.out, self.ref)
+
+    def test_store_filename(self):
+        """Test the coefficient store filename."""
+        assert coeff_store.store_filename(self.prefix) == "".join([
+            self.prefix, "all.bin"])
+
+    def test_write_read_store(self):
+        """Test the store holds the same values as the ASCII files."""
+        self.copy_asc([2010, 2015, 2020])
+        self.out = coeff_store.write_coeff_store(self.prefix)
+        assert self.out == coeff_store.store_filename(self.prefix)
+
+        epochs, coeffs = coeff_store.read_coeff_store(self.out)
+        np.testing.assert_array_equal(epochs, [2010, 2015, 2020])
+        np.testing.assert_array_equal(coeffs.shape,
+                                      (3,) + coeff_store.EPOCH_SHAPE)
+
+        with open("".join([self.prefix, "2015.asc"]), "r") as fin:
+            asc = np.array(fin.read().split(), dtype=float)
+        np.testing.assert_array_equal(coeffs[1].ravel(), asc)
+
+    def test_package_store(self):
+        """Test the store built with the package covers all epochs."""
+        epochs, coeffs = coeff_store.read_coeff_store(
+            coeff_store.store_filename(aacgmv2.AACGM_v2_DAT_PREFIX))
+        assert epochs[0] == 1590
+        assert epochs[-1] == 2030
+        assert np.all(np.diff(epochs) == 5)
+
+    def test_store_only(self):
+        """Test conversions using only the coefficient store."""
+        self.copy_asc([2015, 2020])
+        coeff_store.write_coeff_store(self.prefix)
+        for year in [2015, 2020]:
+            os.remove("{:}{:04d}.asc".format(self.prefix, year))
+
+        self.evaluate_conversion()
+
+    def test_asc_only(self):
+        """Test conversions using only the ASCII coefficient files."""
+        self.copy_asc([2015, 2020])
+        self.evaluate_conversion()
+
+    def test_bad_checksum(self):
+        """Test a store with a bad checksum falls back to the ASCII files."""
+        self.copy_asc([2015, 2020])
+        store_file = coeff_store.write_coeff_store(self.prefix)
+
+        # Corrupt the 2015 coefficients
+        with open(store_file, "r+b") as fio:
+            fio.seek(-np.prod(coeff_store.EPOCH_SHAPE) * 8 - 8, os.SEEK_END)
+            fio.write(b"\xff" * 8)
+
+        with pytest.raises(ValueError, match="checksum mismatch for epoch"):
+            coeff_store.read_coeff_store(store_file)
+
+        self.evaluate_conversion()
+
+    def test_bad_store(self):
+        """Test reading a file that is not a coefficient store."""
+        with pytest.raises(ValueError, match="not a version 1 coefficient"):
+            coeff_store.read_coeff_store(aacgmv2.IGRF_COEFFS)
+
+    def test_write_no_files(self):
+        """Test writing a store without any ASCII files."""
+        with pytest.raises(ValueError, match="no coefficient files found"):
+            coeff_store.write_coeff_store(self.prefix)
+
+    def test_write_irregular_files(self):
+        """Test writing a store with irregularly spaced ASCII files."""
+        self.copy_asc([2010, 2015, 2025])
+        with pytest.raises(ValueError, match="irregularly spaced in time"):
+            coeff_store.write_coeff_store(self.prefix)
+
+    def test_unpack_store(self):
+        """Test unpacking the store contents matches reading the store."""
+        self.copy_asc([2010, 2015, 2020])
+        store_file = coeff_store.write_coeff_store(self.prefix)
+        epochs, coeffs = coeff_store.read_coeff_store(store_file)
+
+        with open(store_file, "rb") as fin:
+            self.out = coeff_store.unpack_coeff_store(fin.read())
+
+        np.testing.assert_array_equal(self.out[0], epochs)
+        np.testing.assert_array_equal(self.out[1], coeffs)
+        assert not self.out[1].flags.writeable
+
+    @pytest.mark.parametrize("nbytes,estr",
+                             [(-8, "unexpected coefficient store size"),
+                              (-1000000, "file too short")])
+    def test_unpack_bad_size(self, nbytes, estr):
+        """Test unpacking truncated store contents.
+
+        Parameters
+        ----------
+        nbytes : int
+            Number of bytes kept, counted from the end
+        estr : str
+            Expected error message
+
+        """
+        self.copy_asc([2015, 2020])
+        with open(coeff_store.write_coeff_store(self.prefix), "rb") as fin:
+            self.out = fin.read()
+
+        with pytest.raises(ValueError, match=estr):
+            coeff_store.unpack_coeff_store(self.out[:nbytes])
+
+    def test_unpack_bad_checksum(self):
+        """Test unpacking store contents with a bad checksum."""
+        self.copy_asc([2015, 2020])
+        with open(coeff_store.write_coeff_store(self.prefix), "rb") as fin:
+            self.out = bytearray(fin.read())
+        self.out[-8:] = b"\xff" * 8
+
+        with pytest.raises(ValueError, match="mismatch for epoch 2020"):
+            coeff_store.unpack_coeff_store(self.out)
+
+    @pytest.mark.parametrize("mode", ["r", "rb"])
+    def test_parse_igrf(self, mode):
+        """Test parsing the IGRF coefficient file.
+
+        Parameters
+        ----------
+        mode : str
+            Mode used to read the file, giving text or bytes
+
+        """
+        with open(aacgmv2.IGRF_COEFFS, mode) as fin:
+            epochs, coeffs, sv = coeff_store.parse_igrf_coeffs(fin.read())
+
+        np.testing.assert_array_equal(epochs, np.arange(1590, 2026, 5))
+        assert coeffs.shape == (len(epochs), coeff_store.IGRF_MAXK)
+        assert sv.shape == (coeff_store.IGRF_MAXK,)
+
+        # g(1, 0), g(1, 1), and h(1, 1) at the first and last epochs
+        np.testing.assert_array_equal(coeffs[[0, -1]][:, [2, 3, 1]],
+                                      [[-36069.0, -2624.0, 1227.0],
+                                       [-29350.0, -1410.3, 4545.5]])
+        np.testing.assert_array_equal(sv[[2, 3, 1]], [12.6, 10.0, -21.5])
+        assert np.all(coeffs[:, 0] == 0.0)
+
+    def test_parse_not_igrf(self):
+        """Test parsing text that is not an IGRF coefficient file."""
+        with pytest.raises(ValueError, match="not an IGRF coefficient file"):
+            coeff_store.parse_igrf_coeffs("# Not a coefficient file\n")
+
+    def test_parse_igrf_bad_line(self):
+        """Test parsing an IGRF coefficient file with a missing value."""
+        self.out = "g/h n m 2015.0 2020.0 2020-25\ng 1 0 -29441.5 -29404.8\n"
+
+        with pytest.raises(ValueError, match="unexpected number of values"):
+            coeff_store.parse_igrf_coeffs(self.out)
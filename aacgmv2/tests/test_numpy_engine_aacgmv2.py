@@ -0,0 +1,142 @@
+"""Unit tests for the AACGMV2 NumPy coefficient engine."""
+from concurrent import futures
+import datetime as dt
+import numpy as np
+import pickle
+import pytest
+
+import aacgmv2
+import aacgmv2._aacgmv2 as c_aacgmv2
+from aacgmv2 import numpy_engine
+
+
+class TestNumpyEngine(object):
+    """Unit tests comparing the NumPy engine to the C library."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        rng = np.random.default_rng(0)
+        self.lat = rng.uniform(-90.0, 90.0, 500)
+        self.lon = rng.uniform(-180.0, 180.0, 500)
+        self.alt = rng.uniform(0.0, 2000.0, 500)
+        self.dtime = dt.datetime(2015, 1, 1, 0, 0, 0)
+        self.model = numpy_engine.CoeffModel()
+        self.out = None
+
+    def teardown_method(self):
+        """Clean up the test envrionment."""
+        del self.lat, self.lon, self.alt, self.dtime, self.model, self.out
+
+    def evaluate_output(self, code):
+        """Compare the output to the C library.
+
+        Parameters
+        ----------
+        code : int
+            Conversion bit code
+
+        """
+        ref = aacgmv2.convert_latlon_arr(self.lat, self.lon, self.alt,
+                                         self.dtime, code)
+        for i, ref_arr in enumerate(ref):
+            np.testing.assert_array_equal(np.isnan(self.out[i]),
+                                          np.isnan(ref_arr))
+            np.testing.assert_allclose(self.out[i], ref_arr, rtol=1.0e-10,
+                                       atol=1.0e-8)
+
+    @pytest.mark.parametrize('code', [0, 1, 16, 17])
+    def test_convert(self, code):
+        """Test conversions match the C library.
+
+        Parameters
+        ----------
+        code : int
+            Conversion bit code
+
+        """
+        self.out = self.model.convert(self.lat, self.lon, self.alt,
+                                      self.dtime, code)
+        assert np.all((self.out[3] == 0) == np.isfinite(self.out[0]))
+        self.evaluate_output(code)
+
+    @pytest.mark.parametrize('code,err', [(0, -4), (c_aacgmv2.BADIDEA, 0),
+                                          (c_aacgmv2.ALLOWTRACE,
+                                           numpy_engine.TRACE_CODE)])
+    def test_convert_high(self, code, err):
+        """Test conversions above the coefficient altitude limit.
+
+        Parameters
+        ----------
+        code : int
+            Conversion bit code
+        err : int
+            Expected error code
+
+        """
+        self.out = self.model.convert(45.0, 0.0, [300.0, 3000.0], self.dtime,
+                                      code | c_aacgmv2.GEOCENTRIC)
+        np.testing.assert_array_equal(self.out[3], [0, err])
+
+    def test_convert_trace(self):
+        """Test all locations must be traced with TRACE."""
+        self.out = self.model.convert(self.lat, self.lon, self.alt,
+                                      self.dtime, c_aacgmv2.TRACE)
+        assert np.all(self.out[3] == numpy_engine.TRACE_CODE)
+        assert np.all(np.isnan(self.out[0]))
+
+    def test_convert_bad_lat(self):
+        """Test latitudes outside the valid range."""
+        self.out = self.model.convert([91.0, 45.0], 0.0, 300.0, self.dtime)
+        np.testing.assert_array_equal(self.out[3], [-8, 0])
+        assert np.isnan(self.out[0][0])
+
+    def test_forbidden_region(self):
+        """Test the forbidden region is flagged."""
+        self.out = self.model.convert(0.0, 0.0, 300.0, self.dtime,
+                                      c_aacgmv2.A2G)
+        assert self.out[3] == -1
+        assert np.isnan(self.out[0])
+
+    @pytest.mark.parametrize('year', [1585, 2030])
+    def test_time_coeffs_bad_time(self, year):
+        """Test a ValueError is raised for times without coefficients.
+
+        Parameters
+        ----------
+        year : int
+            Year outside the coefficients
+
+        """
+        with pytest.raises(ValueError, match="no coefficients"):
+            self.model.time_coeffs(dt.datetime(year, 1, 1))
+
+    def test_pickle(self):
+        """Test the coefficient model may be pickled."""
+        self.model.time_coeffs(self.dtime)
+        self.out = pickle.loads(pickle.dumps(self.model))
+        assert self.out.coeff_prefix == self.model.coeff_prefix
+        np.testing.assert_array_equal(self.out.time_coeffs(self.dtime),
+                                      self.model.time_coeffs(self.dtime))
+
+    def test_threads(self):
+        """Test one coefficient model may be used by several threads."""
+        dtimes = [self.dtime, dt.datetime(2020, 6, 1)] * 4
+        with futures.ThreadPoolExecutor(max_workers=4) as pool:
+            self.out = list(pool.map(lambda dtime: self.model.convert(
+                self.lat, self.lon, self.alt, dtime), dtimes))
+
+        for i, out in enumerate(self.out):
+            np.testing.assert_array_equal(out[0], self.out[i % 2][0])
+
+    def test_get_model(self):
+        """Test coefficient models are shared for each prefix."""
+        self.out = numpy_engine.get_model()
+        assert numpy_engine.get_model(self.out.coeff_prefix) is self.out
+
+    def test_engine_keyword(self):
+        """Test the array wrapper with the NumPy engine and tracing."""
+        self.alt[:5] = 3000.0
+        self.out = aacgmv2.convert_latlon_arr(self.lat, self.lon, self.alt,
+                                              self.dtime, "ALLOWTRACE",
+                                              engine="numpy")
+        self.evaluate_output("ALLOWTRACE")
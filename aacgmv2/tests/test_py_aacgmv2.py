@@ -1,13 +1,28 @@
 """Unit tests for primary Python functions."""
+from concurrent import futures
 import datetime as dt
+import json
 import logging
+import multiprocessing
 import numpy as np
 import os
 import pytest
+import threading
+import tracemalloc
 import warnings
 
 import aacgmv2
 
+_convert_shard = aacgmv2.wrapper._convert_shard
+
+
+def _failing_shard(*args, **kwargs):
+    """Convert a shard, ending the process if it is a worker process."""
+    if multiprocessing.parent_process() is not None:
+        os._exit(1)
+
+    return _convert_shard(*args, **kwargs)
+
 
 class TestConvertArray(object):
     """Unit tests for array conversion."""
@@ -309,10 +324,370 @@ class TestConvertLatLonArr(TestConvertArray):
                                               [2001], self.dtime, self.method)
         assert np.all(np.isnan(np.array(self.out)))
 
+    @pytest.mark.parametrize('stacked', [True, False])
+    def test_convert_latlon_arr_out(self, stacked):
+        """Test array latlon conversion into pre-allocated output.
+
+        Parameters
+        ----------
+        stacked : bool
+            Supply an (N, 3) array if True or a tuple of arrays if False
+
+        """
+        out = np.zeros(shape=(len(self.lat_in), 3))
+        out_arg = out if stacked else (out[:, 0], out[:, 1], out[:, 2])
+        self.out = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in,
+                                              self.alt_in, self.dtime,
+                                              self.method, out=out_arg)
+
+        self.ref[2] = [1.0457, 1.0456]
+        self.evaluate_output()
+        np.testing.assert_allclose(out.transpose(), self.ref, rtol=self.rtol)
+        for oo in self.out:
+            assert np.shares_memory(oo, out)
+
+    @pytest.mark.parametrize('max_workers', [None, 0, 1, 2, 5])
+    def test_convert_latlon_arr_max_workers(self, max_workers):
+        """Test array latlon conversion split across threads.
+
+        Parameters
+        ----------
+        max_workers : int or NoneType
+            Number of threads
+
+        """
+        self.lat_in = [60.0, 61.0, 60.0, 61.0, 60.0]
+        self.out = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in[0],
+                                              self.alt_in[0], self.dtime,
+                                              self.method,
+                                              max_workers=max_workers)
+
+        self.ref = [[rr[i % 2] for i in range(len(self.lat_in))]
+                    for rr in [self.ref[0], self.ref[1], [1.0457, 1.0456]]]
+        self.evaluate_output()
+
+    @pytest.mark.parametrize('engine,method,chunk_func',
+                             [('batch', 'TRACE', '_convert_chunk'),
+                              ('numpy', 'G2A', 'convert_coeffs')])
+    def test_convert_latlon_arr_max_workers_2d(self, engine, method,
+                                               chunk_func, monkeypatch):
+        """Test threads split multi-dimensional locations evenly.
+
+        Parameters
+        ----------
+        engine : str
+            Conversion engine
+        method : str
+            Conversion method code
+        chunk_func : str
+            Function called by each thread, whose first array argument holds
+            the chunk of locations
+
+        """
+        module = aacgmv2.wrapper if engine == 'batch' else aacgmv2.numpy_engine
+        func = getattr(module, chunk_func)
+        chunks = list()
+
+        def record_chunk(*args, **kwargs):
+            chunks.append([arg.shape for arg in args
+                           if isinstance(arg, np.ndarray)][0])
+            return func(*args, **kwargs)
+
+        self.lat_in = np.tile(self.lat_in, (2, 3))
+        self.ref = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in[0],
+                                              self.alt_in[0], self.dtime,
+                                              method, engine=engine)
+
+        monkeypatch.setattr(module, chunk_func, record_chunk)
+        out = [np.empty(shape=self.lat_in.shape, order='F') for i in range(3)]
+        self.out = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in[0],
+                                              self.alt_in[0], self.dtime,
+                                              method, out=out, max_workers=4,
+                                              engine=engine)
+
+        assert chunks == [(3,)] * 4
+        for oo, out_arr, ref in zip(self.out, out, self.ref):
+            assert oo is out_arr
+            np.testing.assert_array_equal(oo, ref)
+
+    @pytest.mark.parametrize('max_workers', [None, 2])
+    def test_convert_latlon_arr_time_arr(self, max_workers):
+        """Test array latlon conversion with one time per location.
+
+        Parameters
+        ----------
+        max_workers : int or NoneType
+            Number of threads
+
+        """
+        dtimes = [dt.datetime(2020, 6, 1), self.dtime, self.dtime,
+                  dt.datetime(2020, 6, 1)]
+        self.lat_in = [60.0, 60.0, 61.0, 61.0]
+        self.ref = [aacgmv2.convert_latlon(lat, self.lon_in[0],
+                                           self.alt_in[0], dtime, self.method)
+                    for lat, dtime in zip(self.lat_in, dtimes)]
+        self.out = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in[0],
+                                              self.alt_in[0], dtimes,
+                                              self.method,
+                                              max_workers=max_workers)
+        self.ref = np.transpose(self.ref)
+        self.evaluate_output()
+
+    @pytest.mark.parametrize('engine', ['batch', 'scalar', 'numpy'])
+    @pytest.mark.parametrize('ntime', [1, 2])
+    def test_convert_latlon_arr_workers(self, engine, ntime):
+        """Test array latlon conversion split across worker processes.
+
+        Parameters
+        ----------
+        engine : str
+            Conversion engine
+        ntime : int
+            Number of distinct times
+
+        """
+        dtimes = ([self.dtime, dt.datetime(2020, 6, 1)][:ntime] * 12)[:12]
+        self.lat_in = np.linspace(50.0, 70.0, 12)
+        self.ref = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in[0],
+                                              self.alt_in[0], dtimes,
+                                              self.method, engine=engine)
+        self.out = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in[0],
+                                              self.alt_in[0], dtimes,
+                                              self.method, engine=engine,
+                                              workers=2)
+        np.testing.assert_array_equal(self.out, self.ref)
+
+    def test_convert_latlon_arr_worker_failure(self, monkeypatch, caplog):
+        """Test locations are converted when a worker process fails."""
+        monkeypatch.setattr(aacgmv2.wrapper, "_convert_shard", _failing_shard)
+        self.lat_in = np.linspace(50.0, 70.0, 12).reshape((3, 4))
+        self.ref = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in[0],
+                                              self.alt_in[0], self.dtime,
+                                              self.method)
+
+        with caplog.at_level(logging.WARNING, logger='aacgmv2_logger'):
+            self.out = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in[0],
+                                                  self.alt_in[0], self.dtime,
+                                                  self.method, workers=2)
+
+        assert "a worker process failed" in caplog.text
+        np.testing.assert_array_equal(self.out, self.ref)
+
+    def test_convert_latlon_arr_worker_pool(self):
+        """Test array latlon conversions reusing a pool of worker processes."""
+        self.lat_in = np.linspace(50.0, 70.0, 12)
+        with aacgmv2.WorkerPool(2) as pool:
+            for dtime in [self.dtime, dt.datetime(2020, 6, 1)]:
+                self.ref = aacgmv2.convert_latlon_arr(
+                    self.lat_in, self.lon_in[0], self.alt_in[0], dtime,
+                    self.method)
+                self.out = aacgmv2.convert_latlon_arr(
+                    self.lat_in, self.lon_in[0], self.alt_in[0], dtime,
+                    self.method, workers=pool)
+                np.testing.assert_array_equal(self.out, self.ref)
+
+    def test_convert_latlon_arr_worker_pool_failure(self, monkeypatch,
+                                                    caplog):
+        """Test a pool of worker processes is replaced after a failure."""
+        self.lat_in = np.linspace(50.0, 70.0, 12)
+        self.ref = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in[0],
+                                              self.alt_in[0], self.dtime,
+                                              self.method)
+
+        with aacgmv2.WorkerPool(2) as pool:
+            monkeypatch.setattr(aacgmv2.wrapper, "_convert_shard",
+                                _failing_shard)
+            with caplog.at_level(logging.WARNING, logger='aacgmv2_logger'):
+                self.out = aacgmv2.convert_latlon_arr(
+                    self.lat_in, self.lon_in[0], self.alt_in[0], self.dtime,
+                    self.method, workers=pool)
+
+            assert "a worker process failed" in caplog.text
+            np.testing.assert_array_equal(self.out, self.ref)
+
+            # The replacement worker processes convert the next call
+            monkeypatch.undo()
+            caplog.clear()
+            with caplog.at_level(logging.WARNING, logger='aacgmv2_logger'):
+                self.out = aacgmv2.convert_latlon_arr(
+                    self.lat_in, self.lon_in[0], self.alt_in[0], self.dtime,
+                    self.method, workers=pool)
+
+            assert "a worker process failed" not in caplog.text
+            np.testing.assert_array_equal(self.out, self.ref)
+
+    def test_convert_latlon_arr_time_res(self):
+        """Test array latlon conversion with times rounded to a resolution."""
+        dtimes = [self.dtime + dt.timedelta(seconds=sec) for sec in [-20, 25]]
+        self.out = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in,
+                                              self.alt_in, dtimes, self.method,
+                                              time_res=dt.timedelta(minutes=1))
+        self.ref[2] = [1.0457, 1.0456]
+        self.evaluate_output()
+
+    def test_convert_latlon_arr_concurrent_times(self):
+        """Test array latlon conversions at different times in threads."""
+        dtimes = [self.dtime, dt.datetime(2020, 6, 1)] * 4
+        self.ref = [aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in,
+                                               self.alt_in, dtime, self.method)
+                    for dtime in dtimes[:2]]
+
+        with futures.ThreadPoolExecutor(max_workers=4) as pool:
+            self.out = list(pool.map(
+                lambda dtime: aacgmv2.convert_latlon_arr(
+                    self.lat_in, self.lon_in, self.alt_in, dtime, self.method),
+                dtimes))
+
+        for i, out in enumerate(self.out):
+            np.testing.assert_allclose(out, self.ref[i % 2], rtol=self.rtol)
+
+    @pytest.mark.parametrize('engine', ['batch', 'scalar', 'numpy'])
+    def test_convert_latlon_arr_engine(self, engine):
+        """Test array latlon conversion with each engine.
+
+        Parameters
+        ----------
+        engine : str
+            Conversion engine
+
+        """
+        self.out = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in,
+                                              self.alt_in, self.dtime,
+                                              self.method, engine=engine)
+        self.ref[2] = [1.0457, 1.0456]
+        self.evaluate_output()
+
+    def test_convert_latlon_arr_bad_engine(self):
+        """Test array latlon conversion raises ValueError for a bad engine."""
+        with pytest.raises(ValueError, match="unknown engine"):
+            aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in, self.alt_in,
+                                       self.dtime, self.method,
+                                       engine="fast")
+
+    @pytest.mark.parametrize('method,max_height,pct',
+                             [("G2A|TRACE", 2000.0, 100),
+                              ("A2G|TRACE", 2000.0, 99),
+                              ("G2A|ALLOWTRACE", 4000.0, 100),
+                              ("A2G|ALLOWTRACE", 4000.0, 99)])
+    def test_convert_latlon_arr_engine_trace(self, method, max_height, pct):
+        """Test the batch and scalar engines agree for traced conversions.
+
+        Parameters
+        ----------
+        method : str
+            Conversion method code
+        max_height : float
+            Maximum height of the random locations in km
+        pct : int
+            Percentile of the locations that must agree within 1e-5 degrees
+
+        """
+        rng = np.random.default_rng(0)
+        self.lat_in = rng.uniform(-88.0, 88.0, size=500)
+        self.lon_in = rng.uniform(-180.0, 180.0, size=500)
+        self.alt_in = rng.uniform(0.0, max_height, size=500)
+
+        self.out = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in,
+                                              self.alt_in, self.dtime, method,
+                                              engine="batch")
+        self.ref = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in,
+                                              self.alt_in, self.dtime, method,
+                                              engine="scalar")
+
+        good = np.isfinite(self.ref[0])
+        np.testing.assert_array_equal(np.isfinite(self.out[0]), good)
+        diff = np.maximum(abs(self.out[0] - self.ref[0]),
+                          abs((self.out[1] - self.ref[1] + 180.0) % 360.0
+                              - 180.0))[good]
+        assert np.percentile(diff, pct) <= 1.0e-5
+        assert diff.max() <= 0.05
+
+    @pytest.mark.parametrize('max_workers', [None, 2])
+    @pytest.mark.parametrize('ntime', [1, 2])
+    def test_convert_latlon_arr_sort_height(self, max_workers, ntime):
+        """Test array latlon conversion in height order.
+
+        Parameters
+        ----------
+        max_workers : int or NoneType
+            Number of threads
+        ntime : int
+            Number of distinct times
+
+        """
+        self.alt_in = np.array([[900.0, 300.0, 300.0], [100.0, 900.0, 100.0]])
+        dtimes = self.dtime if ntime == 1 else np.array(
+            [[self.dtime, dt.datetime(2020, 6, 1), self.dtime]] * 2)
+        self.ref = aacgmv2.convert_latlon_arr(self.lat_in[0], self.lon_in[0],
+                                              self.alt_in, dtimes, self.method)
+        self.out = aacgmv2.convert_latlon_arr(self.lat_in[0], self.lon_in[0],
+                                              self.alt_in, dtimes, self.method,
+                                              max_workers=max_workers,
+                                              sort_height=True)
+
+        for i, oo in enumerate(self.out):
+            np.testing.assert_equal(oo.shape, (2, 3))
+            np.testing.assert_array_equal(oo, self.ref[i])
+
+    def test_convert_latlon_arr_multidim(self):
+        """Test array latlon conversion for broadcast multi-dim input."""
+        self.out = aacgmv2.convert_latlon_arr(
+            np.array(self.lat_in).reshape(2, 1), np.zeros(shape=(1, 3)),
+            self.alt_in[0], self.dtime, self.method)
+
+        self.ref[2] = [1.0457, 1.0456]
+        for i, oo in enumerate(self.out):
+            np.testing.assert_equal(oo.shape, (2, 3))
+            np.testing.assert_allclose(oo, np.transpose([self.ref[i]] * 3),
+                                       rtol=self.rtol)
+
+    def test_convert_latlon_arr_multidim_time_arr(self):
+        """Test array latlon conversion for multi-dim input and times."""
+        dtimes = np.array([[self.dtime, dt.datetime(2020, 6, 1)]] * 2)
+        self.lat_in = np.array([self.lat_in] * 2).transpose()
+        self.out = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in[0],
+                                              self.alt_in[0], dtimes,
+                                              self.method)
+        self.ref = [aacgmv2.convert_latlon_arr(self.lat_in[:, i],
+                                               self.lon_in[0], self.alt_in[0],
+                                               dtimes[0, i], self.method)
+                    for i in range(2)]
+
+        for i, oo in enumerate(self.out):
+            np.testing.assert_equal(oo.shape, (2, 2))
+            np.testing.assert_allclose(oo, np.transpose([self.ref[0][i],
+                                                         self.ref[1][i]]),
+                                       rtol=self.rtol)
+
+    @pytest.mark.parametrize('out,msg',
+                             [(np.zeros(shape=(3, 3)), "must have shape"),
+                              ((np.zeros(shape=2), np.zeros(shape=2)),
+                               "must contain three arrays"),
+                              ((np.zeros(shape=2), np.zeros(shape=2),
+                                np.zeros(shape=2, dtype=np.float32)),
+                               "must be float64"),
+                              ((np.zeros(shape=2), np.zeros(shape=2),
+                                np.zeros(shape=3)), "must match the input")])
+    def test_convert_latlon_arr_out_failure(self, out, msg):
+        """Test array latlon conversion failure for bad output arrays.
+
+        Parameters
+        ----------
+        out : tuple or np.ndarray
+            Bad output arrays
+        msg : str
+            Expected error message
+
+        """
+        with pytest.raises(ValueError, match=msg):
+            aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in, self.alt_in,
+                                       self.dtime, self.method, out=out)
+
     @pytest.mark.parametrize('in_rep,in_irep,msg',
                              [(None, 3, "must be a datetime object"),
-                              ([np.full(shape=(3, 2), fill_value=50.0), 0],
-                               [0, 1], "unable to process multi-dimensional"),
+                              ([np.full(shape=(3, 2), fill_value=50.0),
+                                np.zeros(shape=(3,))], [0, 1],
+                               "arrays are mismatched"),
                               ([50, 60, 70], 0, "arrays are mismatched"),
                               ([[91, 60, -91], 0, 300], [0, 1, 2],
                                "unrealistic latitude"),
@@ -486,6 +861,45 @@ class TestGetAACGMCoordArr(TestConvertArray):
         self.ref = [[64.3481], [83.2885], [0.3306]]
         self.evaluate_output()
 
+    def test_get_aacgm_coord_arr_out(self):
+        """Test array AACGMV2 calculation into a pre-allocated array."""
+        out = np.zeros(shape=(len(self.lat_in), 3))
+        self.out = aacgmv2.get_aacgm_coord_arr(self.lat_in, self.lon_in,
+                                               self.alt_in, self.dtime,
+                                               self.method, out=out)
+        self.evaluate_output()
+        np.testing.assert_allclose(out.transpose(), self.ref, rtol=self.rtol)
+
+    def test_get_aacgm_coord_arr_max_workers(self):
+        """Test array AACGMV2 calculation split across threads."""
+        self.out = aacgmv2.get_aacgm_coord_arr(self.lat_in, self.lon_in,
+                                               self.alt_in, self.dtime,
+                                               self.method, max_workers=2)
+        self.evaluate_output()
+
+    def test_get_aacgm_coord_arr_workers(self):
+        """Test array AACGMV2 calculation split across worker processes."""
+        self.ref = aacgmv2.get_aacgm_coord_arr(self.lat_in, self.lon_in,
+                                               self.alt_in, self.dtime,
+                                               self.method)
+        self.out = aacgmv2.get_aacgm_coord_arr(self.lat_in, self.lon_in,
+                                               self.alt_in, self.dtime,
+                                               self.method, workers=2)
+        np.testing.assert_array_equal(self.out, self.ref)
+
+    def test_get_aacgm_coord_arr_time_arr(self):
+        """Test array AACGMV2 calculation with one time per location."""
+        dtimes = np.array([self.dtime, dt.datetime(2020, 6, 1)],
+                          dtype='datetime64[s]')
+        self.out = aacgmv2.get_aacgm_coord_arr(self.lat_in, self.lon_in,
+                                               self.alt_in, dtimes,
+                                               self.method)
+        self.ref = np.transpose([aacgmv2.get_aacgm_coord(
+            lat, lon, alt, dtime.astype(dt.datetime), self.method)
+            for lat, lon, alt, dtime in zip(self.lat_in, self.lon_in,
+                                            self.alt_in, dtimes)])
+        self.evaluate_output()
+
     def test_get_aacgm_coord_arr_location_failure(self):
         """Test array AACGMV2 calculation with a bad location."""
         self.out = aacgmv2.get_aacgm_coord_arr([0], [0], [0], self.dtime,
@@ -495,12 +909,16 @@ class TestGetAACGMCoordArr(TestConvertArray):
         assert [isinstance(oo, np.ndarray) and len(oo) == 1 for oo in self.out]
         assert np.any([np.isnan(oo) for oo in self.out])
 
-    def test_get_aacgm_coord_arr_mult_failure(self):
-        """Test aacgm_coord_arr failure with multi-dim array input."""
-        with pytest.raises(ValueError):
-            (self.mlat_out, self.mlon_out,
-             self.mlt_out) = aacgmv2.get_aacgm_coord_arr(
-                 np.array([[60, 61, 62], [63, 64, 65]]), 0, 300, self.dtime)
+    def test_get_aacgm_coord_arr_multidim(self):
+        """Test array AACGMV2 calculation with multi-dim array input."""
+        self.out = aacgmv2.get_aacgm_coord_arr(
+            np.array([self.lat_in, self.lat_in[::-1]]), self.lon_in[0],
+            self.alt_in[0], self.dtime, self.method)
+
+        for i, oo in enumerate(self.out):
+            np.testing.assert_equal(oo.shape, (2, 2))
+            np.testing.assert_allclose(oo, [self.ref[i], self.ref[i][::-1]],
+                                       rtol=self.rtol)
 
     def test_get_aacgm_coord_arr_time_failure(self):
         """Test array AACGMV2 calculation with a bad time."""
@@ -716,6 +1134,31 @@ class TestMLTConvert(object):
                                            self.dtime, m2a=False)
         np.testing.assert_allclose(self.mlt_out, self.mlt_comp, rtol=1.0e-4)
 
+    @pytest.mark.parametrize('m2a', [True, False])
+    def test_convert_mlt_out(self, m2a):
+        """Test MLT conversion into a pre-allocated array.
+
+        Parameters
+        ----------
+        m2a : bool
+            Convert from MLT to magnetic longitude if True
+
+        """
+        out = np.zeros(shape=(3,))
+        self.mlt_out = aacgmv2.convert_mlt(
+            self.mlt_list if m2a else self.mlon_list, self.dtime, m2a=m2a,
+            out=out)
+
+        assert self.mlt_out is out
+        np.testing.assert_allclose(out, self.mlon_comp if m2a
+                                   else self.mlt_comp, rtol=1.0e-4)
+
+    def test_convert_mlt_out_failure(self):
+        """Test MLT conversion failure for a mismatched output array."""
+        with pytest.raises(ValueError, match="must be a float64 array"):
+            aacgmv2.convert_mlt(self.mlon_list, self.dtime,
+                                out=np.zeros(shape=(2,)))
+
     def test_mlt_convert_list_w_times(self):
         """Test MLT calculation for data and time arrays."""
         self.dtime = [self.dtime for dd in self.mlon_list]
@@ -731,11 +1174,72 @@ class TestMLTConvert(object):
 
         np.testing.assert_allclose(self.mlt_diff, self.diff_comp, rtol=1.0e-4)
 
-    def test_mlt_convert_multidim_failure(self):
-        """Test MLT calculation failure for multi-dimensional arrays."""
-        self.mlon_list = np.full(shape=(3, 2), fill_value=50.0)
-        with pytest.raises(ValueError):
-            aacgmv2.convert_mlt(self.mlon_list, self.dtime, m2a=False)
+    @pytest.mark.parametrize('m2a', [True, False])
+    def test_mlt_convert_multidim(self, m2a):
+        """Test MLT calculation for multi-dimensional arrays.
+
+        Parameters
+        ----------
+        m2a : bool
+            Convert from MLT to magnetic longitude if True
+
+        """
+        self.mlon_list = np.array([self.mlt_list if m2a else self.mlon_list]
+                                  * 2)
+        self.mlt_out = aacgmv2.convert_mlt(self.mlon_list.transpose(),
+                                           self.dtime, m2a=m2a)
+        np.testing.assert_equal(self.mlt_out.shape, (3, 2))
+        np.testing.assert_allclose(
+            self.mlt_out, np.array([self.mlon_comp if m2a else self.mlt_comp]
+                                   * 2).transpose(), rtol=1.0e-4)
+
+    @pytest.mark.parametrize('m2a', [True, False])
+    def test_mlt_convert_revisited_times(self, m2a):
+        """Test the reference longitude is calculated once for each time.
+
+        Parameters
+        ----------
+        m2a : bool
+            Convert from MLT to magnetic longitude if True
+
+        """
+        dtimes = [dt.datetime(2013, 5, 17, 3, 4 + m2a, sec)
+                  for sec in [5, 1, 7, 1, 5, 7, 3, 1]]
+        self.mlon_list = np.linspace(0.0, 23.0 if m2a else 345.0, 8)
+        stats = aacgmv2._aacgmv2.mlt_cache_stats()
+        self.mlt_out = aacgmv2.convert_mlt(self.mlon_list, dtimes, m2a=m2a)
+        self.mlt_diff = {key: aacgmv2._aacgmv2.mlt_cache_stats()[key]
+                         - stats[key] for key in ['hits', 'misses']}
+
+        assert self.mlt_diff == {'hits': 4, 'misses': 4}
+        np.testing.assert_allclose(self.mlt_out, [aacgmv2.convert_mlt(
+            val, dtime, m2a=m2a)[0] for val, dtime in zip(self.mlon_list,
+                                                          dtimes)])
+
+    @pytest.mark.parametrize('m2a', [True, False])
+    def test_mlt_convert_epoch(self, m2a):
+        """Test MLT calculation for times in seconds since 1970.
+
+        Parameters
+        ----------
+        m2a : bool
+            Convert from MLT to magnetic longitude if True
+
+        """
+        dtimes = np.datetime64(self.dtime2) + np.array(
+            [0, 500, 1999], dtype='timedelta64[ms]')
+        epoch = (dtimes - np.datetime64(0, 'ms')) / np.timedelta64(1, 's')
+        self.mlon_list = self.mlt_list if m2a else self.mlon_list
+        self.mlt_out = aacgmv2.convert_mlt(self.mlon_list, epoch, m2a=m2a)
+        np.testing.assert_array_equal(self.mlt_out, aacgmv2.convert_mlt(
+            self.mlon_list, dtimes, m2a=m2a))
+        np.testing.assert_array_equal(self.mlt_out, aacgmv2.convert_mlt(
+            self.mlon_list, dtimes.astype(dt.datetime), m2a=m2a))
+
+    def test_mlt_convert_datetime_failure(self):
+        """Test MLT calculation failure for array input that is not time."""
+        with pytest.raises(ValueError, match="must be a datetime object"):
+            aacgmv2.convert_mlt(self.mlon_list, [1997, 1998, 1999])
 
     def test_mlt_convert_mismatch_failure(self):
         """Test MLT calculation failure for mismatched array input."""
@@ -744,6 +1248,419 @@ class TestMLTConvert(object):
                                 m2a=False)
 
 
+class TestModelTime(object):
+    """Unit tests for pinning the model time."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.dtime = dt.datetime(2015, 1, 1, 0, 0, 0)
+        self.dtimes = [dt.datetime(2018, 6, 1, 12, 34, sec)
+                       for sec in [11, 12, 13, 12]]
+        self.stats = None
+
+    def teardown_method(self):
+        """Clean up the test envrionment."""
+        aacgmv2._aacgmv2.unlock()
+        del self.dtime, self.dtimes, self.stats
+
+    def test_model_time(self):
+        """Test MLT conversions do not reset the model time in the block."""
+        with aacgmv2.model_time(self.dtime) as self.stats:
+            assert aacgmv2._aacgmv2.locked()
+            aacgmv2.convert_mlt(np.zeros(shape=(4,)), self.dtimes, m2a=True)
+            aacgmv2.convert_mlt(np.zeros(shape=(4,)), self.dtimes)
+
+        assert not aacgmv2._aacgmv2.locked()
+        assert self.stats == {'avoided': 3}
+
+    def test_model_time_locked(self):
+        """Test a model that was already locked stays locked."""
+        aacgmv2._aacgmv2.lock()
+        with aacgmv2.model_time(self.dtime) as self.stats:
+            pass
+
+        assert aacgmv2._aacgmv2.locked()
+        assert self.stats == {'avoided': 0}
+
+    def test_model_time_location(self):
+        """Test location conversions at other times in the block."""
+        self.dtimes = [dt.datetime(2015, 1, 1, 0, 0, 11),
+                       dt.datetime(1975, 1, 1)]
+        ref = aacgmv2.convert_mlt(50.0, self.dtimes[1])
+        with aacgmv2.model_time(self.dtime) as self.stats:
+            aacgmv2.convert_latlon(60.0, 0.0, 300.0, dt.datetime(1970, 1, 1))
+            np.testing.assert_allclose(aacgmv2.convert_mlt(50.0,
+                                                           self.dtimes[0]),
+                                       22.1145, rtol=1.0e-5)
+            assert abs(aacgmv2.convert_mlt(50.0, self.dtimes[1]) - ref) > 0.1
+
+        # Values using the locked coefficients are not used after the block
+        np.testing.assert_allclose(aacgmv2.convert_mlt(50.0, self.dtimes[0]),
+                                   22.1145, rtol=1.0e-5)
+        np.testing.assert_allclose(aacgmv2.convert_mlt(50.0, self.dtimes[1]),
+                                   ref)
+        assert self.stats == {'avoided': 1}
+
+    def test_model_time_threads(self):
+        """Test other threads convert while the model time is pinned."""
+        self.dtimes = [dt.datetime(2020, 6, 1)]
+        ref = aacgmv2.convert_latlon_arr([60.0, 61.0], 0.0, 300.0,
+                                         self.dtimes[0], "TRACE")
+
+        pool = futures.ThreadPoolExecutor(max_workers=1)
+        try:
+            with aacgmv2.model_time(self.dtime):
+                job = pool.submit(aacgmv2.convert_latlon_arr, [60.0, 61.0],
+                                  0.0, 300.0, self.dtimes[0], "TRACE",
+                                  max_workers=4)
+                out = job.result(timeout=60)
+                assert aacgmv2._aacgmv2.locked()
+        finally:
+            pool.shutdown()
+
+        np.testing.assert_array_equal(out, ref)
+
+    def test_model_time_failure(self):
+        """Test a RuntimeError is raised for times without coefficients."""
+        with pytest.raises(RuntimeError, match="cannot set time"):
+            with aacgmv2.model_time(dt.datetime(1500, 1, 1)):
+                pass
+
+        assert not aacgmv2._aacgmv2.locked()
+
+
+class TestStats(object):
+    """Unit tests for the C library performance counters."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.dtime = dt.datetime(2016, 3, 4, 5, 6, 7)
+        self.lat = np.array([60.0, 61.0, 62.0])
+        self.trace_iter = np.full(shape=self.lat.shape, fill_value=-1,
+                                  dtype=np.int64)
+        self.stats = aacgmv2.stats(reset=True)
+
+    def teardown_method(self):
+        """Clean up the test envrionment."""
+        del self.dtime, self.lat, self.trace_iter, self.stats
+
+    def test_reset(self):
+        """Test the counters are read and then reset."""
+        aacgmv2.convert_latlon_arr(self.lat, 0.0, 300.0, self.dtime, "TRACE")
+        self.stats = aacgmv2.stats(reset=True)
+        assert self.stats['traces'] == 3
+        assert self.stats['trace_time'] > 0.0
+
+        self.stats = aacgmv2.stats()
+        assert all([val == 0 for val in self.stats.values()])
+
+    @pytest.mark.parametrize('max_workers', [None, 3])
+    def test_trace_counters(self, max_workers):
+        """Test the tracing counters, summed over the converting threads.
+
+        Parameters
+        ----------
+        max_workers : int or NoneType
+            Number of threads
+
+        """
+        aacgmv2.convert_latlon_arr(self.lat, 0.0, 300.0, self.dtime, "TRACE",
+                                   max_workers=max_workers,
+                                   trace_iter=self.trace_iter)
+        self.stats = aacgmv2.stats()
+        assert self.stats['traces'] == 3
+        assert self.stats['trace_steps'] > 0
+        assert self.stats['trace_bisections'] > 0
+        assert self.stats['trace_steps'] + self.stats['trace_bisections'] \
+            == self.trace_iter.sum()
+
+    def test_interp_counters(self):
+        """Test the time and height interpolation counters."""
+        # Geocentric input keeps one height, which is interpolated once
+        for ndays in [30, 60]:
+            aacgmv2.convert_latlon_arr(
+                self.lat, 0.0, 300.0, self.dtime + dt.timedelta(days=ndays),
+                "G2A|GEOCENTRIC")
+        self.stats = aacgmv2.stats()
+        assert self.stats['time_interps'] == 2
+        assert self.stats['height_interps'] == 2
+        assert self.stats['traces'] == 0
+
+    def test_mlon_ref_counter(self):
+        """Test the MLT reference longitude is counted when calculated."""
+        for _ in range(2):
+            aacgmv2.convert_mlt(self.lat, self.dtime)
+        self.stats = aacgmv2.stats()
+        assert self.stats['mlon_refs'] == 1
+        assert self.stats['mlon_ref_time'] > 0.0
+
+    @pytest.mark.parametrize('engine', ['batch', 'scalar', 'numpy'])
+    def test_trace_iter(self, engine):
+        """Test the tracing iterations of each location.
+
+        Parameters
+        ----------
+        engine : str
+            Coefficient engine
+
+        """
+        height = [300.0, 300.0, 5000.0]
+        aacgmv2.convert_latlon_arr(self.lat, 0.0, height, self.dtime,
+                                   "ALLOWTRACE", engine=engine,
+                                   trace_iter=self.trace_iter)
+        assert list(self.trace_iter[:2]) == [0, 0]
+        assert self.trace_iter[2] > 0
+        assert self.trace_iter[2] == aacgmv2.ufunc.g2a_iter(
+            self.lat, 0.0, height, aacgmv2.wrapper._time_to_epoch(self.dtime),
+            aacgmv2._aacgmv2.ALLOWTRACE)[3][2]
+
+    @pytest.mark.parametrize('trace_iter', [np.zeros(shape=(3,)),
+                                            np.zeros(shape=(2,),
+                                                     dtype=np.int64)])
+    def test_bad_trace_iter(self, trace_iter):
+        """Test a ValueError is raised for bad tracing iteration arrays.
+
+        Parameters
+        ----------
+        trace_iter : np.ndarray
+            Tracing iteration array with a bad type or shape
+
+        """
+        with pytest.raises(ValueError, match="trace_iter must be"):
+            aacgmv2.convert_latlon_arr(self.lat, 0.0, 300.0, self.dtime,
+                                       trace_iter=trace_iter)
+
+
+class TestProfile(object):
+    """Unit tests for the stage profile of the array functions."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.dtime = dt.datetime(2015, 1, 1, 0, 0, 0)
+        self.lat = np.array([45.5, 60.0])
+        self.lon = np.array([-23.5, 0.0])
+        self.prof = None
+
+    def teardown_method(self):
+        """Clean up the test envrionment."""
+        del self.dtime, self.lat, self.lon, self.prof
+
+    def test_disabled(self):
+        """Test that no profile is active outside of a block."""
+        with aacgmv2.profile() as self.prof:
+            assert aacgmv2.wrapper._profile is self.prof
+        aacgmv2.convert_latlon_arr(self.lat, self.lon, 300.0, self.dtime)
+
+        assert aacgmv2.wrapper._profile is None
+        assert self.prof.as_dict() == {}
+
+    def test_convert_latlon_arr(self):
+        """Test the stages of the location conversion."""
+        with aacgmv2.profile() as self.prof:
+            for _ in range(2):
+                aacgmv2.convert_latlon_arr(self.lat, self.lon, 300.0,
+                                           self.dtime)
+
+        assert list(self.prof.stages.keys()) == [
+            "convert_latlon_arr.{:s}".format(stage) for stage in [
+                "recast", "group_times", "allocate", "test_height",
+                "clip_lat", "wrap_lon", "broadcast", "convert"]]
+        for rec in self.prof.stages.values():
+            assert list(rec.keys()) == ['calls', 'time', 'blocks']
+            assert rec['calls'] == 2
+            assert rec['time'] >= 0.0
+
+    def test_get_aacgm_coord_arr(self):
+        """Test the stages of the magnetic coordinate conversion."""
+        with aacgmv2.profile() as self.prof:
+            aacgmv2.get_aacgm_coord_arr(self.lat, self.lon, 300.0,
+                                        self.dtime)
+
+        for stage in ["get_aacgm_coord_arr.convert_latlon_arr",
+                      "get_aacgm_coord_arr.convert_mlt",
+                      "convert_latlon_arr.convert", "convert_mlt.convert"]:
+            assert self.prof.stages[stage]['calls'] == 1
+
+    @pytest.mark.parametrize('mlt_ref,stage', [(False, "convert"),
+                                               (True, "interpolate")])
+    def test_convert_mlt(self, mlt_ref, stage):
+        """Test the stages of the MLT conversion.
+
+        Parameters
+        ----------
+        mlt_ref : bool
+            Use an interpolated reference longitude
+        stage : str
+            Stage that converts the values
+
+        """
+        if mlt_ref:
+            mlt_ref = aacgmv2.MLTReference(self.dtime, self.dtime)
+        with aacgmv2.profile() as self.prof:
+            aacgmv2.convert_mlt(self.lon, self.dtime, mlt_ref=mlt_ref)
+
+        assert "convert_mlt.{:s}".format(stage) in self.prof.stages
+        assert "convert_mlt.recast" in self.prof.stages
+
+    def test_memory(self):
+        """Test the bytes allocated are recorded when tracing memory."""
+        with aacgmv2.profile(memory=True) as self.prof:
+            assert tracemalloc.is_tracing()
+            aacgmv2.convert_latlon_arr(np.full(shape=(1000,), fill_value=45.0),
+                                       0.0, 300.0, self.dtime)
+        assert not tracemalloc.is_tracing()
+
+        rec = self.prof.stages["convert_latlon_arr.allocate"]
+        assert list(rec.keys()) == ['calls', 'time', 'blocks', 'bytes',
+                                    'peak_bytes']
+        assert rec['bytes'] >= 3 * 1000 * 8
+        assert rec['peak_bytes'] >= rec['bytes']
+
+    def test_nested(self):
+        """Test an inner profile block records into its own profile."""
+        with aacgmv2.profile() as self.prof:
+            with aacgmv2.profile() as inner:
+                aacgmv2.convert_mlt(self.lon, self.dtime)
+            assert aacgmv2.wrapper._profile is self.prof
+
+        assert "convert_mlt.convert" in inner.stages
+        assert self.prof.stages == {}
+
+    def test_export(self):
+        """Test the stage records are exported as JSON and reset."""
+        with aacgmv2.profile() as self.prof:
+            aacgmv2.convert_mlt(self.lon, self.dtime)
+
+        assert json.loads(self.prof.to_json()) == self.prof.as_dict()
+        assert self.prof.as_dict() is not self.prof.stages
+
+        self.prof.reset()
+        assert self.prof.as_dict() == {}
+
+    def test_repr(self):
+        """Test the Profile representation."""
+        self.prof = aacgmv2.wrapper.Profile(memory=True)
+        assert repr(self.prof) == "aacgmv2.wrapper.Profile(memory=True)"
+
+
+class TestMLTReference(object):
+    """Unit tests for the interpolated MLT reference longitude."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.start = dt.datetime(2015, 3, 1, 0, 0, 0)
+        self.stop = dt.datetime(2015, 3, 1, 6, 0, 0)
+        self.mlt_ref = aacgmv2.MLTReference(self.start, self.stop)
+        self.dtimes = np.datetime64(self.start) + np.arange(
+            0, 6 * 3600, 7).astype('timedelta64[s]')
+        self.mlon = np.random.default_rng(0).uniform(-180.0, 180.0,
+                                                     self.dtimes.size)
+        self.out = None
+
+    def teardown_method(self):
+        """Clean up the test envrionment."""
+        del self.start, self.stop, self.mlt_ref, self.dtimes, self.mlon
+        del self.out
+
+    def test_grid(self):
+        """Test the grid spacing meets the maximum error."""
+        assert self.mlt_ref.error <= self.mlt_ref.max_error
+        assert 60 <= self.mlt_ref.step < 3600
+        assert repr(self.mlt_ref).startswith("aacgmv2.MLTReference(")
+
+    def test_grid_minimum(self):
+        """Test the grid spacing stops at one minute."""
+        self.mlt_ref = aacgmv2.MLTReference(self.start, self.start
+                                            + dt.timedelta(hours=1),
+                                            max_error=1.0e-14)
+        assert self.mlt_ref.step == 60
+        assert self.mlt_ref.error > self.mlt_ref.max_error
+
+    def test_mlon_ref(self):
+        """Test the interpolated reference longitude is within the error."""
+        self.out = self.mlt_ref.mlon_ref(self.dtimes) \
+            - aacgmv2.convert_mlt(np.full(self.dtimes.shape, 12.0),
+                                  self.dtimes, m2a=True, mlt_ref=False)
+        assert np.all(np.abs(self.out) <= self.mlt_ref.error)
+
+    @pytest.mark.parametrize('m2a', [True, False])
+    def test_convert_mlt(self, m2a):
+        """Test MLT conversion with an interpolated reference longitude.
+
+        Parameters
+        ----------
+        m2a : bool
+            Convert from MLT to magnetic longitude if True
+
+        """
+        if m2a:
+            self.mlon = (self.mlon + 180.0) / 15.0
+
+        self.out = aacgmv2.convert_mlt(self.mlon, self.dtimes, m2a=m2a,
+                                       mlt_ref=self.mlt_ref)
+        ref = aacgmv2.convert_mlt(self.mlon, self.dtimes, m2a=m2a,
+                                  mlt_ref=False)
+        np.testing.assert_allclose(self.out, ref, rtol=0.0,
+                                   atol=self.mlt_ref.error
+                                   * (1.0 if m2a else 1.0 / 15.0) + 1.0e-12)
+
+    def test_outside_span(self):
+        """Test times outside the span are calculated exactly."""
+        dtimes = [self.start - dt.timedelta(days=1),
+                  self.stop + dt.timedelta(days=1)]
+        self.out = self.mlt_ref.convert_mlt([10.0, 20.0], dtimes)
+        np.testing.assert_array_equal(self.out, aacgmv2.convert_mlt(
+            [10.0, 20.0], dtimes, mlt_ref=False))
+
+    def test_dense_times(self):
+        """Test the reference longitude is interpolated for dense times."""
+        stats = aacgmv2._aacgmv2.mlt_cache_stats()
+        self.out = aacgmv2.convert_mlt(self.mlon, self.dtimes)
+        assert aacgmv2._aacgmv2.mlt_cache_stats()['misses'] - stats['misses'] \
+            < self.dtimes.size // 10
+        np.testing.assert_allclose(self.out, aacgmv2.convert_mlt(
+            self.mlon, self.dtimes, mlt_ref=self.mlt_ref))
+
+    def test_sparse_times(self):
+        """Test the reference longitude is exact for sparse times."""
+        self.dtimes = self.dtimes[::10]
+        self.out = aacgmv2.convert_mlt(self.mlon[::10], self.dtimes)
+        np.testing.assert_array_equal(self.out, aacgmv2.convert_mlt(
+            self.mlon[::10], self.dtimes, mlt_ref=False))
+
+    def test_get_aacgm_coord_arr(self):
+        """Test the MLT of the AACGM coordinates may be interpolated."""
+        self.out = aacgmv2.get_aacgm_coord_arr(
+            np.full(self.dtimes.shape, 60.0), self.mlon,
+            np.full(self.dtimes.shape, 300.0), self.dtimes,
+            mlt_ref=self.mlt_ref)
+        np.testing.assert_allclose(self.out[2], self.mlt_ref.convert_mlt(
+            self.out[1], self.dtimes))
+
+    @pytest.mark.parametrize('start,stop,max_error,msg',
+                             [(dt.datetime(2015, 3, 2), dt.datetime(2015, 3, 1),
+                               1.0e-5, "must end after"),
+                              (dt.datetime(2015, 3, 1), dt.datetime(2015, 3, 2),
+                               0.0, "must be positive")])
+    def test_bad_input(self, start, stop, max_error, msg):
+        """Test a ValueError is raised for a bad time span or error.
+
+        Parameters
+        ----------
+        start : dt.datetime
+            Start of the time span
+        stop : dt.datetime
+            End of the time span
+        max_error : float
+            Maximum error
+        msg : str
+            Expected error message
+
+        """
+        with pytest.raises(ValueError, match=msg):
+            aacgmv2.MLTReference(start, stop, max_error=max_error)
+
+
 class TestCoeffPath(object):
     """Unit tests for the coefficient path."""
 
@@ -942,7 +1859,618 @@ class TestTimeReturns(object):
         """Test to see that a good date has a good datetime output."""
         assert self.dtime == aacgmv2.wrapper.test_time(self.dtime)
 
+    def test_good_datetime64(self):
+        """Test to see that a np.datetime64 time is accepted."""
+        assert self.dtime2 == aacgmv2.wrapper.test_time(
+            np.datetime64(self.dtime2))
+
     def test_bad_time(self):
         """Test to see that a warning is raised with a bad time input."""
         with pytest.raises(ValueError):
             aacgmv2.wrapper.test_time(2015)
+
+
+class TestGroupTimes(object):
+    """Unit tests for grouping locations by time."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.dtime = dt.datetime(2015, 1, 1, 0, 0, 0)
+        self.dtimes = [self.dtime + dt.timedelta(seconds=sec)
+                       for sec in [70, 0, 70, 10]]
+        self.out = None
+
+    def teardown_method(self):
+        """Clean up the test envrionment."""
+        del self.dtime, self.dtimes, self.out
+
+    def test_single_time(self):
+        """Test grouping with a single time."""
+        self.out = aacgmv2.wrapper.group_times(self.dtime, 4)
+        assert self.out[0] == [self.dtime]
+        np.testing.assert_array_equal(self.out[1], [0, 4])
+        assert self.out[2] is None
+
+    @pytest.mark.parametrize('as_dt64', [True, False])
+    def test_unsorted_times(self, as_dt64):
+        """Test grouping with unsorted times.
+
+        Parameters
+        ----------
+        as_dt64 : bool
+            Provide the times as np.datetime64 values if True
+
+        """
+        self.out = aacgmv2.wrapper.group_times(
+            np.array(self.dtimes, dtype='datetime64[ms]') if as_dt64
+            else self.dtimes, len(self.dtimes))
+        assert self.out[0] == sorted(set(self.dtimes))
+        np.testing.assert_array_equal(self.out[1], [0, 1, 2, 4])
+        np.testing.assert_array_equal(self.out[2], [1, 3, 0, 2])
+
+    @pytest.mark.parametrize('offset', [0.0, 0.75])
+    def test_epoch_times(self, offset):
+        """Test grouping with times in seconds since 1970.
+
+        Parameters
+        ----------
+        offset : float
+            Fraction of a second added to the times
+
+        """
+        epoch = np.array([(dtime - dt.datetime(1970, 1, 1)).total_seconds()
+                          for dtime in self.dtimes]) + offset
+        self.out = aacgmv2.wrapper.group_times(epoch, len(self.dtimes))
+        assert self.out[0] == sorted(set(self.dtimes))
+        np.testing.assert_array_equal(self.out[2], [1, 3, 0, 2])
+
+    def test_datetime64_time(self):
+        """Test grouping with a single np.datetime64 time."""
+        self.out = aacgmv2.wrapper.group_times(np.datetime64(self.dtime), 4)
+        assert self.out[0] == [self.dtime]
+
+    def test_sorted_times(self):
+        """Test grouping with sorted times does not reorder locations."""
+        self.out = aacgmv2.wrapper.group_times(sorted(self.dtimes), 4)
+        np.testing.assert_array_equal(self.out[1], [0, 1, 2, 4])
+        assert self.out[2] is None
+
+    @pytest.mark.parametrize('time_res', [60, dt.timedelta(minutes=1),
+                                          np.timedelta64(1, 'm')])
+    def test_time_res(self, time_res):
+        """Test rounding times to a given resolution.
+
+        Parameters
+        ----------
+        time_res : int, dt.timedelta, or np.timedelta64
+            Time resolution
+
+        """
+        self.out = aacgmv2.wrapper.group_times(self.dtimes, 4,
+                                               time_res=time_res)
+        assert self.out[0] == [self.dtime, self.dtime
+                               + dt.timedelta(minutes=1)]
+        np.testing.assert_array_equal(self.out[1], [0, 2, 4])
+        np.testing.assert_array_equal(self.out[2], [1, 3, 0, 2])
+
+    @pytest.mark.parametrize('dtime,num,time_res,msg',
+                             [(2015, 1, None, "must be a datetime object"),
+                              ([2015, 2016], 2, None,
+                               "must be a datetime object"),
+                              ([None, None], 2, None,
+                               "must be a datetime object"),
+                              ([0.0, np.nan], 2, None,
+                               "must be a datetime object"),
+                              ([dt.datetime(2015, 1, 1)] * 3, 2, None,
+                               "datetime and locations must match"),
+                              (dt.datetime(2015, 1, 1), 1, 0,
+                               "must be at least one second")])
+    def test_bad_times(self, dtime, num, time_res, msg):
+        """Test group_times failure for bad inputs.
+
+        Parameters
+        ----------
+        dtime : any
+            Time input
+        num : int
+            Number of locations
+        time_res : any
+            Time resolution
+        msg : str
+            Expected error message
+
+        """
+        with pytest.raises(ValueError, match=msg):
+            aacgmv2.wrapper.group_times(dtime, num, time_res=time_res)
+
+
+class TestConverter(TestConvertArray):
+    """Unit tests for the Converter class."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        TestConvertArray.setup_method(self)
+        self.ref[2] = [1.0457, 1.0456]
+        self.conv = aacgmv2.Converter(self.dtime)
+
+    def teardown_method(self):
+        """Clean up the test envrionment."""
+        TestConvertArray.teardown_method(self)
+        del self.conv
+
+    def test_converter_attributes(self):
+        """Test the Converter attributes and representation."""
+        assert self.conv.dtime == self.dtime
+        assert self.conv.coeff_prefix == aacgmv2.AACGM_v2_DAT_PREFIX
+        assert self.conv.igrf_file == aacgmv2.IGRF_COEFFS
+        assert repr(self.conv).find("aacgmv2.Converter(datetime") == 0
+
+    def test_converter_date(self):
+        """Test the Converter accepts a date as the model time."""
+        self.conv = aacgmv2.Converter(self.ddate)
+        assert self.conv.dtime == self.dtime
+
+    def test_converter_convert_latlon(self):
+        """Test the Converter single value conversion."""
+        self.out = self.conv.convert_latlon(self.lat_in[0], self.lon_in[0],
+                                            self.alt_in[0], self.method)
+        self.out = [np.array([oo]) for oo in self.out]
+        self.evaluate_output(ind=0)
+
+    @pytest.mark.parametrize('max_workers', [None, 2])
+    def test_converter_convert_latlon_arr(self, max_workers):
+        """Test the Converter array conversion.
+
+        Parameters
+        ----------
+        max_workers : int or NoneType
+            Number of threads
+
+        """
+        self.out = self.conv.convert_latlon_arr(self.lat_in, self.lon_in,
+                                                self.alt_in, self.method,
+                                                max_workers=max_workers)
+        self.evaluate_output()
+
+    def test_converter_alternating(self):
+        """Test Converters at different times do not affect each other."""
+        other = aacgmv2.Converter(dt.datetime(2020, 6, 1))
+        other_ref = aacgmv2.convert_latlon_arr(self.lat_in, self.lon_in,
+                                               self.alt_in, other.dtime,
+                                               self.method)
+
+        for i in range(2):
+            self.out = other.convert_latlon_arr(self.lat_in, self.lon_in,
+                                                self.alt_in, self.method)
+            np.testing.assert_allclose(self.out, other_ref, rtol=self.rtol)
+
+            self.out = self.conv.convert_latlon_arr(self.lat_in, self.lon_in,
+                                                    self.alt_in, self.method)
+            self.evaluate_output()
+
+    def test_converter_default_model(self):
+        """Test a Converter does not change the default model time."""
+        aacgmv2._aacgmv2.set_datetime(2020, 6, 1, 0, 0, 0)
+        aacgmv2.Converter(dt.datetime(2016, 1, 1))
+        self.out = aacgmv2._aacgmv2.convert(self.lat_in[0], self.lon_in[0],
+                                            self.alt_in[0], 0)
+        np.testing.assert_allclose(self.out, aacgmv2.convert_latlon(
+            self.lat_in[0], self.lon_in[0], self.alt_in[0],
+            dt.datetime(2020, 6, 1)), rtol=self.rtol)
+
+    def test_converter_threads(self):
+        """Test Converters at different times used in concurrent threads."""
+        convs = [self.conv, aacgmv2.Converter(dt.datetime(2020, 6, 1))]
+        lat_in = np.full(shape=(2000,), fill_value=self.lat_in[0])
+        with futures.ThreadPoolExecutor(max_workers=2) as pool:
+            jobs = [pool.submit(conv.convert_latlon_arr, lat_in,
+                                self.lon_in[0], self.alt_in[0], self.method)
+                    for conv in convs for i in range(3)]
+            self.out = [job.result() for job in jobs]
+
+        for i, out in enumerate(self.out):
+            ref = aacgmv2.convert_latlon(self.lat_in[0], self.lon_in[0],
+                                         self.alt_in[0], convs[i // 3].dtime,
+                                         self.method)
+            for j, oo in enumerate(out):
+                np.testing.assert_allclose(oo, ref[j], rtol=self.rtol)
+
+    def test_converter_bad_time(self):
+        """Test the Converter raises a RuntimeError for a bad time."""
+        with pytest.raises(RuntimeError, match="cannot set time"):
+            self.conv.dtime = dt.datetime(2100, 1, 1)
+
+        assert self.conv.dtime == self.dtime
+
+    def test_converter_bad_coeff_file(self):
+        """Test the Converter raises a RuntimeError for missing files."""
+        with pytest.raises(RuntimeError, match="cannot set time"):
+            aacgmv2.Converter(self.dtime, igrf_file="not_a_file.txt",
+                              coeff_prefix="not_a_prefix-")
+
+
+class TestEpochCache(object):
+    """Unit tests for the coefficient epoch cache."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.conv = aacgmv2.Converter(dt.datetime(2014, 6, 1))
+        self.stats = None
+
+    def teardown_method(self):
+        """Clean up the test envrionment."""
+        del self.conv, self.stats
+
+    def test_cache_stats(self):
+        """Test the cache counters when returning to a cached epoch."""
+        for year in [2021, 2014, 2021]:
+            self.conv.dtime = dt.datetime(year, 6, 1)
+
+        self.stats = self.conv.get_cache_stats()
+        assert self.stats == {'hits': 4, 'misses': 4, 'loads': 4, 'cached': 4,
+                              'size': 4}
+
+    def test_cache_eviction(self):
+        """Test the least recently used epochs are evicted."""
+        self.conv.set_cache_size(2)
+        for year in [2021, 2014, 2021]:
+            self.conv.dtime = dt.datetime(year, 6, 1)
+
+        self.stats = self.conv.get_cache_stats()
+        assert self.stats == {'hits': 0, 'misses': 8, 'loads': 8, 'cached': 2,
+                              'size': 2}
+
+    def test_cache_shrink(self):
+        """Test shrinking the cache keeps the epochs in use."""
+        self.conv.dtime = dt.datetime(2021, 6, 1)
+        self.conv.set_cache_size(2)
+        self.conv.set_cache_size()
+        self.conv.dtime = dt.datetime(2021, 7, 1)
+
+        self.stats = self.conv.get_cache_stats()
+        assert self.stats['cached'] == 2
+        assert self.stats['size'] == 4
+        assert self.stats['loads'] == 4
+
+    @pytest.mark.parametrize('size', [1, 33, -1])
+    def test_bad_cache_size(self, size):
+        """Test a ValueError is raised for a bad cache size.
+
+        Parameters
+        ----------
+        size : int
+            Cache size
+
+        """
+        with pytest.raises(ValueError, match="cache size must be"):
+            self.conv.set_cache_size(size)
+
+    def test_prefetch(self):
+        """Test the next epoch is prefetched near the end of an epoch."""
+        with self.conv._lock:
+            self.conv.dtime = dt.datetime(2019, 12, 1)
+            job = aacgmv2.wrapper._prefetch_jobs[(id(self.conv._model), 2025)]
+        assert job.result()
+
+        self.conv.dtime = dt.datetime(2020, 1, 1)
+        self.stats = self.conv.get_cache_stats()
+        assert self.stats == {'hits': 3, 'misses': 3, 'loads': 4, 'cached': 4,
+                              'size': 4}
+
+    def ascii_prefix(self, path, years=range(2010, 2030, 5), epoch=None):
+        """Link the ASCII coefficient files, without the binary store.
+
+        Parameters
+        ----------
+        path : pathlib.Path
+            Directory for the coefficient files
+        years : iterable
+            Epoch years to link (default=range(2010, 2030, 5))
+        epoch : int or NoneType
+            Epoch year whose file is linked for all years, or None to link
+            the file for each year (default=None)
+
+        Returns
+        -------
+        prefix : str
+            Location and file prefix for the coefficient files
+
+        """
+        prefix = os.path.join(str(path), os.path.basename(
+            aacgmv2.AACGM_v2_DAT_PREFIX))
+        for year in years:
+            os.symlink("{:s}{:04d}.asc".format(
+                aacgmv2.AACGM_v2_DAT_PREFIX, year if epoch is None else epoch),
+                "{:s}{:04d}.asc".format(prefix, year))
+
+        return prefix
+
+    def test_prefetch_unlocked(self, tmp_path, monkeypatch):
+        """Test the next epoch is read while conversions hold the model."""
+        load_coeffs = aacgmv2._aacgmv2.load_coeffs
+        loaded = threading.Event()
+
+        def staged_load(fname):
+            staged = load_coeffs(fname)
+            loaded.set()
+            return staged
+
+        monkeypatch.setattr(aacgmv2._aacgmv2, "load_coeffs", staged_load)
+        self.conv = aacgmv2.Converter(dt.datetime(2014, 6, 1),
+                                      coeff_prefix=self.ascii_prefix(tmp_path))
+        with self.conv._lock:
+            self.conv.dtime = dt.datetime(2019, 12, 1)
+            job = aacgmv2.wrapper._prefetch_jobs[(id(self.conv._model), 2025)]
+            assert loaded.wait(60)
+            assert not job.done()
+        assert job.result()
+
+        self.stats = self.conv.get_cache_stats()
+        assert self.stats['loads'] == 4
+        assert self.stats['cached'] == 4
+
+    def test_prefetch_staged(self, tmp_path):
+        """Test staged coefficients are only used for their own file."""
+        self.conv = aacgmv2.Converter(dt.datetime(2017, 6, 1),
+                                      coeff_prefix=self.ascii_prefix(tmp_path))
+        (tmp_path / "other").mkdir()
+        other = self.ascii_prefix(tmp_path / "other", years=[2025],
+                                  epoch=2010)
+        c_aacgmv2 = aacgmv2._aacgmv2
+
+        with self.conv._lock, aacgmv2.wrapper._use_model(self.conv._model):
+            assert c_aacgmv2.stage_file(2015) is None
+            fname = c_aacgmv2.stage_file(2025)
+            assert fname.startswith(str(tmp_path))
+            assert c_aacgmv2.load_coeffs(fname + ".bad") is None
+
+            staged = c_aacgmv2.load_coeffs("{:s}2025.asc".format(other))
+            assert c_aacgmv2.prefetch(2025, staged)
+            assert c_aacgmv2.stage_file(2025) is None
+            assert c_aacgmv2.prefetch(2025, staged)
+
+        self.conv.dtime = dt.datetime(2024, 12, 1)
+        ref = aacgmv2.Converter(self.conv.dtime)
+        np.testing.assert_allclose(
+            self.conv.convert_latlon(60.0, 0.0, 300.0),
+            ref.convert_latlon(60.0, 0.0, 300.0))
+
+    def test_no_prefetch(self):
+        """Test the next epoch is not prefetched early in an epoch."""
+        with self.conv._lock, aacgmv2.wrapper._use_model(self.conv._model):
+            assert aacgmv2.wrapper._prefetch_next(self.conv._model,
+                                                  self.conv._lock) is None
+
+    def test_default_model_cache(self):
+        """Test the default model cache counters."""
+        aacgmv2.set_cache_size()
+        aacgmv2.convert_latlon(60.0, 0.0, 300.0, dt.datetime(2015, 1, 1))
+        self.stats = aacgmv2.get_cache_stats()
+        assert self.stats['size'] == 4
+        assert self.stats['cached'] >= 2
+        assert self.stats['hits'] + self.stats['misses'] >= 2
+
+
+class TestWarmup(object):
+    """Unit tests for loading the model data ahead of time."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.dtimes = [dt.datetime(2001, 1, 1), dt.datetime(2012, 1, 1),
+                       dt.datetime(2003, 6, 1)]
+        self.stats = None
+
+    def teardown_method(self):
+        """Clean up the test envrionment."""
+        del self.dtimes, self.stats
+        aacgmv2.set_cache_size()
+
+    def test_warmup(self):
+        """Test the epochs are loaded, so later conversions do not load."""
+        assert aacgmv2.warmup(self.dtimes) == [2000, 2010]
+        self.stats = aacgmv2.get_cache_stats()
+        assert self.stats['size'] == 4
+
+        for dtime in self.dtimes:
+            aacgmv2.convert_latlon_arr([60.0], 0.0, 300.0, dtime)
+        assert aacgmv2.get_cache_stats()['loads'] == self.stats['loads']
+
+    def test_warmup_cache_size(self):
+        """Test the cache is enlarged to hold all of the epochs."""
+        self.dtimes.extend([dt.datetime(1960, 1, 1), dt.datetime(1990, 1, 1)])
+        self.stats = aacgmv2.warmup(self.dtimes, trace=False)
+        assert self.stats == [1960, 1990, 2000, 2010]
+
+        self.stats = aacgmv2.get_cache_stats()
+        assert self.stats['size'] == 8
+        assert self.stats['cached'] == 8
+
+    def test_warmup_now(self):
+        """Test the epoch of the current time is loaded by default."""
+        year = dt.datetime.now(dt.timezone.utc).year
+        assert aacgmv2.warmup(trace=False) == [year // 5 * 5]
+
+
+class TestSetCoeffs(object):
+    """Unit tests for setting the model coefficients from memory."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.dtime = dt.datetime(2015, 3, 1)
+        self.in_args = [[45.0, 60.0], [10.0, 20.0], [300.0, 2500.0]]
+        self.ref = aacgmv2.convert_latlon_arr(*self.in_args, self.dtime,
+                                              "TRACE")
+        self.aacgm_coeffs = aacgmv2.coeff_store.read_coeff_files(
+            aacgmv2.AACGM_v2_DAT_PREFIX)
+        with open(aacgmv2.IGRF_COEFFS, "r") as fin:
+            self.igrf_text = fin.read()
+        self.out = None
+
+    def teardown_method(self):
+        """Clean up the test envrionment."""
+        aacgmv2.set_coeffs(None, None)
+        aacgmv2.wrapper.set_coeff_path(True, True)
+        del self.dtime, self.in_args, self.ref, self.aacgm_coeffs
+        del self.igrf_text, self.out
+
+    def remove_files(self):
+        """Point the coefficient file environment variables elsewhere."""
+        aacgmv2.wrapper.set_coeff_path("not_an_igrf_file",
+                                       "not_a_coeff_prefix")
+
+    @pytest.mark.parametrize("store", [True, False])
+    @pytest.mark.parametrize("text", [True, False])
+    def test_set_coeffs(self, store, text):
+        """Test conversions with coefficients set from memory.
+
+        Parameters
+        ----------
+        store : bool
+            Set the AACGM coefficients from the store contents if True, or
+            from arrays if False
+        text : bool
+            Set the IGRF coefficients from the file text if True, or from
+            arrays if False
+
+        """
+        if store:
+            with open(aacgmv2.coeff_store.store_filename(
+                    aacgmv2.AACGM_v2_DAT_PREFIX), "rb") as fin:
+                self.aacgm_coeffs = fin.read()
+        if not text:
+            self.igrf_text = aacgmv2.coeff_store.parse_igrf_coeffs(
+                self.igrf_text)
+
+        aacgmv2.set_coeffs(self.aacgm_coeffs, self.igrf_text)
+        assert aacgmv2._aacgmv2.memory_coeffs() == {'aacgm': True,
+                                                    'igrf': True}
+
+        self.remove_files()
+        self.out = aacgmv2.convert_latlon_arr(*self.in_args, self.dtime,
+                                              "TRACE")
+        np.testing.assert_array_equal(self.out, self.ref)
+
+    def test_set_coeffs_revert(self):
+        """Test the coefficient files are read again after setting None."""
+        aacgmv2.set_coeffs(self.aacgm_coeffs, self.igrf_text)
+        aacgmv2.set_coeffs(None, None)
+        assert aacgmv2._aacgmv2.memory_coeffs() == {'aacgm': False,
+                                                    'igrf': False}
+
+        self.out = aacgmv2.convert_latlon_arr(*self.in_args, self.dtime,
+                                              "TRACE")
+        np.testing.assert_array_equal(self.out, self.ref)
+
+    def test_set_coeffs_leave(self):
+        """Test that False leaves the coefficients as they are."""
+        aacgmv2.set_coeffs(igrf_coeffs=self.igrf_text)
+        aacgmv2.set_coeffs(aacgm_coeffs=False)
+        assert aacgmv2._aacgmv2.memory_coeffs() == {'aacgm': False,
+                                                    'igrf': True}
+
+    def test_missing_epoch(self):
+        """Test conversions outside of the epochs set from memory."""
+        aacgmv2.set_coeffs((self.aacgm_coeffs[0][-4:-2],
+                            self.aacgm_coeffs[1][-4:-2]))
+        self.remove_files()
+
+        self.out = aacgmv2.convert_latlon_arr(*self.in_args, self.dtime,
+                                              "TRACE")
+        np.testing.assert_array_equal(self.out, self.ref)
+
+        with pytest.raises(RuntimeError, match="cannot set time"):
+            aacgmv2.convert_latlon_arr(*self.in_args, dt.datetime(2005, 1, 1),
+                                       "TRACE")
+
+    def test_mlt_coeffs(self):
+        """Test the MLT uses the coefficients set from memory."""
+        self.ref = aacgmv2.convert_mlt(30.0, self.dtime)
+
+        # Use the coefficients of the previous epochs for 2015 and 2020
+        aacgmv2.set_coeffs((self.aacgm_coeffs[0][-4:-2],
+                            self.aacgm_coeffs[1][-5:-3]))
+        self.out = aacgmv2.convert_mlt(30.0, self.dtime)
+        assert abs(self.out - self.ref) > 1.0e-3
+
+        aacgmv2.set_coeffs(None)
+        np.testing.assert_array_equal(aacgmv2.convert_mlt(30.0, self.dtime),
+                                      self.ref)
+
+    def test_converter_coeffs(self):
+        """Test Converters holding different coefficients."""
+        self.remove_files()
+        self.out = aacgmv2.Converter(self.dtime,
+                                     coeff_prefix="not_a_coeff_prefix",
+                                     igrf_file="not_an_igrf_file",
+                                     aacgm_coeffs=self.aacgm_coeffs,
+                                     igrf_coeffs=self.igrf_text)
+        np.testing.assert_array_equal(self.out.convert_latlon_arr(
+            *self.in_args, "TRACE"), self.ref)
+
+        # The default model reads the missing files for another epoch
+        with pytest.raises(RuntimeError, match="cannot set time"):
+            aacgmv2.convert_latlon_arr(*self.in_args, dt.datetime(2005, 1, 1),
+                                       "TRACE")
+
+    def test_converter_set_coeffs(self):
+        """Test setting the coefficients of a Converter from memory."""
+        self.out = aacgmv2.Converter(self.dtime)
+        self.out.set_coeffs((self.aacgm_coeffs[0][-4:-2],
+                             self.aacgm_coeffs[1][-5:-3]))
+        assert np.all(self.out.convert_latlon_arr(*self.in_args)[1]
+                      != aacgmv2.convert_latlon_arr(*self.in_args,
+                                                    self.dtime)[1])
+
+        self.out.set_coeffs(None)
+        np.testing.assert_array_equal(
+            self.out.convert_latlon_arr(*self.in_args),
+            aacgmv2.convert_latlon_arr(*self.in_args, self.dtime))
+
+    @pytest.mark.parametrize("kwargs,estr", [
+        ({"aacgm_coeffs": ([2015], np.zeros((1, 2, 5, 3)))},
+         "AACGM coefficients must have shape"),
+        ({"aacgm_coeffs": ([2015, 2025], np.zeros((2, 2, 5, 3, 121)))},
+         "consecutive 5-year epochs"),
+        ({"aacgm_coeffs": b"not a store" * 10}, "not a version 1 coefficient"),
+        ({"igrf_coeffs": ([2015], np.zeros((1, 196)), None)},
+         "IGRF coefficients must be for the 5-year epochs"),
+        ({"igrf_coeffs": (np.arange(1590, 2026, 5), np.zeros((88, 195)),
+                          None)}, "IGRF coefficients must have shape"),
+        ({"igrf_coeffs": (np.arange(1590, 2026, 5), np.zeros((88, 196)),
+                          np.zeros(195))}, "secular variation must have"),
+        ({"igrf_coeffs": b"not a coefficient file"},
+         "not an IGRF coefficient file")])
+    def test_set_coeffs_bad(self, kwargs, estr):
+        """Test setting bad coefficients leaves the model unchanged.
+
+        Parameters
+        ----------
+        kwargs : dict
+            Input keyword arguments
+        estr : str
+            Expected error message
+
+        """
+        # Set good values for the other coefficients
+        self.out = {"aacgm_coeffs": self.aacgm_coeffs,
+                    "igrf_coeffs": self.igrf_text}
+        self.out.update(kwargs)
+
+        with pytest.raises(ValueError, match=estr):
+            aacgmv2.set_coeffs(**self.out)
+
+        assert not any(aacgmv2._aacgmv2.memory_coeffs().values())
+
+    @pytest.mark.parametrize("kwargs", [{"engine": "numpy"}, {"workers": 2}])
+    def test_set_coeffs_files_only(self, kwargs):
+        """Test engines that read the coefficient files are refused.
+
+        Parameters
+        ----------
+        kwargs : dict
+            Input keyword arguments
+
+        """
+        aacgmv2.set_coeffs(self.aacgm_coeffs)
+        with pytest.raises(ValueError, match="cannot use coefficients set"):
+            aacgmv2.convert_latlon_arr(*self.in_args, self.dtime, **kwargs)
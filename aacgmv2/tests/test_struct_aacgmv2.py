@@ -1,10 +1,13 @@
 """Unit tests for the AACGMV2 module structure."""
 
+from importlib import metadata
 import logging
 import numpy as np
 import os
 import pkgutil
 import pytest
+import subprocess
+import sys
 
 import aacgmv2
 
@@ -26,8 +29,10 @@ class TestModuleStructure(object):
 
     def test_module_existence(self):
         """Test the module existence."""
-        # Get the dictionary of functions for the specified module
-        retrieved_dict = aacgmv2.__dict__
+        # Get the dictionary of functions for the specified module, including
+        # those imported when first used
+        retrieved_dict = {name: getattr(aacgmv2, name)
+                          for name in dir(aacgmv2)}
 
         # Submodules only go one level down
         if self.module_name is None:
@@ -39,8 +44,10 @@ class TestModuleStructure(object):
 
     def test_module_functions(self):
         """Test module function structure."""
-        # Get the dictionary of functions for the specified module
-        retrieved_dict = aacgmv2.__dict__
+        # Get the dictionary of functions for the specified module, including
+        # those imported when first used
+        retrieved_dict = {name: getattr(aacgmv2, name)
+                          for name in dir(aacgmv2)}
 
         if self.module_name is None:
             assert True
@@ -98,6 +105,108 @@ class TestUtilsStructure(TestModuleStructure):
         self.test_module_functions()
 
 
+class TestUfuncStructure(TestModuleStructure):
+    """Test the ufunc structure."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.module_name = None
+        self.reference_list = ["g2a", "a2g", "g2a_iter", "a2g_iter", "mlt",
+                               "inv_mlt"]
+
+    def teardown_method(self):
+        """Clean up the test environment."""
+        del self.module_name, self.reference_list
+
+    def test_ufunc_existence(self):
+        """Test the ufunc existence."""
+        self.module_name = "ufunc"
+        self.test_module_existence()
+
+    def test_ufunc_functions(self):
+        """Test the ufunc functions."""
+        self.module_name = "ufunc"
+        self.test_module_functions()
+
+
+class TestCoeffStoreStructure(TestModuleStructure):
+    """Test the coefficient store structure."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.module_name = None
+        self.reference_list = ["store_filename", "read_coeff_files",
+                               "write_coeff_store", "read_coeff_store",
+                               "_unpack_header", "_check_crcs",
+                               "unpack_coeff_store", "parse_igrf_coeffs"]
+
+    def teardown_method(self):
+        """Clean up the test environment."""
+        del self.module_name, self.reference_list
+
+    def test_coeff_store_existence(self):
+        """Test the coefficient store module existence."""
+        self.module_name = "coeff_store"
+        self.test_module_existence()
+
+    def test_coeff_store_functions(self):
+        """Test the coefficient store functions."""
+        self.module_name = "coeff_store"
+        self.test_module_functions()
+
+
+class TestNumpyEngineStructure(TestModuleStructure):
+    """Test the NumPy engine structure."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.module_name = None
+        self.reference_list = ["rylm", "geod2geoc", "geoc2geod", "cgm2alt",
+                               "CoeffModel", "get_model", "convert_coeffs",
+                               "_rylm_norm", "_fractional_year",
+                               "_convert_chunk"]
+
+    def teardown_method(self):
+        """Clean up the test environment."""
+        del self.module_name, self.reference_list
+
+    def test_numpy_engine_existence(self):
+        """Test the NumPy engine module existence."""
+        self.module_name = "numpy_engine"
+        self.test_module_existence()
+
+    def test_numpy_engine_functions(self):
+        """Test the NumPy engine functions."""
+        self.module_name = "numpy_engine"
+        self.test_module_functions()
+
+
+class TestTraceTableStructure(TestModuleStructure):
+    """Test the trace table structure."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.module_name = None
+        self.reference_list = ["TraceTable", "build_trace_table",
+                               "write_trace_table", "read_trace_table",
+                               "_grid_axis", "_to_vector", "_from_vector",
+                               "_angle", "_corners", "_cell_error"]
+
+    def teardown_method(self):
+        """Clean up the test environment."""
+        del self.module_name, self.reference_list
+
+    def test_trace_table_existence(self):
+        """Test the trace table module existence."""
+        self.module_name = "trace_table"
+        self.test_module_existence()
+
+    def test_trace_table_functions(self):
+        """Test the trace table functions."""
+        self.module_name = "trace_table"
+        self.test_module_functions()
+
+
 class TestCStructure(TestModuleStructure):
     """Test the C structure."""
 
@@ -107,7 +216,18 @@ class TestCStructure(TestModuleStructure):
         self.reference_list = ["set_datetime", "convert", "inv_mlt_convert",
                                "inv_mlt_convert_yrsec", "mlt_convert",
                                "mlt_convert_yrsec", "inv_mlt_convert_arr",
-                               "mlt_convert_arr", "convert_arr"]
+                               "mlt_convert_arr", "convert_arr",
+                               "convert_buf", "mlt_convert_buf",
+                               "inv_mlt_convert_buf", "g2a", "a2g", "mlt",
+                               "inv_mlt", "new_model", "set_model",
+                               "set_cache_size", "cache_stats", "next_epoch",
+                               "prefetch", "stage_file", "load_coeffs",
+                               "mlt_cache_stats", "lock",
+                               "unlock", "locked", "stats", "reset_stats",
+                               "g2a_iter", "a2g_iter", "set_coeffs",
+                               "set_igrf_coeffs", "memory_coeffs",
+                               "g2a_nolock", "a2g_nolock", "g2a_iter_nolock",
+                               "a2g_iter_nolock"]
 
     def teardown_method(self):
         """Clean up the test environment."""
@@ -134,7 +254,19 @@ class TestPyStructure(TestModuleStructure):
                                "convert_mlt", "convert_latlon", "test_height",
                                "convert_latlon_arr", "get_aacgm_coord",
                                "get_aacgm_coord_arr", "set_coeff_path",
-                               "test_time"]
+                               "test_time", "group_times", "Converter",
+                               "_use_model", "_convert_chunk",
+                               "_convert_latlon", "_convert_latlon_arr",
+                               "set_cache_size", "get_cache_stats",
+                               "_prefetch_epoch", "_prefetch_next",
+                               "_convert_numpy", "WorkerPool",
+                               "_convert_shard", "_convert_processes",
+                               "MLTReference", "_dense_mlt_ref",
+                               "_epoch_to_datetime", "_time_to_epoch",
+                               "_wrap", "model_time", "stats", "profile",
+                               "Profile", "_StageTimer", "warmup",
+                               "_aacgm_coeff_arrays", "_igrf_coeff_arrays",
+                               "_set_coeffs", "set_coeffs"]
 
     def teardown_method(self):
         """Clean up the test environment."""
@@ -174,16 +306,77 @@ class TestTopStructure(TestModuleStructure):
         self.reference_list = ["convert_bool_to_bit", "convert_str_to_bit",
                                "convert_mlt", "convert_latlon",
                                "convert_latlon_arr", "get_aacgm_coord",
-                               "get_aacgm_coord_arr"]
+                               "get_aacgm_coord_arr", "Converter",
+                               "MLTReference", "set_cache_size",
+                               "get_cache_stats", "model_time", "stats",
+                               "profile", "warmup", "set_coeffs",
+                               "WorkerPool", "__getattr__", "__dir__",
+                               "_set_environ"]
         self.test_module_functions()
 
     def test_top_modules(self):
         """Test the top level modules."""
         self.module_name = "aacgmv2"
         self.reference_list = ["_aacgmv2", "wrapper", "utils", "__main__",
-                               'tests']
+                               'tests', 'ufunc', 'coeff_store',
+                               'numpy_engine', 'trace_table']
         self.test_modules()
 
+    def test_lazy_import(self):
+        """Test that importing the package does not load the submodules."""
+        code = "".join(["import sys; import aacgmv2; print(sorted(name for ",
+                        "name in ['numpy', 'aacgmv2._aacgmv2', ",
+                        "'aacgmv2.wrapper', 'importlib.metadata'] if name ",
+                        "in sys.modules))"])
+        out = subprocess.run([sys.executable, "-c", code], check=True,
+                             capture_output=True, text=True)
+        assert out.stdout.strip() == "[]"
+
+    def test_lazy_environ(self):
+        """Test the environment is only set when the submodules are used."""
+        code = "".join(["import os; import sys; import aacgmv2; ",
+                        "print(os.environ['IGRF_COEFFS']); ",
+                        "sys.stdout.flush(); aacgmv2.wrapper; ",
+                        "print(os.environ['IGRF_COEFFS'] == ",
+                        "aacgmv2.IGRF_COEFFS)"])
+        env = dict(os.environ)
+        env['IGRF_COEFFS'] = "other_igrf"
+        out = subprocess.run([sys.executable, "-c", code], check=True,
+                             capture_output=True, text=True, env=env)
+        assert out.stdout.split() == ["other_igrf", "True"]
+        assert out.stderr.startswith(
+            "resetting environment variable IGRF_COEFFS")
+
+    def test_star_import(self):
+        """Test that a star import provides the public attributes."""
+        code = "".join(["from aacgmv2 import *; print(sorted(set(dir()) & ",
+                        "{'convert_latlon', 'convert_latlon_arr', ",
+                        "'convert_mlt', 'get_aacgm_coord', ",
+                        "'get_aacgm_coord_arr', 'Converter', 'utils', ",
+                        "'wrapper', 'logger', 'stderr', 'logging'}))"])
+        out = subprocess.run([sys.executable, "-c", code], check=True,
+                             capture_output=True, text=True)
+        assert out.stdout.strip() == str(sorted([
+            'convert_latlon', 'convert_latlon_arr', 'convert_mlt',
+            'get_aacgm_coord', 'get_aacgm_coord_arr', 'Converter', 'utils',
+            'wrapper', 'logger']))
+
+    def test_all(self):
+        """Test that the exported names are all package attributes."""
+        for name in aacgmv2.__all__:
+            assert hasattr(aacgmv2, name), name
+
+    def test_lazy_attributes(self):
+        """Test that the attributes imported when first used are stored."""
+        assert aacgmv2.convert_mlt is aacgmv2.wrapper.convert_mlt
+        assert aacgmv2.__dict__['convert_mlt'] is aacgmv2.convert_mlt
+        assert aacgmv2.__version__ == metadata.version('aacgmv2')
+
+    def test_bad_attribute(self):
+        """Test an AttributeError is raised for unknown attributes."""
+        with pytest.raises(AttributeError, match="has no attribute 'fake'"):
+            aacgmv2.fake
+
 
 class TestTopVariables(object):
     """Test the top-level variables."""
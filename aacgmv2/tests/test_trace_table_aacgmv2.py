@@ -0,0 +1,176 @@
+"""Unit tests for the AACGMV2 trace lookup tables."""
+import datetime as dt
+import numpy as np
+import os
+import pytest
+import tempfile
+
+import aacgmv2
+from aacgmv2 import trace_table
+
+
+class TestTraceTable(object):
+    """Unit tests for building, using, and storing trace lookup tables."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dtime = dt.datetime(2015, 1, 1, 0, 0, 0)
+        self.grid = [np.linspace(50.0, 60.0, 5), np.linspace(0.0, 20.0, 5),
+                     np.linspace(2000.0, 3000.0, 3)]
+        self.table = trace_table.build_trace_table(self.dtime, *self.grid,
+                                                   max_workers=2)
+        self.out = None
+
+    def teardown_method(self):
+        """Clean up the test envrionment."""
+        self.tmp_dir.cleanup()
+        del self.tmp_dir, self.dtime, self.grid, self.table, self.out
+
+    def test_build(self):
+        """Test the table holds the traced grid points."""
+        assert self.table.dtime == self.dtime
+        assert self.table.method_code == aacgmv2._aacgmv2.TRACE
+        assert self.table.cell_error.shape == (4, 4, 2)
+        for grid, table_grid in zip(self.grid, [self.table.lat,
+                                                self.table.lon,
+                                                self.table.alt]):
+            np.testing.assert_allclose(table_grid, grid)
+
+        self.out = self.table.interpolate(*np.meshgrid(*self.grid,
+                                                       indexing="ij"),
+                                          max_error=np.inf)
+        ref = aacgmv2.convert_latlon_arr(*np.meshgrid(*self.grid,
+                                                      indexing="ij"),
+                                         self.dtime, "TRACE")
+        assert self.out[3].all()
+        for i, ref_arr in enumerate(ref):
+            np.testing.assert_allclose(self.out[i], ref_arr, atol=1.0e-8)
+
+    def test_interpolation_error(self):
+        """Test interpolated locations are within the error bound."""
+        rng = np.random.default_rng(0)
+        in_args = [rng.uniform(grid[0], grid[-1], 50) for grid in self.grid]
+        self.out = self.table.convert_latlon_arr(*in_args, max_error=np.inf)
+        ref = aacgmv2.convert_latlon_arr(*in_args, self.dtime, "TRACE")
+
+        angle = trace_table._angle(trace_table._to_vector(*self.out),
+                                   trace_table._to_vector(*ref))
+        assert np.all(angle <= self.table.error_bound(np.inf))
+        assert np.isnan(self.table.error_bound(0.0))
+
+    @pytest.mark.parametrize('in_args', [([70.0], [10.0], [2500.0]),
+                                         ([55.0], [10.0], [5000.0]),
+                                         ([55.0], [30.0], [2500.0])])
+    def test_outside_traced(self, in_args):
+        """Test locations outside the grid are traced.
+
+        Parameters
+        ----------
+        in_args : tuple
+            Latitude, longitude, and height outside the grid
+
+        """
+        assert not self.table.interpolate(*in_args)[3].any()
+        self.out = self.table.convert_latlon_arr(*in_args)
+        np.testing.assert_array_equal(self.out, aacgmv2.convert_latlon_arr(
+            *in_args, self.dtime, "TRACE"))
+
+    def test_max_error_traced(self):
+        """Test locations in cells above the maximum error are traced."""
+        in_args = [55.0, 10.0, [2200.0, 2700.0]]
+        self.out = self.table.convert_latlon_arr(*in_args, max_error=0.0)
+        np.testing.assert_array_equal(self.out, aacgmv2.convert_latlon_arr(
+            *in_args, self.dtime, "TRACE"))
+
+    def test_longitude_wrap(self):
+        """Test longitudes are wrapped into the grid."""
+        self.out = self.table.interpolate(55.0, [10.0, 370.0, -350.0],
+                                          2500.0, max_error=np.inf)
+        assert self.out[3].all()
+        for out_arr in self.out[:3]:
+            np.testing.assert_allclose(out_arr, out_arr[0])
+
+    def test_forbidden_region(self):
+        """Test cells touching the forbidden region are traced."""
+        self.table = trace_table.build_trace_table(
+            self.dtime, [0.0, 10.0, 20.0], [0.0, 10.0, 20.0],
+            [2000.0, 2500.0, 3000.0], method_code="A2G")
+        assert np.isnan(self.table.cell_error).any()
+
+        in_args = [[5.0, 15.0], 5.0, 2500.0]
+        self.out = self.table.convert_latlon_arr(*in_args, max_error=np.inf)
+        ref = aacgmv2.convert_latlon_arr(*in_args, self.dtime, "A2G|TRACE")
+        np.testing.assert_array_equal(np.isnan(self.out), np.isnan(ref))
+
+    @pytest.mark.parametrize('grid,msg', [([50.0, 60.0], "three values"),
+                                          ([60.0, 55.0, 50.0], "increasing"),
+                                          ([50.0, 51.0, 60.0], "evenly")])
+    def test_bad_grid(self, grid, msg):
+        """Test a ValueError is raised for bad grids.
+
+        Parameters
+        ----------
+        grid : list
+            Latitude grid
+        msg : str
+            Expected error message
+
+        """
+        with pytest.raises(ValueError, match=msg):
+            trace_table.build_trace_table(self.dtime, grid, *self.grid[1:])
+
+    def test_write_read(self):
+        """Test a table may be written and memory-mapped."""
+        filename = os.path.join(self.tmp_dir.name, "table.bin")
+        assert trace_table.write_trace_table(self.table, filename) == filename
+
+        self.out = trace_table.read_trace_table(filename)
+        assert isinstance(self.out.values, np.memmap)
+        assert self.out.dtime == self.table.dtime
+        assert self.out.method_code == self.table.method_code
+        assert self.out.max_error == self.table.max_error
+        np.testing.assert_array_equal(self.out.values, self.table.values)
+        np.testing.assert_array_equal(self.out.cell_error,
+                                      self.table.cell_error)
+        np.testing.assert_array_equal(self.out.interpolate(55.0, 10.0, 2500.0),
+                                      self.table.interpolate(55.0, 10.0,
+                                                             2500.0))
+
+    @pytest.mark.parametrize('offset,data,msg',
+                             [(0, b"NOTATABL", "not a version"),
+                              (200, b"\1\2\3\4", "checksum mismatch"),
+                              (None, b"\0", "unexpected trace table size")])
+    def test_read_bad_table(self, offset, data, msg):
+        """Test a ValueError is raised for damaged tables.
+
+        Parameters
+        ----------
+        offset : int or NoneType
+            Offset at which the data is written, or None to append it
+        data : bytes
+            Damaging data
+        msg : str
+            Expected error message
+
+        """
+        filename = trace_table.write_trace_table(
+            self.table, os.path.join(self.tmp_dir.name, "table.bin"))
+        with open(filename, "r+b") as fout:
+            if offset is None:
+                fout.seek(0, os.SEEK_END)
+            else:
+                fout.seek(offset)
+            fout.write(data)
+
+        with pytest.raises(ValueError, match=msg):
+            trace_table.read_trace_table(filename)
+
+    def test_read_short_file(self):
+        """Test a ValueError is raised for files shorter than the header."""
+        filename = os.path.join(self.tmp_dir.name, "table.bin")
+        with open(filename, "wb") as fout:
+            fout.write(trace_table.TABLE_MAGIC)
+
+        with pytest.raises(ValueError, match="file too short"):
+            trace_table.read_trace_table(filename)
@@ -0,0 +1,251 @@
+"""Unit tests for the AACGMV2 NumPy ufuncs."""
+from concurrent import futures
+import datetime as dt
+import numpy as np
+import pytest
+
+import aacgmv2
+from aacgmv2 import ufunc
+
+
+class TestConvertUfunc(object):
+    """Unit tests for the coordinate conversion ufuncs."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.epoch = (dt.datetime(2015, 1, 1)
+                      - dt.datetime(1970, 1, 1)).total_seconds()
+        self.lat_in = np.array([60.0, 61.0])
+        self.code = aacgmv2.convert_str_to_bit("TRACE")
+        self.ref = [[58.22676, 59.31847], [81.16135, 81.60797],
+                    [1.0457, 1.0456]]
+        self.out = None
+        self.rtol = 1.0e-4
+
+    def teardown_method(self):
+        """Clean up the test envrionment."""
+        del self.epoch, self.lat_in, self.code, self.ref, self.out, self.rtol
+
+    def evaluate_output(self, shape):
+        """Evaluate ufunc output against the reference values.
+
+        Parameters
+        ----------
+        shape : tuple
+            Expected output shape, with the reference values along the last
+            dimension
+
+        """
+        np.testing.assert_equal(len(self.out), len(self.ref))
+        for i, oo in enumerate(self.out):
+            np.testing.assert_equal(oo.shape, shape)
+            np.testing.assert_allclose(oo, np.broadcast_to(self.ref[i], shape),
+                                       rtol=self.rtol)
+
+    def test_g2a(self):
+        """Test the G2A ufunc."""
+        self.out = ufunc.g2a(self.lat_in, 0.0, 300.0, self.epoch, self.code)
+        self.evaluate_output((2,))
+
+    def test_g2a_broadcast(self):
+        """Test the G2A ufunc with multi-dimensional, broadcast input."""
+        self.out = ufunc.g2a(self.lat_in, np.zeros(shape=(3, 1)), 300.0,
+                             self.epoch, self.code)
+        self.evaluate_output((3, 2))
+
+    def test_g2a_non_contiguous(self):
+        """Test the G2A ufunc with non-contiguous input and output."""
+        self.lat_in = np.array([self.lat_in, self.lat_in]).transpose()
+        self.out = np.full(shape=(3, 2, 2), fill_value=-1.0)
+        ufunc.g2a(self.lat_in, 0.0, 300.0, self.epoch, self.code,
+                  out=(self.out[0], self.out[1], self.out[2]))
+        self.ref = [np.transpose([rr, rr]) for rr in self.ref]
+        self.evaluate_output((2, 2))
+
+    def test_g2a_where(self):
+        """Test the G2A ufunc with a `where` mask."""
+        self.out = [np.full(shape=(2,), fill_value=-1.0) for i in range(3)]
+        ufunc.g2a(self.lat_in, 0.0, 300.0, self.epoch, self.code,
+                  out=tuple(self.out), where=[True, False])
+        self.ref = [[rr[0], -1.0] for rr in self.ref]
+        self.evaluate_output((2,))
+
+    def test_a2g(self):
+        """Test the A2G ufunc matches the array conversion function."""
+        self.out = ufunc.g2a(self.lat_in, 0.0, 300.0, self.epoch, 0)
+        self.ref = aacgmv2.convert_latlon_arr(self.out[0], self.out[1], 300.0,
+                                              dt.datetime(2015, 1, 1), "A2G")
+        self.out = ufunc.a2g(self.out[0], self.out[1], 300.0, self.epoch,
+                             aacgmv2.convert_str_to_bit("A2G"))
+        self.evaluate_output((2,))
+
+    def test_g2a_times(self):
+        """Test the G2A ufunc with a different time for each location."""
+        epochs = np.array([self.epoch, (dt.datetime(2020, 6, 1)
+                                        - dt.datetime(1970, 1, 1)
+                                        ).total_seconds()])
+        self.out = ufunc.g2a(self.lat_in, 0.0, 300.0, epochs, self.code)
+        self.ref = [np.array(aacgmv2.convert_latlon(
+            lat, 0.0, 300.0, dt.datetime(1970, 1, 1)
+            + dt.timedelta(seconds=epoch), self.code))
+            for lat, epoch in zip(self.lat_in, epochs)]
+        np.testing.assert_allclose(self.out, np.transpose(self.ref),
+                                   rtol=self.rtol)
+
+    def test_g2a_concurrent_times(self):
+        """Test the G2A ufunc called at different times in threads."""
+        self.lat_in = np.linspace(-80.0, 80.0, 20000)
+        epochs = [(dt.datetime(year, 1, 1)
+                   - dt.datetime(1970, 1, 1)).total_seconds()
+                  for year in [1990, 2020]]
+        code = aacgmv2.convert_str_to_bit("G2A")
+        self.ref = [ufunc.g2a(self.lat_in, 0.0, 300.0, epoch, code)
+                    for epoch in epochs]
+
+        with futures.ThreadPoolExecutor(max_workers=4) as pool:
+            self.out = list(pool.map(
+                lambda epoch: ufunc.g2a(self.lat_in, 0.0, 300.0, epoch, code),
+                epochs * 8))
+
+        for i, out in enumerate(self.out):
+            np.testing.assert_allclose(out, self.ref[i % 2], rtol=self.rtol)
+
+    @pytest.mark.parametrize('lat,epoch', [(0.0, 0.0), (60.0, np.nan),
+                                           (60.0, -1.0e12)])
+    def test_g2a_bad(self, lat, epoch):
+        """Test the G2A ufunc sets NaN for locations that cannot be converted.
+
+        Parameters
+        ----------
+        lat : float
+            Input latitude
+        epoch : float
+            Input time in seconds since 1970
+
+        """
+        self.out = ufunc.g2a(lat, 0.0, 0.0, self.epoch if epoch == 0.0
+                             else epoch, 0)
+        assert np.all(np.isnan(self.out))
+
+    @pytest.mark.parametrize('func', [ufunc.g2a, ufunc.a2g])
+    @pytest.mark.parametrize('code', [0, aacgmv2._aacgmv2.GEOCENTRIC,
+                                      aacgmv2._aacgmv2.ALLOWTRACE,
+                                      aacgmv2._aacgmv2.BADIDEA,
+                                      aacgmv2._aacgmv2.TRACE])
+    @pytest.mark.parametrize('height', [300.0, [0.0, 300.0, 2500.0]])
+    def test_batch_engine(self, func, code, height):
+        """Test the batch engine matches conversion one location at a time.
+
+        Parameters
+        ----------
+        func : np.ufunc
+            Conversion ufunc
+        code : int
+            Bit code
+        height : float or list
+            Heights, broadcast against the locations
+
+        Notes
+        -----
+        Field lines traced together differ by rounding, which may change the
+        adaptive steps of the trace and so differ within its accuracy.
+
+        """
+        lat = np.tile(np.linspace(-91.0, 89.0, 37), 3)
+        lon = np.linspace(-180.0, 540.0, lat.size)
+        height = np.resize(height, lat.shape)
+        self.ref = func(lat, lon, height, self.epoch,
+                        code + aacgmv2._aacgmv2.SCALAR)
+        self.out = func(lat, lon, height, self.epoch, code)
+
+        tol = 1.0e-4 if code & (aacgmv2._aacgmv2.ALLOWTRACE
+                                | aacgmv2._aacgmv2.TRACE) else 1.0e-10
+        for i, oo in enumerate(self.out):
+            np.testing.assert_array_equal(np.isnan(oo), np.isnan(self.ref[i]))
+            np.testing.assert_allclose(oo, self.ref[i], rtol=tol, atol=tol)
+
+    @pytest.mark.parametrize('func,iter_func', [(ufunc.g2a, ufunc.g2a_iter),
+                                                (ufunc.a2g, ufunc.a2g_iter)])
+    @pytest.mark.parametrize('scalar', [0, aacgmv2._aacgmv2.SCALAR])
+    def test_iter(self, func, iter_func, scalar):
+        """Test the ufuncs that also return the tracing iterations.
+
+        Parameters
+        ----------
+        func : np.ufunc
+            Conversion ufunc
+        iter_func : np.ufunc
+            Conversion ufunc that also returns the tracing iterations
+        scalar : int
+            SCALAR bit code, or 0 for the batch engine
+
+        """
+        height = [300.0, 2500.0]
+        code = aacgmv2._aacgmv2.ALLOWTRACE + scalar
+        self.ref = func(self.lat_in, 0.0, height, self.epoch, code)
+        self.out = iter_func(self.lat_in, 0.0, height, self.epoch, code)
+
+        assert len(self.out) == 4
+        for i, oo in enumerate(self.out[:3]):
+            np.testing.assert_array_equal(oo, self.ref[i])
+        assert self.out[3].dtype == np.int64
+        assert self.out[3][0] == 0
+        assert self.out[3][1] > 0
+
+
+class TestMLTUfunc(object):
+    """Unit tests for the MLT ufuncs."""
+
+    def setup_method(self):
+        """Create a clean test environment."""
+        self.epoch = (dt.datetime(2015, 1, 1)
+                      - dt.datetime(1970, 1, 1)).total_seconds()
+        self.mlon = np.array([270.0, 80.0, -95.0])
+        self.mlt = np.array([12.7780412, 0.11137453, 12.44470786])
+        self.out = None
+
+    def teardown_method(self):
+        """Clean up the test envrionment."""
+        del self.epoch, self.mlon, self.mlt, self.out
+
+    def test_mlt(self):
+        """Test the MLT ufunc."""
+        self.out = ufunc.mlt(self.mlon, self.epoch)
+        np.testing.assert_allclose(self.out, self.mlt, rtol=1.0e-4)
+
+    def test_inv_mlt(self):
+        """Test the inverse MLT ufunc."""
+        self.out = ufunc.inv_mlt(self.mlt, self.epoch)
+        np.testing.assert_allclose(self.out, [-90.0, 80.0, -95.0],
+                                   atol=1.0e-4)
+
+    def test_mlt_broadcast(self):
+        """Test the MLT ufunc with multi-dimensional input and output."""
+        self.out = np.zeros(shape=(2, 3))
+        ufunc.mlt(self.mlon, np.full(shape=(2, 1), fill_value=self.epoch),
+                  out=self.out)
+        np.testing.assert_allclose(self.out, [self.mlt, self.mlt],
+                                   rtol=1.0e-4)
+
+    @pytest.mark.parametrize('dtime', [dt.datetime(1969, 12, 31, 23, 59, 59),
+                                       dt.datetime(1904, 2, 29, 12),
+                                       dt.datetime(2000, 3, 1, 0, 0, 1)])
+    def test_mlt_epoch_dates(self, dtime):
+        """Test the MLT ufunc handles dates before and after 1970.
+
+        Parameters
+        ----------
+        dtime : dt.datetime
+            Input time
+
+        """
+        self.out = ufunc.mlt(self.mlon, (dtime - dt.datetime(1970, 1, 1)
+                                         ).total_seconds())
+        np.testing.assert_allclose(self.out, [aacgmv2._aacgmv2.mlt_convert(
+            dtime.year, dtime.month, dtime.day, dtime.hour, dtime.minute,
+            dtime.second, mlon) for mlon in self.mlon], rtol=1.0e-6)
+
+    def test_mlt_nan_time(self):
+        """Test the MLT ufunc returns NaN for an undefined time."""
+        self.out = ufunc.mlt(self.mlon, np.nan)
+        assert np.all(np.isnan(self.out))
@@ -0,0 +1,652 @@
+# Copyright (C) 2019 NRL
+# Author: Angeline Burrell
+# Disclaimer: This code is under the MIT license, whose details can be found at
+# the root in the LICENSE file
+#
+# -*- coding: utf-8 -*-
+"""Lookup tables of field-line tracing results.
+
+Attributes
+----------
+TABLE_MAGIC : bytes
+    Identifier at the start of a trace table file
+TABLE_VERSION : int
+    Version of the trace table file format
+
+Notes
+-----
+Field-line tracing is needed above 2000 km and costs far more than the
+coefficient conversions.  A `TraceTable` holds the traced conversions at one
+model time on a regular latitude, longitude, and altitude grid, and converts
+locations inside the grid by trilinear interpolation of the output position,
+held as a unit vector and a radius so that longitudes wrap smoothly.
+
+When the table is built, the interpolation error of each grid cell is
+estimated from the second differences of the traced positions along each
+axis, which bound the error of linear interpolation for a smoothly varying
+mapping, and from the difference between the interpolated and traced
+positions at the cell centre.  Interpolation is used only in cells whose
+estimate is below the requested maximum error.  Locations in other cells,
+including cells touching the forbidden region (where a corner or the centre
+could not be traced), and locations outside the grid are traced instead.
+
+The table file is little-endian, with a 104 byte header, the float64 grid
+values, and the float64 cell error estimates.  It is memory-mapped when read,
+so that it may be shared by several processes.
+
+"""
+
+import datetime as dt
+import numpy as np
+import os
+import struct
+import zlib
+
+import aacgmv2
+from aacgmv2 import wrapper
+
+TABLE_MAGIC = b"AACGMTT\0"
+TABLE_VERSION = 1
+
+_HEADER = struct.Struct("<8s4Iq7d3I4x")
+_EPOCH = dt.datetime(1970, 1, 1)
+
+
+def _grid_axis(values, name):
+    """Test a grid axis and get its start, step, and number of points.
+
+    Parameters
+    ----------
+    values : array-like
+        Increasing, evenly spaced grid values
+    name : str
+        Name of the axis, used in error messages
+
+    Returns
+    -------
+    start : float
+        First grid value
+    step : float
+        Grid spacing
+    num : int
+        Number of grid values
+
+    Raises
+    ------
+    ValueError
+        If the values are not an increasing, evenly spaced grid of at least
+        three values.
+
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 1 or values.size < 3:
+        raise ValueError("{:} grid must have at least three values".format(
+            name))
+
+    step = (values[-1] - values[0]) / (values.size - 1)
+    if step <= 0.0 or not np.allclose(np.diff(values), step, rtol=1.0e-6):
+        raise ValueError("{:} grid must be increasing and evenly spaced".format(
+            name))
+
+    return float(values[0]), float(step), int(values.size)
+
+
+def _to_vector(lat, lon, rad):
+    """Express output positions as unit vectors and a radius.
+
+    Parameters
+    ----------
+    lat : np.ndarray
+        Latitude in degrees
+    lon : np.ndarray
+        Longitude in degrees
+    rad : np.ndarray
+        Radius or altitude
+
+    Returns
+    -------
+    values : np.ndarray
+        Array with a last dimension of length four, holding the Cartesian unit
+        vector and the radius
+
+    """
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon),
+                     np.sin(lat), rad], axis=-1)
+
+
+def _from_vector(values):
+    """Get output positions from (interpolated) unit vectors and radii.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Array with a last dimension of length four, see `_to_vector`
+
+    Returns
+    -------
+    lat : np.ndarray
+        Latitude in degrees
+    lon : np.ndarray
+        Longitude in degrees
+    rad : np.ndarray
+        Radius or altitude
+
+    """
+    lat = np.degrees(np.arctan2(values[..., 2], np.hypot(values[..., 0],
+                                                         values[..., 1])))
+    lon = np.degrees(np.arctan2(values[..., 1], values[..., 0]))
+
+    return lat, lon, values[..., 3].copy()
+
+
+def _angle(values, ref):
+    """Get the angle between the positions of two value arrays.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Array with a last dimension of length four, see `_to_vector`
+    ref : np.ndarray
+        Reference array with the same shape, holding unit vectors
+
+    Returns
+    -------
+    angle : np.ndarray
+        Angle in degrees
+
+    """
+    vec = values[..., :3] / np.linalg.norm(values[..., :3], axis=-1,
+                                           keepdims=True)
+
+    return np.degrees(2.0 * np.arcsin(np.minimum(np.linalg.norm(
+        vec - ref[..., :3], axis=-1) / 2.0, 1.0)))
+
+
+def _corners(values):
+    """Get the values at each corner of the grid cells.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Values at the grid points, with the grid in the first three dimensions
+
+    Returns
+    -------
+    corners : generator
+        Values at one corner of all grid cells, for each of the eight corners
+
+    """
+    for corner in range(8):
+        yield values[tuple(slice(1, None) if (corner >> iaxis) & 1
+                           else slice(None, -1) for iaxis in range(3))]
+
+
+def _cell_error(values, centres):
+    """Estimate the interpolation error of each grid cell.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Traced positions at the grid points, see `_to_vector`
+    centres : np.ndarray
+        Traced positions at the cell centres
+
+    Returns
+    -------
+    cell_error : np.ndarray
+        Estimated interpolation error in degrees, NaN if a corner or the
+        centre could not be traced
+
+    """
+    # The error of linear interpolation along each axis is at most an eighth
+    # of the second difference, taken as the largest at the cell corners
+    curve_error = np.zeros(shape=centres.shape[:3], dtype=np.float64)
+    for iaxis in range(3):
+        vec = np.moveaxis(values[..., :3], iaxis, 0)
+        diff2 = np.linalg.norm(vec[2:] - 2.0 * vec[1:-1] + vec[:-2], axis=-1)
+        diff2 = np.moveaxis(np.concatenate([diff2[:1], diff2, diff2[-1:]]),
+                            0, iaxis)
+        curve_error += np.max(list(_corners(diff2)), axis=0) / 8.0
+    curve_error = np.degrees(curve_error)
+
+    # Test the interpolation at the cell centres, which also flags cells next
+    # to the forbidden region
+    interp = np.mean(list(_corners(values)), axis=0)
+
+    return np.maximum(curve_error, _angle(interp, centres))
+
+
+class TraceTable(object):
+    """Lookup table of traced conversions at one model time.
+
+    Parameters
+    ----------
+    dtime : dt.datetime
+        Date and time of the magnetic field model
+    grid : tuple
+        Start, step, and number of points of the latitude, longitude, and
+        altitude grids, each a tuple
+    values : np.ndarray
+        Traced output positions at the grid points, with shape (lat, lon,
+        alt, 4), see Notes
+    cell_error : np.ndarray
+        Estimated interpolation error in degrees for each grid cell, with
+        shape (lat - 1, lon - 1, alt - 1), or NaN where tracing failed
+    method_code : int
+        Bit code of the conversion, including the TRACE bit
+    max_error : float
+        Default maximum cell error in degrees for which locations are
+        interpolated (default=0.01)
+
+    Attributes
+    ----------
+    dtime : dt.datetime
+        Date and time of the magnetic field model
+    lat, lon, alt : np.ndarray
+        Grid latitudes (degrees N), longitudes (degrees E), and altitudes (km)
+    method_code : int
+        Bit code of the conversion
+    max_error : float
+        Default maximum cell error in degrees for which locations are
+        interpolated
+    values : np.ndarray
+        Traced output positions at the grid points
+    cell_error : np.ndarray
+        Estimated interpolation error in degrees for each grid cell
+
+    Notes
+    -----
+    The last dimension of `values` holds the Cartesian unit vector of the
+    output latitude and longitude and the output radius or altitude.  Tables
+    are usually created with `build_trace_table` or `read_trace_table`.
+
+    The error estimate of each cell is the larger of the error bound for a
+    smoothly varying mapping, from the second differences of the traced
+    positions, and the difference at the cell centre.  It does not include
+    the accuracy of the trace itself.  The radius is interpolated without an
+    error estimate, as it varies smoothly with altitude.
+
+    """
+
+    def __init__(self, dtime, grid, values, cell_error, method_code,
+                 max_error=0.01):
+        self.dtime = wrapper.test_time(dtime)
+        self._grid = tuple(tuple(axis) for axis in grid)
+        self.values = values
+        self.cell_error = cell_error
+        self.method_code = method_code
+        self.max_error = max_error
+
+        shape = tuple(axis[2] for axis in self._grid)
+        if values.shape != shape + (4,):
+            raise ValueError("table values must have shape {:}".format(
+                shape + (4,)))
+
+        if cell_error.shape != tuple(num - 1 for num in shape):
+            raise ValueError("cell errors must have shape {:}".format(
+                tuple(num - 1 for num in shape)))
+
+    def __repr__(self):
+        """Provide a readable representation of the TraceTable."""
+        return "".join(["aacgmv2.trace_table.TraceTable(", repr(self.dtime),
+                        ", shape=", repr(self.values.shape[:3]),
+                        ", method_code=", repr(self.method_code), ")"])
+
+    @property
+    def lat(self):
+        """Grid latitudes in degrees N."""
+        return self._axis(0)
+
+    @property
+    def lon(self):
+        """Grid longitudes in degrees E."""
+        return self._axis(1)
+
+    @property
+    def alt(self):
+        """Grid altitudes in km."""
+        return self._axis(2)
+
+    def _axis(self, iaxis):
+        """Get the values of a grid axis.
+
+        Parameters
+        ----------
+        iaxis : int
+            Axis index
+
+        Returns
+        -------
+        values : np.ndarray
+            Grid values
+
+        """
+        start, step, num = self._grid[iaxis]
+        return start + step * np.arange(num)
+
+    def error_bound(self, max_error=None):
+        """Get the largest error estimate of the interpolated cells.
+
+        Parameters
+        ----------
+        max_error : float or NoneType
+            Maximum cell error in degrees for which locations are
+            interpolated, or None to use `max_error` (default=None)
+
+        Returns
+        -------
+        bound : float
+            Largest estimated interpolation error in degrees, or NaN if no
+            cell is interpolated
+
+        """
+        if max_error is None:
+            max_error = self.max_error
+
+        good = self.cell_error <= max_error
+        return float(self.cell_error[good].max()) if good.any() else np.nan
+
+    def interpolate(self, in_lat, in_lon, height, max_error=None):
+        """Interpolate the table, without tracing locations outside it.
+
+        Parameters
+        ----------
+        in_lat : np.ndarray, list, or float
+            Input latitude in degrees N
+        in_lon : np.ndarray, list, or float
+            Input longitude in degrees E
+        height : np.ndarray, list, or float
+            Altitude above the surface of the earth in km
+        max_error : float or NoneType
+            Maximum cell error in degrees for which locations are
+            interpolated, or None to use `max_error` (default=None)
+
+        Returns
+        -------
+        out_lat : np.ndarray
+            Output latitudes in degrees N
+        out_lon : np.ndarray
+            Output longitudes in degrees E
+        out_r : np.ndarray
+            Geocentric radial distance (R_Earth) or altitude above the surface
+            of the Earth (km)
+        good : np.ndarray
+            True for locations that were interpolated, the output of other
+            locations is NaN
+
+        """
+        if max_error is None:
+            max_error = self.max_error
+
+        in_arrs = list(np.broadcast_arrays(*[
+            np.atleast_1d(np.asarray(arr, dtype=np.float64))
+            for arr in [in_lat, in_lon, height]]))
+        shape = in_arrs[0].shape
+
+        # Wrap the longitudes into the grid, then find the cells
+        lon_start = self._grid[1][0]
+        in_arrs[1] = (in_arrs[1] - lon_start) % 360.0 + lon_start
+
+        good = np.ones(shape=shape, dtype=bool)
+        index = list()
+        frac = list()
+        for in_arr, (start, step, num) in zip(in_arrs, self._grid):
+            pos = (in_arr - start) / step
+            good &= (pos >= 0.0) & (pos <= num - 1)
+            icell = np.clip(np.floor(np.nan_to_num(pos)), 0, num - 2).astype(
+                np.intp)
+            index.append(icell)
+            frac.append(pos - icell)
+
+        good &= self.cell_error[tuple(index)] <= max_error
+
+        # Interpolate the good locations
+        values = np.full(shape=shape + (4,), fill_value=np.nan,
+                         dtype=np.float64)
+        index = [icell[good] for icell in index]
+        frac = [ff[good][:, np.newaxis] for ff in frac]
+        gvals = np.zeros(shape=(len(index[0]), 4), dtype=np.float64)
+        for corner in range(8):
+            weight = np.ones(shape=(len(index[0]), 1), dtype=np.float64)
+            corner_index = list()
+            for iaxis in range(3):
+                upper = (corner >> iaxis) & 1
+                weight *= frac[iaxis] if upper else 1.0 - frac[iaxis]
+                corner_index.append(index[iaxis] + upper)
+            gvals += weight * self.values[tuple(corner_index)]
+        values[good] = gvals
+
+        return _from_vector(values) + (good,)
+
+    def convert_latlon_arr(self, in_lat, in_lon, height, max_error=None,
+                           max_workers=None):
+        """Convert locations using the table, tracing those outside it.
+
+        Parameters
+        ----------
+        in_lat : np.ndarray, list, or float
+            Input latitude in degrees N (`method_code` specifies type of
+            latitude)
+        in_lon : np.ndarray, list, or float
+            Input longitude in degrees E (`method_code` specifies type of
+            longitude)
+        height : np.ndarray, list, or float
+            Altitude above the surface of the earth in km
+        max_error : float or NoneType
+            Maximum cell error in degrees for which locations are
+            interpolated, or None to use `max_error` (default=None)
+        max_workers : int or NoneType
+            Number of threads used to trace the remaining locations, see
+            `aacgmv2.convert_latlon_arr` (default=None)
+
+        Returns
+        -------
+        out_lat : np.ndarray
+            Output latitudes in degrees N
+        out_lon : np.ndarray
+            Output longitudes in degrees E
+        out_r : np.ndarray
+            Geocentric radial distance (R_Earth) or altitude above the surface
+            of the Earth (km)
+
+        Notes
+        -----
+        Locations outside the grid, in cells with an error estimate above
+        `max_error`, or in cells touching the forbidden region are traced at
+        the table time with `aacgmv2.convert_latlon_arr`.
+
+        """
+        out_lat, out_lon, out_r, good = self.interpolate(in_lat, in_lon,
+                                                         height, max_error)
+
+        if not good.all():
+            in_arrs = np.broadcast_arrays(*[
+                np.atleast_1d(np.asarray(arr, dtype=np.float64))
+                for arr in [in_lat, in_lon, height]])
+            trace_out = wrapper.convert_latlon_arr(
+                *[arr[~good] for arr in in_arrs], self.dtime,
+                self.method_code, max_workers=max_workers)
+            for out_arr, trace_arr in zip([out_lat, out_lon, out_r],
+                                          trace_out):
+                out_arr[~good] = trace_arr
+
+        return out_lat, out_lon, out_r
+
+
+def build_trace_table(dtime, lat, lon, alt, method_code="G2A", max_error=0.01,
+                      max_workers=None, coeff_prefix=None, igrf_file=None):
+    """Trace conversions on a grid to build a lookup table.
+
+    Parameters
+    ----------
+    dtime : dt.datetime
+        Date and time of the magnetic field model, to the nearest whole second
+        below
+    lat : array-like
+        Increasing, evenly spaced grid latitudes in degrees N, at least three
+        values as for the other grids
+    lon : array-like
+        Increasing, evenly spaced grid longitudes in degrees E.  A grid that
+        spans 360 degrees covers all longitudes.
+    alt : array-like
+        Increasing, evenly spaced grid altitudes in km
+    method_code : int or str
+        Bit code or string denoting the conversion, see
+        `aacgmv2.convert_latlon_arr`.  The TRACE bit is always added.
+        (default="G2A")
+    max_error : float
+        Default maximum cell error in degrees for which locations are
+        interpolated (default=0.01)
+    max_workers : int or NoneType
+        Number of threads used to trace the grid, see
+        `aacgmv2.convert_latlon_arr` (default=None)
+    coeff_prefix : str or NoneType
+        Location and file prefix for AACGM coefficient files, or None to use
+        aacgmv2.AACGM_v2_DAT_PREFIX (default=None)
+    igrf_file : str or NoneType
+        Full filename of IGRF coefficient file, or None to use
+        aacgmv2.IGRF_COEFFS (default=None)
+
+    Returns
+    -------
+    table : TraceTable
+        Lookup table
+
+    Raises
+    ------
+    ValueError
+        If a grid or the method code is incorrect.
+    RuntimeError
+        If unable to set the AACGMV2 datetime.
+
+    Notes
+    -----
+    The grid points and the cell centres are traced, so that building a table
+    costs about twice as many traces as it has grid points.  The traces are
+    run by a separate `aacgmv2.Converter`, and `max_workers` threads trace
+    concurrently.
+
+    """
+    dtime = wrapper.test_time(dtime).replace(microsecond=0)
+    grid = [_grid_axis(values, name) for values, name in [
+        (lat, "latitude"), (lon, "longitude"), (alt, "altitude")]]
+
+    try:
+        bit_code = wrapper.convert_str_to_bit(method_code.upper())
+    except AttributeError:
+        bit_code = method_code
+
+    if not isinstance(bit_code, int):
+        raise ValueError("unknown method code {:}".format(method_code))
+    bit_code = (bit_code | aacgmv2._aacgmv2.TRACE) & ~(
+        aacgmv2._aacgmv2.ALLOWTRACE | aacgmv2._aacgmv2.BADIDEA)
+
+    # Trace the grid points and the cell centres
+    conv = wrapper.Converter(dtime, coeff_prefix=coeff_prefix,
+                             igrf_file=igrf_file)
+    axes = [start + step * np.arange(num) for start, step, num in grid]
+    values = _to_vector(*conv.convert_latlon_arr(
+        *np.meshgrid(*axes, indexing="ij"), bit_code,
+        max_workers=max_workers))
+    centres = _to_vector(*conv.convert_latlon_arr(
+        *np.meshgrid(*[axis[:-1] + 0.5 * (axis[1] - axis[0])
+                       for axis in axes], indexing="ij"), bit_code,
+        max_workers=max_workers))
+
+    return TraceTable(dtime, grid, values, _cell_error(values, centres),
+                      bit_code, max_error=max_error)
+
+
+def write_trace_table(table, filename):
+    """Write a lookup table to a file.
+
+    Parameters
+    ----------
+    table : TraceTable
+        Lookup table
+    filename : str
+        Output filename
+
+    Returns
+    -------
+    filename : str
+        Output filename
+
+    """
+    values = np.ascontiguousarray(table.values, dtype='<f8')
+    cell_error = np.ascontiguousarray(table.cell_error, dtype='<f8')
+    crc = zlib.crc32(cell_error.tobytes(), zlib.crc32(values.tobytes()))
+    seconds = int((table.dtime - _EPOCH).total_seconds())
+    header = _HEADER.pack(TABLE_MAGIC, TABLE_VERSION, _HEADER.size,
+                          table.method_code, crc, seconds, table.max_error,
+                          *[val for axis in table._grid for val in axis[:2]],
+                          *[axis[2] for axis in table._grid])
+
+    # Write to a temporary file first, so that a table that is in use is
+    # replaced rather than modified
+    tmp_file = "{:}.{:d}.tmp".format(filename, os.getpid())
+    with open(tmp_file, "wb") as fout:
+        fout.write(header)
+        fout.write(values.tobytes())
+        fout.write(cell_error.tobytes())
+    os.replace(tmp_file, filename)
+
+    return filename
+
+
+def read_trace_table(filename, verify=True):
+    """Read a lookup table from a file.
+
+    Parameters
+    ----------
+    filename : str
+        Trace table filename
+    verify : bool
+        If True, test the checksum of the table, which reads the whole file
+        (default=True)
+
+    Returns
+    -------
+    table : TraceTable
+        Lookup table with read-only, memory-mapped values
+
+    Raises
+    ------
+    ValueError
+        If the file is not a valid trace table or the checksum fails.
+
+    """
+    with open(filename, "rb") as fin:
+        header = fin.read(_HEADER.size)
+
+    if len(header) != _HEADER.size:
+        raise ValueError("file too short for a trace table")
+
+    (magic, version, header_size, method_code, crc, seconds, max_error,
+     *grid) = _HEADER.unpack(header)
+    if magic != TABLE_MAGIC or version != TABLE_VERSION:
+        raise ValueError("not a version {:d} trace table".format(
+            TABLE_VERSION))
+
+    grid = [(grid[2 * i], grid[2 * i + 1], grid[6 + i]) for i in range(3)]
+    shape = tuple(axis[2] for axis in grid)
+    cell_shape = tuple(num - 1 for num in shape)
+    nvalues = int(np.prod(shape)) * 4
+    if os.path.getsize(filename) != header_size + 8 * (
+            nvalues + int(np.prod(cell_shape))):
+        raise ValueError("unexpected trace table size")
+
+    values = np.memmap(filename, dtype='<f8', mode='r', offset=header_size,
+                       shape=shape + (4,))
+    cell_error = np.memmap(filename, dtype='<f8', mode='r',
+                           offset=header_size + 8 * nvalues, shape=cell_shape)
+
+    if verify and zlib.crc32(cell_error.tobytes(),
+                             zlib.crc32(values.tobytes())) != crc:
+        raise ValueError("checksum mismatch for trace table")
+
+    return TraceTable(_EPOCH + dt.timedelta(seconds=seconds), grid, values,
+                      cell_error, method_code, max_error=max_error)
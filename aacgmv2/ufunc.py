@@ -0,0 +1,50 @@
+# Copyright (C) 2019 NRL
+# Author: Angeline Burrell
+# Disclaimer: This code is under the MIT license, whose details can be found at
+# the root in the LICENSE file
+#
+# -*- coding: utf-8 -*-
+"""NumPy universal functions for AACGM-V2 conversions.
+
+Attributes
+----------
+g2a : np.ufunc
+    Convert geographic/detic to AACGM-V2 coordinates, called as
+    ``g2a(lat, lon, height, time, code)`` and returning the latitude,
+    longitude, and geocentric radial distance
+a2g : np.ufunc
+    Convert AACGM-V2 to geographic/detic coordinates, called as
+    ``a2g(lat, lon, height, time, code)`` and returning the latitude,
+    longitude, and altitude
+g2a_iter : np.ufunc
+    As `g2a`, also returning the number of field-line tracing iterations (RK45
+    steps and bisection steps) of each location, or 0 for locations converted
+    with the coefficients
+a2g_iter : np.ufunc
+    As `a2g`, also returning the number of field-line tracing iterations
+mlt : np.ufunc
+    Convert AACGM-V2 longitude to magnetic local time, called as
+    ``mlt(mlon, time)``
+inv_mlt : np.ufunc
+    Convert magnetic local time to AACGM-V2 longitude, called as
+    ``inv_mlt(mlt, time)``
+
+Notes
+-----
+Times are Universal Time in seconds since 1970-01-01 00:00:00, and `code` is
+the bit code described in `aacgmv2.convert_str_to_bit`.  As ufuncs, these
+support broadcasting, multi-dimensional and non-contiguous input, and the
+`out` and `where` keywords.  Locations that cannot be converted are NaN.
+
+The C library holds a single model time, so these hold the model lock used by
+`aacgmv2.wrapper` while converting.  Calls from several threads at once, with
+different times, are serialized rather than interleaved.
+
+"""
+
+from aacgmv2._aacgmv2 import a2g  # noqa F401
+from aacgmv2._aacgmv2 import a2g_iter  # noqa F401
+from aacgmv2._aacgmv2 import g2a  # noqa F401
+from aacgmv2._aacgmv2 import g2a_iter  # noqa F401
+from aacgmv2._aacgmv2 import inv_mlt  # noqa F401
+from aacgmv2._aacgmv2 import mlt  # noqa F401
@@ -6,14 +6,165 @@
 # -*- coding: utf-8 -*-
 """Pythonic wrappers for AACGM-V2 C functions."""
 
+from concurrent import futures
+import contextlib
 import datetime as dt
+import json
 import numpy as np
 import os
+import sys
+import threading
+import time
+import tracemalloc
 
 import aacgmv2
 import aacgmv2._aacgmv2 as c_aacgmv2
+from aacgmv2 import coeff_store, numpy_engine
 from aacgmv2._aacgmv2 import TRACE, ALLOWTRACE, BADIDEA
 
+# Set the coefficient environment variables, if imported directly
+aacgmv2._set_environ()
+
+# The default C model holds a single model time, so setting the time and
+# performing the conversion must not be interleaved between threads.  The
+# lock is shared with the public ufuncs, which hold it while converting
+_model_lock = c_aacgmv2.model_lock
+
+# The coefficients for the next 5-year epoch are loaded by a background thread
+# when the model time approaches the end of its epoch
+_prefetch_lock = threading.Lock()
+_prefetch_pool = None
+_prefetch_jobs = dict()
+
+# Converters of a worker process used by `convert_latlon_arr(workers=N)`,
+# keyed by their coefficient files, and the largest number of locations sent
+# to a worker at once
+_worker_state = dict()
+_SHARD_SIZE = 10000
+
+# Smallest number of distinct times, and of distinct times per minute of the
+# time span, for which `convert_mlt` interpolates the MLT reference longitude
+_MLT_DENSE = 1000
+
+# Stage profile recorded by the array functions, set by `profile`
+_profile = None
+
+
+@contextlib.contextmanager
+def _use_model(model):
+    """Select the C model state used by conversions in the calling thread.
+
+    Parameters
+    ----------
+    model : PyCapsule or NoneType
+        Model state from `c_aacgmv2.new_model`, or None for the default model
+
+    """
+    if model is None:
+        yield
+    else:
+        c_aacgmv2.set_model(model)
+        try:
+            yield
+        finally:
+            c_aacgmv2.set_model(None)
+
+
+def _convert_chunk(model, ufunc, *args, **kwargs):
+    """Call a conversion ufunc using the desired C model state.
+
+    Parameters
+    ----------
+    model : PyCapsule or NoneType
+        Model state from `c_aacgmv2.new_model`, or None for the default model
+    ufunc : np.ufunc
+        Conversion ufunc
+    *args, **kwargs
+        Arguments and keyword arguments for `ufunc`
+
+    """
+    with _use_model(model):
+        ufunc(*args, **kwargs)
+
+
+def _prefetch_epoch(model, lock, year, fname):
+    """Load the coefficients for a 5-year epoch into the model cache.
+
+    Parameters
+    ----------
+    model : PyCapsule or NoneType
+        Model state from `c_aacgmv2.new_model`, or None for the default model
+    lock : threading.RLock
+        Lock serializing the use of `model`
+    year : int
+        Epoch year
+    fname : str or NoneType
+        ASCII coefficient file from `c_aacgmv2.stage_file`, or None if the
+        epoch does not need to be read from a file
+
+    Returns
+    -------
+    cached : bool
+        True if the epoch is cached, False if it could not be loaded
+
+    Notes
+    -----
+    The coefficient file is read into a staging buffer without holding `lock`,
+    so conversions continue while it is read.  The lock is only held to put
+    the staged coefficients into the model cache.
+
+    """
+    staged = None if fname is None else c_aacgmv2.load_coeffs(fname)
+
+    with lock, _use_model(model):
+        return c_aacgmv2.prefetch(year, staged)
+
+
+def _prefetch_next(model, lock):
+    """Prefetch the next 5-year epoch in the background, if needed.
+
+    Parameters
+    ----------
+    model : PyCapsule or NoneType
+        Model state from `c_aacgmv2.new_model`, or None for the default model
+    lock : threading.RLock
+        Lock serializing the use of `model`
+
+    Returns
+    -------
+    job : concurrent.futures.Future or NoneType
+        Prefetch job, or None if the model time is not close to the end of its
+        epoch or the next epoch is already cached
+
+    Notes
+    -----
+    Must be called with `lock` held and `model` selected, after setting the
+    model time.
+
+    """
+    global _prefetch_pool
+
+    year = c_aacgmv2.next_epoch()
+    if year == 0:
+        return None
+
+    fname = c_aacgmv2.stage_file(year)
+
+    with _prefetch_lock:
+        for key in [key for key, job in _prefetch_jobs.items() if job.done()]:
+            del _prefetch_jobs[key]
+
+        key = (id(model), year)
+        if key not in _prefetch_jobs:
+            if _prefetch_pool is None:
+                _prefetch_pool = futures.ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="aacgmv2-prefetch")
+            _prefetch_jobs[key] = _prefetch_pool.submit(_prefetch_epoch,
+                                                        model, lock, year,
+                                                        fname)
+
+        return _prefetch_jobs[key]
+
 
 def test_time(dtime):
     """Test the time input and ensure it is a dt.datetime object.
@@ -31,9 +182,12 @@ def test_time(dtime):
     Raises
     ------
     ValueError
-        If time is not a dt.date or dt.datetime object
+        If time is not a dt.date, dt.datetime, or np.datetime64 object
 
     """
+    if isinstance(dtime, np.datetime64) and not np.isnat(dtime):
+        dtime = dtime.astype('datetime64[us]').astype(dt.datetime)
+
     if isinstance(dtime, dt.date):
         # Because datetime objects identify as both dt.date and dt.datetime,
         # you need an extra test here to ensure you don't lose the time
@@ -46,6 +200,112 @@ def test_time(dtime):
     return dtime
 
 
+def _time_to_epoch(dtime):
+    """Cast time input as seconds since 1970.
+
+    Parameters
+    ----------
+    dtime : any
+        Single time, or an array of datetime objects, np.datetime64 values, or
+        float seconds since 1970
+
+    Returns
+    -------
+    epoch : float or np.ndarray
+        Seconds since 1970, as a float for a single datetime and an array with
+        the shape of `dtime` otherwise.  Not-a-time values are returned as NaN.
+
+    Raises
+    ------
+    ValueError
+        If the input is not a time or an array of times
+
+    """
+    try:
+        return (test_time(dtime) - dt.datetime(1970, 1, 1)).total_seconds()
+    except ValueError as verr:
+        times = np.asarray(dtime)
+        if times.dtype.kind == 'f':
+            return times.astype(np.float64)
+
+        if times.dtype.kind == 'O' and times.shape != () and all(
+                [isinstance(tt, dt.date) for tt in times.ravel()]):
+            times = times.astype('datetime64[us]')
+
+        if times.dtype.kind != 'M':
+            raise ValueError(verr)
+
+    epoch = (times.astype('datetime64[us]') - np.datetime64(0, 'us')) \
+        / np.timedelta64(1, 's')
+    return np.where(np.isnat(times), np.nan, epoch)
+
+
+def group_times(dtime, shape, time_res=None):
+    """Group locations by the model time needed to convert them.
+
+    Parameters
+    ----------
+    dtime : dt.datetime, np.datetime64, float, or array-like
+        Single time for all locations or one time per location, as datetime
+        objects, np.datetime64 values, or float seconds since 1970
+    shape : int or tuple
+        Number of locations or shape of the location arrays
+    time_res : dt.timedelta, np.timedelta64, int, or NoneType
+        Resolution (in seconds, if an integer) to which the times are rounded
+        before grouping, or None to group by whole seconds (default=None)
+
+    Returns
+    -------
+    times : list
+        Distinct model times as dt.datetime objects, in increasing order
+    bounds : np.ndarray
+        Indices bounding each group, so that the locations for `times[i]` are
+        found between `bounds[i]` and `bounds[i + 1]` in the sorted order
+    order : np.ndarray or NoneType
+        Indices that sort the flattened locations by time, or None if the
+        locations are already sorted
+
+    Raises
+    ------
+    ValueError
+        If the times are not datetimes, do not match the number of locations,
+        or the time resolution is less than a second
+
+    """
+    epoch = np.floor(_time_to_epoch(dtime))
+    if epoch.shape == ():
+        epoch = epoch.reshape(1)
+    elif epoch.shape != tuple(np.atleast_1d(shape)):
+        raise ValueError("array input for datetime and locations must match")
+
+    if not np.all(np.isfinite(epoch)):
+        raise ValueError('time variable (dtime) must be a datetime object')
+
+    times = epoch.ravel().astype(np.int64).astype('datetime64[s]')
+
+    # Round the times to the desired resolution
+    if time_res is not None:
+        res = np.timedelta64(time_res, 's').astype(np.int64)
+        if res < 1:
+            raise ValueError('time resolution must be at least one second')
+
+        times = ((times.astype(np.int64) + res // 2) // res
+                 * res).astype('datetime64[s]')
+
+    # Identify the distinct times and the order needed to group locations
+    if len(times) == 1:
+        bounds = np.array([0, np.prod(shape, dtype=int)])
+        order = None
+    else:
+        times, inverse, counts = np.unique(times, return_inverse=True,
+                                           return_counts=True)
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        order = None if np.all(inverse[1:] >= inverse[:-1]) else np.argsort(
+            inverse, kind='stable')
+
+    return list(times.astype(dt.datetime)), bounds, order
+
+
 def test_height(height, bit_code):
     """Test the input height and ensure it is appropriate for the method.
 
@@ -147,6 +407,427 @@ def set_coeff_path(igrf_file=False, coeff_prefix=False):
     return
 
 
+def _aacgm_coeff_arrays(aacgm_coeffs):
+    """Get the AACGM coefficients set from memory as arrays for the C library.
+
+    Parameters
+    ----------
+    aacgm_coeffs : bytes-like or tuple
+        See `set_coeffs`
+
+    Returns
+    -------
+    first_epoch : int
+        Year of the first 5-year epoch
+    coeffs : np.ndarray
+        Contiguous, flattened float64 coefficients
+
+    Raises
+    ------
+    ValueError
+        If the coefficients are not a valid coefficient store, do not have
+        the expected shape, or are not for consecutive 5-year epochs.
+
+    """
+    if isinstance(aacgm_coeffs, tuple):
+        epochs, coeffs = aacgm_coeffs
+    else:
+        epochs, coeffs = coeff_store.unpack_coeff_store(aacgm_coeffs)
+
+    epochs = np.asarray(epochs, dtype=int).reshape(-1)
+    coeffs = np.ascontiguousarray(coeffs, dtype=np.float64)
+    shape = (len(epochs),) + coeff_store.EPOCH_SHAPE
+    if coeffs.shape != shape:
+        raise ValueError("AACGM coefficients must have shape {:}, got "
+                         "{:}".format(shape, coeffs.shape))
+
+    if len(epochs) == 0 or epochs[0] % 5 != 0 or np.any(
+            epochs != epochs[0] + 5 * np.arange(len(epochs))):
+        raise ValueError("AACGM coefficients must be for consecutive 5-year "
+                         "epochs")
+
+    return int(epochs[0]), coeffs.reshape(-1)
+
+
+def _igrf_coeff_arrays(igrf_coeffs):
+    """Get the IGRF coefficients set from memory as arrays for the C library.
+
+    Parameters
+    ----------
+    igrf_coeffs : str, bytes-like, or tuple
+        See `set_coeffs`
+
+    Returns
+    -------
+    coeffs : np.ndarray
+        Contiguous, flattened float64 coefficients
+    sv : np.ndarray or NoneType
+        Contiguous float64 secular variation, or None for none
+
+    Raises
+    ------
+    ValueError
+        If the coefficients are not an IGRF coefficient file, do not have the
+        expected shape, or are not for the expected epochs.
+
+    """
+    if isinstance(igrf_coeffs, tuple):
+        epochs, coeffs, sv = igrf_coeffs
+    elif isinstance(igrf_coeffs, str):
+        epochs, coeffs, sv = coeff_store.parse_igrf_coeffs(igrf_coeffs)
+    else:
+        epochs, coeffs, sv = coeff_store.parse_igrf_coeffs(bytes(igrf_coeffs))
+
+    # The C library interpolates the IGRF coefficients for fixed epochs
+    good_epochs = np.arange(c_aacgmv2.IGRF_FIRST_EPOCH,
+                            c_aacgmv2.IGRF_LAST_EPOCH + 1, 5)
+    epochs = np.asarray(epochs, dtype=int).reshape(-1)
+    if not np.array_equal(epochs, good_epochs):
+        raise ValueError("IGRF coefficients must be for the 5-year epochs "
+                         "from {:d} to {:d}".format(good_epochs[0],
+                                                    good_epochs[-1]))
+
+    coeffs = np.ascontiguousarray(coeffs, dtype=np.float64)
+    if coeffs.shape != (len(epochs), c_aacgmv2.IGRF_MAXK):
+        raise ValueError("IGRF coefficients must have shape {:}, got "
+                         "{:}".format((len(epochs), c_aacgmv2.IGRF_MAXK),
+                                      coeffs.shape))
+
+    if sv is not None:
+        sv = np.ascontiguousarray(sv, dtype=np.float64)
+        if sv.shape != (c_aacgmv2.IGRF_MAXK,):
+            raise ValueError("IGRF secular variation must have shape "
+                             "{:}, got {:}".format((c_aacgmv2.IGRF_MAXK,),
+                                                   sv.shape))
+
+    return coeffs.reshape(-1), sv
+
+
+def _set_coeffs(model, lock, aacgm_coeffs=False, igrf_coeffs=False):
+    """Set the coefficients of a C model state from memory.
+
+    Parameters
+    ----------
+    model : PyCapsule or NoneType
+        Model state from `c_aacgmv2.new_model`, or None for the default model
+    lock : threading.RLock
+        Lock that serializes access to the model state
+    aacgm_coeffs, igrf_coeffs
+        See `set_coeffs`
+
+    """
+    # Test all of the coefficients before changing the model
+    if aacgm_coeffs is not False and aacgm_coeffs is not None:
+        aacgm_coeffs = _aacgm_coeff_arrays(aacgm_coeffs)
+    if igrf_coeffs is not False and igrf_coeffs is not None:
+        igrf_coeffs = _igrf_coeff_arrays(igrf_coeffs)
+
+    with lock, _use_model(model):
+        if aacgm_coeffs is None:
+            c_aacgmv2.set_coeffs(0, None)
+        elif aacgm_coeffs is not False:
+            c_aacgmv2.set_coeffs(*aacgm_coeffs)
+
+        if igrf_coeffs is None:
+            c_aacgmv2.set_igrf_coeffs(None, None)
+        elif igrf_coeffs is not False:
+            c_aacgmv2.set_igrf_coeffs(*igrf_coeffs)
+
+    return
+
+
+def set_coeffs(aacgm_coeffs=False, igrf_coeffs=False):
+    """Set the coefficients of the default model from memory.
+
+    Parameters
+    ----------
+    aacgm_coeffs : bytes-like, tuple, NoneType, or bool
+        Contents of an AACGM coefficient store, a tuple of the epoch years and
+        the coefficients with shape (epoch,) + `coeff_store.EPOCH_SHAPE` for
+        consecutive 5-year epochs (as returned by
+        `coeff_store.read_coeff_files`), None to read the coefficient files
+        again, or False to leave as is (default=False)
+    igrf_coeffs : str, bytes-like, tuple, NoneType, or bool
+        Contents of an IGRF coefficient file, a tuple of the epoch years, the
+        coefficients, and the secular variation (as returned by
+        `coeff_store.parse_igrf_coeffs`), None to read the IGRF coefficient
+        file again, or False to leave as is (default=False)
+
+    Raises
+    ------
+    ValueError
+        If the coefficients do not have the expected shape or epochs, or are
+        not a valid coefficient store or IGRF coefficient file.
+
+    Notes
+    -----
+    The coefficients are copied, and the coefficient files are not read while
+    they are set, so conversions outside of the given AACGM epochs fail.  Each
+    `Converter` may hold other coefficients, so that several model versions
+    stay resident at once.  The 'numpy' engine and worker processes of
+    `convert_latlon_arr` read the coefficient files, and so may not be used
+    with coefficients set from memory.
+
+    """
+    _set_coeffs(None, _model_lock, aacgm_coeffs, igrf_coeffs)
+
+    return
+
+
+def set_cache_size(size=None):
+    """Set the number of 5-year coefficient epochs cached by the default model.
+
+    Parameters
+    ----------
+    size : int or NoneType
+        Maximum number of cached epochs, at least 2, or None for the default
+        of 4 (default=None)
+
+    Raises
+    ------
+    ValueError
+        If the size is out of range.
+
+    Notes
+    -----
+    When the model time moves to another epoch, the least recently used
+    epochs are evicted first.  Jobs that repeatedly jump between several
+    decades may be sped up by a larger cache, at ~30 kB per epoch.
+
+    """
+    with _model_lock:
+        c_aacgmv2.set_cache_size(0 if size is None else size)
+
+    return
+
+
+def get_cache_stats():
+    """Get the coefficient cache counters of the default model.
+
+    Returns
+    -------
+    stats : dict
+        Number of epochs found in the cache ('hits') and not found ('misses'),
+        number read from the coefficient files ('loads', including
+        prefetches), number currently cached ('cached'), and the cache
+        capacity ('size')
+
+    """
+    with _model_lock:
+        return c_aacgmv2.cache_stats()
+
+
+def stats(reset=False):
+    """Get the performance counters and timers of the C library.
+
+    Parameters
+    ----------
+    reset : bool
+        If True, set the counters and timers to zero after reading them
+        (default=False)
+
+    Returns
+    -------
+    stats : dict
+        Number of coefficient loads ('coef_loads'), time interpolations of the
+        coefficients ('time_interps'), height interpolations of the
+        coefficients ('height_interps'), MLT reference longitude calculations
+        ('mlon_refs'), traced field lines ('traces'), adaptive RK45 steps
+        ('trace_steps'), and bisection steps ('trace_bisections'), with the
+        cumulative wall time of each stage in seconds ('coef_load_time',
+        'time_interp_time', 'height_interp_time', 'mlon_ref_time', and
+        'trace_time')
+
+    Notes
+    -----
+    The counters are kept by each thread of this process and summed, so they
+    include the threads used by `max_workers` but not the worker processes
+    used by `workers`.  The timers of nested stages overlap, e.g., the MLT
+    reference longitude time includes any coefficient interpolation it needs.
+
+    See Also
+    --------
+    convert_latlon_arr : `trace_iter` gives the tracing iterations of each
+        location
+
+    """
+    with _model_lock:
+        out = c_aacgmv2.stats()
+        if reset:
+            c_aacgmv2.reset_stats()
+
+    return out
+
+
+@contextlib.contextmanager
+def model_time(dtime):
+    """Pin the date and time of the default model for a batch of conversions.
+
+    Parameters
+    ----------
+    dtime : dt.datetime
+        Date and time for the magnetic field model
+
+    Yields
+    ------
+    stats : dict
+        Number of MLT reference longitude calculations in the calling thread
+        that did not reset the model time ('avoided'), set when the block
+        exits
+
+    Raises
+    ------
+    RuntimeError
+        If unable to set the AACGMV2 datetime.
+
+    Notes
+    -----
+    By default, MLT conversions more than 30 days from the model time reset
+    it, re-interpolating the coefficients for the next location conversion.
+    Within the block the model time is locked, so that MLT conversions use
+    the coefficients for `dtime`.  The lock belongs to the default model, so
+    this also applies to MLT conversions in other threads, which are not
+    blocked while it is held.  Location conversions still convert at their
+    own time, after which MLT conversions return the model to `dtime`.
+    Reference longitudes more than 30 days from `dtime` are not used from the
+    cache after the block.
+
+    Examples
+    --------
+    ::
+
+        with aacgmv2.model_time(dt.datetime(2015, 1, 1)) as stats:
+            mlt = aacgmv2.convert_mlt(mlon, dtimes)
+
+    """
+    dtime = test_time(dtime)
+
+    # Pin the time with the C library lock, taking the model lock only while
+    # setting it, so that other threads may convert during the block
+    with _model_lock:
+        try:
+            c_aacgmv2.set_datetime(dtime.year, dtime.month, dtime.day,
+                                   dtime.hour, dtime.minute, dtime.second)
+        except (TypeError, RuntimeError) as err:
+            raise RuntimeError("cannot set time for {:}: {:}".format(dtime,
+                                                                     err))
+        _prefetch_next(None, _model_lock)
+
+        stats = {'avoided': 0}
+        avoided = c_aacgmv2.mlt_cache_stats()['avoided']
+        locked = c_aacgmv2.locked()
+        c_aacgmv2.lock()
+
+    try:
+        yield stats
+    finally:
+        with _model_lock:
+            if not locked:
+                c_aacgmv2.unlock()
+        stats['avoided'] = c_aacgmv2.mlt_cache_stats()['avoided'] - avoided
+
+
+def warmup(times=None, trace=True):
+    """Load the model data used by conversions ahead of time.
+
+    Parameters
+    ----------
+    times : dt.datetime, np.datetime64, float, array-like, or NoneType
+        Time or times (as in `convert_latlon_arr`) whose 5-year coefficient
+        epochs are loaded, or None for the current UT (default=None)
+    trace : bool
+        If True, also load the IGRF coefficients by tracing one field line
+        at each epoch (default=True)
+
+    Returns
+    -------
+    epochs : list
+        First year of each 5-year coefficient epoch loaded
+
+    Notes
+    -----
+    Importing `aacgmv2` does not import the C extension or NumPy, and the
+    coefficients of an epoch are read when a conversion first needs them.
+    This converts one location and MLT at a time in each epoch, so that the
+    first calls of latency-sensitive work do not pay for importing modules
+    or reading coefficient files.  The cache of the default model is
+    enlarged to hold every epoch loaded (see `set_cache_size`).
+
+    """
+    if times is None:
+        times = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+
+    # Take the first time in each 5-year epoch
+    epoch = np.atleast_1d(_time_to_epoch(times)).ravel()
+    epoch = epoch[np.isfinite(epoch)]
+    years = np.array([_epoch_to_datetime(sec).year // 5 * 5
+                      for sec in np.floor(epoch)], dtype=int)
+    years, first = np.unique(years, return_index=True)
+
+    with _model_lock:
+        # Each epoch is interpolated between its own and the next epoch
+        size = np.union1d(years, years + 5).size
+        if size > c_aacgmv2.cache_stats()['size']:
+            c_aacgmv2.set_cache_size(int(size))
+
+        for sec in epoch[first]:
+            ctime = _epoch_to_datetime(np.floor(sec))
+            convert_latlon_arr([45.0], [0.0], [300.0], ctime,
+                               method_code="TRACE" if trace else "G2A")
+            convert_mlt([0.0], ctime)
+
+    return [int(year) for year in years]
+
+
+@contextlib.contextmanager
+def profile(memory=False):
+    """Record the time and allocations of the stages of the array functions.
+
+    Parameters
+    ----------
+    memory : bool
+        If True, also trace the bytes allocated in each stage using
+        `tracemalloc`, which slows the conversions down (default=False)
+
+    Yields
+    ------
+    prof : Profile
+        Stage profile, updated as the array functions in the block run
+
+    Notes
+    -----
+    The stages of `convert_latlon_arr` (including `Converter`
+    conversions), `get_aacgm_coord_arr`, and `convert_mlt` are recorded by
+    every thread while the block is active.  Outside of a block, these
+    functions only test whether a profile is active.  An inner block records
+    into its own profile, and the outer profile resumes when it exits.
+
+    Examples
+    --------
+    ::
+
+        with aacgmv2.profile() as prof:
+            aacgmv2.convert_latlon_arr(lat, lon, height, dtime)
+        print(prof.to_json(indent=1))
+
+    """
+    global _profile
+
+    prof = Profile(memory=memory)
+    trace = memory and not tracemalloc.is_tracing()
+    if trace:
+        tracemalloc.start()
+
+    outer = _profile
+    _profile = prof
+    try:
+        yield prof
+    finally:
+        _profile = outer
+        if trace:
+            tracemalloc.stop()
+
+
 def convert_latlon(in_lat, in_lon, height, dtime, method_code="G2A"):
     """Convert between geomagnetic coordinates and AACGM coordinates.
 
@@ -194,6 +875,28 @@ def convert_latlon(in_lat, in_lon, height, dtime, method_code="G2A"):
     RuntimeError
         If unable to set AACGMV2 datetime.
 
+    """
+    return _convert_latlon(in_lat, in_lon, height, dtime, method_code, None,
+                           _model_lock)
+
+
+def _convert_latlon(in_lat, in_lon, height, dtime, method_code, model, lock):
+    """Convert a single location using the desired C model state.
+
+    Parameters
+    ----------
+    in_lat, in_lon, height, dtime, method_code
+        See `convert_latlon`
+    model : PyCapsule or NoneType
+        Model state from `c_aacgmv2.new_model`, or None for the default model
+    lock : threading.RLock
+        Lock that serializes access to the model state
+
+    Returns
+    -------
+    out_lat, out_lon, out_r : float
+        See `convert_latlon`
+
     """
     # Test time
     dtime = test_time(dtime)
@@ -227,32 +930,38 @@ def convert_latlon(in_lat, in_lon, height, dtime, method_code="G2A"):
     # Constrain longitudes between -180 and 180
     in_lon = ((in_lon + 180.0) % 360.0) - 180.0
 
-    # Set current date and time
-    try:
-        c_aacgmv2.set_datetime(dtime.year, dtime.month, dtime.day, dtime.hour,
-                               dtime.minute, dtime.second)
-    except (TypeError, RuntimeError) as err:
-        raise RuntimeError("cannot set time for {:}: {:}".format(dtime, err))
-
-    # convert location
-    try:
-        # One or all of the inputs may be a numpy array-like object, cast them
-        # all and extract the value to be sure
-        lat_out, lon_out, r_out = c_aacgmv2.convert(
-            np.asarray(in_lat).item(), np.asarray(in_lon).item(),
-            np.asarray(height).item(), bit_code)
-    except Exception as err:
-        estr = "".join(["unable to perform conversion at {:}".format(in_lat),
-                        ", {:} {:} km, {:}".format(in_lon, height, dtime),
-                        " using method {:} <{:}>. Recall".format(bit_code, err),
-                        " that AACGMV2 is undefined near the equator."])
-        aacgmv2.logger.warning(estr)
-        pass
+    with lock, _use_model(model):
+        # Set current date and time
+        try:
+            c_aacgmv2.set_datetime(dtime.year, dtime.month, dtime.day,
+                                   dtime.hour, dtime.minute, dtime.second)
+        except (TypeError, RuntimeError) as err:
+            raise RuntimeError("cannot set time for {:}: {:}".format(dtime,
+                                                                     err))
+        _prefetch_next(model, lock)
+
+        # convert location
+        try:
+            # One or all of the inputs may be a numpy array-like object, cast
+            # them all and extract the value to be sure
+            lat_out, lon_out, r_out = c_aacgmv2.convert(
+                np.asarray(in_lat).item(), np.asarray(in_lon).item(),
+                np.asarray(height).item(), bit_code)
+        except Exception as err:
+            estr = "".join(["unable to perform conversion at {:}".format(
+                in_lat), ", {:} {:} km, {:}".format(in_lon, height, dtime),
+                " using method {:} <{:}>. Recall".format(bit_code, err),
+                " that AACGMV2 is undefined near the equator."])
+            aacgmv2.logger.warning(estr)
+            pass
 
     return lat_out, lon_out, r_out
 
 
-def convert_latlon_arr(in_lat, in_lon, height, dtime, method_code="G2A"):
+def convert_latlon_arr(in_lat, in_lon, height, dtime, method_code="G2A",
+                       out=None, max_workers=None, time_res=None,
+                       sort_height=False, engine="batch", workers=None,
+                       trace_iter=None):
     """Convert between geomagnetic coordinates and AACGM coordinates.
 
     Parameters
@@ -263,8 +972,10 @@ def convert_latlon_arr(in_lat, in_lon, height, dtime, method_code="G2A"):
         Input longitude in degrees E (method_code specifies type of longitude)
     height : np.ndarray or list or float
         Altitude above the surface of the earth in km
-    dtime : dt.datetime
-        Single datetime object for magnetic field
+    dtime : dt.datetime, np.datetime64, float, or array-like
+        Single datetime object for magnetic field, or an array of datetime
+        objects, np.datetime64 values, or float seconds since 1970 with one
+        time per location
     method_code : int or str
         Bit code or string denoting which type(s) of conversion to perform
         (default="G2A")
@@ -281,6 +992,46 @@ def convert_latlon_arr(in_lat, in_lon, height, dtime, method_code="G2A"):
             Use coefficients above 2000 km
         GEOCENTRIC
             Assume inputs are geocentric w/ RE=6371.2
+    out : tuple, np.ndarray, or NoneType
+        Optional pre-allocated float64 output, either a tuple of three arrays
+        with the broadcast shape of the locations or a single array with an
+        additional last dimension of length three (e.g., shape (N, 3)). The
+        results are written into these arrays.  If None, new arrays are
+        allocated. (default=None)
+    max_workers : int or NoneType
+        Number of threads used to convert the locations.  If greater than one,
+        the input is split into contiguous chunks that are converted
+        concurrently and written to the output in order.  If None, the
+        conversion is performed in the calling thread. (default=None)
+    time_res : dt.timedelta, np.timedelta64, int, or NoneType
+        Resolution (in seconds, if an integer) to which the times are rounded
+        to set the magnetic field model, reducing the number of distinct model
+        times. If None, times are used to the nearest whole second below.
+        (default=None)
+    sort_height : bool
+        If True, the locations at each model time are converted in order of
+        height and returned in the original order, which speeds up inputs
+        that mix many heights (e.g., radar range gates or vertical profiles).
+        (default=False)
+    engine : str
+        Method used to evaluate the coefficients: 'batch' evaluates the
+        spherical harmonic expansion for batches of locations at once and
+        traces their field lines together,
+        'scalar' evaluates one location at a time, and 'numpy' uses the
+        `aacgmv2.numpy_engine` module instead of the C library.  Locations
+        that need field-line tracing are always converted by the C library.
+        (default='batch')
+    workers : int, WorkerPool, or NoneType
+        Number of worker processes used to convert the locations, or a
+        `WorkerPool` that is reused across calls.  If greater than one, the
+        locations are split into shards that are converted by a process pool
+        and written to the output in order.  If None, no worker processes are
+        used. (default=None)
+    trace_iter : np.ndarray or NoneType
+        Optional pre-allocated int64 array with the broadcast shape of the
+        locations, set to the number of field-line tracing iterations (RK45
+        steps and bisection steps) of each location, or 0 for locations
+        converted with the coefficients. (default=None)
 
     Returns
     -------
@@ -301,59 +1052,144 @@ def convert_latlon_arr(in_lat, in_lon, height, dtime, method_code="G2A"):
 
     Notes
     -----
-    At least one of in_lat, in_lon, and height must be a list or array.
+    At least one of in_lat, in_lon, and height must be a list or array.  The
+    inputs are broadcast against each other and may be multi-dimensional.
 
     If errors are encountered, NaN or Inf will be included in the input so
     that all successful calculations are returned.  To select only good values
     use a function like `np.isfinite`.
 
-    Multi-dimensional arrays are not allowed.
+    This is a thin layer over the `aacgmv2.ufunc.g2a` and `aacgmv2.ufunc.a2g`
+    ufuncs.  When `out` is supplied, the returned arrays are views of `out`.
+
+    When `dtime` holds one time per location, the locations are grouped by
+    time so that the magnetic field model is interpolated once for each
+    distinct time.  The output is returned in the original order.
+
+    The C routines release the GIL while converting, so using `max_workers`
+    scales with the number of available cores for large inputs.  Conversions
+    that need different times are serialized, as the default C model holds a
+    single model time.  Use `Converter` objects to hold several model times.
+    The 'numpy' engine does not use the C model state, so only locations that
+    need field-line tracing are serialized.
+
+    The 'batch' and 'scalar' engines trace field lines with the same steps,
+    but evaluate the IGRF field in a different order of operations, so their
+    traced outputs are not bit-for-bit identical.  G2A traces agree within
+    1e-5 degrees (typically 1e-7).  Nearly all A2G traces (over 99%) agree
+    within 1e-5 degrees, but the adaptive step size of the A2G trace changes
+    discontinuously, so a few locations may differ by up to the round-trip
+    error of the trace itself, a few hundredths of a degree.
+
+    Field-line tracing (e.g., `method_code="TRACE"`) costs far more than the
+    coefficients, and large tracing jobs may be split across processes with
+    `workers`.  Each worker process loads the coefficient files of the
+    default model (see `set_coeff_path`) once, and converts shards of up to
+    10000 locations.  An integer `workers` starts the processes for this call
+    only; pass a `WorkerPool` to keep them, and their coefficients, across
+    calls.  If a worker process dies, the shards it had not returned are
+    converted in the calling process instead, so that no locations are lost.
+    With the 'numpy' engine, only the locations that need tracing are sent to
+    the worker processes.
+
+    """
+    return _convert_latlon_arr(in_lat, in_lon, height, dtime, method_code,
+                               out, max_workers, time_res, sort_height, engine,
+                               None, _model_lock, workers=workers,
+                               trace_iter=trace_iter)
+
+
+def _convert_latlon_arr(in_lat, in_lon, height, dtime, method_code, out,
+                        max_workers, time_res, sort_height, engine, model,
+                        lock, coeff_prefix=None, igrf_file=None, workers=None,
+                        trace_iter=None):
+    """Convert an array of locations using the desired C model state.
+
+    Parameters
+    ----------
+    in_lat, in_lon, height, dtime, method_code, out, max_workers, time_res,
+    sort_height, engine, workers, trace_iter
+        See `convert_latlon_arr`
+    model : PyCapsule or NoneType
+        Model state from `c_aacgmv2.new_model`, or None for the default model
+    lock : threading.RLock
+        Lock that serializes access to the model state
+    coeff_prefix : str or NoneType
+        Coefficient file prefix used by the 'numpy' engine and the worker
+        processes, or None to use the AACGM_v2_DAT_PREFIX environment variable
+        (default=None)
+    igrf_file : str or NoneType
+        IGRF coefficient file used by the worker processes, or None to use the
+        IGRF_COEFFS environment variable (default=None)
+
+    Returns
+    -------
+    out_lat, out_lon, out_r : np.ndarray
+        See `convert_latlon_arr`
 
     """
+    # Time the stages of the conversion, if profiling
+    stages = None if _profile is None else _profile.start(
+        "convert_latlon_arr")
+
     # Recast the data as numpy arrays
-    in_lat = np.array(in_lat)
-    in_lon = np.array(in_lon)
-    height = np.array(height)
+    in_lat = np.asarray(in_lat, dtype=np.float64)
+    in_lon = np.asarray(in_lon, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
 
-    # If one or two of these elements is a float, int, or single element array,
-    # create an array equal to the length of the longest input
-    test_array = np.array([len(in_lat.shape), len(in_lon.shape),
-                           len(height.shape)])
+    if max([in_lat.ndim, in_lon.ndim, height.ndim]) == 0:
+        aacgmv2.logger.info("".join(["for a single location, consider ",
+                                     "using convert_latlon or ",
+                                     "get_aacgm_coord"]))
 
-    if test_array.max() > 1:
-        raise ValueError("unable to process multi-dimensional arrays")
-    else:
-        if test_array.max() == 0:
-            aacgmv2.logger.info("".join(["for a single location, consider ",
-                                         "using convert_latlon or ",
-                                         "get_aacgm_coord"]))
-            in_lat = np.array([in_lat])
-            in_lon = np.array([in_lon])
-            height = np.array([height])
-        else:
-            max_len = max([len(arr) for i, arr in enumerate([in_lat, in_lon,
-                                                             height])
-                           if test_array[i] > 0])
-
-            if not test_array[0] or (len(in_lat) == 1 and max_len > 1):
-                in_lat = np.full(shape=(max_len,), fill_value=in_lat)
-            if not test_array[1] or (len(in_lon) == 1 and max_len > 1):
-                in_lon = np.full(shape=(max_len,), fill_value=in_lon)
-            if not test_array[2] or (len(height) == 1 and max_len > 1):
-                height = np.full(shape=(max_len,), fill_value=height)
-
-    # Ensure that lat, lon, and height are the same length or if the lengths
-    # differ that the different ones contain only a single value
-    if not (in_lat.shape == in_lon.shape and in_lat.shape == height.shape):
+    # Ensure that lat, lon, and height may be broadcast to the same shape,
+    # treating single values as a single location
+    try:
+        shape = np.broadcast_shapes(in_lat.shape, in_lon.shape, height.shape,
+                                    (1,))
+    except ValueError:
         raise ValueError('lat, lon, and height arrays are mismatched')
 
-    # Test time
-    dtime = test_time(dtime)
+    if stages is not None:
+        stages.lap("recast")
+
+    # Test time and group the locations by the model time
+    times, time_bounds, order = group_times(dtime, shape, time_res)
+
+    if stages is not None:
+        stages.lap("group_times")
 
     # Initialise output
-    lat_out = np.full(shape=in_lat.shape, fill_value=np.nan)
-    lon_out = np.full(shape=in_lon.shape, fill_value=np.nan)
-    r_out = np.full(shape=height.shape, fill_value=np.nan)
+    if out is None:
+        out = [np.empty(shape=shape, dtype=np.float64) for i in range(3)]
+    else:
+        if isinstance(out, np.ndarray):
+            if out.shape != shape + (3,):
+                raise ValueError("output array must have shape {:}".format(
+                    shape + (3,)))
+            out = [out[..., i] for i in range(3)]
+        elif len(out) != 3:
+            raise ValueError('output must contain three arrays')
+
+        for out_arr in out:
+            if not (isinstance(out_arr, np.ndarray)
+                    and out_arr.dtype == np.float64):
+                raise ValueError('output arrays must be float64 numpy arrays')
+            if out_arr.shape != shape:
+                raise ValueError('output arrays must match the input shape')
+    lat_out, lon_out, r_out = out
+
+    # The tracing iterations are an optional fourth output
+    if trace_iter is not None:
+        if not (isinstance(trace_iter, np.ndarray)
+                and trace_iter.dtype == np.int64
+                and trace_iter.shape == shape):
+            raise ValueError("".join(["trace_iter must be an int64 numpy ",
+                                      "array with shape {:}".format(shape)]))
+        out = list(out) + [trace_iter]
+
+    if stages is not None:
+        stages.lap("allocate")
 
     # Test and set the conversion method code
     try:
@@ -364,49 +1200,453 @@ def convert_latlon_arr(in_lat, in_lon, height, dtime, method_code="G2A"):
     if not isinstance(bit_code, int):
         raise ValueError("unknown method code {:}".format(method_code))
 
+    # Test the conversion engine
+    if engine not in ("batch", "scalar", "numpy"):
+        raise ValueError("unknown engine {:}".format(engine))
+
+    # The NumPy engine and the worker processes read the coefficient files
+    if isinstance(workers, WorkerPool):
+        use_workers = workers.workers > 1
+    else:
+        use_workers = workers is not None and workers > 1
+    if engine == "numpy" or use_workers:
+        with lock, _use_model(model):
+            memory = c_aacgmv2.memory_coeffs()
+        if (engine == "numpy" and memory['aacgm']) or (use_workers and any(
+                memory.values())):
+            raise ValueError("".join(["the numpy engine and worker processes",
+                                      " cannot use coefficients set from ",
+                                      "memory"]))
+
     # Test height
     if not test_height(np.nanmax(height), bit_code):
+        for out_arr in out[:3]:
+            out_arr.fill(np.nan)
+        if trace_iter is not None:
+            trace_iter.fill(0)
+        if stages is not None:
+            stages.lap("test_height")
         return lat_out, lon_out, r_out
 
+    if stages is not None:
+        stages.lap("test_height")
+
     # Test latitude range
     if np.abs(in_lat).max() > 90.0:
         if np.abs(in_lat).max() > 90.1:
             raise ValueError('unrealistic latitude')
         in_lat = np.clip(in_lat, -90.0, 90.0)
 
+    if stages is not None:
+        stages.lap("clip_lat")
+
     # Constrain longitudes between -180 and 180
     in_lon = ((in_lon + 180.0) % 360.0) - 180.0
 
-    # Set current date and time
-    try:
-        c_aacgmv2.set_datetime(dtime.year, dtime.month, dtime.day, dtime.hour,
-                               dtime.minute, dtime.second)
-    except (TypeError, RuntimeError) as err:
-        raise RuntimeError("cannot set time for {:}: {:}".format(dtime, err))
+    if stages is not None:
+        stages.lap("wrap_lon")
 
-    try:
-        lat_out, lon_out, r_out, bad_ind = c_aacgmv2.convert_arr(list(in_lat),
-                                                                 list(in_lon),
-                                                                 list(height),
-                                                                 bit_code)
-
-        # Cast the output as numpy arrays or masks
-        lat_out = np.array(lat_out)
-        lon_out = np.array(lon_out)
-        r_out = np.array(r_out)
-        bad_ind = np.array(bad_ind) >= 0
-
-        # Replace any bad indices with NaN, casting output as numpy arrays
-        if np.any(bad_ind):
-            lat_out[bad_ind] = np.nan
-            lon_out[bad_ind] = np.nan
-            r_out[bad_ind] = np.nan
-    except SystemError as serr:
-        aacgmv2.logger.warning('C Error encountered: {:}'.format(serr))
+    # Sort the locations at each time by height, so that the height
+    # interpolation of the coefficients is reused by runs of equal heights
+    if sort_height and height.size > 1:
+        hflat = np.broadcast_to(height, shape).ravel()
+        igroup = np.repeat(np.arange(len(times)), np.diff(time_bounds))
+        if order is None:
+            order = np.lexsort((hflat, igroup))
+        else:
+            order = order[np.lexsort((hflat[order], igroup))]
+
+        if stages is not None:
+            stages.lap("sort_height")
+
+    # Broadcast the inputs without copying.  With several times, or when
+    # sorting by height, the locations are flattened and sorted.  They are
+    # also flattened when threads convert multi-dimensional locations, so
+    # that each thread converts an equal share of the elements.
+    if max_workers is None or max_workers < 1:
+        max_workers = 1
+    in_arrs = [np.broadcast_to(arr, shape) for arr in [in_lat, in_lon, height]]
+    flat = len(times) > 1 or order is not None or (max_workers > 1
+                                                   and len(shape) > 1)
+    if not flat:
+        sort_arrs = out
+    else:
+        in_arrs = [arr.ravel() if order is None else arr.ravel()[order]
+                   for arr in in_arrs]
+        sort_arrs = [out_arr.reshape(-1) if order is None
+                     and out_arr.flags.c_contiguous else np.empty(
+                         shape=(out_arr.size,), dtype=out_arr.dtype)
+                     for out_arr in out]
+
+    if stages is not None:
+        stages.lap("broadcast")
+
+    # Convert using NumPy, leaving the locations that need tracing to the C
+    # library
+    if engine == "numpy":
+        trace = _convert_numpy(in_arrs, sort_arrs[:3], times,
+                               time_bounds if flat else None, bit_code,
+                               max_workers, coeff_prefix)
+        if trace_iter is not None:
+            sort_arrs[3][...] = 0
+        if trace.any():
+            trace_times = np.repeat(np.array(times, dtype=object), np.diff(
+                time_bounds))[trace] if len(times) > 1 else times[0]
+            trace_out = [np.empty(shape=(trace.sum(),), dtype=sort_arr.dtype)
+                         for sort_arr in sort_arrs]
+            _convert_latlon_arr(*[arr[trace] for arr in in_arrs], trace_times,
+                                bit_code, trace_out[:3], max_workers, None,
+                                False, "batch", model, lock, coeff_prefix,
+                                igrf_file, workers, *trace_out[3:])
+            for sort_arr, trace_arr in zip(sort_arrs, trace_out):
+                sort_arr[trace] = trace_arr
+        in_arrs = list()
+
+        if stages is not None:
+            stages.lap("numpy_engine")
+
+    # Convert using a pool of worker processes
+    if use_workers and in_arrs:
+        _convert_processes(in_arrs, sort_arrs, times,
+                           time_bounds if flat else None, bit_code, engine,
+                           workers, coeff_prefix, igrf_file)
+        in_arrs = list()
+
+        if stages is not None:
+            stages.lap("workers")
+
+    # Select the conversion ufunc, without the model lock as `lock` is held
+    # while the threads convert
+    if trace_iter is None:
+        ufunc = c_aacgmv2.a2g_nolock if bit_code & c_aacgmv2.A2G \
+            else c_aacgmv2.g2a_nolock
+    else:
+        ufunc = c_aacgmv2.a2g_iter_nolock if bit_code & c_aacgmv2.A2G \
+            else c_aacgmv2.g2a_iter_nolock
+    if engine == "scalar":
+        bit_code |= c_aacgmv2.SCALAR
+
+    pool = None if max_workers == 1 else futures.ThreadPoolExecutor(
+        max_workers=max_workers)
+
+    with lock, _use_model(model):
+        try:
+            for itime, ctime in enumerate(times if in_arrs else []):
+                # Set current date and time
+                try:
+                    c_aacgmv2.set_datetime(ctime.year, ctime.month, ctime.day,
+                                           ctime.hour, ctime.minute,
+                                           ctime.second)
+                except (TypeError, RuntimeError) as err:
+                    raise RuntimeError("cannot set time for {:}: {:}".format(
+                        ctime, err))
+                _prefetch_next(model, lock)
+                epoch = (ctime - dt.datetime(1970, 1, 1)).total_seconds()
+
+                # Split the locations at this time into chunks, one per
+                # thread.  With several threads the locations are flat, so
+                # the chunks split the element range evenly.
+                start = time_bounds[itime] if flat else 0
+                stop = time_bounds[itime + 1] if flat else shape[0]
+                bounds = np.linspace(start, stop, max(1, min(max_workers,
+                                                             stop - start))
+                                     + 1, dtype=int)
+
+                # Convert the locations, bad values are set to NaN
+                jobs = list()
+                for i, j in zip(bounds[:-1], bounds[1:]):
+                    args = [arr[i:j] for arr in in_arrs] + [epoch, bit_code]
+                    kwargs = {'out': tuple([arr[i:j] for arr in sort_arrs])}
+                    if pool is None:
+                        ufunc(*args, **kwargs)
+                    else:
+                        jobs.append(pool.submit(_convert_chunk, model, ufunc,
+                                                *args, **kwargs))
+
+                # Raise any errors encountered by the threads
+                for job in jobs:
+                    job.result()
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    if stages is not None:
+        stages.lap("convert")
+
+    # Return the output to the original order and shape
+    if flat:
+        for out_arr, sort_arr in zip(out, sort_arrs):
+            if order is not None:
+                sort_arr[order] = sort_arr.copy()
+            if not np.shares_memory(out_arr, sort_arr):
+                out_arr[...] = sort_arr.reshape(shape)
+
+        if stages is not None:
+            stages.lap("reorder")
 
     return lat_out, lon_out, r_out
 
 
+def _convert_numpy(in_arrs, out_arrs, times, time_bounds, bit_code,
+                   max_workers, coeff_prefix):
+    """Convert locations using the NumPy coefficient engine.
+
+    Parameters
+    ----------
+    in_arrs : list
+        Input latitude, longitude, and height arrays
+    out_arrs : list
+        Output latitude, longitude, and radius arrays
+    times : list
+        Model times
+    time_bounds : np.ndarray or NoneType
+        Index of the first location at each time and the end of the last
+        time, or None if all locations share the first time
+    bit_code : int
+        Conversion bit code
+    max_workers : int or NoneType
+        Number of threads used to convert the locations
+    coeff_prefix : str or NoneType
+        Coefficient file prefix, or None to use the AACGM_v2_DAT_PREFIX
+        environment variable
+
+    Returns
+    -------
+    trace : np.ndarray
+        Boolean array that is True for locations that must be traced
+
+    Raises
+    ------
+    RuntimeError
+        If the coefficients do not cover a model time
+
+    """
+    np_model = numpy_engine.get_model(coeff_prefix)
+    trace = np.zeros(shape=in_arrs[0].shape, dtype=bool)
+
+    def convert_slice(coeffs, islice):
+        out = numpy_engine.convert_coeffs(*[arr[islice] for arr in in_arrs],
+                                          coeffs, bit_code)
+        for out_arr, val in zip(out_arrs, out[:3]):
+            out_arr[islice] = val
+        trace[islice] = out[3] == numpy_engine.TRACE_CODE
+
+    if max_workers is None or max_workers < 1:
+        max_workers = 1
+
+    with futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        jobs = list()
+        for itime, ctime in enumerate(times):
+            try:
+                coeffs = np_model.time_coeffs(ctime)
+            except ValueError as err:
+                raise RuntimeError("cannot set time for {:}: {:}".format(
+                    ctime, err))
+
+            # Split the locations at this time into chunks, which split the
+            # elements evenly as the locations are flat with several threads
+            start = 0 if time_bounds is None else time_bounds[itime]
+            stop = trace.shape[0] if time_bounds is None \
+                else time_bounds[itime + 1]
+            bounds = np.linspace(start, stop, max(1, min(max_workers,
+                                                         stop - start)) + 1,
+                                 dtype=int)
+            for i, j in zip(bounds[:-1], bounds[1:]):
+                if max_workers == 1:
+                    convert_slice(coeffs, slice(i, j))
+                else:
+                    jobs.append(pool.submit(convert_slice, coeffs,
+                                            slice(i, j)))
+
+        # Raise any errors encountered by the threads
+        for job in jobs:
+            job.result()
+
+    return trace
+
+
+def _convert_shard(in_lat, in_lon, height, dtime, bit_code, engine,
+                   iterations=False, converter=None, coeff_prefix=None,
+                   igrf_file=None):
+    """Convert a shard of locations at one model time.
+
+    Parameters
+    ----------
+    in_lat, in_lon, height : np.ndarray
+        Input latitude, longitude, and height, see `convert_latlon_arr`
+    dtime : dt.datetime
+        Model time
+    bit_code : int
+        Conversion bit code
+    engine : str
+        Coefficient engine, 'batch' or 'scalar'
+    iterations : bool
+        If True, also return the tracing iterations of each location
+        (default=False)
+    converter : Converter or NoneType
+        Converter used for the shard, or None to use the converter of this
+        worker process for the coefficient files (default=None)
+    coeff_prefix : str or NoneType
+        Location and file prefix for AACGM coefficient files of the worker
+        process converter (default=None)
+    igrf_file : str or NoneType
+        Full filename of IGRF coefficient file of the worker process
+        converter (default=None)
+
+    Returns
+    -------
+    out_lat, out_lon, out_r : np.ndarray
+        See `convert_latlon_arr`
+    trace_iter : np.ndarray
+        Tracing iterations of each location, only returned if `iterations` is
+        True
+
+    """
+    # Each worker process keeps a converter for each set of coefficient files
+    if converter is None:
+        converter = _worker_state.get((coeff_prefix, igrf_file))
+        if converter is None:
+            converter = Converter(dtime, coeff_prefix=coeff_prefix,
+                                  igrf_file=igrf_file)
+            _worker_state[(coeff_prefix, igrf_file)] = converter
+
+    if converter.dtime != dtime:
+        converter.dtime = dtime
+
+    if not iterations:
+        return converter.convert_latlon_arr(in_lat, in_lon, height, bit_code,
+                                            engine=engine)
+
+    trace_iter = np.empty(shape=np.shape(in_lat), dtype=np.int64)
+    return converter.convert_latlon_arr(
+        in_lat, in_lon, height, bit_code, engine=engine,
+        trace_iter=trace_iter) + (trace_iter,)
+
+
+def _convert_processes(in_arrs, out_arrs, times, time_bounds, bit_code,
+                       engine, workers, coeff_prefix, igrf_file):
+    """Convert locations using a pool of worker processes.
+
+    Parameters
+    ----------
+    in_arrs : list
+        Input latitude, longitude, and height arrays
+    out_arrs : list
+        Output latitude, longitude, and radius arrays, and optionally the
+        tracing iteration array
+    times : list
+        Model times
+    time_bounds : np.ndarray or NoneType
+        Index of the first location at each time and the end of the last
+        time, or None if all locations share the first time
+    bit_code : int
+        Conversion bit code
+    engine : str
+        Coefficient engine, 'batch' or 'scalar'
+    workers : int or WorkerPool
+        Number of worker processes, or a pool of worker processes that is
+        left running
+    coeff_prefix : str or NoneType
+        Coefficient file prefix, or None to use the AACGM_v2_DAT_PREFIX
+        environment variable
+    igrf_file : str or NoneType
+        IGRF coefficient file, or None to use the IGRF_COEFFS environment
+        variable
+
+    Raises
+    ------
+    RuntimeError
+        If unable to set the AACGMV2 datetime.
+
+    Notes
+    -----
+    The locations at each time are split into shards, about four per worker
+    and at most `_SHARD_SIZE` locations, so that the work is balanced and the
+    memory held by pending shards is bounded.
+
+    """
+    if coeff_prefix is None:
+        coeff_prefix = os.environ['AACGM_v2_DAT_PREFIX']
+    if igrf_file is None:
+        igrf_file = os.environ['IGRF_COEFFS']
+
+    # Flatten the locations and outputs
+    shape = in_arrs[0].shape
+    in_arrs = [arr.ravel() for arr in in_arrs]
+    flat_out = [out_arr.reshape(-1) if out_arr.flags.c_contiguous
+                else np.empty(shape=(out_arr.size,), dtype=out_arr.dtype)
+                for out_arr in out_arrs]
+
+    # Start the worker processes, unless a pool was given
+    own_pool = not isinstance(workers, WorkerPool)
+    pool = WorkerPool(workers) if own_pool else workers
+    workers = pool.workers
+
+    # Split the locations at each time into shards
+    if time_bounds is None:
+        time_bounds = [0, in_arrs[0].size]
+    shard_size = min(_SHARD_SIZE, -(-in_arrs[0].size // (4 * workers)))
+    shards = list()
+    for itime, ctime in enumerate(times):
+        for i in range(time_bounds[itime], time_bounds[itime + 1],
+                       shard_size):
+            shards.append((ctime, slice(i, min(i + shard_size,
+                                               time_bounds[itime + 1]))))
+
+    def shard_args(ishard):
+        ctime, islice = shards[ishard]
+        return [arr[islice] for arr in in_arrs] + [
+            ctime, bit_code, engine, len(out_arrs) > 3]
+
+    # Convert the shards, keeping at most two per worker in progress and
+    # writing the results in order.  Stop at the first shard lost to a
+    # failed worker process.
+    nshard = 0
+    jobs = dict()
+    try:
+        while nshard < len(shards):
+            for ishard in range(nshard, min(nshard + 2 * workers,
+                                            len(shards))):
+                if ishard not in jobs:
+                    jobs[ishard] = pool.submit(_convert_shard,
+                                               *shard_args(ishard),
+                                               coeff_prefix=coeff_prefix,
+                                               igrf_file=igrf_file)
+
+            out = jobs.pop(nshard).result()
+            for out_arr, val in zip(flat_out, out):
+                out_arr[shards[nshard][1]] = val
+            nshard += 1
+    except futures.process.BrokenProcessPool:
+        if not own_pool:
+            pool._restart()
+    finally:
+        for job in jobs.values():
+            job.cancel()
+        if own_pool:
+            pool.shutdown()
+
+    # Convert the shards left by a failed worker process in this process
+    if nshard < len(shards):
+        aacgmv2.logger.warning("".join([
+            "a worker process failed, converting the remaining ",
+            "{:d} locations in this process".format(
+                in_arrs[0].size - shards[nshard][1].start)]))
+        converter = Converter(shards[nshard][0], coeff_prefix=coeff_prefix,
+                              igrf_file=igrf_file)
+        for ishard in range(nshard, len(shards)):
+            out = _convert_shard(*shard_args(ishard), converter=converter)
+            for out_arr, val in zip(flat_out, out):
+                out_arr[shards[ishard][1]] = val
+
+    # Return the output to its shape
+    for out_arr, flat_arr in zip(out_arrs, flat_out):
+        if not np.shares_memory(out_arr, flat_arr):
+            out_arr[...] = flat_arr.reshape(shape)
+
+    return
+
+
 def get_aacgm_coord(glat, glon, height, dtime, method="ALLOWTRACE"):
     """Get AACGM latitude, longitude, and magnetic local time.
 
@@ -455,7 +1695,10 @@ def get_aacgm_coord(glat, glon, height, dtime, method="ALLOWTRACE"):
     return mlat, mlon, mlt
 
 
-def get_aacgm_coord_arr(glat, glon, height, dtime, method="ALLOWTRACE"):
+def get_aacgm_coord_arr(glat, glon, height, dtime, method="ALLOWTRACE",
+                        out=None, max_workers=None, time_res=None,
+                        sort_height=False, engine="batch", workers=None,
+                        mlt_ref=None):
     """Get AACGM latitude, longitude, and magnetic local time.
 
     Parameters
@@ -466,8 +1709,10 @@ def get_aacgm_coord_arr(glat, glon, height, dtime, method="ALLOWTRACE"):
         Geodetic longitude in degrees E
     height : np.array or list
         Altitude above the surface of the earth in km
-    dtime : dt.datetime
-        Date and time to calculate magnetic location
+    dtime : dt.datetime, np.datetime64, float, or array-like
+        Date and time to calculate magnetic location, either a single datetime
+        or one datetime, np.datetime64 value, or float second since 1970 per
+        location
     method : str
         The type(s) of conversion to perform (default="ALLOWTRACE")
 
@@ -479,6 +1724,30 @@ def get_aacgm_coord_arr(glat, glon, height, dtime, method="ALLOWTRACE"):
             Use coefficients above 2000 km
         GEOCENTRIC
             Assume inputs are geocentric w/ RE=6371.2
+    out : tuple, np.ndarray, or NoneType
+        Optional pre-allocated float64 output, either a tuple of three arrays
+        with one element per location or a single array with shape (N, 3),
+        into which mlat, mlon, and mlt are written.  If None, new arrays are
+        allocated. (default=None)
+    max_workers : int or NoneType
+        Number of threads used to convert the locations, as described in
+        `convert_latlon_arr`. (default=None)
+    time_res : dt.timedelta, np.timedelta64, int, or NoneType
+        Resolution to which the times are rounded to set the magnetic field
+        model, as described in `convert_latlon_arr`.  The MLT is calculated
+        using the times as given. (default=None)
+    sort_height : bool
+        If True, the locations are converted in order of height, as described
+        in `convert_latlon_arr`. (default=False)
+    engine : str
+        Method used to evaluate the coefficients, as described in
+        `convert_latlon_arr`. (default='batch')
+    workers : int or NoneType
+        Number of worker processes used to convert the locations, as
+        described in `convert_latlon_arr`. (default=None)
+    mlt_ref : MLTReference, bool, or NoneType
+        Interpolated reference longitude used to calculate the MLT, as
+        described in `convert_mlt`. (default=None)
 
     Returns
     -------
@@ -490,18 +1759,32 @@ def get_aacgm_coord_arr(glat, glon, height, dtime, method="ALLOWTRACE"):
         Magnetic local time in hours
 
     """
+    # Time the stages of the conversion, if profiling
+    stages = None if _profile is None else _profile.start(
+        "get_aacgm_coord_arr")
+
     # Initialize method code
     method_code = "G2A|{:s}".format(method)
 
-    # Get magnetic lat and lon.
-    mlat, mlon, _ = convert_latlon_arr(glat, glon, height, dtime,
-                                       method_code=method_code)
+    # Get magnetic lat and lon, using the MLT output to hold the radius
+    mlat, mlon, mlt = convert_latlon_arr(glat, glon, height, dtime,
+                                         method_code=method_code, out=out,
+                                         max_workers=max_workers,
+                                         time_res=time_res,
+                                         sort_height=sort_height,
+                                         engine=engine, workers=workers)
+
+    if stages is not None:
+        stages.lap("convert_latlon_arr")
 
     if np.any(np.isfinite(mlon)):
         # Get magnetic local time
-        mlt = convert_mlt(mlon, dtime, m2a=False)
+        mlt = convert_mlt(mlon, dtime, m2a=False, out=mlt, mlt_ref=mlt_ref)
     else:
-        mlt = np.full(shape=len(mlat), fill_value=np.nan)
+        mlt.fill(np.nan)
+
+    if stages is not None:
+        stages.lap("convert_mlt")
 
     return mlat, mlon, mlt
 
@@ -591,18 +1874,29 @@ def convert_bool_to_bit(a2g=False, trace=False, allowtrace=False,
     return bit_code
 
 
-def convert_mlt(arr, dtime, m2a=False):
+def convert_mlt(arr, dtime, m2a=False, out=None, mlt_ref=None):
     """Convert between magnetic local time (MLT) and AACGM-v2 longitude.
 
     Parameters
     ----------
     arr : array-like or float
         Magnetic longitudes (degrees E) or MLTs (hours) to convert
-    dtime : array-like or dt.datetime
-        Date and time for MLT conversion in Universal Time (UT).
+    dtime : array-like, dt.datetime, np.datetime64, or float
+        Date and time for MLT conversion in Universal Time (UT), either a
+        single time or an array of datetime objects, np.datetime64 values, or
+        float seconds since 1970 with the same shape as `arr`
     m2a : bool
         Convert MLT to AACGM-v2 longitude (True) or magnetic longitude to MLT
         (False).  (default=False)
+    out : np.ndarray or NoneType
+        Optional pre-allocated float64 output array with the same shape as
+        `arr`, into which the results are written.  If None, a new array is
+        allocated. (default=None)
+    mlt_ref : MLTReference, bool, or NoneType
+        Interpolated reference longitude used for the conversion.  If None,
+        one is created for dense time series with many distinct times; if
+        False, the reference longitude is calculated exactly for every
+        distinct time. (default=None)
 
     Returns
     -------
@@ -614,58 +1908,848 @@ def convert_mlt(arr, dtime, m2a=False):
     This routine previously based on Laundal et al. 2016, but now uses the
     improved calculation available in AACGM-V2.4.
 
+    This is a thin layer over the `aacgmv2.ufunc.mlt` and
+    `aacgmv2.ufunc.inv_mlt` ufuncs.  Single values are returned as an array
+    with one element.
+
+    The reference longitude of the subsolar point is calculated once for each
+    distinct time (to the second), as the values are converted in order of
+    time and the C library caches the reference longitude for recent times.
+    For dense time series, with at least 1000 distinct times and one distinct
+    time per minute of the time span, the reference longitude is instead
+    interpolated by an `MLTReference` within its default maximum error.
+
     """
-    arr = np.asarray(arr)
+    # Time the stages of the conversion, if profiling
+    stages = None if _profile is None else _profile.start("convert_mlt")
+
+    arr = np.asarray(arr, dtype=np.float64)
     if arr.shape == ():
-        arr = np.array([arr])
+        arr = arr.reshape(1)
 
-    if len(arr.shape) > 1:
-        raise ValueError("unable to process multi-dimensional arrays")
+    if stages is not None:
+        stages.lap("recast")
 
-    # Test time
-    try:
-        dtime = test_time(dtime)
-        years = [dtime.year for dd in arr]
-        months = [dtime.month for dd in arr]
-        days = [dtime.day for dd in arr]
-        hours = [dtime.hour for dd in arr]
-        minutes = [dtime.minute for dd in arr]
-        seconds = [dtime.second for dd in arr]
-    except ValueError as verr:
-        dtime = np.asarray(dtime)
-        if dtime.shape == ():
-            raise ValueError(verr)
-        elif dtime.shape != arr.shape:
-            raise ValueError("array input for datetime and MLon/MLT must match")
+    # Test time, casting it as seconds since 1970
+    epoch = _time_to_epoch(dtime)
+    if np.ndim(epoch) > 0 and epoch.shape != arr.shape:
+        raise ValueError("array input for datetime and MLon/MLT must match")
+
+    if stages is not None:
+        stages.lap("time_to_epoch")
+
+    # Initialise output
+    if out is None:
+        out = np.empty(shape=arr.shape, dtype=np.float64)
+    elif not (isinstance(out, np.ndarray) and out.dtype == np.float64
+              and out.shape == arr.shape):
+        raise ValueError('output must be a float64 array matching the input')
 
-        years = [dd.year for dd in dtime]
-        months = [dd.month for dd in dtime]
-        days = [dd.day for dd in dtime]
-        hours = [dd.hour for dd in dtime]
-        minutes = [dd.minute for dd in dtime]
-        seconds = [dd.second for dd in dtime]
+    if stages is not None:
+        stages.lap("allocate")
 
-    arr = list(arr)
+    # Interpolate the reference longitude for dense time series
+    if mlt_ref is None and np.ndim(epoch) > 0:
+        mlt_ref = _dense_mlt_ref(epoch)
+
+        if stages is not None:
+            stages.lap("dense_mlt_ref")
+
+    if isinstance(mlt_ref, MLTReference):
+        out[...] = mlt_ref.convert_mlt(arr, epoch, m2a=m2a)
+
+        if stages is not None:
+            stages.lap("interpolate")
+        return out
+
+    # Convert the values in order of time, so that the reference longitude is
+    # calculated once for each distinct time
+    order = None
+    if np.ndim(epoch) > 0:
+        flat_epoch = epoch.ravel()
+        if np.any(flat_epoch[1:] < flat_epoch[:-1]):
+            order = np.argsort(flat_epoch, kind='stable')
+
+        if stages is not None:
+            stages.lap("sort_times")
 
     # Calculate desired location, C routines set date and time
-    if m2a:
-        # Get the magnetic longitude
-        if len(arr) == 1:
-            out = c_aacgmv2.inv_mlt_convert(years[0], months[0], days[0],
-                                            hours[0], minutes[0], seconds[0],
-                                            arr[0])
-            out = np.array([out])
+    ufunc = c_aacgmv2.inv_mlt if m2a else c_aacgmv2.mlt
+    with _model_lock:
+        if order is None:
+            # Get the magnetic longitude or magnetic local time
+            ufunc(arr, epoch, out=out)
         else:
-            out = c_aacgmv2.inv_mlt_convert_arr(years, months, days, hours,
-                                                minutes, seconds, arr)
-    else:
-        # Get magnetic local time
-        if len(arr) == 1:
-            out = c_aacgmv2.mlt_convert(years[0], months[0], days[0], hours[0],
-                                        minutes[0], seconds[0], arr[0])
-            out = np.array([out])
-        else:
-            out = np.array(c_aacgmv2.mlt_convert_arr(years, months, days, hours,
-                                                     minutes, seconds, arr))
+            sort_out = np.empty(shape=(arr.size,), dtype=np.float64)
+            sort_out[order] = ufunc(arr.ravel()[order], flat_epoch[order])
+            out[...] = sort_out.reshape(arr.shape)
+
+    if stages is not None:
+        stages.lap("convert")
 
     return out
+
+
+def _dense_mlt_ref(epoch):
+    """Create an interpolated MLT reference longitude for dense time series.
+
+    Parameters
+    ----------
+    epoch : np.ndarray
+        Times in seconds since 1970
+
+    Returns
+    -------
+    mlt_ref : MLTReference or NoneType
+        Interpolated reference longitude spanning the times, or None if the
+        times are too sparse for interpolation to be faster
+
+    """
+    sec = np.floor(epoch[np.isfinite(epoch)])
+    if sec.size < _MLT_DENSE:
+        return None
+
+    sec = np.unique(sec)
+    if sec.size < _MLT_DENSE or sec.size * 60 < sec[-1] - sec[0]:
+        return None
+
+    return MLTReference(_epoch_to_datetime(sec[0]),
+                        _epoch_to_datetime(sec[-1]))
+
+
+def _epoch_to_datetime(sec):
+    """Cast seconds since 1970 as a datetime.
+
+    Parameters
+    ----------
+    sec : float
+        Whole seconds since 1970
+
+    Returns
+    -------
+    dtime : dt.datetime
+        Date and time
+
+    """
+    return dt.datetime(1970, 1, 1) + dt.timedelta(seconds=int(sec))
+
+
+class MLTReference(object):
+    """Interpolated MLT reference longitude over a time span.
+
+    Parameters
+    ----------
+    start : dt.datetime
+        Start of the time span in UT
+    stop : dt.datetime
+        End of the time span in UT
+    max_error : float
+        Maximum interpolation error of the reference longitude in degrees.
+        One degree is four minutes of MLT. (default=1.0e-5)
+
+    Attributes
+    ----------
+    start : dt.datetime
+        Start of the time span in UT
+    stop : dt.datetime
+        End of the time span in UT
+    max_error : float
+        Requested maximum interpolation error in degrees
+    step : int
+        Spacing of the interpolation grid in seconds
+    error : float
+        Estimated maximum interpolation error in degrees, which may exceed
+        `max_error` if the grid spacing reached its minimum of one minute
+
+    Raises
+    ------
+    ValueError
+        If the time span or maximum error are invalid, or if the reference
+        longitude cannot be calculated over the time span.
+
+    Notes
+    -----
+    The reference longitude is the AACGM-v2 longitude of the subsolar point,
+    which varies smoothly with time.  It is calculated exactly on a grid
+    spanning the times, spaced by halving from one hour (to no less than one
+    minute) until the estimated error is below `max_error`, and is evaluated
+    using cubic interpolation.
+    The error is estimated from the fourth differences on the grid and by
+    comparing the interpolated and exact values midway between grid points.
+    As in the C library, times are truncated to the second.  Times outside
+    the span are calculated exactly.
+
+    """
+
+    def __init__(self, start, stop, max_error=1.0e-5):
+        self.start = test_time(start)
+        self.stop = test_time(stop)
+        if self.stop < self.start:
+            raise ValueError("time span must end after it starts")
+        if not max_error > 0.0:
+            raise ValueError("maximum error must be positive")
+        self.max_error = max_error
+
+        start = np.floor(_time_to_epoch(self.start))
+        stop = np.floor(_time_to_epoch(self.stop))
+
+        # Halve the grid spacing until the estimated error is small enough,
+        # stopping at one minute
+        self.step = 7200
+        self.error = np.inf
+        while self.error > max_error and self.step > 60:
+            self.step = max(self.step // 2, 60)
+            self._epoch = start - self.step
+            self._times = self._epoch + self.step * np.arange(
+                int((stop - self._epoch) // self.step) + 4)
+            self._values = np.unwrap(self._exact(self._times), period=360.0)
+
+            mid = self._times[1:-2] + self.step // 2
+            self.error = max(np.max(np.abs(np.diff(self._values, n=4)))
+                             * 3.0 / 128.0 if self._values.size > 4 else 0.0,
+                             np.max(np.abs(self._interpolate(mid)
+                                           - np.unwrap(self._exact(mid),
+                                                       period=360.0))))
+
+    def __repr__(self):
+        """Provide an evaluatable representation of the MLTReference."""
+        return "".join(["aacgmv2.MLTReference(", repr(self.start), ", ",
+                        repr(self.stop), ", max_error=", repr(self.max_error),
+                        ")"])
+
+    @staticmethod
+    def _exact(sec):
+        """Calculate the reference longitude exactly.
+
+        Parameters
+        ----------
+        sec : np.ndarray
+            Times in seconds since 1970
+
+        Returns
+        -------
+        mlon_ref : np.ndarray
+            Reference longitude in degrees E
+
+        Raises
+        ------
+        ValueError
+            If the reference longitude cannot be calculated.
+
+        """
+        with _model_lock:
+            mlon_ref = c_aacgmv2.inv_mlt(np.full(np.shape(sec), 12.0), sec)
+
+        if np.any(np.isnan(mlon_ref[np.isfinite(sec)])):
+            raise ValueError("unable to calculate MLT reference longitude")
+
+        return mlon_ref
+
+    def _interpolate(self, sec):
+        """Interpolate the unwrapped reference longitude.
+
+        Parameters
+        ----------
+        sec : np.ndarray
+            Whole seconds since 1970 within the time span
+
+        Returns
+        -------
+        mlon_ref : np.ndarray
+            Unwrapped reference longitude in degrees E
+
+        """
+        # Use the grid points on either side of each interval
+        pos = (sec - self._epoch) / self.step
+        i = np.clip(np.floor(pos).astype(int), 1, self._times.size - 3)
+        x = pos - i
+
+        return (-x * (x - 1.0) * (x - 2.0) / 6.0 * self._values[i - 1]
+                + (x + 1.0) * (x - 1.0) * (x - 2.0) / 2.0 * self._values[i]
+                - (x + 1.0) * x * (x - 2.0) / 2.0 * self._values[i + 1]
+                + (x + 1.0) * x * (x - 1.0) / 6.0 * self._values[i + 2])
+
+    def mlon_ref(self, dtime):
+        """Get the reference longitude for the MLT conversion.
+
+        Parameters
+        ----------
+        dtime : array-like or dt.datetime
+            Single datetime, or an array of datetime objects, np.datetime64
+            values, or seconds since 1970
+
+        Returns
+        -------
+        mlon_ref : np.ndarray
+            AACGM-v2 longitude of the subsolar point in degrees E, between
+            -180 and 180
+
+        """
+        sec = np.floor(np.atleast_1d(_time_to_epoch(dtime)))
+
+        mlon_ref = np.full(sec.shape, np.nan)
+        inside = (sec >= self._times[1]) & (sec <= self._times[-3] + self.step)
+        mlon_ref[inside] = self._interpolate(sec[inside])
+        mlon_ref[inside] = _wrap(mlon_ref[inside], 360.0, -180.0, 180.0)
+
+        outside = ~inside & np.isfinite(sec)
+        if outside.any():
+            with _model_lock:
+                mlon_ref[outside] = c_aacgmv2.inv_mlt(
+                    np.full(outside.sum(), 12.0), sec[outside])
+
+        return mlon_ref
+
+    def convert_mlt(self, arr, dtime, m2a=False):
+        """Convert between MLT and AACGM-v2 longitude.
+
+        Parameters
+        ----------
+        arr : array-like or float
+            Magnetic longitudes (degrees E) or MLTs (hours) to convert
+        dtime : array-like or dt.datetime
+            Single datetime, or an array of datetime objects, np.datetime64
+            values, or seconds since 1970 with the same shape as `arr`
+        m2a : bool
+            Convert MLT to AACGM-v2 longitude (True) or magnetic longitude to
+            MLT (False).  (default=False)
+
+        Returns
+        -------
+        out : np.ndarray
+            Converted coordinates/MLT in degrees E or hours (as appropriate)
+
+        """
+        arr = np.atleast_1d(np.asarray(arr, dtype=np.float64))
+        mlon_ref = self.mlon_ref(dtime)
+
+        if m2a:
+            return _wrap((arr - 12.0) * 15.0 + mlon_ref, 360.0, -180.0, 180.0)
+
+        return _wrap(12.0 + (arr - mlon_ref) / 15.0, 24.0, 0.0, 24.0)
+
+
+class Profile(object):
+    """Wall time and allocations of the stages of the array functions.
+
+    Parameters
+    ----------
+    memory : bool
+        If True, the bytes allocated in each stage are recorded, which
+        requires `tracemalloc` to be tracing (default=False)
+
+    Attributes
+    ----------
+    memory : bool
+        True if the bytes allocated are recorded
+    stages : dict
+        Record of each stage, keyed by '<function>.<stage>', holding the
+        number of times the stage ran ('calls'), its cumulative wall time in
+        seconds ('time'), and the net number of Python memory blocks it
+        allocated ('blocks').  If `memory` is True, the records also hold the
+        net bytes allocated ('bytes') and the largest number of bytes
+        allocated at once during one run of the stage ('peak_bytes').
+
+    See Also
+    --------
+    profile : Context manager that records a Profile
+
+    Notes
+    -----
+    The stages of a function that calls another array function (e.g.,
+    `get_aacgm_coord_arr`) include the time and allocations of the stages of
+    the inner function, which are also recorded separately, although their
+    'peak_bytes' only cover the part after the last inner stage.  Memory blocks
+    and bytes are counted for the whole process, so conversions in other
+    threads are included, and memory blocks do not include the data of
+    large NumPy arrays.
+
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.stages = dict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """Provide an evaluatable representation of the Profile."""
+        return "".join(["aacgmv2.wrapper.Profile(memory=", repr(self.memory),
+                        ")"])
+
+    def start(self, func):
+        """Start timing the stages of a function call.
+
+        Parameters
+        ----------
+        func : str
+            Name of the function
+
+        Returns
+        -------
+        stages : _StageTimer
+            Timer whose `lap` method records each stage as it finishes
+
+        """
+        return _StageTimer(self, func)
+
+    def record(self, stage, sec, blocks, nbytes=0, peak_bytes=0):
+        """Add one run of a stage to the profile.
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage, as '<function>.<stage>'
+        sec : float
+            Wall time of the stage in seconds
+        blocks : int
+            Net number of Python memory blocks allocated
+        nbytes : int
+            Net number of bytes allocated, if `memory` is True (default=0)
+        peak_bytes : int
+            Largest number of bytes allocated at once, if `memory` is True
+            (default=0)
+
+        """
+        with self._lock:
+            if stage not in self.stages:
+                self.stages[stage] = {'calls': 0, 'time': 0.0, 'blocks': 0}
+                if self.memory:
+                    self.stages[stage].update({'bytes': 0, 'peak_bytes': 0})
+
+            rec = self.stages[stage]
+            rec['calls'] += 1
+            rec['time'] += sec
+            rec['blocks'] += blocks
+            if self.memory:
+                rec['bytes'] += nbytes
+                rec['peak_bytes'] = max(rec['peak_bytes'], peak_bytes)
+
+    def reset(self):
+        """Remove the records of all stages."""
+        with self._lock:
+            self.stages.clear()
+
+    def as_dict(self):
+        """Copy the stage records.
+
+        Returns
+        -------
+        stages : dict
+            Copy of `stages`
+
+        """
+        with self._lock:
+            return {stage: dict(rec) for stage, rec in self.stages.items()}
+
+    def to_json(self, **kwargs):
+        """Serialize the stage records as JSON.
+
+        Parameters
+        ----------
+        **kwargs : dict
+            Keyword arguments for `json.dumps`
+
+        Returns
+        -------
+        stages : str
+            JSON object of the stage records
+
+        """
+        return json.dumps(self.as_dict(), **kwargs)
+
+
+class _StageTimer(object):
+    """Time the stages of one call of an array function.
+
+    Parameters
+    ----------
+    prof : Profile
+        Profile into which the stages are recorded
+    func : str
+        Name of the function
+
+    """
+
+    def __init__(self, prof, func):
+        self.prof = prof
+        self.func = func
+        self._last = self._now()
+
+    def _now(self):
+        """Get the current time, memory blocks, and traced bytes.
+
+        Returns
+        -------
+        now : tuple
+            Performance counter in seconds, number of allocated memory
+            blocks, and traced bytes (0 if not recording memory)
+
+        """
+        if self.prof.memory and tracemalloc.is_tracing():
+            nbytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        else:
+            nbytes = 0
+
+        return time.perf_counter(), sys.getallocatedblocks(), nbytes
+
+    def lap(self, stage):
+        """Record the stage finished since the previous lap.
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage
+
+        """
+        sec = time.perf_counter()
+        blocks = sys.getallocatedblocks()
+        if self.prof.memory and tracemalloc.is_tracing():
+            nbytes, peak_bytes = tracemalloc.get_traced_memory()
+        else:
+            nbytes = peak_bytes = self._last[2]
+
+        self.prof.record(".".join([self.func, stage]), sec - self._last[0],
+                         blocks - self._last[1], nbytes - self._last[2],
+                         max(peak_bytes - self._last[2], 0))
+        self._last = self._now()
+
+
+def _wrap(val, period, low, high):
+    """Wrap values into a range as the C library does.
+
+    Parameters
+    ----------
+    val : np.ndarray
+        Values to wrap
+    period : float
+        Period of the values
+    low : float
+        Lower limit of the range
+    high : float
+        Upper limit of the range
+
+    Returns
+    -------
+    val : np.ndarray
+        Values between `low` and `high`, with both limits allowed
+
+    """
+    val = np.where(val > high, val - period * np.ceil((val - high) / period),
+                   val)
+    return np.where(val < low, val + period * np.ceil((low - val) / period),
+                    val)
+
+
+class Converter(object):
+    """Convert between geographic/detic and AACGM-V2 coordinates at one time.
+
+    Parameters
+    ----------
+    dtime : dt.datetime
+        Date and time for the magnetic field model
+    coeff_prefix : str or NoneType
+        Location and file prefix for AACGM coefficient files, or None to use
+        aacgmv2.AACGM_v2_DAT_PREFIX (default=None)
+    igrf_file : str or NoneType
+        Full filename of IGRF coefficient file, or None to use
+        aacgmv2.IGRF_COEFFS (default=None)
+    aacgm_coeffs : bytes-like, tuple, or NoneType
+        AACGM coefficients set from memory instead of being read from the
+        coefficient files, see `aacgmv2.set_coeffs` (default=None)
+    igrf_coeffs : str, bytes-like, tuple, or NoneType
+        IGRF coefficients set from memory instead of being read from the IGRF
+        coefficient file, see `aacgmv2.set_coeffs` (default=None)
+
+    Attributes
+    ----------
+    dtime : dt.datetime
+        Date and time for the magnetic field model.  Setting this updates the
+        model coefficients.
+    coeff_prefix : str
+        Location and file prefix for AACGM coefficient files
+    igrf_file : str
+        Full filename of IGRF coefficient file
+
+    Raises
+    ------
+    RuntimeError
+        If unable to create the model or to set the AACGMV2 datetime.
+    ValueError
+        If the coefficients set from memory are not valid.
+
+    Notes
+    -----
+    Each Converter holds its own coefficients, height interpolation, and IGRF
+    model, so several may be used (e.g., one per time bin or one per thread)
+    without reloading or re-interpolating the coefficients of another.  The
+    module-level functions use a separate, default model.  Calls to a single
+    Converter are serialized.  Each model caches the coefficients of several
+    5-year epochs, see `aacgmv2.set_cache_size`.
+
+    """
+
+    def __init__(self, dtime, coeff_prefix=None, igrf_file=None,
+                 aacgm_coeffs=None, igrf_coeffs=None):
+        self.coeff_prefix = aacgmv2.AACGM_v2_DAT_PREFIX \
+            if coeff_prefix is None else coeff_prefix
+        self.igrf_file = aacgmv2.IGRF_COEFFS if igrf_file is None \
+            else igrf_file
+        self._model = c_aacgmv2.new_model(self.coeff_prefix, self.igrf_file)
+        self._lock = threading.RLock()
+        self._dtime = None
+        _set_coeffs(self._model, self._lock,
+                    False if aacgm_coeffs is None else aacgm_coeffs,
+                    False if igrf_coeffs is None else igrf_coeffs)
+        self.dtime = dtime
+
+    def __repr__(self):
+        """Provide an evaluatable representation of the Converter."""
+        return "".join(["aacgmv2.Converter(", repr(self.dtime),
+                        ", coeff_prefix=", repr(self.coeff_prefix),
+                        ", igrf_file=", repr(self.igrf_file), ")"])
+
+    @property
+    def dtime(self):
+        """Date and time for the magnetic field model."""
+        return self._dtime
+
+    @dtime.setter
+    def dtime(self, dtime):
+        dtime = test_time(dtime)
+
+        with self._lock, _use_model(self._model):
+            try:
+                c_aacgmv2.set_datetime(dtime.year, dtime.month, dtime.day,
+                                       dtime.hour, dtime.minute, dtime.second)
+            except (TypeError, RuntimeError) as err:
+                raise RuntimeError("cannot set time for {:}: {:}".format(
+                    dtime, err))
+            _prefetch_next(self._model, self._lock)
+            self._dtime = dtime
+
+    def set_coeffs(self, aacgm_coeffs=False, igrf_coeffs=False):
+        """Set the coefficients of this model from memory.
+
+        Parameters
+        ----------
+        aacgm_coeffs, igrf_coeffs
+            See `aacgmv2.set_coeffs`
+
+        Raises
+        ------
+        ValueError
+            If the coefficients are not valid.
+        RuntimeError
+            If unable to set the AACGMV2 datetime with the new coefficients.
+
+        """
+        with self._lock:
+            _set_coeffs(self._model, self._lock, aacgm_coeffs, igrf_coeffs)
+
+            # The model time is reset with the coefficients
+            self.dtime = self._dtime
+
+    def set_cache_size(self, size=None):
+        """Set the number of 5-year coefficient epochs cached by this model.
+
+        Parameters
+        ----------
+        size : int or NoneType
+            Maximum number of cached epochs, at least 2, or None for the
+            default of 4 (default=None)
+
+        Raises
+        ------
+        ValueError
+            If the size is out of range.
+
+        """
+        with self._lock, _use_model(self._model):
+            c_aacgmv2.set_cache_size(0 if size is None else size)
+
+    def get_cache_stats(self):
+        """Get the coefficient cache counters of this model.
+
+        Returns
+        -------
+        stats : dict
+            See `aacgmv2.get_cache_stats`
+
+        """
+        with self._lock, _use_model(self._model):
+            return c_aacgmv2.cache_stats()
+
+    def convert_latlon(self, in_lat, in_lon, height, method_code="G2A"):
+        """Convert between geomagnetic coordinates and AACGM coordinates.
+
+        Parameters
+        ----------
+        in_lat : float
+            Input latitude in degrees N (code specifies type of latitude)
+        in_lon : float
+            Input longitude in degrees E (code specifies type of longitude)
+        height : float
+            Altitude above the surface of the earth in km
+        method_code : str or int
+            Bit code or string denoting which type(s) of conversion to perform,
+            see `aacgmv2.convert_latlon` (default="G2A")
+
+        Returns
+        -------
+        out_lat : float
+            Output latitude in degrees N
+        out_lon : float
+            Output longitude in degrees E
+        out_r : float
+            Geocentric radial distance (R_Earth) or altitude above the surface
+            of the Earth (km)
+
+        Raises
+        ------
+        ValueError
+            If input is incorrect.
+
+        """
+        return _convert_latlon(in_lat, in_lon, height, self.dtime, method_code,
+                               self._model, self._lock)
+
+    def convert_latlon_arr(self, in_lat, in_lon, height, method_code="G2A",
+                           out=None, max_workers=None, sort_height=False,
+                           engine="batch", workers=None, trace_iter=None):
+        """Convert between geomagnetic coordinates and AACGM coordinates.
+
+        Parameters
+        ----------
+        in_lat : np.ndarray, list, or float
+            Input latitude in degrees N (method_code specifies type of
+            latitude)
+        in_lon : np.ndarray or list or float
+            Input longitude in degrees E (method_code specifies type of
+            longitude)
+        height : np.ndarray or list or float
+            Altitude above the surface of the earth in km
+        method_code : int or str
+            Bit code or string denoting which type(s) of conversion to perform,
+            see `aacgmv2.convert_latlon_arr` (default="G2A")
+        out : tuple, np.ndarray, or NoneType
+            Optional pre-allocated float64 output, see
+            `aacgmv2.convert_latlon_arr` (default=None)
+        max_workers : int or NoneType
+            Number of threads used to convert the locations, or None to convert
+            in the calling thread (default=None)
+        sort_height : bool
+            If True, the locations are converted in order of height and
+            returned in the original order (default=False)
+        engine : str
+            Method used to evaluate the coefficients, see
+            `aacgmv2.convert_latlon_arr` (default='batch')
+        workers : int or NoneType
+            Number of worker processes used to convert the locations, which
+            use the coefficient files of this Converter, see
+            `aacgmv2.convert_latlon_arr` (default=None)
+        trace_iter : np.ndarray or NoneType
+            Optional pre-allocated int64 array for the tracing iterations of
+            each location, see `aacgmv2.convert_latlon_arr` (default=None)
+
+        Returns
+        -------
+        out_lat : np.ndarray
+            Output latitudes in degrees N
+        out_lon : np.ndarray
+            Output longitudes in degrees E
+        out_r : np.ndarray
+            Geocentric radial distance (R_Earth) or altitude above the surface
+            of the Earth (km)
+
+        Raises
+        ------
+        ValueError
+            If input is incorrect.
+
+        """
+        return _convert_latlon_arr(in_lat, in_lon, height, self.dtime,
+                                   method_code, out, max_workers, None,
+                                   sort_height, engine, self._model,
+                                   self._lock, self.coeff_prefix,
+                                   self.igrf_file, workers, trace_iter)
+
+
+class WorkerPool(object):
+    """Pool of worker processes for `convert_latlon_arr`, kept across calls.
+
+    Parameters
+    ----------
+    workers : int
+        Number of worker processes
+
+    Attributes
+    ----------
+    workers : int
+        Number of worker processes
+
+    See Also
+    --------
+    convert_latlon_arr : Uses the pool when passed as `workers`
+
+    Notes
+    -----
+    The worker processes load the coefficient files once, on their first
+    conversion, and keep them for later calls.  Conversions by a Converter
+    use the coefficient files of that Converter.  If a worker process dies,
+    the pool is replaced by a new one.  Use the WorkerPool as a context
+    manager, or call `shutdown`, to stop the worker processes.
+
+    Examples
+    --------
+    ::
+
+        with aacgmv2.WorkerPool(4) as pool:
+            for lat, lon, alt in chunks:
+                out = aacgmv2.convert_latlon_arr(lat, lon, alt, dtime,
+                                                 "TRACE", workers=pool)
+
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._pool = futures.ProcessPoolExecutor(max_workers=workers)
+
+    def __repr__(self):
+        """Provide an evaluatable representation of the WorkerPool."""
+        return "".join(["aacgmv2.WorkerPool(", repr(self.workers), ")"])
+
+    def __enter__(self):
+        """Use the pool as a context manager."""
+        return self
+
+    def __exit__(self, *args):
+        """Stop the worker processes at the end of the block."""
+        self.shutdown()
+
+    def _restart(self):
+        """Replace a pool whose worker process has died."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = futures.ProcessPoolExecutor(max_workers=self.workers)
+
+    def submit(self, func, *args, **kwargs):
+        """Submit a job to the worker processes.
+
+        Parameters
+        ----------
+        func : function
+            Function called by a worker process
+        *args, **kwargs
+            Arguments and keyword arguments for `func`
+
+        Returns
+        -------
+        job : futures.Future
+            Result of the job
+
+        """
+        return self._pool.submit(func, *args, **kwargs)
+
+    def shutdown(self):
+        """Stop the worker processes, after their jobs finish."""
+        self._pool.shutdown()
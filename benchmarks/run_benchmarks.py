@@ -0,0 +1,443 @@
+# Copyright (C) 2019 NRL
+# Author: Angeline Burrell
+# Disclaimer: This code is under the MIT license, whose details can be found at
+# the root in the LICENSE file
+#
+# -*- coding: utf-8 -*-
+"""Benchmark the AACGM-V2 conversions.
+
+Run the benchmarks from the repository root, saving the results as JSON::
+
+    python benchmarks/run_benchmarks.py -o results.json
+
+and compare the results of two commits::
+
+    python benchmarks/run_benchmarks.py --compare old.json new.json
+
+"""
+
+import argparse
+import datetime as dt
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import aacgmv2
+
+# Start of the 2015 coefficient epoch, and a time in the middle of it
+EPOCH_START = dt.datetime(2015, 1, 1)
+DTIME = dt.datetime(2017, 3, 15, 12, 0, 0)
+
+# Code run in a new process to time the first conversions
+COLD_NAMES = ["cold_import", "cold_first_convert", "cold_first_mlt"]
+COLD_CODE = """
+import datetime as dt
+import time
+dtime = dt.datetime.fromisoformat('{:s}')
+t0 = time.perf_counter()
+import aacgmv2
+t1 = time.perf_counter()
+aacgmv2.convert_latlon(60.0, 15.0, 300.0, dtime)
+t2 = time.perf_counter()
+aacgmv2.convert_mlt(15.0, dtime)
+t3 = time.perf_counter()
+print(t1 - t0, t2 - t1, t3 - t2)
+"""
+
+
+def locations(num, seed=0):
+    """Create random locations with mixed altitudes.
+
+    Parameters
+    ----------
+    num : int
+        Number of locations
+    seed : int
+        Random number generator seed (default=0)
+
+    Returns
+    -------
+    lat : np.ndarray
+        Latitudes in degrees N, poleward of the AACGM-v2 forbidden region
+    lon : np.ndarray
+        Longitudes in degrees E
+    alt : np.ndarray
+        Altitudes between 0 and 2000 km
+
+    """
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(40.0, 89.0, num) * rng.choice([-1.0, 1.0], num)
+
+    return lat, rng.uniform(-180.0, 180.0, num), rng.uniform(0.0, 2000.0, num)
+
+
+def time_call(func, repeat):
+    """Time repeated calls of a function.
+
+    Parameters
+    ----------
+    func : function
+        Function called without arguments
+    repeat : int
+        Number of timed calls
+
+    Returns
+    -------
+    times : list
+        Wall time of each call in seconds
+
+    """
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    return times
+
+
+def bench_scalar(repeat, max_points):
+    """Benchmark the single-location functions.
+
+    Parameters
+    ----------
+    repeat : int
+        Number of timed runs
+    max_points : int
+        Largest number of points
+
+    Yields
+    ------
+    name : str
+        Benchmark name
+    points : int
+        Number of points converted in each run
+    func : function
+        Function performing one run
+
+    """
+    lat, lon, alt = locations(min(max_points, 1000))
+
+    def convert_latlon():
+        for args in zip(lat, lon, alt):
+            aacgmv2.convert_latlon(*args, DTIME)
+
+    def get_aacgm_coord():
+        for args in zip(lat, lon, alt):
+            aacgmv2.get_aacgm_coord(*args, DTIME)
+
+    yield "convert_latlon", lat.size, convert_latlon
+    yield "get_aacgm_coord", lat.size, get_aacgm_coord
+
+
+def bench_arrays(repeat, max_points):
+    """Benchmark the array conversions for coefficients and tracing.
+
+    Parameters
+    ----------
+    repeat : int
+        Number of timed runs
+    max_points : int
+        Largest number of points
+
+    Yields
+    ------
+    name : str
+        Benchmark name
+    points : int
+        Number of points converted in each run
+    func : function
+        Function performing one run
+
+    """
+    for power in range(3, 8):
+        num = 10 ** power
+        if num > max_points:
+            break
+
+        lat, lon, alt = locations(num)
+        for code in ["G2A", "A2G"]:
+            yield ("convert_latlon_arr_{:s}_1e{:d}".format(code, power), num,
+                   lambda code=code, lat=lat, lon=lon, alt=alt:
+                   aacgmv2.convert_latlon_arr(lat, lon, alt, DTIME, code))
+
+    # Field-line tracing is compared to the coefficients at the same points
+    lat, lon, alt = locations(min(max_points, 1000))
+    for code in ["G2A", "G2A|TRACE", "A2G", "A2G|TRACE"]:
+        yield ("convert_latlon_arr_{:s}_trace_cmp".format(code.replace(
+            "|", "_")), lat.size, lambda code=code: aacgmv2.convert_latlon_arr(
+                lat, lon, alt, DTIME, code))
+
+
+def bench_mlt(repeat, max_points):
+    """Benchmark the MLT conversions.
+
+    Parameters
+    ----------
+    repeat : int
+        Number of timed runs
+    max_points : int
+        Largest number of points
+
+    Yields
+    ------
+    name : str
+        Benchmark name
+    points : int
+        Number of points converted in each run
+    func : function
+        Function performing one run
+
+    """
+    num = min(max_points, 10 ** 6)
+    mlon = locations(num)[1]
+    dense = np.datetime64(DTIME) + np.arange(num).astype('timedelta64[s]')
+    sparse = np.datetime64(DTIME) + np.random.default_rng(1).integers(
+        0, 365 * 86400, num).astype('timedelta64[s]')
+
+    yield ("convert_mlt_single_time", num,
+           lambda: aacgmv2.convert_mlt(mlon, DTIME))
+    yield ("convert_mlt_dense_times", num,
+           lambda: aacgmv2.convert_mlt(mlon, dense))
+    yield ("convert_mlt_dense_times_exact", num,
+           lambda: aacgmv2.convert_mlt(mlon, dense, mlt_ref=False))
+    yield ("convert_mlt_sparse_times", num,
+           lambda: aacgmv2.convert_mlt(mlon, sparse))
+
+
+def bench_epochs(repeat, max_points):
+    """Benchmark conversions that cross the 5-year coefficient epochs.
+
+    Parameters
+    ----------
+    repeat : int
+        Number of timed runs
+    max_points : int
+        Largest number of points
+
+    Yields
+    ------
+    name : str
+        Benchmark name
+    points : int
+        Number of points converted in each run
+    func : function
+        Function performing one run
+
+    """
+    # Alternate between the last second of one epoch and the first of the next
+    num = min(max_points, 1000)
+    lat, lon, alt = locations(num)
+    dtimes = np.where(np.arange(num) % 2 == 0,
+                      np.datetime64(EPOCH_START - dt.timedelta(seconds=1)),
+                      np.datetime64(EPOCH_START))
+
+    def scalar_crossings():
+        for i in range(num):
+            aacgmv2.convert_latlon(lat[i], lon[i], alt[i],
+                                   dtimes[i].astype(dt.datetime))
+
+    yield "epoch_crossings_scalar", num, scalar_crossings
+    yield ("epoch_crossings_arr", num,
+           lambda: aacgmv2.convert_latlon_arr(lat, lon, alt, dtimes))
+
+    # Jump between epochs a decade apart, beyond the default epoch cache
+    years = [1990 + 5 * (i % 7) for i in range(num // 10)]
+    yield ("epoch_jumps_scalar", len(years),
+           lambda: [aacgmv2.convert_latlon(60.0, 15.0, 300.0,
+                                           dt.datetime(year, 6, 1))
+                    for year in years])
+
+
+def bench_cold(repeat):
+    """Benchmark the import and first conversions in new processes.
+
+    Parameters
+    ----------
+    repeat : int
+        Number of processes started
+
+    Returns
+    -------
+    results : dict
+        Import, first location conversion (including the coefficient and IGRF
+        loads), and first MLT conversion times for each process
+
+    """
+    code = COLD_CODE.format(DTIME.isoformat())
+    results = {name: list() for name in COLD_NAMES}
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], check=True,
+                             capture_output=True, text=True).stdout
+        for key, val in zip(results.keys(), out.split()):
+            results[key].append(float(val))
+
+    return results
+
+
+def summarize(times, points):
+    """Summarize the timed runs of a benchmark.
+
+    Parameters
+    ----------
+    times : list
+        Wall time of each run in seconds
+    points : int
+        Number of points converted in each run
+
+    Returns
+    -------
+    result : dict
+        Run times, their minimum and median, and the throughput of the
+        fastest run in points per second
+
+    """
+    return {"points": points, "times": times, "min": min(times),
+            "median": float(np.median(times)),
+            "rate": points / min(times) if min(times) > 0 else None}
+
+
+def run(select=None, repeat=3, max_points=10 ** 7):
+    """Run the benchmarks.
+
+    Parameters
+    ----------
+    select : str or NoneType
+        Only run benchmarks with names containing this string, or None to run
+        all benchmarks (default=None)
+    repeat : int
+        Number of timed runs of each benchmark (default=3)
+    max_points : int
+        Largest number of points converted in a run (default=10 ** 7)
+
+    Returns
+    -------
+    report : dict
+        Description of the environment ('meta') and the summary of each
+        benchmark ('results')
+
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"],
+                                capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    report = {"meta": {"commit": commit,
+                       "date": dt.datetime.now().isoformat(),
+                       "aacgmv2": aacgmv2.__version__,
+                       "numpy": np.__version__,
+                       "python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "repeat": repeat, "max_points": max_points},
+              "results": dict()}
+
+    for bench in [bench_scalar, bench_arrays, bench_mlt, bench_epochs]:
+        for name, points, func in bench(repeat, max_points):
+            if select is None or select in name:
+                # Warm up the model and caches before timing the runs
+                func()
+                report["results"][name] = summarize(time_call(func, repeat),
+                                                    points)
+                print("{:40s} {:12.6f} s".format(
+                    name, report["results"][name]["min"]), file=sys.stderr)
+
+    if select is None or any([select in name for name in COLD_NAMES]):
+        for name, times in bench_cold(repeat).items():
+            report["results"][name] = summarize(times, 1)
+            print("{:40s} {:12.6f} s".format(name, min(times)),
+                  file=sys.stderr)
+
+    return report
+
+
+def compare(old, new, threshold=1.1):
+    """Compare two benchmark reports.
+
+    Parameters
+    ----------
+    old : dict
+        Report of the reference run
+    new : dict
+        Report of the run to compare
+    threshold : float
+        Ratio of the new to the old minimum time above which a benchmark is
+        considered to have regressed (default=1.1)
+
+    Returns
+    -------
+    regressed : list
+        Names of the regressed benchmarks
+
+    Notes
+    -----
+    Only benchmarks converting the same number of points in both reports are
+    compared.
+
+    """
+    regressed = list()
+    print("{:40s} {:>12s} {:>12s} {:>8s}".format("benchmark", "old (s)",
+                                                 "new (s)", "ratio"))
+    for name in sorted(set(old["results"]) & set(new["results"])):
+        # Runs converting different numbers of points are not comparable
+        if old["results"][name]["points"] != new["results"][name]["points"]:
+            continue
+
+        old_time = old["results"][name]["min"]
+        new_time = new["results"][name]["min"]
+        ratio = new_time / old_time if old_time > 0 else np.inf
+        flag = ""
+        if ratio > threshold:
+            regressed.append(name)
+            flag = " *"
+        print("{:40s} {:12.6f} {:12.6f} {:8.3f}{:s}".format(
+            name, old_time, new_time, ratio, flag))
+
+    return regressed
+
+
+def main():
+    """Run or compare the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-o', '--output', metavar='FILE', default=None,
+                        help='JSON results file (stdout if none specified)')
+    parser.add_argument('-k', '--select', metavar='NAME', default=None,
+                        help='only run benchmarks with names containing NAME')
+    parser.add_argument('-r', '--repeat', metavar='N', type=int, default=3,
+                        help='number of timed runs of each benchmark '
+                        '(default: 3)')
+    parser.add_argument('-n', '--max-points', metavar='N', type=int,
+                        default=10 ** 7, help='largest number of points '
+                        'converted in a run (default: 10000000)')
+    parser.add_argument('--compare', metavar=('OLD', 'NEW'), nargs=2,
+                        default=None, help='compare two JSON results files '
+                        'instead of running the benchmarks')
+    parser.add_argument('--threshold', type=float, default=1.1,
+                        help='time ratio above which --compare reports a '
+                        'regression and exits with status 1 (default: 1.1)')
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        reports = list()
+        for filename in args.compare:
+            with open(filename, 'r') as fin:
+                reports.append(json.load(fin))
+        return 1 if compare(*reports, threshold=args.threshold) else 0
+
+    report = run(args.select, args.repeat, args.max_points)
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=1)
+    else:
+        with open(args.output, 'w') as fout:
+            json.dump(report, fout, indent=1)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -34,6 +34,51 @@
   #endif
 #endif
 
+/* thread-local storage, used for caches that are updated during conversion */
+#ifndef AACGM_TLS
+  #ifdef _MSC_VER
+    #define AACGM_TLS __declspec(thread)
+  #else
+    #define AACGM_TLS __thread
+  #endif
+#endif
+
+/* epoch coefficient cache: default and maximum number of cached epochs, and
+   the fraction of a year before an epoch boundary to prefetch the next one */
+#define AACGM_CACHE_SIZE 4
+#define AACGM_CACHE_MAX  32
+#define AACGM_PREFETCH   0.5
+
+/* number of heights for which the height interpolated coefficients are cached
+   in each direction */
+#define AACGM_HEIGHT_SLOTS 16
+
+/* number of locations evaluated together by AACGM_v2_ConvertBatch */
+#define AACGM_BATCH 32
+
+/* coefficients for a single 5-year epoch, in the order of the ASCII files */
+typedef double AACGM_v2_EpochCoefs[NFLAG][POLYORD][NCOORD][AACGM_KMAX];
+
+/* model state: coefficients, date and time, and coefficient file locations */
+typedef struct AACGM_v2_Model AACGM_v2_Model;
+
+/* performance counters and cumulative wall times (in seconds) of the
+   expensive stages of the conversions, see AACGM_v2_GetStats */
+typedef struct {
+  unsigned long coef_loads;        /* calls to AACGM_v2_LoadCoefs */
+  double coef_load_time;
+  unsigned long time_interps;      /* time interpolations of the coefficients */
+  double time_interp_time;
+  unsigned long height_interps;    /* height interpolations of the coefs */
+  double height_interp_time;
+  unsigned long mlon_refs;         /* MLT reference longitude calculations */
+  double mlon_ref_time;
+  unsigned long traces;            /* traced field lines */
+  unsigned long trace_steps;       /* adaptive RK45 steps */
+  unsigned long trace_bisections;  /* bisection (RK4) steps */
+  double trace_time;
+} AACGM_v2_Stats;
+
 /*****************************************************************************
  * function prototypes
  *****************************************************************************/
@@ -45,8 +90,12 @@ int AACGM_v2_CGM2Alt(double r_height_in, double r_lat_in, double *r_lat_adj);
 double AACGM_v2_Sgn(double a, double b);
 int convert_geo_coord_v2(double lat_in, double lon_in, double height_in,
                          double *lat_out, double *lon_out, int flag, int order);
-int AACGM_v2_LoadCoefFP(FILE *fp, int code);
-int AACGM_v2_LoadCoef(char *fname, int code);
+int AACGM_v2_LoadCoefFP(FILE *fp, AACGM_v2_EpochCoefs *coefs);
+int AACGM_v2_LoadCoef(char *fname, AACGM_v2_EpochCoefs *coefs);
+int AACGM_v2_OpenStore(const char *root);
+void AACGM_v2_CloseStore(void);
+const AACGM_v2_EpochCoefs *AACGM_v2_StoreCoefs(int year);
+int AACGM_v2_CacheCoefs(int year, int keep);
 int AACGM_v2_LoadCoefs(int year);
 int AACGM_v2_TimeInterp(void);
 void AACGM_v2_errmsg(int ecode);
@@ -54,11 +103,38 @@ int AACGM_v2_Trace(double lat_in, double lon_in, double alt,
                    double *lat_out, double *lon_out);
 int AACGM_v2_Trace_inv(double lat_in, double lon_in, double alt,
                        double *lat_out, double *lon_out);
+double AACGM_v2_Clock(void);
+AACGM_v2_Stats *AACGM_v2_ThreadStats(void);
 
 
 /* public functions */
+AACGM_v2_Model *AACGM_v2_NewModel(const char *prefix, const char *igrf_file);
+void AACGM_v2_FreeModel(AACGM_v2_Model *model);
+AACGM_v2_Model *AACGM_v2_SetModel(AACGM_v2_Model *model);
+int AACGM_v2_SetCoefs(int first_epoch, int nepoch,
+                      const AACGM_v2_EpochCoefs *coefs);
+int AACGM_v2_MemoryCoefs(void);
+unsigned long AACGM_v2_CoefsSerial(void);
+int AACGM_v2_SetCacheSize(int size);
+void AACGM_v2_GetCacheStats(unsigned long *hits, unsigned long *misses,
+                            unsigned long *loads, int *count, int *size);
+int AACGM_v2_NextEpoch(void);
+int AACGM_v2_PrefetchCoefs(int year);
+int AACGM_v2_StageFile(int year, char *fname);
+int AACGM_v2_AdoptCoefs(int year, const char *fname,
+                        AACGM_v2_EpochCoefs *coefs);
 int AACGM_v2_Convert(double in_lat, double in_lon, double height,
                      double *out_lat, double *out_lon, double *r, int code);
+int AACGM_v2_ConvertBatch(int n, const double *in_lat, const double *in_lon,
+                          const double *height, double *out_lat,
+                          double *out_lon, double *r, int *err, int code);
+int AACGM_v2_ConvertBatchIter(int n, const double *in_lat,
+                              const double *in_lon, const double *height,
+                              double *out_lat, double *out_lon, double *r,
+                              int *err, unsigned long *niter, int code);
+void AACGM_v2_GetStats(AACGM_v2_Stats *stats);
+void AACGM_v2_ResetStats(void);
+unsigned long AACGM_v2_TraceIter(void);
 int AACGM_v2_SetDateTime(int year, int month, int day,
                          int hour, int minute, int second);
 int AACGM_v2_GetDateTime(int *year, int *month, int *day,
@@ -67,6 +143,8 @@ int AACGM_v2_SetNow(void);
 int AACGM_v2_Lock(void);
 int AACGM_v2_Unlock(void);
 int AACGM_v2_Locked(void);
+int AACGM_v2_GetLockDateTime(int *year, int *month, int *day,
+                             int *hour, int *minute, int *second);
 
 #endif
 
@@ -18,6 +18,20 @@
 #define MAXNYR 100                    /* maximum number of epochs */
 #define IGRF_ORDER  13                     /* maximum order of SH expansion */
 #define IGRF_MAXK   ((IGRF_ORDER+1)*(IGRF_ORDER+1)) /* # of SH coefficients */
+#define IGRF_BATCH  64                     /* locations per batch in */
+                                           /* IGRF_compute_batch */
+
+/* thread-local storage, used to select the model state for each thread */
+#ifndef AACGM_TLS
+  #ifdef _MSC_VER
+    #define AACGM_TLS __declspec(thread)
+  #else
+    #define AACGM_TLS __thread
+  #endif
+#endif
+
+/* model state: coefficients, date and time, and derived dipole parameters */
+typedef struct IGRF_Model IGRF_Model;
 
 #define DTOR (M_PI/180.)
 #define MIN(a,b) ((a) < (b) ? (a) : (b))
@@ -33,7 +47,14 @@ void igrf_pause(void);
 void IGRF_msg_notime(void);
 
 /* public functions */
+IGRF_Model *IGRF_NewModel(const char *filename);
+void IGRF_FreeModel(IGRF_Model *model);
+IGRF_Model *IGRF_SetModel(IGRF_Model *model);
+int IGRF_SetCoefs(int nyear, const double *coefs, const double *svs);
+int IGRF_MemoryCoefs(void);
 int IGRF_compute(const double rtp[], double brtp[]);
+int IGRF_compute_batch(int n, const double *x, const double *y,
+                       const double *z, double *bx, double *by, double *bz);
 int IGRF_SetNow(void);
 int IGRF_GetDateTime(int *year, int *month, int *day,
                       int *hour, int *minute, int *second, int *dayno);
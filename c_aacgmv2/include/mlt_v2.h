@@ -2,6 +2,10 @@
 #ifndef _MLT_v2_H
 #define _MLT_v2_H
 
+/* number of times for which the MLT reference longitude is cached */
+#define MLT_CACHE_BITS 8
+#define MLT_CACHE_SIZE (1 << MLT_CACHE_BITS)
+
 double MLTConvert_v2(int yr, int mo, int dy, int hr, int mt ,int sc,
                       double mlon);
 double inv_MLTConvert_v2(int yr, int mo, int dy, int hr, int mt ,int sc,
@@ -14,6 +18,8 @@ double MLTConvertYrsec_v2(int yr,int yrsec, double mlon);
 double inv_MLTConvertYrsec_v2(int yr,int yrsec, double mlt);
 double MLTConvertEpoch_v2(double epoch, double mlon);
 double inv_MLTConvertEpoch_v2(double epoch, double mlt);
+void MLT_v2_GetCacheStats(unsigned long *hits, unsigned long *misses,
+                          int *count, int *size, unsigned long *avoided);
 
 #endif
 
@@ -32,14 +32,38 @@
 ; convert_geo_coord_v2
 ; AACGM_v2_LoadCoefFP
 ; AACGM_v2_LoadCoef
+; AACGM_v2_OpenStore
+; AACGM_v2_CloseStore
+; AACGM_v2_StoreCoefs
+; AACGM_v2_CacheCoefs
 ; AACGM_v2_LoadCoefs
+; AACGM_v2_NewModel
+; AACGM_v2_FreeModel
+; AACGM_v2_SetModel
+; AACGM_v2_SetCoefs
+; AACGM_v2_MemoryCoefs
+; AACGM_v2_CoefsSerial
+; AACGM_v2_SetCacheSize
+; AACGM_v2_GetCacheStats
+; AACGM_v2_Clock
+; AACGM_v2_ThreadStats
+; AACGM_v2_GetStats
+; AACGM_v2_ResetStats
+; AACGM_v2_TraceIter
+; AACGM_v2_NextEpoch
+; AACGM_v2_PrefetchCoefs
+; AACGM_v2_StageFile
+; AACGM_v2_AdoptCoefs
 ; AACGM_v2_Convert
+; AACGM_v2_ConvertBatch
+; AACGM_v2_ConvertBatchIter
 ; AACGM_v2_SetDateTime
 ; AACGM_v2_GetDateTime
 ; AACGM_v2_SetNow
 ; AACGM_v2_Lock
 ; AACGM_v2_Unlock
 ; AACGM_v2_Locked
+; AACGM_v2_GetLockDateTime
 ; AACGM_v2_errmsg
 ;
 
@@ -56,37 +80,127 @@
 #include <string.h>
 #include <math.h>
 #include <time.h>
+#ifdef _WIN32
+  #include <windows.h>
+#else
+  #include <fcntl.h>
+  #include <sys/mman.h>
+  #include <sys/stat.h>
+  #include <unistd.h>
+#endif
 #include "rtime.h"
 #include "aacgmlib_v2.h"
 #include "igrflib.h"
 
 #define DEBUG 0
 
-/* put these in the library header file when you figure out how to do so... */
-static struct {
-  int year;
-  int month;
-  int day;
-  int hour;
-  int minute;
-  int second;
-  int dayno;
-  int daysinyear;
-  int locked;
-} aacgm_date = {-1,-1,-1,-1,-1,-1,-1,-1,0};
+/* binary coefficient store: a little-endian header, CRC-32 checksums for
+   each epoch, and the float64 coefficients for each epoch in the order of the
+   ASCII files; written by aacgmv2/coeff_store.py */
+#define STORE_MAGIC   "AACGMCF\0"
+#define STORE_VERSION 1
+#define STORE_HEADER  48  /* bytes before the checksums */
+#define STORE_SUFFIX  "all.bin"
+#define STORE_MEMORY  2   /* store status for coefficients set in memory */
+
+/* model state, so that several models may be used at once */
+struct AACGM_v2_Model {
+  struct {
+    int year;
+    int month;
+    int day;
+    int hour;
+    int minute;
+    int second;
+    int dayno;
+    int daysinyear;
+    int locked;
+    int lock_date[6];  /* date and time when locked, see AACGM_v2_Lock */
+  } date;
+
+  int myear_old;
+  double fyear_old;
+
+  unsigned long id;          /* unique model identifier */
+  unsigned long generation;  /* incremented when the coefficients change */
+
+  double coef[AACGM_KMAX][NCOORD][POLYORD][NFLAG];      /* interpolated coefs */
+  const AACGM_v2_EpochCoefs *coefs[2];  /* bracketing coefs */
+
+  struct {
+    int status;          /* 0: not opened; 1: open; 2: set in memory;
+                            -1: unavailable */
+    void *map;           /* mapped file, or copy of the coefficients */
+    size_t size;         /* mapped file size in bytes */
+    int first_epoch;     /* first 5-year epoch year */
+    int epoch_step;      /* years between epochs */
+    int nepoch;          /* number of epochs */
+    const unsigned char *crc;            /* CRC-32 for each epoch */
+    const AACGM_v2_EpochCoefs *epochs;   /* coefficients for each epoch */
+    signed char *verified;  /* 1: checksum verified; -1: failed; 0: not yet */
+    char root[256];         /* coefficient prefix used to open the store */
+  } store;
+
+  struct {
+    int size;                /* maximum number of epochs; 0 for the default */
+    int count;               /* number of cached epochs */
+    unsigned long clock;     /* incremented each time an epoch is used */
+    unsigned long hits;      /* epochs found in the cache */
+    unsigned long misses;    /* epochs not found in the cache */
+    unsigned long loads;     /* epochs read from the store or ASCII files */
+    char root[256];          /* coefficient prefix of the cached epochs */
+    struct {
+      int year;                          /* 5-year epoch year */
+      unsigned long used;                /* clock when last used */
+      const AACGM_v2_EpochCoefs *coefs;  /* coefficients for the epoch */
+      AACGM_v2_EpochCoefs *owned;        /* ASCII coefs; NULL for the store */
+    } entry[AACGM_CACHE_MAX];
+  } cache;
+
+  char prefix[256];   /* coefficient prefix; AACGM_v2_DAT_PREFIX if empty */
+  IGRF_Model *igrf;   /* IGRF model; NULL for the default */
+};
+
+/* the default model is used by each thread until another is selected */
+static AACGM_v2_Model aacgm_default = {{-1,-1,-1,-1,-1,-1,-1,-1,0}, -1, -1.,
+                                       0, 0};
+static AACGM_TLS AACGM_v2_Model *aacgm = &aacgm_default;
+static unsigned long aacgm_last_id = 0;
+static unsigned long coefs_serial = 0;  /* see AACGM_v2_CoefsSerial */
 
 static int myear = 0;       /* model year: 5-year epoch */
 static double fyear = 0.;   /* floating point year */
 
-static int myear_old = -1;
-static double fyear_old = -1.;
+/* height interpolation is cached separately for each thread, keeping
+   AACGM_HEIGHT_SLOTS heights for each direction; the cache is invalidated
+   whenever the model or its coefficient generation changes */
+struct height_slot {
+  double height;                     /* height in km */
+  unsigned long used;                /* clock when last used */
+  double cint[AACGM_KMAX][NCOORD];   /* height interpolated coefficients */
+};
 
-static double height_old[2] = {-1,-1};
+static AACGM_TLS struct height_slot height_slots[NFLAG][AACGM_HEIGHT_SLOTS];
+static AACGM_TLS int height_count[NFLAG] = {0,0};
+static AACGM_TLS int height_last[NFLAG] = {0,0};
+static AACGM_TLS unsigned long height_clock = 0;
+static AACGM_TLS unsigned long height_id = 0;
+static AACGM_TLS unsigned long height_generation = 0;
+
+/* performance counters are kept by each thread, so that they are updated
+   without locks, in blocks that are linked together when first used so that
+   AACGM_v2_GetStats may sum them; the blocks are never freed */
+struct stats_block {
+  AACGM_v2_Stats stats;
+  struct stats_block *next;
+};
 
-static struct {
-  double coef[AACGM_KMAX][NCOORD][POLYORD][NFLAG];      /* interpolated coefs */
-  double coefs[AACGM_KMAX][NCOORD][POLYORD][NFLAG][2];  /* bracketing coefs */
-} sph_harm_model;
+static struct stats_block *stats_head = NULL;
+static AACGM_v2_Stats stats_spare;  /* used if a block cannot be allocated */
+static AACGM_TLS struct stats_block *stats_mine = NULL;
+
+/* iterations of the last field line traced by AACGM_v2_Convert */
+static AACGM_TLS unsigned long trace_last_iter = 0;
 
 /* SGS added for MSC compatibility */
 #ifndef complex
@@ -353,6 +467,127 @@ int AACGM_v2_Rylm(double colat, double lon, int order, double *ylmval)
   return (0);
 } 
 
+/*-----------------------------------------------------------------------------
+; rylm_norm, rylm_batch
+;
+; Batched form of AACGM_v2_Rylm for AACGM_v2_ConvertBatch: compute the
+; normalization factors (including the sign for negative m) once, then the
+; orthonormal spherical harmonic functions of order SHORDER for up to
+; AACGM_BATCH points, stored as ylm[k][point].  The recursions are those of
+; AACGM_v2_Rylm, applied to all points at each step, and no memory is
+; allocated.
+;+-----------------------------------------------------------------------------
+*/
+
+static void rylm_norm(double *norm)
+{
+  int k, l, m;
+  double fact[2*SHORDER+2];
+
+  fact[0] = fact[1] = 1;
+  for (k=2; k <= 2*SHORDER+1; k++) fact[k] = k*fact[k-1];
+
+  for (l=0; l<=SHORDER; l++) {
+    for (m=0; m<=l; m++) {
+      k = l * (l+1) + m;      /* 1D index for l,m */
+      norm[k] = sqrt((2*l+1)/(4*M_PI) * fact[l-m]/fact[l+m]);
+    }
+    for (m=-l; m<0; m++) {
+      k = l * (l+1) + m;      /* 1D index for l,m */
+      norm[k] = norm[l * (l+1) - m] * ((-m % 2) ? -1 : 1);
+    }
+  }
+}
+
+static void rylm_batch(int n, const double *colat, const double *lon,
+                       const double *norm, double ylm[][AACGM_BATCH])
+{
+  int k, l, m, p;
+  int ia, ib, ic, id;
+  double cos_theta[AACGM_BATCH];
+  double q_fac_x[AACGM_BATCH], q_fac_y[AACGM_BATCH];
+  double q_val_x[AACGM_BATCH], q_val_y[AACGM_BATCH];
+  double d1, z2x, z2y, l2, tl, fac, ca, cb;
+
+  for (p=0; p<n; p++) {
+    cos_theta[p] = cos(colat[p]);
+    d1 = -sin(colat[p]);
+    q_fac_x[p] = q_val_x[p] = d1 * cos(lon[p]);
+    q_fac_y[p] = q_val_y[p] = d1 * sin(lon[p]);
+
+    ylm[0][p] = 1;              /* l = 0, m = 0 */
+    ylm[2][p] = cos_theta[p];   /* l = 1, m = 0 */
+    ylm[3][p] = q_val_x[p];     /* l = 1, m = +1 */
+    ylm[1][p] = -q_val_y[p];    /* l = 1, m = -1 */
+  }
+
+  /* zonal harmonics, P_l^(m=0) */
+  for (l=2; l<=SHORDER; l++) {
+    ia = (l-2)*(l-1);
+    ib = (l-1)*l;
+    ic = l * (l+1);
+    for (p=0; p<n; p++)
+      ylm[ic][p] = (cos_theta[p] * (2*l-1) * ylm[ib][p] -
+                    (l-1)*ylm[ia][p])/l;
+  }
+
+  /* P_l^l, including the longitude dependence */
+  for (l=2; l<=SHORDER; l++) {
+    d1 = l*2 - 1.;
+    ia = l*(l+2);   /* m = +l */
+    ib = l*l;       /* m = -l */
+    for (p=0; p<n; p++) {
+      z2x = d1 * q_fac_x[p];
+      z2y = d1 * q_fac_y[p];
+      fac = z2x * q_val_x[p] - z2y * q_val_y[p];
+      q_val_y[p] = z2x * q_val_y[p] + z2y * q_val_x[p];
+      q_val_x[p] = fac;
+
+      ylm[ia][p] =  q_val_x[p];
+      ylm[ib][p] = -q_val_y[p];
+    }
+  }
+
+  /* P_l,l-1 */
+  for (l=2; l<=SHORDER; l++) {
+    l2 = l*l;
+    tl = 2*l;
+    ia = l2 - 1;
+    ib = l2 - tl + 1;
+    ic = l2 + tl - 1;
+    id = l2 + 1;
+    fac = tl - 1;
+    for (p=0; p<n; p++) {
+      ylm[ic][p] = fac * cos_theta[p] * ylm[ia][p];   /* Pl,l-1   */
+      ylm[id][p] = fac * cos_theta[p] * ylm[ib][p];   /* Pl,-(l-1) */
+    }
+  }
+
+  /* remaining P_l,m for each m = 1 to order-2 */
+  for (m=1; m<=SHORDER-2; m++) {
+    for (l=m+2; l<=SHORDER; l++) {
+      ca = ((double) (2*l-1))/(l-m);
+      cb = ((double) (l+m-1))/(l-m);
+
+      l2 = l*l;
+      ic = l2 + l + m;
+      ib = l2 - l + m;
+      ia = l2 - l - l - l + 2 + m;
+      for (p=0; p<n; p++) {
+        /* positive m */
+        ylm[ic][p] = ca * cos_theta[p] * ylm[ib][p] - cb * ylm[ia][p];
+        /* negative m */
+        ylm[ic-m-m][p] = ca * cos_theta[p] * ylm[ib-m-m][p] -
+                         cb * ylm[ia-m-m][p];
+      }
+    }
+  }
+
+  /* normalization, see AACGM_v2_Rylm */
+  for (k=0; k<AACGM_KMAX; k++)
+    for (p=0; p<n; p++) ylm[k][p] *= norm[k];
+}
+
 /*-----------------------------------------------------------------------------
 ;
 ; NAME:
@@ -500,94 +735,61 @@ double AACGM_v2_Sgn(double a, double b)
 }
 
 /*-----------------------------------------------------------------------------
+; height_coefs, coef_output
 ;
-; NAME:
-;       convert_geo_coord_v2
-;
-; PURPOSE:
-;       Second-level function used to determine the lat/lon of the input
-;       coordinates.
-;
-; CALLING SEQUENCE:
-;       err = convert_geo_coord_v2(in_lat,in_lon,height, out_lat,out_lon,
-;                               code,order);
-;     
-;     Input Arguments:  
-;       in_lat        - latitude in degrees
-;       in_lon        - longitude in degrees
-;       height        - height above Earth in km
-;       code          - bitwise code for passing options into converter
-;                       G2A         - geographic (geodetic) to AACGM-v2
-;                       A2G         - AACGM-v2 to geographic (geodetic)
-;                       TRACE       - use field-line tracing, not coefficients
-;                       ALLOWTRACE  - use trace only above 2000 km
-;                       BADIDEA     - use coefficients above 2000 km
-;       order         - integer order of spherical harmonic expansion
-;
-;     Output Arguments:
-;       out_lat       - pointer to output latitude in degrees
-;       out_lon       - pointer to output longitude in degrees
-;
-;     Return Value:
-;       error code
-;
+; Helper functions for convert_geo_coord_v2 and AACGM_v2_ConvertBatch: get the
+; height interpolated coefficients for a height, using the cache of the
+; calling thread, and get the output latitude and longitude from the
+; cartesian coordinates given by the spherical harmonic expansion.
 ;+-----------------------------------------------------------------------------
 */
 
-int convert_geo_coord_v2(double lat_in, double lon_in, double height_in,
-                      double *lat_out, double *lon_out, int code, int order) {
-
-/*  int i,j,k,l,m,f,a,t,flag;*/
-  int i,j,k,l,m,flag;
-  int i_err64, err;
-
-/*  extern int rylm(); */
-  double ylmval[AACGM_KMAX];
-  double colat_temp;
-  double lon_output;
-    
-  double lat_adj=0;
-/*  double lat_alt=0; */
-  double colat_input; 
-   
-  double alt_var_cu=0, lon_temp=0, alt_var_sq=0, alt_var_qu=0;
-  double colat_output=0, r=0, x=0, y=0, z=0;
-  double ztmp, fac;
-  double alt_var=0;
-  double lon_input=0;
-
-  static double cint[AACGM_KMAX][NCOORD][NFLAG];
-
-  #if DEBUG > 0
-  printf("convert_geo_coord_v2\n");
-  #endif
+static double (*height_coefs(double height_in, int flag))[NCOORD]
+{
+  int i,j,k;
+  double alt_var, alt_var_sq, alt_var_cu, alt_var_qu, t0;
+  struct height_slot *slot;
+  AACGM_v2_Stats *stats;
+
+  /* force height interpolation if the model or coefficients have changed */
+  if (height_id != aacgm->id || height_generation != aacgm->generation) {
+    height_count[0] = height_count[1] = 0;
+    height_last[0] = height_last[1] = 0;
+    height_id = aacgm->id;
+    height_generation = aacgm->generation;
+  }
 
-  /* no date/time set so use current time */
-  if (aacgm_date.year < 0) {    /* AACGM_v2_SetNow();*/
-    AACGM_v2_errmsg(0);
-    return -128;
+  /* find the altitude dependence of the coefficients for this height,
+     checking the most recently used height first */
+  slot = NULL;
+  if (height_count[flag] > 0 &&
+      height_slots[flag][height_last[flag]].height == height_in) {
+    slot = &height_slots[flag][height_last[flag]];
+  } else {
+    for (k=0; k<height_count[flag]; k++) {
+      if (height_slots[flag][k].height == height_in) {
+        slot = &height_slots[flag][k];
+        height_last[flag] = k;
+        break;
+      }
+    }
   }
 
-  /* TRACE */ /* call tracing functions here and return */
-  if ((code & TRACE) || (height_in > MAXALT && (code & ALLOWTRACE))) {
-    if (A2G & code) {   /* AACGM-v2 to geographic */
-      err = AACGM_v2_Trace_inv(lat_in,lon_in,height_in, lat_out,lon_out);
+  if (slot == NULL) {
+    t0 = AACGM_v2_Clock();
 
-      /* v2.3 moved to AACGM_v2_Convert
-      if ((code & GEOCENTRIC) == 0) {
-        geoc2geod(*lat_out,*lon_out,(RE+height_in)/RE, llh);
-        *lat_out = llh[0];
-      } */
+    /* use a free slot, or evict the least recently used height */
+    if (height_count[flag] < AACGM_HEIGHT_SLOTS) {
+      k = height_count[flag]++;
     } else {
-      err = AACGM_v2_Trace(lat_in,lon_in,height_in, lat_out,lon_out);
+      k = 0;
+      for (i=1; i<AACGM_HEIGHT_SLOTS; i++)
+        if (height_slots[flag][i].used < height_slots[flag][k].used) k = i;
     }
+    slot = &height_slots[flag][k];
+    height_last[flag] = k;
 
-    return (err);
-  }
-
-  /* determine the altitude dependence of the coefficients */
-  flag = (A2G & code);    /* 0 for G2A; 1 for A2G */
-  if (height_in != height_old[flag]) {
+    /* determine the altitude dependence of the coefficients */
     alt_var = height_in/(double)MAXALT;
     alt_var_sq = alt_var * alt_var;
     alt_var_cu = alt_var * alt_var_sq;
@@ -605,57 +807,36 @@ int convert_geo_coord_v2(double lat_in, double lon_in, double height_in,
     for (i=0; i<NCOORD; i++) {
       for (j=0; j<AACGM_KMAX;j++) {
         /* change to allow general polynomial approximation */
-        cint[j][i][flag] =  sph_harm_model.coef[j][i][0][flag] +
-                            sph_harm_model.coef[j][i][1][flag]*alt_var+
-                            sph_harm_model.coef[j][i][2][flag]*alt_var_sq+
-                            sph_harm_model.coef[j][i][3][flag]*alt_var_cu+
-                            sph_harm_model.coef[j][i][4][flag]*alt_var_qu;
+        slot->cint[j][i] =  aacgm->coef[j][i][0][flag] +
+                            aacgm->coef[j][i][1][flag]*alt_var+
+                            aacgm->coef[j][i][2][flag]*alt_var_sq+
+                            aacgm->coef[j][i][3][flag]*alt_var_cu+
+                            aacgm->coef[j][i][4][flag]*alt_var_qu;
         #if DEBUG > 10
-        printf("%35.30lf %35.30lf\n", cint[j][i][flag],
-                            sph_harm_model.coef[j][i][0][flag]);
+        printf("%35.30lf %35.30lf\n", slot->cint[j][i],
+                            aacgm->coef[j][i][0][flag]);
         #endif
 
       }
     }
 
-    height_old[flag] = height_in;
-  }
-  #if DEBUG > 1
-  printf("cint[0][0][%d] = %lf\n", flag, cint[0][0][flag]);
-  printf("cint[%d][0][%d] = %lf\n",
-            AACGM_KMAX-1, flag, cint[AACGM_KMAX-1][0][flag]);
-  printf("cint[%d][%d][%d] = %lf\n", AACGM_KMAX-1, NCOORD-1, flag,
-                                      cint[AACGM_KMAX-1][NCOORD-1][flag]);
-  #endif
-
-  x = y = z = 0;
-
-  lon_input = lon_in*DTOR;
-
-  if (flag == 0) {
-    colat_input = (90.-lat_in)*DTOR;
-  } else {
-    /* use intermediate "at-altitude" coordinates for inverse trans. */
-    i_err64 = AACGM_v2_CGM2Alt(height_in, lat_in, &lat_adj);
+    slot->height = height_in;
 
-    if (i_err64 != 0) return -64;
-    colat_input= (90. - lat_adj)*DTOR;
+    stats = AACGM_v2_ThreadStats();
+    stats->height_interps++;
+    stats->height_interp_time += AACGM_v2_Clock() - t0;
   }
+  slot->used = ++height_clock;
 
-  /* Compute the values of the spherical harmonic functions.
-   * NOTE: this function was adapted to use orthonormal SH functions */
-  AACGM_v2_Rylm(colat_input, lon_input, order, ylmval);
+  return slot->cint;
+}
 
-  for (l=0; l<=order; l++) {
-    for (m=-l; m<=l; m++) {
-      k = l * (l+1) + m;      /* SGS: changes indexing */
+static int coef_output(double x, double y, double z, int flag,
+                       double *lat_out, double *lon_out)
+{
+  double colat_temp, lon_temp, colat_output, lon_output;
+  double r, fac, ztmp;
 
-      x += cint[k][0][flag]*ylmval[k];
-      y += cint[k][1][flag]*ylmval[k];
-      z += cint[k][2][flag]*ylmval[k];
-    }
-  }
- 
   /* COMMENT: SGS
    * 
    * This answers one of my questions about how the coordinates for AACGM are
@@ -722,23 +903,36 @@ int convert_geo_coord_v2(double lat_in, double lon_in, double height_in,
   } */
 
   return 0;
-} 
-
+}
 
 /*-----------------------------------------------------------------------------
 ;
 ; NAME:
-;       AACGM_v2_LoadCoefFP
+;       convert_geo_coord_v2
 ;
 ; PURPOSE:
-;       Load a set of spherical harmonic coefficients.
+;       Second-level function used to determine the lat/lon of the input
+;       coordinates.
 ;
 ; CALLING SEQUENCE:
-;       err = AACGM_v2_LoadCoefFP(fp, code);
+;       err = convert_geo_coord_v2(in_lat,in_lon,height, out_lat,out_lon,
+;                               code,order);
 ;     
 ;     Input Arguments:  
-;       fp            - FILE pointer to open coefficient file
-;       code          - 0 for 1st set; 1 for 2nd set
+;       in_lat        - latitude in degrees
+;       in_lon        - longitude in degrees
+;       height        - height above Earth in km
+;       code          - bitwise code for passing options into converter
+;                       G2A         - geographic (geodetic) to AACGM-v2
+;                       A2G         - AACGM-v2 to geographic (geodetic)
+;                       TRACE       - use field-line tracing, not coefficients
+;                       ALLOWTRACE  - use trace only above 2000 km
+;                       BADIDEA     - use coefficients above 2000 km
+;       order         - integer order of spherical harmonic expansion
+;
+;     Output Arguments:
+;       out_lat       - pointer to output latitude in degrees
+;       out_lon       - pointer to output longitude in degrees
 ;
 ;     Return Value:
 ;       error code
@@ -746,171 +940,1350 @@ int convert_geo_coord_v2(double lat_in, double lon_in, double height_in,
 ;+-----------------------------------------------------------------------------
 */
 
-int AACGM_v2_LoadCoefFP(FILE *fp, int code)
-{
-  /*  char tmp[64]; */
-  double tmp;
-  int f,l,a,t;
+int convert_geo_coord_v2(double lat_in, double lon_in, double height_in,
+                      double *lat_out, double *lon_out, int code, int order) {
+
+  int k,l,m,flag;
+  int i_err64, err;
+
+  double ylmval[AACGM_KMAX];
+  double lat_adj=0;
+  double colat_input; 
+  double x=0, y=0, z=0;
+  double lon_input=0;
+
+  double (*cint)[NCOORD];
 
   #if DEBUG > 0
-  printf("AACGM_v2_LoadCoefFP\n");
+  printf("convert_geo_coord_v2\n");
   #endif
 
-  if (fp==NULL) {
-    #if DEBUG > 0
-    printf("NULL file pointer in AACGM_v2_LoadCoefFP\n");
-    #endif
-    return -1;
+  /* no date/time set so use current time */
+  if (aacgm->date.year < 0) {    /* AACGM_v2_SetNow();*/
+    AACGM_v2_errmsg(0);
+    return -128;
   }
 
-  for (f=0;f<NFLAG;f++) { 
-    for (l=0;l<POLYORD;l++) {
-      for (a=0;a<NCOORD;a++) { 
-        for (t=0;t<AACGM_KMAX;t++) {
-          if (fscanf(fp, "%lf", &tmp) != 1) {
-            #if DEBUG > 0
-            printf("FILE error, aborting\n");
-            #endif
-            fclose(fp);
-            return -1;
-          }
+  /* TRACE */ /* call tracing functions here and return */
+  if ((code & TRACE) || (height_in > MAXALT && (code & ALLOWTRACE))) {
+    if (A2G & code) {   /* AACGM-v2 to geographic */
+      err = AACGM_v2_Trace_inv(lat_in,lon_in,height_in, lat_out,lon_out);
 
-          sph_harm_model.coefs[t][a][l][f][code] = tmp;
-        }
-      }
+      /* v2.3 moved to AACGM_v2_Convert
+      if ((code & GEOCENTRIC) == 0) {
+        geoc2geod(*lat_out,*lon_out,(RE+height_in)/RE, llh);
+        *lat_out = llh[0];
+      } */
+    } else {
+      err = AACGM_v2_Trace(lat_in,lon_in,height_in, lat_out,lon_out);
     }
-  }
 
-  #if DEBUG > 10
-  for (f=0;f<NFLAG;f++) { 
-    for (l=0;l<POLYORD;l++) {
-      for (a=0;a<NCOORD;a++) { 
-        for (t=0;t<AACGM_KMAX;t++) {
-          printf("%lf ", sph_harm_model.coefs[t][a][l][f][code]);
-        }
-        printf("\n");
-      }
-      printf("\n");
-    }
-    printf("\n");
+    return (err);
   }
+
+  /* determine the altitude dependence of the coefficients */
+  flag = (A2G & code);    /* 0 for G2A; 1 for A2G */
+  cint = height_coefs(height_in, flag);
+  #if DEBUG > 1
+  printf("cint[0][0] = %lf\n", cint[0][0]);
+  printf("cint[%d][0] = %lf\n", AACGM_KMAX-1, cint[AACGM_KMAX-1][0]);
+  printf("cint[%d][%d] = %lf\n", AACGM_KMAX-1, NCOORD-1,
+                                  cint[AACGM_KMAX-1][NCOORD-1]);
   #endif
 
-return 0;
+  x = y = z = 0;
+
+  lon_input = lon_in*DTOR;
+
+  if (flag == 0) {
+    colat_input = (90.-lat_in)*DTOR;
+  } else {
+    /* use intermediate "at-altitude" coordinates for inverse trans. */
+    i_err64 = AACGM_v2_CGM2Alt(height_in, lat_in, &lat_adj);
+
+    if (i_err64 != 0) return -64;
+    colat_input= (90. - lat_adj)*DTOR;
+  }
+
+  /* Compute the values of the spherical harmonic functions.
+   * NOTE: this function was adapted to use orthonormal SH functions */
+  AACGM_v2_Rylm(colat_input, lon_input, order, ylmval);
+
+  for (l=0; l<=order; l++) {
+    for (m=-l; m<=l; m++) {
+      k = l * (l+1) + m;      /* SGS: changes indexing */
+
+      x += cint[k][0]*ylmval[k];
+      y += cint[k][1]*ylmval[k];
+      z += cint[k][2]*ylmval[k];
+    }
+  }
+ 
+  return coef_output(x, y, z, flag, lat_out, lon_out);
+} 
+
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_LoadCoefFP
+;
+; PURPOSE:
+;       Load a set of spherical harmonic coefficients.
+;
+; CALLING SEQUENCE:
+;       err = AACGM_v2_LoadCoefFP(fp, coefs);
+;     
+;     Input Arguments:  
+;       fp            - FILE pointer to open coefficient file
+;       coefs         - coefficients for the epoch, set on output
+;
+;     Return Value:
+;       error code
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int AACGM_v2_LoadCoefFP(FILE *fp, AACGM_v2_EpochCoefs *coefs)
+{
+  /*  char tmp[64]; */
+  double tmp;
+  int f,l,a,t;
+
+  #if DEBUG > 0
+  printf("AACGM_v2_LoadCoefFP\n");
+  #endif
+
+  if (fp==NULL) {
+    #if DEBUG > 0
+    printf("NULL file pointer in AACGM_v2_LoadCoefFP\n");
+    #endif
+    return -1;
+  }
+
+  for (f=0;f<NFLAG;f++) { 
+    for (l=0;l<POLYORD;l++) {
+      for (a=0;a<NCOORD;a++) { 
+        for (t=0;t<AACGM_KMAX;t++) {
+          if (fscanf(fp, "%lf", &tmp) != 1) {
+            #if DEBUG > 0
+            printf("FILE error, aborting\n");
+            #endif
+            fclose(fp);
+            return -1;
+          }
+
+          (*coefs)[f][l][a][t] = tmp;
+        }
+      }
+    }
+  }
+
+  #if DEBUG > 10
+  for (f=0;f<NFLAG;f++) { 
+    for (l=0;l<POLYORD;l++) {
+      for (a=0;a<NCOORD;a++) { 
+        for (t=0;t<AACGM_KMAX;t++) {
+          printf("%lf ", (*coefs)[f][l][a][t]);
+        }
+        printf("\n");
+      }
+      printf("\n");
+    }
+    printf("\n");
+  }
+  #endif
+
+return 0;
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_LoadCoef
+;
+; PURPOSE:
+;       Load a set of spherical harmonic coefficients.
+;
+; CALLING SEQUENCE:
+;       ret = AACGM_v2_LoadCoef(fname,coefs);
+;     
+;     Input Arguments:  
+;       fname         - filename containing the AACGM coefficient set
+;       coefs         - coefficients for the epoch, set on output
+;
+;     Return Value:
+;       error code
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int AACGM_v2_LoadCoef(char *fname, AACGM_v2_EpochCoefs *coefs)
+{
+  FILE *fp=NULL;
+  int err=-2;
+
+  #if DEBUG > 0
+  printf("loading %s\n", fname);
+  #endif
+
+  fp = fopen(fname,"r");
+  if (fp==NULL) {
+    #if DEBUG > 0
+    printf("NULL file pointer in AACGM_v2_LoadCoef\n");
+    #endif
+    return -1;
+  }
+
+  err = AACGM_v2_LoadCoefFP(fp, coefs);
+  if (err != 0) {
+    #if DEBUG > 0
+    printf("error in AACGM_v2_LoadCoefFP\n");
+    #endif
+    return -2;
+  }
+  fclose(fp);
+
+  return 0;
+}
+
+/*-----------------------------------------------------------------------------
+; cache_find, cache_drop, cache_clear, cache_root, cache_file
+;
+; Helper functions for the epoch coefficient cache: find the cached epoch for
+; a year, remove a cached epoch, remove all cached epochs, get the
+; coefficient prefix, clearing the cache and opening the binary coefficient
+; store if needed, and get the ASCII coefficient file for a year.
+;+-----------------------------------------------------------------------------
+*/
+
+static int cache_find(int year)
+{
+  int i;
+
+  for (i=0; i<aacgm->cache.count; i++)
+    if (aacgm->cache.entry[i].year == year) return i;
+
+  return -1;
+}
+
+static void cache_drop(int i)
+{
+  free(aacgm->cache.entry[i].owned);
+  aacgm->cache.count--;
+  if (i != aacgm->cache.count)
+    aacgm->cache.entry[i] = aacgm->cache.entry[aacgm->cache.count];
+}
+
+static void cache_clear(void)
+{
+  while (aacgm->cache.count > 0) cache_drop(aacgm->cache.count-1);
+  aacgm->myear_old = -1;
+}
+
+static int cache_root(char *root)
+{
+  /* coefficients set in memory do not use the coefficient files */
+  if (aacgm->store.status == STORE_MEMORY) {
+    root[0] = '\0';
+    return 0;
+  }
+
+  if (aacgm->prefix[0] != '\0') strcpy(root,aacgm->prefix);
+  else if (getenv("AACGM_v2_DAT_PREFIX") != NULL)
+    strcpy(root,getenv("AACGM_v2_DAT_PREFIX"));
+  else root[0] = '\0';
+  if (strlen(root)==0) {
+    AACGM_v2_errmsg(2);
+    return -1;
+  }
+
+  /* epochs cached from another set of coefficient files are not used */
+  if (strcmp(aacgm->cache.root, root) != 0) {
+    cache_clear();
+    strcpy(aacgm->cache.root, root);
+  }
+
+  /* use the binary coefficient store, if available */
+  AACGM_v2_OpenStore(root);
+
+  return 0;
+}
+
+static void cache_file(int year, char *fname)
+{
+  char yrstr[11];
+
+  sprintf(yrstr,"%4.4d",year);
+  strcpy(fname,aacgm->cache.root);
+  strcat(fname,yrstr);
+  strcat(fname,".asc");
+}
+
+/*-----------------------------------------------------------------------------
+; store_map, store_unmap, store_uint32, store_crc32
+;
+; Helper functions for the binary coefficient store: map a file into memory
+; (read-only), unmap it, decode a little-endian unsigned 32-bit integer, and
+; compute the CRC-32 (as used by zlib) of a block of memory.
+;+-----------------------------------------------------------------------------
+*/
+
+static void *store_map(const char *fname, size_t *size)
+{
+  void *map;
+#ifdef _WIN32
+  HANDLE file, mapping;
+  LARGE_INTEGER fsize;
+
+  file = CreateFileA(fname, GENERIC_READ, FILE_SHARE_READ, NULL,
+                     OPEN_EXISTING, FILE_ATTRIBUTE_NORMAL, NULL);
+  if (file == INVALID_HANDLE_VALUE) return NULL;
+
+  if (!GetFileSizeEx(file, &fsize) || fsize.QuadPart == 0) {
+    CloseHandle(file);
+    return NULL;
+  }
+  *size = (size_t)fsize.QuadPart;
+
+  mapping = CreateFileMappingA(file, NULL, PAGE_READONLY, 0, 0, NULL);
+  CloseHandle(file);
+  if (mapping == NULL) return NULL;
+
+  map = MapViewOfFile(mapping, FILE_MAP_READ, 0, 0, 0);
+  CloseHandle(mapping);
+#else
+  int fd;
+  struct stat st;
+
+  fd = open(fname, O_RDONLY);
+  if (fd < 0) return NULL;
+
+  if (fstat(fd, &st) != 0 || st.st_size == 0) {
+    close(fd);
+    return NULL;
+  }
+  *size = (size_t)st.st_size;
+
+  /* shared mapping, so that the pages are shared between processes */
+  map = mmap(NULL, *size, PROT_READ, MAP_SHARED, fd, 0);
+  close(fd);
+  if (map == MAP_FAILED) return NULL;
+#endif
+
+  return map;
+}
+
+static void store_unmap(void *map, size_t size)
+{
+#ifdef _WIN32
+  UnmapViewOfFile(map);
+#else
+  munmap(map, size);
+#endif
+}
+
+static unsigned long store_uint32(const unsigned char *bytes)
+{
+  return ((unsigned long)bytes[0] | ((unsigned long)bytes[1] << 8) |
+          ((unsigned long)bytes[2] << 16) | ((unsigned long)bytes[3] << 24));
+}
+
+static unsigned long store_crc32(const unsigned char *bytes, size_t len)
+{
+  unsigned long crc = 0xFFFFFFFFUL;
+  size_t i;
+  int k;
+
+  for (i=0; i<len; i++) {
+    crc ^= bytes[i];
+    for (k=0; k<8; k++) crc = (crc >> 1) ^ (0xEDB88320UL & (0UL-(crc & 1UL)));
+  }
+
+  return (crc ^ 0xFFFFFFFFUL);
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_OpenStore
+;
+; PURPOSE:
+;       Memory-map the binary coefficient store for the current model, which
+;       holds the coefficients for all 5-year epochs in a single file named
+;       using the coefficient file prefix, e.g., aacgm_coeffs-14-all.bin.
+;
+; CALLING SEQUENCE:
+;       err = AACGM_v2_OpenStore(root);
+;     
+;     Input Arguments:  
+;       root          - coefficient file prefix
+;
+;     Return Value:
+;       0 if the store is open, -1 if it is unavailable or invalid
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int AACGM_v2_OpenStore(const char *root)
+{
+  char fname[512];
+  const unsigned char *bytes;
+  unsigned long header_size, nepoch;
+  unsigned int one = 1;
+  size_t size = 0;
+  void *map;
+
+  /* use the open store, unless the coefficient prefix has changed */
+  if (aacgm->store.status != 0 && strcmp(aacgm->store.root, root) == 0)
+    return (aacgm->store.status > 0) ? 0 : -1;
+
+  AACGM_v2_CloseStore();
+  aacgm->store.status = -1;
+  if (strlen(root) >= sizeof(aacgm->store.root)) return -1;
+  strcpy(aacgm->store.root, root);
+
+  /* the coefficients are stored as little-endian doubles */
+  if (*(unsigned char *)&one != 1) return -1;
+
+  strcpy(fname,root);
+  strcat(fname,STORE_SUFFIX);
+  #if DEBUG > 0
+  printf("AACGM_v2_OpenStore: %s\n", fname);
+  #endif
+
+  map = store_map(fname, &size);
+  if (map == NULL) return -1;
+
+  /* check the header */
+  bytes = (const unsigned char *)map;
+  header_size = (size >= STORE_HEADER) ? store_uint32(bytes+12) : 0;
+  nepoch = (size >= STORE_HEADER) ? store_uint32(bytes+24) : 0;
+  if (size < STORE_HEADER || memcmp(bytes, STORE_MAGIC, 8) != 0 ||
+      store_uint32(bytes+8) != STORE_VERSION ||
+      store_uint32(bytes+28) != AACGM_KMAX ||
+      store_uint32(bytes+32) != NCOORD ||
+      store_uint32(bytes+36) != POLYORD || store_uint32(bytes+40) != NFLAG ||
+      header_size % sizeof(double) != 0 || nepoch == 0 ||
+      header_size < STORE_HEADER + 4*nepoch ||
+      size != header_size + nepoch*sizeof(AACGM_v2_EpochCoefs)) {
+    fprintf(stderr, "AACGM-v2 WARNING: invalid coefficient store %s, using "
+                    "ASCII coefficient files\n", fname);
+    store_unmap(map, size);
+    return -1;
+  }
+
+  aacgm->store.verified = (signed char *)calloc(nepoch, sizeof(signed char));
+  if (aacgm->store.verified == NULL) {
+    store_unmap(map, size);
+    return -1;
+  }
+
+  aacgm->store.map = map;
+  aacgm->store.size = size;
+  aacgm->store.first_epoch = (int)store_uint32(bytes+16);
+  aacgm->store.epoch_step = (int)store_uint32(bytes+20);
+  aacgm->store.nepoch = (int)nepoch;
+  aacgm->store.crc = bytes + STORE_HEADER;
+  aacgm->store.epochs = (const AACGM_v2_EpochCoefs *)(bytes + header_size);
+  aacgm->store.status = 1;
+
+  return 0;
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_CloseStore
+;
+; PURPOSE:
+;       Unmap the binary coefficient store for the current model, if open,
+;       or free the coefficients set in memory.
+;
+; CALLING SEQUENCE:
+;       AACGM_v2_CloseStore();
+;     
+;+-----------------------------------------------------------------------------
+*/
+
+void AACGM_v2_CloseStore(void)
+{
+  int i;
+
+  if (aacgm->store.status > 0) {
+    /* do not leave cached coefficients pointing to the unmapped store */
+    for (i=aacgm->cache.count-1; i>=0; i--) {
+      if (aacgm->cache.entry[i].owned == NULL) {
+        cache_drop(i);
+        aacgm->myear_old = -1;
+      }
+    }
+    if (aacgm->store.status == STORE_MEMORY) free(aacgm->store.map);
+    else store_unmap(aacgm->store.map, aacgm->store.size);
+    free(aacgm->store.verified);
+  }
+
+  memset(&aacgm->store, 0, sizeof(aacgm->store));
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_StoreCoefs
+;
+; PURPOSE:
+;       Use the coefficients for a 5-year epoch from the binary coefficient
+;       store, verifying the checksum the first time the epoch is used.
+;
+; CALLING SEQUENCE:
+;       coefs = AACGM_v2_StoreCoefs(year);
+;     
+;     Input Arguments:  
+;       year          - 5-year epoch year
+;
+;     Return Value:
+;       pointer to the coefficients, or NULL if the epoch is not available
+;       from the store
+;
+;+-----------------------------------------------------------------------------
+*/
+
+static int store_index(int year)
+{
+  int i;
+
+  if (aacgm->store.status <= 0 || year < aacgm->store.first_epoch ||
+      aacgm->store.epoch_step <= 0 ||
+      (year - aacgm->store.first_epoch) % aacgm->store.epoch_step != 0)
+    return -1;
+
+  i = (year - aacgm->store.first_epoch) / aacgm->store.epoch_step;
+  if (i >= aacgm->store.nepoch || aacgm->store.verified[i] < 0) return -1;
+
+  return i;
+}
+
+const AACGM_v2_EpochCoefs *AACGM_v2_StoreCoefs(int year)
+{
+  int i;
+
+  i = store_index(year);
+  if (i < 0) return NULL;
+
+  if (aacgm->store.verified[i] == 0) {
+    if (store_crc32((const unsigned char *)(aacgm->store.epochs + i),
+                    sizeof(AACGM_v2_EpochCoefs)) !=
+        store_uint32(aacgm->store.crc + 4*i)) {
+      fprintf(stderr, "AACGM-v2 WARNING: checksum mismatch for %d in "
+                      "coefficient store, using ASCII coefficient files\n",
+                      year);
+      aacgm->store.verified[i] = -1;
+    } else {
+      aacgm->store.verified[i] = 1;
+    }
+  }
+  if (aacgm->store.verified[i] < 0) return NULL;
+
+  return aacgm->store.epochs + i;
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_CacheCoefs
+;
+; PURPOSE:
+;       Load the coefficients for a 5-year epoch into the epoch cache, from the
+;       binary coefficient store if available and otherwise from the ASCII
+;       coefficient file.  If the cache is full, the least recently used epoch
+;       is evicted, other than the epochs currently in use.
+;
+; CALLING SEQUENCE:
+;       i = AACGM_v2_CacheCoefs(year, keep);
+;     
+;     Input Arguments:  
+;       year          - 5-year epoch year
+;       keep          - another epoch year that must not be evicted, or -1
+;
+;     Return Value:
+;       index of the cached epoch, or a negative error code
+;
+;+-----------------------------------------------------------------------------
+*/
+
+static int cache_insert(int year, int keep, AACGM_v2_EpochCoefs *staged)
+{
+  char fname[256];
+  int i,j,ret,size;
+  const AACGM_v2_EpochCoefs *coefs;
+  AACGM_v2_EpochCoefs *owned=NULL;
+
+  i = cache_find(year);
+  if (i >= 0) {
+    free(staged);
+    aacgm->cache.entry[i].used = ++aacgm->cache.clock;
+    return i;
+  }
+
+  /* evict the least recently used epoch, if needed */
+  size = (aacgm->cache.size > 0) ? aacgm->cache.size : AACGM_CACHE_SIZE;
+  if (aacgm->cache.count >= size) {
+    j = -1;
+    for (i=0; i<aacgm->cache.count; i++) {
+      if (aacgm->cache.entry[i].year == keep ||
+          (aacgm->myear_old >= 0 &&
+           (aacgm->cache.entry[i].year == aacgm->myear_old ||
+            aacgm->cache.entry[i].year == aacgm->myear_old+5)))
+        continue;
+      if (j < 0 || aacgm->cache.entry[i].used < aacgm->cache.entry[j].used)
+        j = i;
+    }
+    if (j < 0) {
+      free(staged);
+      return -3;
+    }
+    cache_drop(j);
+  }
+
+  /* coefficients staged by AACGM_v2_AdoptCoefs are owned by the cache */
+  owned = staged;
+  coefs = (staged != NULL) ? staged : AACGM_v2_StoreCoefs(year);
+  if (coefs == NULL) {
+    /* only the epochs set in memory are available */
+    if (aacgm->store.status == STORE_MEMORY) return -1;
+
+    owned = (AACGM_v2_EpochCoefs *)malloc(sizeof(AACGM_v2_EpochCoefs));
+    if (owned == NULL) return -4;
+
+    cache_file(year, fname);
+    #if DEBUG > 0
+    printf("AACGM_v2_CacheCoefs: %s\n", fname);
+    #endif
+    ret = AACGM_v2_LoadCoef(fname,owned);
+    if (ret != 0) {
+      free(owned);
+      return ret;
+    }
+    coefs = (const AACGM_v2_EpochCoefs *)owned;
+  }
+  aacgm->cache.loads++;
+
+  i = aacgm->cache.count++;
+  aacgm->cache.entry[i].year = year;
+  aacgm->cache.entry[i].used = ++aacgm->cache.clock;
+  aacgm->cache.entry[i].coefs = coefs;
+  aacgm->cache.entry[i].owned = owned;
+
+  return i;
+}
+
+int AACGM_v2_CacheCoefs(int year, int keep)
+{
+  return cache_insert(year, keep, NULL);
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_LoadCoefs
+;
+; PURPOSE:
+;       Load two sets of spherical harmonic coefficients, using the epoch
+;       cache.
+;
+; CALLING SEQUENCE:
+;       err = AACGM_v2_LoadCoefs(myear);
+;     
+;     Input Arguments:  
+;       myear         - 5-year epoch year prior to desired time; bracketing
+;                       set is +5 years.
+;
+;     Return Value:
+;       error code
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int AACGM_v2_LoadCoefs(int year)
+{
+  char root[256];
+  int code,i;
+  double t0;
+  AACGM_v2_Stats *stats;
+
+  #if DEBUG > 0
+  printf("AACGM_v2_LoadCoefs\n");
+  #endif
+  /* default location of coefficient files */
+  if (cache_root(root) != 0) return -1;
+
+  if (year <= 0) return -1;
+
+  t0 = AACGM_v2_Clock();
+  stats = AACGM_v2_ThreadStats();
+  stats->coef_loads++;
+
+  /* the current epochs may be evicted while loading the new ones */
+  aacgm->myear_old = -1;
+
+  for (code=G2A; code<=A2G; code++) {
+    if (cache_find(year+5*code) >= 0) aacgm->cache.hits++;
+    else aacgm->cache.misses++;
+
+    /* forward coefficients, then inverse coefficients */
+    i = AACGM_v2_CacheCoefs(year+5*code, year);
+    if (i < 0) break;
+    aacgm->coefs[code] = aacgm->cache.entry[i].coefs;
+  }
+
+  stats->coef_load_time += AACGM_v2_Clock() - t0;
+  if (i < 0) return i;
+
+  aacgm->myear_old = year;
+
+  return 0;
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_NewModel
+;
+; PURPOSE:
+;       Allocate a model state, which holds its own coefficients, date and
+;       time, and IGRF model, so that several models may be used without
+;       reloading or interpolating the coefficients each time another is used.
+;
+; CALLING SEQUENCE:
+;       model = AACGM_v2_NewModel(prefix, igrf_file);
+;
+;     Input Arguments:
+;       prefix        - AACGM-v2 coefficient file prefix, or NULL to use the
+;                       AACGM_v2_DAT_PREFIX environment variable
+;       igrf_file     - IGRF coefficient file, or NULL to use the IGRF_COEFFS
+;                       environment variable
+;
+;     Return Value:
+;       pointer to the new model, or NULL on failure
+;
+; NOTES:
+;
+;       Not thread-safe; models should be allocated by a single thread.
+;
+;+-----------------------------------------------------------------------------
+*/
+
+AACGM_v2_Model *AACGM_v2_NewModel(const char *prefix, const char *igrf_file)
+{
+  AACGM_v2_Model *model;
+
+  if (prefix != NULL && strlen(prefix) >= sizeof(model->prefix)) return NULL;
+
+  model = (AACGM_v2_Model *)calloc(1, sizeof(AACGM_v2_Model));
+  if (model == NULL) return NULL;
+
+  model->igrf = IGRF_NewModel(igrf_file);
+  if (model->igrf == NULL) {
+    free(model);
+    return NULL;
+  }
+
+  model->date.year = model->date.month = model->date.day = -1;
+  model->date.hour = model->date.minute = model->date.second = -1;
+  model->date.dayno = model->date.daysinyear = -1;
+  model->myear_old = -1;
+  model->fyear_old = -1.;
+  model->id = ++aacgm_last_id;
+  if (prefix != NULL) strcpy(model->prefix, prefix);
+
+  return model;
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_FreeModel
+;
+; PURPOSE:
+;       Free a model state allocated by AACGM_v2_NewModel, including its IGRF
+;       model. The model must not be selected by any thread.
+;
+; CALLING SEQUENCE:
+;       AACGM_v2_FreeModel(model);
+;
+;+-----------------------------------------------------------------------------
+*/
+
+void AACGM_v2_FreeModel(AACGM_v2_Model *model)
+{
+  AACGM_v2_Model *old_model;
+
+  if (model == NULL || model == &aacgm_default) return;
+
+  old_model = aacgm;
+  aacgm = model;
+  cache_clear();
+  AACGM_v2_CloseStore();
+  aacgm = old_model;
+
+  IGRF_FreeModel(model->igrf);
+  free(model);
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_SetModel
+;
+; PURPOSE:
+;       Select the model state, and the corresponding IGRF model, used by the
+;       calling thread. Each model should be used by one thread at a time.
+;
+; CALLING SEQUENCE:
+;       old_model = AACGM_v2_SetModel(model);
+;
+;     Input Arguments:
+;       model         - model from AACGM_v2_NewModel, or NULL for the default
+;
+;     Return Value:
+;       pointer to the model previously used by the calling thread
+;
+;+-----------------------------------------------------------------------------
+*/
+
+AACGM_v2_Model *AACGM_v2_SetModel(AACGM_v2_Model *model)
+{
+  AACGM_v2_Model *old_model = aacgm;
+
+  aacgm = (model == NULL) ? &aacgm_default : model;
+  IGRF_SetModel(aacgm->igrf);
+
+  return old_model;
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_SetCoefs
+;
+; PURPOSE:
+;       Set the coefficients of the current model for consecutive 5-year
+;       epochs from memory, so that the coefficient files are not read, or
+;       return to reading the coefficient files.  The coefficients are copied,
+;       and the cached coefficients and model time are cleared, so the model
+;       time must be set again before converting.
+;
+; CALLING SEQUENCE:
+;       err = AACGM_v2_SetCoefs(first_epoch, nepoch, coefs);
+;
+;     Input Arguments:
+;       first_epoch   - year of the first 5-year epoch
+;       nepoch        - number of epochs, or 0 to use the coefficient files
+;       coefs         - coefficients for each epoch, ordered as in the ASCII
+;                       coefficient files
+;
+;     Return Value:
+;       0 on success, -1 if the epochs are invalid, -4 if memory cannot be
+;       allocated
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int AACGM_v2_SetCoefs(int first_epoch, int nepoch,
+                      const AACGM_v2_EpochCoefs *coefs)
+{
+  AACGM_v2_EpochCoefs *epochs = NULL;
+  signed char *verified = NULL;
+
+  if (nepoch < 0 || (nepoch > 0 && (coefs == NULL || first_epoch <= 0 ||
+                                    first_epoch % 5 != 0)))
+    return -1;
+
+  if (nepoch > 0) {
+    epochs = (AACGM_v2_EpochCoefs *)malloc(nepoch*sizeof(AACGM_v2_EpochCoefs));
+    verified = (signed char *)malloc(nepoch*sizeof(signed char));
+    if (epochs == NULL || verified == NULL) {
+      free(epochs);
+      free(verified);
+      return -4;
+    }
+    memcpy(epochs, coefs, nepoch*sizeof(AACGM_v2_EpochCoefs));
+    memset(verified, 1, nepoch*sizeof(signed char));
+  }
+
+  /* drop the coefficients of the files or of the previous epochs */
+  cache_clear();
+  AACGM_v2_CloseStore();
+  aacgm->cache.root[0] = '\0';
+
+  aacgm->date.year = aacgm->date.month = aacgm->date.day = -1;
+  aacgm->date.hour = aacgm->date.minute = aacgm->date.second = -1;
+  aacgm->date.dayno = aacgm->date.daysinyear = -1;
+  aacgm->fyear_old = -1.;
+  aacgm->generation++;
+  coefs_serial++;
+
+  if (nepoch > 0) {
+    aacgm->store.status = STORE_MEMORY;
+    aacgm->store.map = epochs;
+    aacgm->store.size = nepoch*sizeof(AACGM_v2_EpochCoefs);
+    aacgm->store.first_epoch = first_epoch;
+    aacgm->store.epoch_step = 5;
+    aacgm->store.nepoch = nepoch;
+    aacgm->store.epochs = epochs;
+    aacgm->store.verified = verified;
+  }
+
+  return 0;
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_MemoryCoefs
+;
+; PURPOSE:
+;       Determine whether the coefficients of the current model were set from
+;       memory by AACGM_v2_SetCoefs.
+;
+; CALLING SEQUENCE:
+;       memory = AACGM_v2_MemoryCoefs();
+;
+;     Return Value:
+;       1 if the coefficients were set from memory, otherwise 0
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int AACGM_v2_MemoryCoefs(void)
+{
+  return (aacgm->store.status == STORE_MEMORY);
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_CoefsSerial
+;
+; PURPOSE:
+;       Get the number of times that coefficients were set from memory by
+;       AACGM_v2_SetCoefs in any model, so that values derived from earlier
+;       coefficients may be discarded.
+;
+; CALLING SEQUENCE:
+;       serial = AACGM_v2_CoefsSerial();
+;
+;     Return Value:
+;       number of calls to AACGM_v2_SetCoefs
+;
+;+-----------------------------------------------------------------------------
+*/
+
+unsigned long AACGM_v2_CoefsSerial(void)
+{
+  return (coefs_serial);
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_SetCacheSize
+;
+; PURPOSE:
+;       Set the maximum number of 5-year epochs held in the coefficient cache
+;       of the current model, evicting the least recently used epochs if
+;       needed.
+;
+; CALLING SEQUENCE:
+;       err = AACGM_v2_SetCacheSize(size);
+;
+;     Input Arguments:
+;       size          - number of epochs, from 2 to AACGM_CACHE_MAX, or 0 for
+;                       the default (AACGM_CACHE_SIZE)
+;
+;     Return Value:
+;       0 on success, -1 if the size is out of range
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int AACGM_v2_SetCacheSize(int size)
+{
+  int i,j;
+
+  if (size != 0 && (size < 2 || size > AACGM_CACHE_MAX)) return -1;
+
+  aacgm->cache.size = size;
+  if (size == 0) size = AACGM_CACHE_SIZE;
+
+  while (aacgm->cache.count > size) {
+    j = -1;
+    for (i=0; i<aacgm->cache.count; i++) {
+      if (aacgm->myear_old >= 0 &&
+          (aacgm->cache.entry[i].year == aacgm->myear_old ||
+           aacgm->cache.entry[i].year == aacgm->myear_old+5))
+        continue;
+      if (j < 0 || aacgm->cache.entry[i].used < aacgm->cache.entry[j].used)
+        j = i;
+    }
+    cache_drop(j);
+  }
+
+  return 0;
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_GetCacheStats
+;
+; PURPOSE:
+;       Get the coefficient cache counters of the current model.
+;
+; CALLING SEQUENCE:
+;       AACGM_v2_GetCacheStats(&hits, &misses, &loads, &count, &size);
+;
+;     Output Arguments:
+;       hits          - number of epochs found in the cache
+;       misses        - number of epochs not found in the cache
+;       loads         - number of epochs read from the binary coefficient
+;                       store or ASCII coefficient files, including prefetches
+;       count         - number of cached epochs
+;       size          - maximum number of cached epochs
+;
+;+-----------------------------------------------------------------------------
+*/
+
+void AACGM_v2_GetCacheStats(unsigned long *hits, unsigned long *misses,
+                            unsigned long *loads, int *count, int *size)
+{
+  *hits = aacgm->cache.hits;
+  *misses = aacgm->cache.misses;
+  *loads = aacgm->cache.loads;
+  *count = aacgm->cache.count;
+  *size = (aacgm->cache.size > 0) ? aacgm->cache.size : AACGM_CACHE_SIZE;
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_Clock
+;
+; PURPOSE:
+;       Read a monotonic clock for the performance timers.
+;
+; CALLING SEQUENCE:
+;       t = AACGM_v2_Clock();
+;
+;     Return Value:
+;       time in seconds from an arbitrary start
+;
+;+-----------------------------------------------------------------------------
+*/
+
+double AACGM_v2_Clock(void)
+{
+#ifdef _WIN32
+  LARGE_INTEGER count, freq;
+
+  QueryPerformanceCounter(&count);
+  QueryPerformanceFrequency(&freq);
+  return ((double)count.QuadPart/(double)freq.QuadPart);
+#else
+  struct timespec ts;
+
+  clock_gettime(CLOCK_MONOTONIC, &ts);
+  return (ts.tv_sec + 1e-9*ts.tv_nsec);
+#endif
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_ThreadStats
+;
+; PURPOSE:
+;       Get the performance counters of the calling thread, allocating them
+;       and linking them to those of the other threads when first used.
+;
+; CALLING SEQUENCE:
+;       stats = AACGM_v2_ThreadStats();
+;
+;     Return Value:
+;       pointer to the counters of the calling thread
+;
+;+-----------------------------------------------------------------------------
+*/
+
+AACGM_v2_Stats *AACGM_v2_ThreadStats(void)
+{
+  struct stats_block *block;
+
+  if (stats_mine != NULL) return &stats_mine->stats;
+
+  block = (struct stats_block *)calloc(1, sizeof(struct stats_block));
+  if (block == NULL) return &stats_spare;
+
+  /* push the block onto the list without a lock */
+  #ifdef _WIN32
+  do {
+    block->next = stats_head;
+  } while (InterlockedCompareExchangePointer((PVOID volatile *)&stats_head,
+                                             block, block->next) !=
+           block->next);
+  #else
+  do {
+    block->next = stats_head;
+  } while (!__sync_bool_compare_and_swap(&stats_head, block->next, block));
+  #endif
+
+  stats_mine = block;
+  return &block->stats;
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_GetStats
+;
+; PURPOSE:
+;       Get the performance counters and timers, summed over all threads.
+;
+; CALLING SEQUENCE:
+;       AACGM_v2_GetStats(&stats);
+;
+;     Output Arguments:
+;       stats         - number of coefficient loads, time and height
+;                       interpolations, MLT reference longitude calculations,
+;                       traced field lines, RK45 steps, and bisection steps,
+;                       with the cumulative wall time of each stage in seconds
+;
+; NOTES:
+;
+;       The counters of threads that are converting are read as they are
+;       updated, so may be behind by the stage in progress.
+;
+;+-----------------------------------------------------------------------------
+*/
+
+void AACGM_v2_GetStats(AACGM_v2_Stats *stats)
+{
+  struct stats_block *block;
+  const AACGM_v2_Stats *s;
+
+  memset(stats, 0, sizeof(AACGM_v2_Stats));
+  for (block=stats_head; ; block=block->next) {
+    s = (block == NULL) ? &stats_spare : &block->stats;
+    stats->coef_loads += s->coef_loads;
+    stats->coef_load_time += s->coef_load_time;
+    stats->time_interps += s->time_interps;
+    stats->time_interp_time += s->time_interp_time;
+    stats->height_interps += s->height_interps;
+    stats->height_interp_time += s->height_interp_time;
+    stats->mlon_refs += s->mlon_refs;
+    stats->mlon_ref_time += s->mlon_ref_time;
+    stats->traces += s->traces;
+    stats->trace_steps += s->trace_steps;
+    stats->trace_bisections += s->trace_bisections;
+    stats->trace_time += s->trace_time;
+    if (block == NULL) break;
+  }
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_ResetStats
+;
+; PURPOSE:
+;       Set the performance counters and timers of all threads to zero.
+;
+; CALLING SEQUENCE:
+;       AACGM_v2_ResetStats();
+;
+;+-----------------------------------------------------------------------------
+*/
+
+void AACGM_v2_ResetStats(void)
+{
+  struct stats_block *block;
+
+  for (block=stats_head; block!=NULL; block=block->next)
+    memset(&block->stats, 0, sizeof(AACGM_v2_Stats));
+  memset(&stats_spare, 0, sizeof(AACGM_v2_Stats));
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_TraceIter
+;
+; PURPOSE:
+;       Get the number of iterations (RK45 steps and bisection steps) used to
+;       trace the field line of the last call to AACGM_v2_Convert in the
+;       calling thread.
+;
+; CALLING SEQUENCE:
+;       niter = AACGM_v2_TraceIter();
+;
+;     Return Value:
+;       number of iterations, or 0 if the last location was not traced
+;
+;+-----------------------------------------------------------------------------
+*/
+
+unsigned long AACGM_v2_TraceIter(void)
+{
+  return trace_last_iter;
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_NextEpoch
+;
+; PURPOSE:
+;       Determine whether the next 5-year epoch should be prefetched, i.e.,
+;       whether the current time is within AACGM_PREFETCH years of the end of
+;       the current epoch and the epoch after it is not yet cached.
+;
+; CALLING SEQUENCE:
+;       year = AACGM_v2_NextEpoch();
+;
+;     Return Value:
+;       epoch year to prefetch, or 0 if none
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int AACGM_v2_NextEpoch(void)
+{
+  int myear;
+
+  if (aacgm->myear_old < 0 || aacgm->fyear_old < 0) return 0;
+
+  myear = aacgm->myear_old;
+  if (aacgm->fyear_old < myear + 5 - AACGM_PREFETCH) return 0;
+
+  /* the next pair of epochs is myear+5 (already used) and myear+10 */
+  if (cache_find(myear+10) >= 0) return 0;
+
+  return myear+10;
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_PrefetchCoefs
+;
+; PURPOSE:
+;       Load the coefficients for a 5-year epoch into the coefficient cache of
+;       the current model without changing the model time.  The epochs in use
+;       are not evicted, so nothing is loaded if the cache is full of them.
+;
+; CALLING SEQUENCE:
+;       err = AACGM_v2_PrefetchCoefs(year);
+;
+;     Input Arguments:
+;       year          - 5-year epoch year
+;
+;     Return Value:
+;       0 if the epoch is cached, or a negative error code
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int AACGM_v2_PrefetchCoefs(int year)
+{
+  char root[256];
+  int i;
+
+  if (year <= 0 || year % 5 != 0 || cache_root(root) != 0) return -1;
+
+  i = AACGM_v2_CacheCoefs(year, -1);
+
+  return (i < 0) ? i : 0;
 }
 
 /*-----------------------------------------------------------------------------
 ;
 ; NAME:
-;       AACGM_v2_LoadCoef
+;       AACGM_v2_StageFile
 ;
 ; PURPOSE:
-;       Load a set of spherical harmonic coefficients.
+;       Get the ASCII coefficient file that AACGM_v2_PrefetchCoefs would read
+;       for a 5-year epoch, so that it may be read with AACGM_v2_LoadCoef
+;       without using the current model and passed to AACGM_v2_AdoptCoefs.
 ;
 ; CALLING SEQUENCE:
-;       ret = AACGM_v2_LoadCoef(fname,code);
-;     
-;     Input Arguments:  
-;       fname         - filename containing the AACGM coefficient set
-;       code          - 0 for 1st set; 1 for 2nd set
+;       ret = AACGM_v2_StageFile(year, fname);
+;
+;     Input Arguments:
+;       year          - 5-year epoch year
+;       fname         - ASCII coefficient file name, set on output
 ;
 ;     Return Value:
-;       error code
+;       1 if the epoch must be read from fname, 0 if it is cached or available
+;       from the binary coefficient store or memory, or a negative error code
 ;
 ;+-----------------------------------------------------------------------------
 */
 
-int AACGM_v2_LoadCoef(char *fname, int code)
+int AACGM_v2_StageFile(int year, char *fname)
 {
-  FILE *fp=NULL;
-  int err=-2;
+  char root[256];
 
-  #if DEBUG > 0
-  printf("loading %s\n", fname);
-  #endif
+  if (year <= 0 || year % 5 != 0 || cache_root(root) != 0) return -1;
 
-  fp = fopen(fname,"r");
-  if (fp==NULL) {
-    #if DEBUG > 0
-    printf("NULL file pointer in AACGM_v2_LoadCoef\n");
-    #endif
-    return -1;
-  }
+  if (cache_find(year) >= 0 || aacgm->store.status == STORE_MEMORY ||
+      store_index(year) >= 0)
+    return 0;
 
-  err = AACGM_v2_LoadCoefFP(fp, code);
-  if (err != 0) {
-    #if DEBUG > 0
-    printf("error in AACGM_v2_LoadCoefFP\n");
-    #endif
-    return -2;
-  }
-  fclose(fp);
+  cache_file(year, fname);
 
-  return 0;
+  return 1;
 }
 
 /*-----------------------------------------------------------------------------
 ;
 ; NAME:
-;       AACGM_v2_LoadCoefs
+;       AACGM_v2_AdoptCoefs
 ;
 ; PURPOSE:
-;       Load two sets of spherical harmonic coefficients.
+;       Put the coefficients for a 5-year epoch, read from the file given by
+;       AACGM_v2_StageFile, into the coefficient cache of the current model,
+;       taking ownership of them.  If the model now uses another file for the
+;       epoch, the coefficients are discarded and the epoch is prefetched with
+;       AACGM_v2_PrefetchCoefs instead.
 ;
 ; CALLING SEQUENCE:
-;       err = AACGM_v2_LoadCoefs(myear);
-;     
-;     Input Arguments:  
-;       myear         - 5-year epoch year prior to desired time; bracketing
-;                       set is +5 years.
+;       err = AACGM_v2_AdoptCoefs(year, fname, coefs);
+;
+;     Input Arguments:
+;       year          - 5-year epoch year
+;       fname         - ASCII coefficient file the coefficients were read from
+;       coefs         - coefficients allocated with malloc
 ;
 ;     Return Value:
-;       error code
+;       0 if the epoch is cached, or a negative error code
 ;
 ;+-----------------------------------------------------------------------------
 */
 
-int AACGM_v2_LoadCoefs(int year)
+int AACGM_v2_AdoptCoefs(int year, const char *fname,
+                        AACGM_v2_EpochCoefs *coefs)
 {
-  char fname[256];
-  char root[256];
-  char yrstr[11];
-  int ret=0;
+  char staged[256];
+  int i;
 
-  #if DEBUG > 0
-  printf("AACGM_v2_LoadCoefs\n");
-  #endif
-  /* default location of coefficient files */
-  strcpy(root,getenv("AACGM_v2_DAT_PREFIX"));  
-  if (strlen(root)==0) {
-    AACGM_v2_errmsg(2);
-    return -1;
+  if (AACGM_v2_StageFile(year, staged) != 1 || strcmp(staged, fname) != 0) {
+    free(coefs);
+    return AACGM_v2_PrefetchCoefs(year);
   }
 
-  if (year <= 0) return -1;
-  sprintf(yrstr,"%4.4d",year);  
-
-  strcpy(fname,root);
-  strcat(fname,yrstr);
-  strcat(fname,".asc");
-  #if DEBUG > 0
-  printf("AACGM_v2_LoadCoefs: %s\n", fname);
-  #endif
-  ret = AACGM_v2_LoadCoef(fname,G2A);   /* forward coefficients */
-  if (ret != 0) return ret;
-
-  sprintf(yrstr,"%4.4d",year+5);  
-  strcpy(fname,root);
-  strcat(fname,yrstr);
-  strcat(fname,".asc");
-  #if DEBUG > 0
-  printf("AACGM_v2_LoadCoefs: %s\n", fname);
-  #endif
-  ret += AACGM_v2_LoadCoef(fname,A2G);  /* inverse coefficients */
-
-  myear_old = year;
+  i = cache_insert(year, -1, coefs);
 
-  return ret;
+  return (i < 0) ? i : 0;
 }
 
 /*-----------------------------------------------------------------------------
@@ -982,6 +2355,8 @@ int AACGM_v2_Convert(double in_lat, double in_lon, double height,
   printf("AACGM_v2_Convert\n");
   #endif
 
+  trace_last_iter = 0;
+
   /* latitude out of bounds */
   if (fabs(in_lat) > 90.) {
     fprintf(stderr, "ERROR: latitude must be in the range -90 to +90 degrees: "
@@ -1048,6 +2423,624 @@ int AACGM_v2_Convert(double in_lat, double in_lon, double height,
   return 0;
 }
 
+/*-----------------------------------------------------------------------------
+; trace_start, trace_step, trace_batch
+;
+; Lockstep field-line tracing for AACGM_v2_ConvertBatch.  Each field line is
+; traced in a lane that follows the steps of AACGM_v2_Trace (G2A) or
+; AACGM_v2_Trace_inv (A2G): adaptive RK45 steps, each with its own step size,
+; to the magnetic equator (G2A) or the starting altitude (A2G), then bisection
+; of a fixed RK4 step.  Every RK stage needs the field at one position, so
+; trace_batch evaluates the field at the pending positions of all active lanes
+; with one call to IGRF_compute_batch, and each lane then advances to its next
+; stage with trace_step.  Lanes that finish are refilled with the next
+; location, so the batch stays full until the last field lines.
+;+-----------------------------------------------------------------------------
+*/
+
+#define TRACE_PENDING 1   /* error code marking locations still to be traced */
+
+struct trace_lane {
+  int idx;              /* location index, or -1 if the lane is free */
+  int inverse;          /* 0: AACGM_v2_Trace; 1: AACGM_v2_Trace_inv */
+  int bisect;           /* 0: adaptive RK45 steps; 1: bisection with RK4 */
+  int stage;            /* field evaluation within the current step */
+  int idir;             /* direction along the field line */
+  int err;
+  unsigned long niter;  /* adaptive RK45 steps */
+  unsigned long nbisect;  /* bisection steps */
+  double alt;           /* starting altitude in km */
+  double ds, b0[3], bmag0, r0;
+  double xyzg[3], xyzp[3], xyzc[3], rtp[3];
+  double k[6][3];
+  double pos[3];        /* position of the next field evaluation */
+  double lat, lon;      /* output */
+};
+
+static void trace_rk45(struct trace_lane *lane)
+{
+  int j;
+
+  /* first stage of an RK45 attempt, using the field at the start of the
+     step as in AACGM_v2_RK45 */
+  for (j=0; j<3; j++) {
+    lane->k[0][j] = lane->ds*lane->idir*lane->b0[j]/lane->bmag0;
+    lane->pos[j] = lane->xyzg[j] + lane->k[0][j]/4.;
+  }
+  lane->stage = 1;
+}
+
+static int trace_finish(struct trace_lane *lane)
+{
+  double Lshell, xyzm[3], rtp[3];
+
+  if (lane->inverse) {
+    lane->lat = 90. - lane->rtp[1]/DTOR;
+    lane->lon = lane->rtp[2]/DTOR;
+    if (lane->lon > 180) lane->lon -= 360.;
+    lane->err = 0;
+    return 0;
+  }
+
+  /* 'trace' back to reference surface along Dipole field lines */
+  Lshell = sqrt(lane->xyzc[0]*lane->xyzc[0] + lane->xyzc[1]*lane->xyzc[1] +
+                lane->xyzc[2]*lane->xyzc[2]);
+  if (Lshell < (RE+lane->alt)/RE) { /* magnetic equator is below ... */
+    lane->lat = NAN;
+    lane->lon = NAN;
+    lane->err = -1;
+  } else {
+    geo2mag(lane->xyzc, xyzm);
+    car2sph(xyzm, rtp);
+
+    lane->lat = -lane->idir*acos(sqrt(1./Lshell))/DTOR;
+    lane->lon = rtp[2]/DTOR;
+    if (lane->lon > 180) lane->lon -= 360.;
+    lane->err = 0;
+  }
+
+  return 0;
+}
+
+static int trace_bisect(struct trace_lane *lane)
+{
+  int j;
+
+  /* bisect stepsize (fixed) to land on magnetic equator w/in 1 m */
+  if (lane->ds > 1e-3/RE) {
+    lane->ds *= .5;
+    lane->nbisect++;
+    for (j=0; j<3; j++) lane->xyzp[j] = lane->pos[j] = lane->xyzc[j];
+    lane->bisect = 1;
+    lane->stage = 0;
+    return 1;
+  }
+
+  return trace_finish(lane);
+}
+
+static int trace_adapt(struct trace_lane *lane)
+{
+  int j, more;
+  double xyzm[3];
+
+  /* test whether to continue the adaptive steps, see AACGM_v2_Trace and
+     AACGM_v2_Trace_inv */
+  if (lane->inverse) {
+    more = (lane->rtp[0] > (RE + lane->alt)/RE);
+  } else {
+    /* stop if the trace has gone below the starting altitude */
+    if (lane->niter > 0 && ((lane->xyzg[0]*lane->xyzg[0] +
+                             lane->xyzg[1]*lane->xyzg[1] +
+                             lane->xyzg[2]*lane->xyzg[2]) <
+                            (RE+lane->alt)*(RE+lane->alt)/(RE*RE))) {
+      for (j=0; j<3; j++) lane->xyzc[j] = lane->xyzg[j];
+      return trace_finish(lane);
+    }
+    geo2mag(lane->xyzg, xyzm);
+    more = (lane->idir*xyzm[2] < 0.);
+  }
+
+  if (more) {
+    for (j=0; j<3; j++) lane->xyzp[j] = lane->pos[j] = lane->xyzg[j];
+    lane->stage = 0;
+    return 1;
+  }
+
+  if (lane->niter > 1) {
+    for (j=0; j<3; j++) lane->xyzc[j] = lane->xyzp[j];
+    return trace_bisect(lane);
+  }
+
+  for (j=0; j<3; j++) lane->xyzc[j] = lane->xyzg[j];  /* use last value */
+  return trace_finish(lane);
+}
+
+static int trace_start(struct trace_lane *lane, int idx, double lat_in,
+                       double lon_in, double alt, int inverse)
+{
+  double Lshell, xyzm[3];
+
+  lane->idx = idx;
+  lane->inverse = inverse;
+  lane->bisect = 0;
+  lane->niter = 0;
+  lane->nbisect = 0;
+  lane->alt = alt;
+  lane->ds = 1./RE;
+
+  if (inverse) {
+    /* poles map to infinity */
+    if (fabs(fabs(lat_in) - 90.) < 1e-6)
+      lat_in += (lat_in > 0) ? -1e-6 : 1e-6;
+
+    Lshell = 1./(cos(lat_in*DTOR)*cos(lat_in*DTOR));
+    if (Lshell < (RE+alt)/RE) { /* solution does not exist */
+      lane->lat = NAN;
+      lane->lon = NAN;
+      lane->err = -1;
+      return 0;
+    }
+
+    /* magnetic, then geographic, Cartesian coordinates of the starting
+       point at the magnetic equator */
+    xyzm[0] = Lshell*cos(lon_in*DTOR);
+    xyzm[1] = Lshell*sin(lon_in*DTOR);
+    xyzm[2] = 0.;
+    mag2geo(xyzm, lane->xyzg);
+    car2sph(lane->xyzg, lane->rtp);
+
+    lane->idir = (lat_in > 0) ? 1 : -1;
+  } else {
+    lane->rtp[0] = (RE+alt)/RE;
+    lane->rtp[1] = (90.-lat_in)*DTOR;
+    lane->rtp[2] = lon_in*DTOR;
+    sph2car(lane->rtp, lane->xyzg);
+    geo2mag(lane->xyzg, xyzm);
+
+    lane->idir = (xyzm[2] > 0.) ? -1 : 1;   /* N or S hemisphere */
+  }
+
+  return trace_adapt(lane);
+}
+
+static int trace_step(struct trace_lane *lane, const double b[3])
+{
+  int j, s;
+  double bmag, rr, delt, w1[3], w2[3];
+  double (*k)[3] = lane->k;
+
+  bmag = sqrt(b[0]*b[0] + b[1]*b[1] + b[2]*b[2]);
+  s = lane->stage;
+
+  if (lane->bisect) {
+    /* RK4 step from xyzc, see AACGM_v2_RK45 */
+    for (j=0; j<3; j++) k[s][j] = lane->ds*lane->idir*b[j]/bmag;
+    if (s < 3) {
+      for (j=0; j<3; j++)
+        lane->pos[j] = lane->xyzc[j] + ((s < 2) ? .5*k[s][j] : k[s][j]);
+      lane->stage++;
+      return 1;
+    }
+
+    for (j=0; j<3; j++)
+      lane->xyzc[j] += (k[0][j] + k[1][j]+k[1][j] + k[2][j]+k[2][j] +
+                        k[3][j])/6.;
+
+    if (lane->inverse) {
+      car2sph(lane->xyzc, lane->rtp);
+      if (lane->rtp[0] < (RE + lane->alt)/RE)
+        for (j=0; j<3; j++) lane->xyzc[j] = lane->xyzp[j];
+    } else {
+      geo2mag(lane->xyzc, w1);
+      if (lane->idir * w1[2] > 0)
+        for (j=0; j<3; j++) lane->xyzc[j] = lane->xyzp[j];
+    }
+
+    return trace_bisect(lane);
+  }
+
+  /* adaptive RK45 step from xyzg, see AACGM_v2_RK45 */
+  if (s == 0) {
+    for (j=0; j<3; j++) lane->b0[j] = b[j];
+    lane->bmag0 = bmag;
+    lane->r0 = sqrt(lane->xyzg[0]*lane->xyzg[0] +
+                    lane->xyzg[1]*lane->xyzg[1] + lane->xyzg[2]*lane->xyzg[2]);
+    trace_rk45(lane);
+    return 1;
+  }
+
+  for (j=0; j<3; j++) k[s][j] = lane->ds*lane->idir*b[j]/bmag;
+  switch (s) {
+    case 1:
+      for (j=0; j<3; j++)
+        lane->pos[j] = lane->xyzg[j] + (3.*k[0][j] + 9.*k[1][j])/32.;
+      break;
+    case 2:
+      for (j=0; j<3; j++)
+        lane->pos[j] = lane->xyzg[j] + (1932.*k[0][j] - 7200.*k[1][j] +
+                                        7296.*k[2][j])/2197.;
+      break;
+    case 3:
+      for (j=0; j<3; j++)
+        lane->pos[j] = lane->xyzg[j] + 439.*k[0][j]/216. - 8.*k[1][j] +
+                       3680.*k[2][j]/513. - 845.*k[3][j]/4104.;
+      break;
+    case 4:
+      for (j=0; j<3; j++)
+        lane->pos[j] = lane->xyzg[j] - 8.*k[0][j]/27. + 2.*k[1][j] -
+                       3544.*k[2][j]/2565. + 1859.*k[3][j]/4104. -
+                       11.*k[4][j]/40.;
+      break;
+  }
+  if (s < 5) {
+    lane->stage++;
+    return 1;
+  }
+
+  rr = 0.;
+  for (j=0; j<3; j++) {
+    w1[j] = lane->xyzg[j] + 25.*k[0][j]/216. + 1408.*k[2][j]/2565. +
+            2197.*k[3][j]/4104. - k[4][j]/5.;
+    w2[j] = lane->xyzg[j] + 16.*k[0][j]/135. + 6656.*k[2][j]/12825. +
+            28561.*k[3][j]/56430. - 9.*k[4][j]/50. + 2.*k[5][j]/55.;
+    rr += (w1[j]-w2[j])*(w1[j]-w2[j]);
+  }
+  rr = sqrt(rr)/lane->ds;
+
+  if (fabs(rr) > 1e-16) {
+    delt = 0.84 *pow(1.e-4/RE/rr,0.25);
+    lane->ds *= delt;
+    lane->ds = MIN(50*lane->r0*lane->r0*lane->r0/RE, lane->ds);
+  }
+
+  /* we use the RK4 solution, and repeat the attempt from there if the
+     error is too large */
+  for (j=0; j<3; j++) lane->xyzg[j] = w1[j];
+  if (rr > 1.e-4/RE) {
+    trace_rk45(lane);
+    return 1;
+  }
+
+  /* make sure that stepsize does not go to zero */
+  if (lane->inverse) {
+    if (lane->ds*RE < 5e-1) lane->ds = 5e-1/RE;
+    car2sph(lane->xyzg, lane->rtp);
+  } else {
+    if (lane->ds*RE < 1e-2) lane->ds = 1e-2/RE;
+  }
+  lane->niter++;
+
+  return trace_adapt(lane);
+}
+
+static int trace_output(struct trace_lane *lane, double *lat, double *lon,
+                        double *height, int *err, unsigned long *niter,
+                        AACGM_v2_Stats *stats, int code)
+{
+  int i;
+  double h, llh[3];
+
+  stats->traces++;
+  stats->trace_steps += lane->niter;
+  stats->trace_bisections += lane->nbisect;
+
+  /* outputs, see AACGM_v2_Convert */
+  i = lane->idx;
+  if (niter != NULL) niter[i] = lane->niter + lane->nbisect;
+  h = height[i];
+  lat[i] = lane->lat;
+  lon[i] = lane->lon;
+  err[i] = lane->err;
+  if ((code & A2G) == 0) {
+    height[i] = (h + RE)/RE;
+  } else if ((code & GEOCENTRIC) == 0) {
+    geoc2geod(lat[i],lon[i],(RE+h)/RE, llh);
+    lat[i] = llh[0];
+    height[i] = llh[2];
+  }
+  lane->idx = -1;
+
+  return (err[i] != 0);
+}
+
+static int trace_batch(int n, double *lat, double *lon, double *height,
+                       int *err, unsigned long *niter, int code)
+{
+  int i, j, q, nlane, nbad;
+  int lane_idx[AACGM_BATCH];
+  struct trace_lane lanes[AACGM_BATCH];
+  double x[AACGM_BATCH], y[AACGM_BATCH], z[AACGM_BATCH];
+  double bx[AACGM_BATCH], by[AACGM_BATCH], bz[AACGM_BATCH];
+  double b[3], t0;
+  struct trace_lane *lane;
+  AACGM_v2_Stats *stats;
+
+  t0 = AACGM_v2_Clock();
+  stats = AACGM_v2_ThreadStats();
+
+  /* set date for IGRF model */
+  IGRF_SetDateTime(aacgm->date.year, aacgm->date.month, aacgm->date.day,
+                   aacgm->date.hour, aacgm->date.minute, aacgm->date.second);
+
+  for (j=0; j<AACGM_BATCH; j++) lanes[j].idx = -1;
+
+  nbad = 0;
+  i = 0;
+  while (1) {
+    /* start tracing the next locations in the free lanes */
+    nlane = 0;
+    for (j=0; j<AACGM_BATCH; j++) {
+      lane = &lanes[j];
+      for (; lane->idx < 0 && i < n; i++) {
+        if (err[i] == TRACE_PENDING &&
+            !trace_start(lane, i, lat[i], lon[i], height[i], code & A2G))
+          nbad += trace_output(lane, lat, lon, height, err, niter, stats,
+                               code);
+      }
+      if (lane->idx >= 0) lane_idx[nlane++] = j;
+    }
+    if (nlane == 0) break;
+
+    /* evaluate the field at the pending position of every lane at once */
+    for (q=0; q<nlane; q++) {
+      lane = &lanes[lane_idx[q]];
+      x[q] = lane->pos[0];
+      y[q] = lane->pos[1];
+      z[q] = lane->pos[2];
+    }
+    IGRF_compute_batch(nlane, x, y, z, bx, by, bz);
+
+    for (q=0; q<nlane; q++) {
+      lane = &lanes[lane_idx[q]];
+      b[0] = bx[q];
+      b[1] = by[q];
+      b[2] = bz[q];
+      if (!trace_step(lane, b))
+        nbad += trace_output(lane, lat, lon, height, err, niter, stats,
+                             code);
+    }
+  }
+
+  stats->trace_time += AACGM_v2_Clock() - t0;
+
+  return nbad;
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_ConvertBatch
+;
+; PURPOSE:
+;       Convert an array of locations, as AACGM_v2_Convert, evaluating the
+;       spherical harmonic expansion for batches of AACGM_BATCH locations.
+;       The spherical harmonic functions are computed for the batch without
+;       allocating memory, and multiplied by the coefficients in one blocked
+;       operation.  Locations that use field-line tracing are traced together
+;       by trace_batch, and those that fail the input checks are converted
+;       one at a time by AACGM_v2_Convert.
+;
+; CALLING SEQUENCE:
+;       nbad = AACGM_v2_ConvertBatch(n, in_lat, in_lon, height,
+;                 out_lat, out_lon, r, err, code);
+;
+;     Input Arguments:
+;       n             - number of locations
+;       in_lat        - array of input latitudes in degrees
+;       in_lon        - array of input longitudes in degrees
+;       height        - array of altitudes in km
+;       code          - bitwise code for passing options into converter, as
+;                       for AACGM_v2_Convert
+;
+;     Output Arguments:
+;       out_lat       - array of output latitudes in degrees
+;       out_lon       - array of output longitudes in degrees
+;       r             - array of geocentric radial distances in Re (G2A) or
+;                       heights in km (A2G)
+;       err           - array of error codes from AACGM_v2_Convert
+;
+;     Return Value:
+;       number of locations that could not be converted
+;
+; NOTES:
+;
+;       If all locations in a batch have the same (geocentric) height, the
+;       height interpolated coefficients are used, and the results are the
+;       same as those of AACGM_v2_Convert.  Otherwise, the expansion is
+;       evaluated for each term of the height polynomial, which may differ
+;       from AACGM_v2_Convert by rounding.  The traced locations also differ
+;       by rounding, as IGRF_compute_batch sums the field in another order.
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int AACGM_v2_ConvertBatch(int n, const double *in_lat, const double *in_lon,
+                          const double *height, double *out_lat,
+                          double *out_lon, double *r, int *err, int code)
+{
+  return AACGM_v2_ConvertBatchIter(n, in_lat, in_lon, height, out_lat,
+                                   out_lon, r, err, NULL, code);
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_ConvertBatchIter
+;
+; PURPOSE:
+;       Convert an array of locations, as AACGM_v2_ConvertBatch, also getting
+;       the number of field-line tracing iterations for each location.
+;
+; CALLING SEQUENCE:
+;       nbad = AACGM_v2_ConvertBatchIter(n, in_lat, in_lon, height,
+;                 out_lat, out_lon, r, err, niter, code);
+;
+;     Input Arguments:
+;       as for AACGM_v2_ConvertBatch
+;
+;     Output Arguments:
+;       as for AACGM_v2_ConvertBatch, and
+;       niter         - array of the number of RK45 steps and bisection steps
+;                       used to trace each location, 0 for locations converted
+;                       with the coefficients, or NULL if not needed
+;
+;     Return Value:
+;       number of locations that could not be converted
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int AACGM_v2_ConvertBatchIter(int n, const double *in_lat,
+                              const double *in_lon, const double *height,
+                              double *out_lat, double *out_lon, double *r,
+                              int *err, unsigned long *niter, int code)
+{
+  int i, k, c, l, p, nb, nbad, ntrace, flag, same;
+  int idx[AACGM_BATCH];
+  double colat[AACGM_BATCH], lon[AACGM_BATCH], hgt[AACGM_BATCH];
+  double ylm[AACGM_KMAX][AACGM_BATCH];
+  double acc[NCOORD][POLYORD][AACGM_BATCH];
+  double xyz[NCOORD][AACGM_BATCH];
+  double norm[AACGM_KMAX];
+  double rtp[3], llh[3];
+  double lat, lat_adj, h, a, alt_var, alt_pow;
+  double (*cint)[NCOORD];
+
+  flag = (code & A2G) ? 1 : 0;
+  nbad = ntrace = 0;
+  rylm_norm(norm);
+
+  i = 0;
+  while (i < n) {
+    /* gather a batch of locations that use the coefficients */
+    nb = 0;
+    for (; i<n && nb<AACGM_BATCH; i++) {
+      lat = in_lat[i];
+      lon[nb] = in_lon[i];
+      h = height[i];
+
+      if (aacgm->date.year >= 0 && fabs(lat) <= 90. && isfinite(lon[nb]) &&
+          isfinite(h)) {
+        /* geodetic inputs to geocentric, see AACGM_v2_Convert */
+        if ((code & GEOCENTRIC) == 0 && (code & A2G) == 0) {
+          geod2geoc(lat,lon[nb],h, rtp);
+          lat = 90. - rtp[1]/DTOR;
+          lon[nb] = rtp[2]/DTOR;
+          h = (rtp[0]-1.)*RE;
+        }
+
+        if (((code & TRACE) || (h > MAXALT && (code & ALLOWTRACE))) &&
+            (h >= 0 || (code & VERBOSE) == 0)) {
+          /* trace after the coefficient batches, keeping the geocentric
+             inputs in the outputs */
+          out_lat[i] = lat;
+          out_lon[i] = lon[nb];
+          r[i] = h;
+          err[i] = TRACE_PENDING;
+          ntrace++;
+          continue;
+        } else if ((h <= MAXALT || (code & (ALLOWTRACE|BADIDEA)) == BADIDEA) &&
+            (h >= 0 || (code & VERBOSE) == 0)) {
+          if (flag == 0) {
+            colat[nb] = (90.-lat)*DTOR;
+          } else if (AACGM_v2_CGM2Alt(h, lat, &lat_adj) == 0) {
+            colat[nb] = (90. - lat_adj)*DTOR;
+          } else {
+            h = HUGE_VAL;  /* use AACGM_v2_Convert to set the error */
+          }
+        } else {
+          h = HUGE_VAL;
+        }
+      } else {
+        h = HUGE_VAL;
+      }
+
+      if (h == HUGE_VAL) {
+        err[i] = AACGM_v2_Convert(in_lat[i], in_lon[i], height[i],
+                                  &out_lat[i], &out_lon[i], &r[i], code);
+        if (err[i] < 0) nbad++;
+        if (niter != NULL) niter[i] = trace_last_iter;
+        continue;
+      }
+
+      if (niter != NULL) niter[i] = 0;
+      lon[nb] *= DTOR;
+      hgt[nb] = h;
+      idx[nb++] = i;
+    }
+    if (nb == 0) continue;
+
+    /* spherical harmonic functions for the batch */
+    rylm_batch(nb, colat, lon, norm, ylm);
+
+    same = 1;
+    for (p=1; p<nb; p++) if (hgt[p] != hgt[0]) same = 0;
+
+    if (same) {
+      /* one height: use the height interpolated coefficients */
+      cint = height_coefs(hgt[0], flag);
+      for (c=0; c<NCOORD; c++) {
+        for (p=0; p<nb; p++) xyz[c][p] = 0;
+        for (k=0; k<AACGM_KMAX; k++) {
+          a = cint[k][c];
+          for (p=0; p<nb; p++) xyz[c][p] += a*ylm[k][p];
+        }
+      }
+    } else {
+      /* several heights: evaluate each term of the height polynomial */
+      for (c=0; c<NCOORD; c++) {
+        for (l=0; l<POLYORD; l++) {
+          for (p=0; p<nb; p++) acc[c][l][p] = 0;
+          for (k=0; k<AACGM_KMAX; k++) {
+            a = aacgm->coef[k][c][l][flag];
+            for (p=0; p<nb; p++) acc[c][l][p] += a*ylm[k][p];
+          }
+        }
+        for (p=0; p<nb; p++) {
+          alt_var = hgt[p]/(double)MAXALT;
+          alt_pow = 1;
+          xyz[c][p] = 0;
+          for (l=0; l<POLYORD; l++) {
+            xyz[c][p] += acc[c][l][p]*alt_pow;
+            alt_pow *= alt_var;
+          }
+        }
+      }
+    }
+
+    /* outputs, see convert_geo_coord_v2 and AACGM_v2_Convert */
+    for (p=0; p<nb; p++) {
+      k = idx[p];
+      err[k] = coef_output(xyz[0][p], xyz[1][p], xyz[2][p], flag,
+                           &out_lat[k], &out_lon[k]);
+
+      h = hgt[p];
+      if (flag == 0) {
+        r[k] = (h + RE)/RE;
+      } else {
+        if ((code & GEOCENTRIC) == 0 && err[k] == 0) {
+          geoc2geod(out_lat[k],out_lon[k],(RE+h)/RE, llh);
+          out_lat[k] = llh[0];
+          h = llh[2];
+        }
+        r[k] = h;
+      }
+
+      if (err[k] != 0) {
+        err[k] = -1;
+        nbad++;
+      }
+    }
+  }
+
+  /* field-line tracing, advancing all traced locations together */
+  if (ntrace > 0)
+    nbad += trace_batch(n, out_lat, out_lon, r, err, niter, code);
+
+  return nbad;
+}
+
 /*-----------------------------------------------------------------------------
 ;
 ; NAME:
@@ -1088,20 +3081,20 @@ int AACGM_v2_SetDateTime(int year, int month, int day,
     return (-1);
   }
 
-  aacgm_date.year   = year;
-  aacgm_date.month  = month;
-  aacgm_date.day    = day;
-  aacgm_date.hour   = hour;
-  aacgm_date.minute = minute;
-  aacgm_date.second = second;
-  aacgm_date.dayno  = doy;
-  aacgm_date.daysinyear = ndays;
+  aacgm->date.year   = year;
+  aacgm->date.month  = month;
+  aacgm->date.day    = day;
+  aacgm->date.hour   = hour;
+  aacgm->date.minute = minute;
+  aacgm->date.second = second;
+  aacgm->date.dayno  = doy;
+  aacgm->date.daysinyear = ndays;
 
   #if DEBUG > 0
   printf("AACGM_v2_SetDateTime\n");
   printf("%03d: %04d%02d%02d %02d%02d:%02d\n",
-        aacgm_date.dayno, aacgm_date.year, aacgm_date.month, aacgm_date.day,
-        aacgm_date.hour, aacgm_date.minute, aacgm_date.second);
+        aacgm->date.dayno, aacgm->date.year, aacgm->date.month, aacgm->date.day,
+        aacgm->date.hour, aacgm->date.minute, aacgm->date.second);
   #endif
 
   err = AACGM_v2_TimeInterp();
@@ -1138,13 +3131,13 @@ int AACGM_v2_SetDateTime(int year, int month, int day,
 int AACGM_v2_GetDateTime(int *year, int *month, int *day,
                       int *hour, int *minute, int *second, int *dayno)
 {
-  *year   = aacgm_date.year;
-  *month  = aacgm_date.month;
-  *day    = aacgm_date.day;
-  *hour   = aacgm_date.hour;
-  *minute = aacgm_date.minute;
-  *second = aacgm_date.second;
-  *dayno  = aacgm_date.dayno;
+  *year   = aacgm->date.year;
+  *month  = aacgm->date.month;
+  *day    = aacgm->date.day;
+  *hour   = aacgm->date.hour;
+  *minute = aacgm->date.minute;
+  *second = aacgm->date.second;
+  *dayno  = aacgm->date.dayno;
 
   return 0;
 }
@@ -1190,20 +3183,20 @@ int AACGM_v2_SetNow(void)
     return (-1);
   }
 
-  aacgm_date.year   = (*tm_now).tm_year + 1900;
-  aacgm_date.month  = (*tm_now).tm_mon  + 1;
-  aacgm_date.day    = (*tm_now).tm_mday;
-  aacgm_date.hour   = (*tm_now).tm_hour;
-  aacgm_date.minute = (*tm_now).tm_min;
-  aacgm_date.second = (*tm_now).tm_sec;
-  aacgm_date.dayno  = (*tm_now).tm_yday + 1;
-  aacgm_date.daysinyear = ndays;
+  aacgm->date.year   = (*tm_now).tm_year + 1900;
+  aacgm->date.month  = (*tm_now).tm_mon  + 1;
+  aacgm->date.day    = (*tm_now).tm_mday;
+  aacgm->date.hour   = (*tm_now).tm_hour;
+  aacgm->date.minute = (*tm_now).tm_min;
+  aacgm->date.second = (*tm_now).tm_sec;
+  aacgm->date.dayno  = (*tm_now).tm_yday + 1;
+  aacgm->date.daysinyear = ndays;
 
   #if DEBUG > 0
   printf("AACGM_v2_SetNow\n");
   printf("%03d: %04d%02d%02d %02d%02d:%02d\n",
-        aacgm_date.dayno, aacgm_date.year, aacgm_date.month, aacgm_date.day,
-        aacgm_date.hour, aacgm_date.minute, aacgm_date.second);
+        aacgm->date.dayno, aacgm->date.year, aacgm->date.month, aacgm->date.day,
+        aacgm->date.hour, aacgm->date.minute, aacgm->date.second);
   #endif
 
   err = AACGM_v2_TimeInterp();
@@ -1218,7 +3211,9 @@ int AACGM_v2_SetNow(void)
 ;
 ; PURPOSE:
 ;       Function to set lock, which will prevent extra date and time checks
-;       when performing MLT_v2 conversions.
+;       when performing MLT_v2 conversions.  The current date and time are
+;       kept, and MLT_v2 conversions while locked use the coefficients for
+;       them, even if AACGM_v2_SetDateTime has been called since.
 ;
 ; CALLING SEQUENCE:
 ;       err = AACGM_v2_Lock();
@@ -1231,7 +3226,13 @@ int AACGM_v2_SetNow(void)
 
 int AACGM_v2_Lock(void)
 {
-  aacgm_date.locked = 1;
+  aacgm->date.locked = 1;
+  aacgm->date.lock_date[0] = aacgm->date.year;
+  aacgm->date.lock_date[1] = aacgm->date.month;
+  aacgm->date.lock_date[2] = aacgm->date.day;
+  aacgm->date.lock_date[3] = aacgm->date.hour;
+  aacgm->date.lock_date[4] = aacgm->date.minute;
+  aacgm->date.lock_date[5] = aacgm->date.second;
 
   return 0;
 }
@@ -1256,7 +3257,7 @@ int AACGM_v2_Lock(void)
 
 int AACGM_v2_Unlock(void)
 {
-  aacgm_date.locked = 0;
+  aacgm->date.locked = 0;
 
   return 0;
 }
@@ -1281,7 +3282,41 @@ int AACGM_v2_Unlock(void)
 
 int AACGM_v2_Locked(void)
 {
-  return (aacgm_date.locked);
+  return (aacgm->date.locked);
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       AACGM_v2_GetLockDateTime
+;
+; PURPOSE:
+;       Function to get the date and time kept by AACGM_v2_Lock.
+;
+; CALLING SEQUENCE:
+;       err = AACGM_v2_GetLockDateTime(&year, &month, &day,
+;                                      &hour, &minute, &second);
+;
+;     Return Value:
+;       error code, -1 if not locked or if the date and time were not set
+;       when locked
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int AACGM_v2_GetLockDateTime(int *year, int *month, int *day,
+                             int *hour, int *minute, int *second)
+{
+  if (!aacgm->date.locked || aacgm->date.lock_date[0] < 0) return -1;
+
+  *year   = aacgm->date.lock_date[0];
+  *month  = aacgm->date.lock_date[1];
+  *day    = aacgm->date.lock_date[2];
+  *hour   = aacgm->date.lock_date[3];
+  *minute = aacgm->date.lock_date[4];
+  *second = aacgm->date.lock_date[5];
+
+  return 0;
 }
 
 /*-----------------------------------------------------------------------------
@@ -1366,41 +3401,46 @@ void AACGM_v2_errmsg(int ecode)
 int AACGM_v2_TimeInterp(void)
 {
   int myear,f,l,a,t,err;
-  double fyear;
+  double fyear, t0;
+  AACGM_v2_Stats *stats;
 
   /* myear is the epoch model year */
-  myear = aacgm_date.year/5*5;
-  if (myear != myear_old) {   /* load the new coefficients, if needed */
+  myear = aacgm->date.year/5*5;
+  if (myear != aacgm->myear_old) {   /* load the new coefficients, if needed */
     err = AACGM_v2_LoadCoefs(myear);
     if (err != 0) return err;
-    fyear_old = -1;           /* force time interpolation */
-    height_old[0] = -1.;      /* force height interpolation */
-    height_old[1] = -1.;
+    aacgm->fyear_old = -1;           /* force time interpolation */
+    aacgm->generation++;        /* force height interpolation */
   }
 
   /* fyear is the floating point time */
-  fyear = aacgm_date.year + ((aacgm_date.dayno-1) + (aacgm_date.hour +
-                    (aacgm_date.minute + aacgm_date.second/60.)/60.)/24.)/
-                    aacgm_date.daysinyear;
+  fyear = aacgm->date.year + ((aacgm->date.dayno-1) + (aacgm->date.hour +
+                    (aacgm->date.minute + aacgm->date.second/60.)/60.)/24.)/
+                    aacgm->date.daysinyear;
 
   /* time interpolation right here */
-  if (fyear != fyear_old) {
+  if (fyear != aacgm->fyear_old) {
     #if DEBUG > 0
     printf("** TIME INTERPOLATION **\n");
     #endif
+    t0 = AACGM_v2_Clock();
 
     for (f=0;f<NFLAG;f++)
     for (l=0;l<POLYORD;l++)
     for (a=0;a<NCOORD;a++)
     for (t=0;t<AACGM_KMAX;t++)
-      sph_harm_model.coef[t][a][l][f] = sph_harm_model.coefs[t][a][l][f][0] +
-          (fyear - myear) * (sph_harm_model.coefs[t][a][l][f][1] -
-                            sph_harm_model.coefs[t][a][l][f][0])/5;
+      aacgm->coef[t][a][l][f] = (*aacgm->coefs[0])[f][l][a][t] +
+          (fyear - myear) * ((*aacgm->coefs[1])[f][l][a][t] -
+                             (*aacgm->coefs[0])[f][l][a][t])/5;
+
+    aacgm->generation++;        /* force height interpolation because coeffs */
+                              /* have changed */
 
-    height_old[0] = -1.;      /* force height interpolation because coeffs */
-    height_old[1] = -1.;      /* have changed */
+    aacgm->fyear_old = fyear;
 
-    fyear_old = fyear;
+    stats = AACGM_v2_ThreadStats();
+    stats->time_interps++;
+    stats->time_interp_time += AACGM_v2_Clock() - t0;
   }
 
   return (0);
@@ -1411,13 +3451,17 @@ int AACGM_v2_Trace(double lat_in, double lon_in, double alt,
                     double *lat_out, double *lon_out)
 {
   int err, kk, idir, below;
-  unsigned long k,niter;
-  double ds, dsRE, dsRE0, eps, Lshell;
+  unsigned long k,niter,nbisect;
+  double ds, dsRE, dsRE0, eps, Lshell, t0;
   double rtp[3],xyzg[3],xyzm[3],xyzc[3],xyzp[3];
+  AACGM_v2_Stats *stats;
+
+  t0 = AACGM_v2_Clock();
+  niter = nbisect = 0;
 
   /* set date for IGRF model */
-  IGRF_SetDateTime(aacgm_date.year, aacgm_date.month, aacgm_date.day,
-                    aacgm_date.hour, aacgm_date.minute, aacgm_date.second);
+  IGRF_SetDateTime(aacgm->date.year, aacgm->date.month, aacgm->date.day,
+                    aacgm->date.hour, aacgm->date.minute, aacgm->date.second);
 
   /* Q: these could eventually be command-line options */
   ds    = 1.;
@@ -1492,7 +3536,7 @@ int AACGM_v2_Trace(double lat_in, double lon_in, double alt,
 
       kk++;
     }
-    niter += kk;
+    nbisect = kk;
   } else {
     /*if (below) printf("BELOW\n");*/
     for (k=0;k<3;k++) xyzc[k] = xyzg[k];    /* just use last value */
@@ -1516,6 +3560,13 @@ int AACGM_v2_Trace(double lat_in, double lon_in, double alt,
     err = 0;
   }
 
+  stats = AACGM_v2_ThreadStats();
+  stats->traces++;
+  stats->trace_steps += niter;
+  stats->trace_bisections += nbisect;
+  stats->trace_time += AACGM_v2_Clock() - t0;
+  trace_last_iter = niter + nbisect;
+
   return (err);
 }
 
@@ -1523,13 +3574,17 @@ int AACGM_v2_Trace_inv(double lat_in, double lon_in, double alt,
                     double *lat_out, double *lon_out)
 {
   int err, kk, idir;
-  unsigned long k,niter;
-  double ds, dsRE, dsRE0, eps, Lshell;
+  unsigned long k,niter,nbisect;
+  double ds, dsRE, dsRE0, eps, Lshell, t0;
   double rtp[3],xyzg[3],xyzm[3],xyzc[3],xyzp[3];
+  AACGM_v2_Stats *stats;
+
+  t0 = AACGM_v2_Clock();
+  niter = nbisect = 0;
 
   /* set date for IGRF model */
-  IGRF_SetDateTime(aacgm_date.year, aacgm_date.month, aacgm_date.day,
-                    aacgm_date.hour, aacgm_date.minute, aacgm_date.second);
+  IGRF_SetDateTime(aacgm->date.year, aacgm->date.month, aacgm->date.day,
+                    aacgm->date.hour, aacgm->date.minute, aacgm->date.second);
 
   /* Q: these could eventually be command-line options */
   ds    = 1.;
@@ -1598,7 +3653,7 @@ int AACGM_v2_Trace_inv(double lat_in, double lon_in, double alt,
 
         kk++;
       }
-      niter += kk;
+      nbisect = kk;
     }
 
     *lat_out = 90. - rtp[1]/DTOR;
@@ -1607,6 +3662,13 @@ int AACGM_v2_Trace_inv(double lat_in, double lon_in, double alt,
     err = 0;
   }
 
+  stats = AACGM_v2_ThreadStats();
+  stats->traces++;
+  stats->trace_steps += niter;
+  stats->trace_bisections += nbisect;
+  stats->trace_time += AACGM_v2_Clock() - t0;
+  trace_last_iter = niter + nbisect;
+
   return (err);
 }
 
@@ -10,40 +10,50 @@
 /*#define DEBUG 1*/
 /* TO DO: should these go in igrflib.h? */
 
-static struct {
-  int year;
-  int month;
-  int day;
-  int hour;
-  int minute;
-  int second;
-  int dayno;
-  int daysinyear;
-} igrf_date = {-1,-1,-1,-1,-1,-1,-1,-1};
-
-static struct {
-  double ctcl;
-  double ctsl;
-  double stcl;
-  double stsl;
-  double ct0;
-  double st0;
-  double cl0;
-  double sl0;
-} geopack = {0.,0.,0.,0.,0.,0.,0.,0.};
-
-struct {    /* eccentric dipole structure */
-  double B02, B0;
-  double latref, lonref;
-  double g2m[3][3];
-  double L0, L1, L2, E;
-  double pos[3];
-} ecdip;
-
-static double IGRF_coef_set[MAXNYR][IGRF_MAXK]; /* all the coefficients */
-static double IGRF_svs[IGRF_MAXK];              /* secular variations */
-static double IGRF_coefs[IGRF_MAXK];            /* interpolated coefficients */
-static int    nmx;                          /* order of expansion */
+/* model state, so that several models may be used at once */
+struct IGRF_Model {
+  struct {
+    int year;
+    int month;
+    int day;
+    int hour;
+    int minute;
+    int second;
+    int dayno;
+    int daysinyear;
+  } date;
+
+  struct {
+    double ctcl;
+    double ctsl;
+    double stcl;
+    double stsl;
+    double ct0;
+    double st0;
+    double cl0;
+    double sl0;
+  } geopack;
+
+  struct {    /* eccentric dipole structure */
+    double B02, B0;
+    double latref, lonref;
+    double g2m[3][3];
+    double L0, L1, L2, E;
+    double pos[3];
+  } ecdip;
+
+  double coef_set[MAXNYR][IGRF_MAXK]; /* all the coefficients */
+  double svs[IGRF_MAXK];              /* secular variations */
+  double coefs[IGRF_MAXK];            /* interpolated coefficients */
+  int    nmx;                         /* order of expansion */
+  char   filename[MAXSTR];            /* coefficients; IGRF_COEFFS if empty */
+  int    memory;                      /* coefficients set by IGRF_SetCoefs */
+};
+
+/* the default model is used by each thread until another is selected */
+static IGRF_Model igrf_default = {{-1,-1,-1,-1,-1,-1,-1,-1},
+                                  {0.,0.,0.,0.,0.,0.,0.,0.}};
+static AACGM_TLS IGRF_Model *igrf = &igrf_default;
 
 /*-----------------------------------------------------------------------------
 ; for debugging
@@ -58,6 +68,146 @@ void igrf_pause(void)
   fprintf(stdout, "\n");
 }
 
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       IGRF_NewModel
+;
+; PURPOSE:
+;       Allocate a model state, which holds its own coefficients, date and
+;       time, so that several models may be used without reloading or
+;       interpolating the coefficients each time another is used.
+;
+; CALLING SEQUENCE:
+;       model = IGRF_NewModel(filename);
+;
+;     Input Arguments:
+;       filename      - name of file which contains IGRF coefficients, or NULL
+;                       to use the IGRF_COEFFS environment variable
+;
+;     Return Value:
+;       pointer to the new model, or NULL on failure
+;
+;+-----------------------------------------------------------------------------
+*/
+
+IGRF_Model *IGRF_NewModel(const char *filename)
+{
+  IGRF_Model *model;
+
+  if (filename != NULL && strlen(filename) >= MAXSTR) return (NULL);
+
+  model = (IGRF_Model *)calloc(1, sizeof(IGRF_Model));
+  if (model == NULL) return (NULL);
+
+  model->date.year = model->date.month = model->date.day = -1;
+  model->date.hour = model->date.minute = model->date.second = -1;
+  model->date.dayno = model->date.daysinyear = -1;
+  if (filename != NULL) strcpy(model->filename, filename);
+
+  return (model);
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       IGRF_FreeModel
+;
+; PURPOSE:
+;       Free a model state allocated by IGRF_NewModel. The model must not be
+;       selected by any thread.
+;
+; CALLING SEQUENCE:
+;       IGRF_FreeModel(model);
+;
+;+-----------------------------------------------------------------------------
+*/
+
+void IGRF_FreeModel(IGRF_Model *model)
+{
+  if (model != &igrf_default) free(model);
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       IGRF_SetModel
+;
+; PURPOSE:
+;       Select the model state used by the calling thread.
+;
+; CALLING SEQUENCE:
+;       old_model = IGRF_SetModel(model);
+;
+;     Input Arguments:
+;       model         - model from IGRF_NewModel, or NULL for the default
+;
+;     Return Value:
+;       pointer to the model previously used by the calling thread
+;
+;+-----------------------------------------------------------------------------
+*/
+
+IGRF_Model *IGRF_SetModel(IGRF_Model *model)
+{
+  IGRF_Model *old_model = igrf;
+
+  igrf = (model == NULL) ? &igrf_default : model;
+
+  return (old_model);
+}
+
+/*-----------------------------------------------------------------------------
+; igrf_normalization
+;
+; Compute the Schmidt quasi-normalization factors, which scale the
+; coefficients given in the IGRF coefficient files, in the order used by the
+; AACGM code (k = l * (l+1) + m).
+;+-----------------------------------------------------------------------------
+*/
+
+static void igrf_normalization(double Slm[])
+{
+  int k,l,m,n, fac;
+  double fctrl[2*IGRF_ORDER+1], dfc[2*IGRF_ORDER];
+
+  #if DEBUG > 1
+  printf("Schmidt quasi-normalization factors\n");
+  printf("===================================\n\n");
+  #endif
+
+  /* factorial */
+  fctrl[0] = fctrl[1] = 1.;
+  for (k=2; k<= 2*IGRF_ORDER; k++)
+    fctrl[k] = k*fctrl[k-1];
+
+  /*for(k=0; k<=2*IGRF_ORDER; k++) printf("%lf\n", fctrl[k]); */
+
+  /* double factorial */
+  dfc[1] = 1;
+  for (k=3; k<2*IGRF_ORDER; k+=2)
+    dfc[k] = dfc[k-2]*k;
+
+  for (l=0; l<=IGRF_ORDER; l++) {
+    for (m=0; m<=l; m++) {
+      k = l * (l+1) + m;      /* 1D index for l,m */
+      n = l * (l+1) - m;      /* 1D index for l,m */
+
+      fac = (m) ? 2 : 1;
+      /* Davis 2004; Wertz 1978 recursion
+      Slm[k] = Slm[n] = sqrt(fac*fctrl[l-m]/fctrl[l+m])*dfc[2*l-1]/fctrl[l-m];
+      */
+      /* Winch 2004 */
+      Slm[k] = Slm[n] = sqrt(fac*fctrl[l-m]/fctrl[l+m]);
+
+      #if DEBUG > 1
+      printf("$ %2d %2d %2d %e %e %e\n", l, m, k, fctrl[l-m],fctrl[l+m],Slm[k]);
+      printf("$ %2d %2d %2d %e %e %e\n", l,-m, n, fctrl[l-m],fctrl[l+m],Slm[n]);
+      #endif
+    }
+  }
+}
+
 /*-----------------------------------------------------------------------------
 ;
 ; NAME:
@@ -93,7 +243,7 @@ void igrf_pause(void)
 int IGRF_loadcoeffs(void)
 {
   int k,l,m,n, ll,mm;
-  int fac, len;
+  int len;
   int iyear, nyear;
   int dgrf[MAXNYR];
   int epoch[MAXNYR];
@@ -103,7 +253,7 @@ int IGRF_loadcoeffs(void)
   char line[MAXSTR];
   double fyear;
   double coef, sv;
-  double Slm[IGRF_MAXK], fctrl[2*IGRF_ORDER+1], dfc[2*IGRF_ORDER];
+  double Slm[IGRF_MAXK];
   FILE *fp;
 
   #if DEBUG > 0
@@ -111,7 +261,9 @@ int IGRF_loadcoeffs(void)
   #endif
 
   /* file containing the IGRF coefficients */
-  if ((filename = getenv("IGRF_COEFFS")) == NULL) {
+  if (igrf->filename[0] != '\0') {
+    filename = igrf->filename;
+  } else if ((filename = getenv("IGRF_COEFFS")) == NULL) {
     printf("\n");
     printf("***************************************************************\n");
     printf("* You MUST set the environment variable IGRF_COEFFS \n");
@@ -120,41 +272,7 @@ int IGRF_loadcoeffs(void)
   }
 /*  strcpy(filename,getenv("IGRF_COEFFS")); */
 
-  #if DEBUG > 1
-  printf("Schmidt quasi-normalization factors\n");
-  printf("===================================\n\n");
-  #endif
-
-  /* factorial */
-  fctrl[0] = fctrl[1] = 1.;
-  for (k=2; k<= 2*IGRF_ORDER; k++)
-    fctrl[k] = k*fctrl[k-1];
-
-  /*for(k=0; k<=2*IGRF_ORDER; k++) printf("%lf\n", fctrl[k]); */
-
-  /* double factorial */
-  dfc[1] = 1;
-  for (k=3; k<2*IGRF_ORDER; k+=2)
-    dfc[k] = dfc[k-2]*k;
-
-  for (l=0; l<=IGRF_ORDER; l++) {
-    for (m=0; m<=l; m++) {
-      k = l * (l+1) + m;      /* 1D index for l,m */
-      n = l * (l+1) - m;      /* 1D index for l,m */
-
-      fac = (m) ? 2 : 1;
-      /* Davis 2004; Wertz 1978 recursion
-      Slm[k] = Slm[n] = sqrt(fac*fctrl[l-m]/fctrl[l+m])*dfc[2*l-1]/fctrl[l-m];
-      */
-      /* Winch 2004 */
-      Slm[k] = Slm[n] = sqrt(fac*fctrl[l-m]/fctrl[l+m]);
-
-      #if DEBUG > 1
-      printf("$ %2d %2d %2d %e %e %e\n", l, m, k, fctrl[l-m],fctrl[l+m],Slm[k]);
-      printf("$ %2d %2d %2d %e %e %e\n", l,-m, n, fctrl[l-m],fctrl[l+m],Slm[n]);
-      #endif
-    }
-  }
+  igrf_normalization(Slm);
 
   /* get the coefficients */
   fp = fopen(filename, "r");
@@ -246,13 +364,13 @@ int IGRF_loadcoeffs(void)
     fscanf(fp, "%d %d", &ll, &mm);  /* l amd m */
     for (n=0; n<nyear; n++) {
       fscanf(fp, "%lf", &coef);     /* coefficient */
-      IGRF_coef_set[n][k] = coef * Slm[k];    /* NORMALIZE */
+      igrf->coef_set[n][k] = coef * Slm[k];    /* NORMALIZE */
       #if DEBUG > 1
-      fprintf(stderr, "%d %d %d %d %f\n", k, l, n, 0, IGRF_coef_set[n][k]);
+      fprintf(stderr, "%d %d %d %d %f\n", k, l, n, 0, igrf->coef_set[n][k]);
       #endif
     }
     fscanf(fp, "%lf", &sv);         /* secular variation */
-    IGRF_svs[k] = sv * Slm[k];      /* NORMALIZE */
+    igrf->svs[k] = sv * Slm[k];      /* NORMALIZE */
     fscanf(fp, "%c", &jnk);         /* <CR> */
 
     for (m=1; m<=l; m++) {
@@ -264,13 +382,13 @@ int IGRF_loadcoeffs(void)
 
       for (n=0; n<nyear; n++) {
         fscanf(fp, "%lf", &coef);     /* coefficient */
-        IGRF_coef_set[n][k] = coef * Slm[k];    /* NORMALIZE */
+        igrf->coef_set[n][k] = coef * Slm[k];    /* NORMALIZE */
         #if DEBUG > 1
-        fprintf(stderr, "%d %d %d %d %f\n", k, l, n, m, IGRF_coef_set[n][k]);
+        fprintf(stderr, "%d %d %d %d %f\n", k, l, n, m, igrf->coef_set[n][k]);
         #endif
       }
       fscanf(fp, "%lf", &sv);         /* secular variation */
-      IGRF_svs[k] = sv * Slm[k];      /* NORMALIZE */
+      igrf->svs[k] = sv * Slm[k];      /* NORMALIZE */
       fscanf(fp, "%c", &jnk);         /* <CR> */
 
       k = l * (l+1) - m;            /* 1D index for l,m */
@@ -280,13 +398,13 @@ int IGRF_loadcoeffs(void)
       fscanf(fp, "%d %d", &ll, &mm);  /* l amd m */
       for (n=0; n<nyear; n++) {
         fscanf(fp, "%lf", &coef);     /* coefficient */
-        IGRF_coef_set[n][k] = coef * Slm[k];    /* NORMALIZE */
+        igrf->coef_set[n][k] = coef * Slm[k];    /* NORMALIZE */
         #if DEBUG > 1
-        fprintf(stderr, "%d %d %d %d %f\n", k, l, n, -m, IGRF_coef_set[n][k]);
+        fprintf(stderr, "%d %d %d %d %f\n", k, l, n, -m, igrf->coef_set[n][k]);
         #endif
       }
       fscanf(fp, "%lf", &sv);         /* secular variation */
-      IGRF_svs[k] = sv * Slm[k];      /* NORMALIZE */
+      igrf->svs[k] = sv * Slm[k];      /* NORMALIZE */
 
       /* note, some files end each line with <CR><LF> while others are <LF> */
       fscanf(fp, "%c", &jnk);                 /* <LF or CR> */
@@ -301,7 +419,7 @@ int IGRF_loadcoeffs(void)
 
   #if DEBUG > 1
   for (n=0; n<nyear; n++)
-    fprintf(stderr, "%04d %f\n", epoch[n], IGRF_coef_set[n][0]);
+    fprintf(stderr, "%04d %f\n", epoch[n], igrf->coef_set[n][0]);
   igrf_pause();
   #endif
 
@@ -312,7 +430,7 @@ int IGRF_loadcoeffs(void)
     for (m=-l; m<=l; m++) {
       k = l * (l+1) + m;
       fprintf(stderr, "%2d %3d %3d: %e\n", l,m,k,
-                      IGRF_coef_set[(1980-1900)/5][k]);
+                      igrf->coef_set[(1980-1900)/5][k]);
     }
   }
   igrf_pause();
@@ -321,6 +439,86 @@ int IGRF_loadcoeffs(void)
   return (0);
 }
 
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       IGRF_SetCoefs
+;
+; PURPOSE:
+;       Set the spherical harmonic coefficients of the current model from
+;       memory, so that the coefficient file is not read, or return to reading
+;       the coefficient file.  The coefficients are normalized as they are
+;       when read from the file, and the date and time are reset, so that
+;       they must be set again.
+;
+; CALLING SEQUENCE:
+;       err = IGRF_SetCoefs(nyear, coefs, svs);
+;
+;     Input Arguments:
+;       nyear         - number of 5-year epochs from IGRF_FIRST_EPOCH to
+;                       IGRF_LAST_EPOCH, or 0 to use the coefficient file
+;       coefs         - nyear*IGRF_MAXK coefficients, as given in the
+;                       coefficient file, with index n*IGRF_MAXK + k for
+;                       epoch n and k = l * (l+1) + m, where m < 0 for h
+;       svs           - IGRF_MAXK secular variations, indexed as coefs, or
+;                       NULL for none
+;
+;     Return Value:
+;       error code
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int IGRF_SetCoefs(int nyear, const double *coefs, const double *svs)
+{
+  int k,n;
+  double Slm[IGRF_MAXK];
+
+  if (nyear != 0 &&
+      (nyear != (IGRF_LAST_EPOCH-IGRF_FIRST_EPOCH)/5 + 1 || coefs == NULL))
+    return (-1);
+
+  if (nyear > 0) {
+    igrf_normalization(Slm);
+    for (n=0; n<nyear; n++)
+      for (k=0; k<IGRF_MAXK; k++)
+        igrf->coef_set[n][k] = coefs[n*IGRF_MAXK + k] * Slm[k];
+    for (k=0; k<IGRF_MAXK; k++)
+      igrf->svs[k] = (svs == NULL) ? 0. : svs[k] * Slm[k];
+  }
+  igrf->memory = (nyear > 0);
+
+  /* reset date, so that the coefficients are interpolated or loaded again */
+  igrf->date.year = igrf->date.month = igrf->date.day = -1;
+  igrf->date.hour = igrf->date.minute = igrf->date.second = -1;
+  igrf->date.dayno = igrf->date.daysinyear = -1;
+
+  return (0);
+}
+
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       IGRF_MemoryCoefs
+;
+; PURPOSE:
+;       Determine whether the coefficients of the current model were set from
+;       memory by IGRF_SetCoefs.
+;
+; CALLING SEQUENCE:
+;       memory = IGRF_MemoryCoefs();
+;
+;     Return Value:
+;       1 if the coefficients were set from memory, otherwise 0
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int IGRF_MemoryCoefs(void)
+{
+  return (igrf->memory);
+}
+
 /*-----------------------------------------------------------------------------
 ;
 ; NAME:
@@ -471,7 +669,7 @@ int IGRF_compute(const double rtp[], double brtp[]) {
   #endif
 
   /* no date/time set so bail */
-  if (igrf_date.year < 0) {
+  if (igrf->date.year < 0) {
     IGRF_msg_notime();
     return -128;
   }
@@ -482,7 +680,7 @@ int IGRF_compute(const double rtp[], double brtp[]) {
   if (fabs(st) < 1e-15) theta += (st < 0.) ? 1e-15 : -1e-15;
 
   /* Compute the values of the Legendre Polynomials, and derivatives */
-  IGRF_Plm(theta,nmx,plmval,dplmval);
+  IGRF_Plm(theta,igrf->nmx,plmval,dplmval);
 
 /*  aor  = RE/r;*/      /* a/r, where RE = a */
 /*  aor  = RE/rtp[0];*/   /* a/r, where RE = a */
@@ -500,23 +698,23 @@ int IGRF_compute(const double rtp[], double brtp[]) {
 
   for (k=0;k<3;k++) brtp[k] = 0;
 
-  for (l=1; l<=nmx; l++) {  /* no l = 0 term in IGRF */
+  for (l=1; l<=igrf->nmx; l++) {  /* no l = 0 term in IGRF */
     for (k=0;k<3;k++) tbrtp[k] = 0;
     for (m=0; m<=l; m++) {
       k = l*(l+1) + m;  /* g */
       n = l*(l+1) - m;  /* h */
 
-      tbrtp[0] += (IGRF_coefs[k]*cosm_arr[m] + IGRF_coefs[n]*sinm_arr[m]) *
+      tbrtp[0] += (igrf->coefs[k]*cosm_arr[m] + igrf->coefs[n]*sinm_arr[m]) *
               plmval[k];
-      tbrtp[1] += (IGRF_coefs[k]*cosm_arr[m] + IGRF_coefs[n]*sinm_arr[m]) *
+      tbrtp[1] += (igrf->coefs[k]*cosm_arr[m] + igrf->coefs[n]*sinm_arr[m]) *
               dplmval[k];
-      tbrtp[2] += (-IGRF_coefs[k]*sinm_arr[m] + IGRF_coefs[n]*cosm_arr[m]) *
+      tbrtp[2] += (-igrf->coefs[k]*sinm_arr[m] + igrf->coefs[n]*cosm_arr[m]) *
               m*plmval[k];
 
-/*      printf("%2d %2d %e %e %e\n", l,m, IGRF_coefs[k],IGRF_coefs[n], plmval[k]);
+/*      printf("%2d %2d %e %e %e\n", l,m, igrf->coefs[k],igrf->coefs[n], plmval[k]);
 //      printf("[]: %e %e %e\n", tbrtp[0], tbrtp[1], tbrtp[2]);
 //      printf("  %2d: brr=%lf, coef[k]=%lf, coef[n]=%lf, plmval[k]=%lf\n",
-//            m,brr,IGRF_coefs[k],IGRF_coefs[n],plmval[k]);
+//            m,brr,igrf->coefs[k],igrf->coefs[n],plmval[k]);
 //      printf("  %2d: brr=%lf, cosm=%lf, sinm=%lf\n", m,brr,cosm_arr[m],sinm_arr[m]);*/
     }
 /*    printf("%2d brr = %lf\n", l,brr);*/
@@ -544,6 +742,148 @@ int IGRF_compute(const double rtp[], double brtp[]) {
   return (0);
 } 
 
+/*-----------------------------------------------------------------------------
+;
+; NAME:
+;       IGRF_compute_batch
+;
+; PURPOSE:
+;       Compute the IGRF magnetic field in Cartesian coordinates for many
+;       locations at once.
+;
+; CALLING SEQUENCE:
+;       err = IGRF_compute_batch(n, x, y, z, bx, by, bz);
+;     
+;     Input Arguments: 
+;       n             - number of locations
+;       x, y, z       - geocentric Cartesian coordinates in RE
+;
+;     Output Arguments:
+;       bx, by, bz    - Cartesian components of the field
+;
+;     Return Value:
+;       error code
+;
+; NOTES:
+;       Gives the field of IGRF_compute followed by bspcar, to rounding error.
+;       The sums run over m and then l, using the recursions of IGRF_Plm and
+;       the multiple angle formulas for cos(m*phi) and sin(m*phi), so that no
+;       trigonometric functions are evaluated.  The innermost loops run over
+;       up to IGRF_BATCH locations, so that they may be vectorized.
+;
+;+-----------------------------------------------------------------------------
+*/
+
+int IGRF_compute_batch(int n, const double *x, const double *y,
+                       const double *z, double *bx, double *by, double *bz)
+{
+  int i, l, m, p, nb;
+  double st[IGRF_BATCH], ct[IGRF_BATCH], sp[IGRF_BATCH], cp[IGRF_BATCH];
+  double cm[IGRF_BATCH], sm[IGRF_BATCH], pmm[IGRF_BATCH], dpmm[IGRF_BATCH];
+  double p1[IGRF_BATCH], p2[IGRF_BATCH], dp1[IGRF_BATCH], dp2[IGRF_BATCH];
+  double br[IGRF_BATCH], bt[IGRF_BATCH], bp[IGRF_BATCH];
+  double afac[IGRF_ORDER+1][IGRF_BATCH];
+  double sq, r, a, b, c, g, h, fac, pl, dpl, gc, hs;
+
+  /* no date/time set so bail */
+  if (igrf->date.year < 0) {
+    IGRF_msg_notime();
+    return -128;
+  }
+
+  for (i=0; i<n; i+=IGRF_BATCH) {
+    nb = MIN(IGRF_BATCH, n-i);
+
+    /* trigonometric functions of the position, see car2sph; the poles are
+       moved off the axis as in IGRF_compute */
+    for (p=0; p<nb; p++) {
+      sq = x[i+p]*x[i+p] + y[i+p]*y[i+p];
+      r  = sqrt(sq + z[i+p]*z[i+p]);
+      if (sq > 0.) {
+        sq = sqrt(sq);
+        st[p] = sq/r;
+        ct[p] = z[i+p]/r;
+        cp[p] = x[i+p]/sq;
+        sp[p] = y[i+p]/sq;
+      } else {
+        st[p] = 1e-15;
+        ct[p] = (z[i+p] < 0) ? -1. : 1.;
+        cp[p] = 1.;
+        sp[p] = 0.;
+      }
+
+      /* (a/r)^(l+2), r is in units of RE */
+      afac[0][p] = 1./(r*r);
+      for (l=1; l<=igrf->nmx; l++) afac[l][p] = afac[l-1][p]/r;
+
+      cm[p]   = 1.;
+      sm[p]   = 0.;
+      pmm[p]  = 1.;
+      dpmm[p] = 0.;
+      br[p] = bt[p] = bp[p] = 0.;
+    }
+
+    for (m=0; m<=igrf->nmx; m++) {
+      /* P^{m,m}, dP^{m,m}/dtheta, cos(m*phi), and sin(m*phi) */
+      if (m > 0) {
+        a = 2*m-1;
+        for (p=0; p<nb; p++) {
+          dpmm[p] = a*(dpmm[p]*st[p] + pmm[p]*ct[p]);
+          pmm[p]  = a*pmm[p]*st[p];
+          fac   = cm[p]*cp[p] - sm[p]*sp[p];
+          sm[p] = sm[p]*cp[p] + cm[p]*sp[p];
+          cm[p] = fac;
+        }
+      }
+
+      for (p=0; p<nb; p++) {
+        p1[p]  = pmm[p];
+        dp1[p] = dpmm[p];
+        p2[p]  = dp2[p] = 0.;
+      }
+
+      for (l=m; l<=igrf->nmx; l++) {
+        /* P^{l,m} and dP^{l,m}/dtheta from l-1 and l-2 */
+        if (l > m) {
+          a = 2*l-1;
+          b = (l == m+1) ? 0. : l+m-1;
+          c = 1./(l-m);
+          for (p=0; p<nb; p++) {
+            pl  = (a*ct[p]*p1[p] - b*p2[p])*c;
+            dpl = (a*(ct[p]*dp1[p] - st[p]*p1[p]) - b*dp2[p])*c;
+            p2[p]  = p1[p];
+            dp2[p] = dp1[p];
+            p1[p]  = pl;
+            dp1[p] = dpl;
+          }
+        }
+        if (l == 0) continue;   /* no l = 0 term in IGRF */
+
+        g = igrf->coefs[l*(l+1) + m];
+        h = igrf->coefs[l*(l+1) - m];
+        for (p=0; p<nb; p++) {
+          gc = g*cm[p] + h*sm[p];
+          hs = -g*sm[p] + h*cm[p];
+          br[p] += afac[l][p]*(l+1)*gc*p1[p];
+          bt[p] -= afac[l][p]*gc*dp1[p];
+          bp[p] -= afac[l][p]*hs*m*p1[p];
+        }
+      }
+    }
+
+    /* spherical to Cartesian components, see bspcar */
+    for (p=0; p<nb; p++) {
+      bp[p] /= st[p];
+      fac = br[p]*st[p] + bt[p]*ct[p];
+      bx[i+p] = fac*cp[p] - bp[p]*sp[p];
+      by[i+p] = fac*sp[p] + bp[p]*cp[p];
+      bz[i+p] = br[p]*ct[p] - bt[p]*st[p];
+    }
+  }
+
+  return (0);
+}
+
 /*-----------------------------------------------------------------------------
 ;
 ; NAME:
@@ -573,42 +913,42 @@ int IGRF_interpolate_coefs(void) {
   #endif
 
   /* fyear is the floating point time */
-  fyear = igrf_date.year + ((igrf_date.dayno-1) + (igrf_date.hour +
-                    (igrf_date.minute + igrf_date.second/60.)/60.)/24.)/
-                    igrf_date.daysinyear;
+  fyear = igrf->date.year + ((igrf->date.dayno-1) + (igrf->date.hour +
+                    (igrf->date.minute + igrf->date.second/60.)/60.)/24.)/
+                    igrf->date.daysinyear;
 
   /* NOTE: FORTRAN code allows 10-year extrapolation beyond last epoch.
    * Here we are limiting to only 5 */
   if (fyear < IGRF_FIRST_EPOCH || fyear > IGRF_LAST_EPOCH + 5) {
     /* reset date */
-    igrf_date.year = igrf_date.month = igrf_date.day = -1;
-    igrf_date.hour = igrf_date.minute = igrf_date.second = -1;
-    igrf_date.dayno = igrf_date.daysinyear = -1;
+    igrf->date.year = igrf->date.month = igrf->date.day = -1;
+    igrf->date.hour = igrf->date.minute = igrf->date.second = -1;
+    igrf->date.dayno = igrf->date.daysinyear = -1;
 
     fprintf(stdout, "Date range for current IGRF model is: %4d to %4d\n\n",
                       IGRF_FIRST_EPOCH, IGRF_LAST_EPOCH+5);
     return (-3);
   }
 
-  myear = igrf_date.year/5*5;                 /* epoch year */
-  nmx   = (igrf_date.year < 1995) ? 10 : 13;  /* order of expansion */
+  myear = igrf->date.year/5*5;                 /* epoch year */
+  igrf->nmx   = (igrf->date.year < 1995) ? 10 : 13;  /* order of expansion */
   i     = (myear - IGRF_FIRST_EPOCH)/5;       /* index of first set of coefs */
 
   if (fyear < IGRF_LAST_EPOCH) {
     /* interpolate bounding coefficients */
-    for (l=1; l<=nmx; l++) {  /* no l = 0 term in IGRF */
+    for (l=1; l<=igrf->nmx; l++) {  /* no l = 0 term in IGRF */
       for (m=-l; m<=l; m++) {
         k = l * (l+1) + m;      /* SGS: changes indexing */
-        IGRF_coefs[k] = IGRF_coef_set[i][k] + (fyear-myear)*
-                        (IGRF_coef_set[i+1][k]-IGRF_coef_set[i][k])/5;
+        igrf->coefs[k] = igrf->coef_set[i][k] + (fyear-myear)*
+                        (igrf->coef_set[i+1][k]-igrf->coef_set[i][k])/5;
       }
     }
   } else {
     /* use secular varation */
-    for (l=1; l<=nmx; l++) {  /* no l = 0 term in IGRF */
+    for (l=1; l<=igrf->nmx; l++) {  /* no l = 0 term in IGRF */
       for (m=-l; m<=l; m++) {
         k = l * (l+1) + m;      /* SGS: changes indexing */
-        IGRF_coefs[k] = IGRF_coef_set[i][k] + (fyear-myear)*IGRF_svs[k];
+        igrf->coefs[k] = igrf->coef_set[i][k] + (fyear-myear)*igrf->svs[k];
       }
     }
   }
@@ -618,34 +958,34 @@ int IGRF_interpolate_coefs(void) {
    */
 
 /* C & IDL index: k = l * (l+1) + m */
-  g10 = -IGRF_coefs[2]; /* 1*2+0 = 2 */
-  g11 =  IGRF_coefs[3]; /* 1*2+1 = 3 */
-  h11 =  IGRF_coefs[1]; /* 1*2-1 = 1 */
+  g10 = -igrf->coefs[2]; /* 1*2+0 = 2 */
+  g11 =  igrf->coefs[3]; /* 1*2+1 = 3 */
+  h11 =  igrf->coefs[1]; /* 1*2-1 = 1 */
 
   sq  = g11*g11 + h11*h11;
 
   sqq = sqrt(sq);
   sqr = sqrt(g10*g10 + sq);
 
-  geopack.sl0  = -h11/sqq;
-  geopack.cl0  = -g11/sqq;
-  geopack.st0  = sqq/sqr;
-  geopack.ct0  = g10/sqr;
+  igrf->geopack.sl0  = -h11/sqq;
+  igrf->geopack.cl0  = -g11/sqq;
+  igrf->geopack.st0  = sqq/sqr;
+  igrf->geopack.ct0  = g10/sqr;
 
-  geopack.stcl = geopack.st0*geopack.cl0;
-  geopack.stsl = geopack.st0*geopack.sl0;
-  geopack.ctsl = geopack.ct0*geopack.sl0;
-  geopack.ctcl = geopack.ct0*geopack.cl0;
+  igrf->geopack.stcl = igrf->geopack.st0*igrf->geopack.cl0;
+  igrf->geopack.stsl = igrf->geopack.st0*igrf->geopack.sl0;
+  igrf->geopack.ctsl = igrf->geopack.ct0*igrf->geopack.sl0;
+  igrf->geopack.ctcl = igrf->geopack.ct0*igrf->geopack.cl0;
 
   #if DEBUG > 0
-  printf("sl0  = %lf\n", geopack.sl0);
-  printf("cl0  = %lf\n", geopack.cl0);
-  printf("st0  = %lf\n", geopack.st0);
-  printf("ct0  = %lf\n", geopack.ct0);
-  printf("stcl = %lf\n", geopack.stcl);
-  printf("stsl = %lf\n", geopack.stsl);
-  printf("ctsl = %lf\n", geopack.ctsl);
-  printf("ctcl = %lf\n", geopack.ctcl);
+  printf("sl0  = %lf\n", igrf->geopack.sl0);
+  printf("cl0  = %lf\n", igrf->geopack.cl0);
+  printf("st0  = %lf\n", igrf->geopack.st0);
+  printf("ct0  = %lf\n", igrf->geopack.ct0);
+  printf("stcl = %lf\n", igrf->geopack.stcl);
+  printf("stsl = %lf\n", igrf->geopack.stsl);
+  printf("ctsl = %lf\n", igrf->geopack.ctsl);
+  printf("ctcl = %lf\n", igrf->geopack.ctcl);
   #endif
 
   /* for eccentric dipole coordinates */
@@ -669,54 +1009,58 @@ int IGRF_interpolate_coefs(void) {
   }
 
               /* S_(1,-1)^2 + S_(1,0)^2 + S_(1,1)^2 */
-  ecdip.B02 = IGRF_coefs[1]*IGRF_coefs[1]/(Slm[1]*Slm[1]) +
-              IGRF_coefs[2]*IGRF_coefs[2]/(Slm[2]*Slm[2]) +
-              IGRF_coefs[3]*IGRF_coefs[3]/(Slm[3]*Slm[3]);
-  ecdip.B0  = sqrt(ecdip.B02);
-
-  ecdip.latref = asin(-IGRF_coefs[2]/Slm[2]/ecdip.B0)/DTOR;
-  ecdip.lonref = 180 + atan2(IGRF_coefs[1]/Slm[1],IGRF_coefs[3]/Slm[3])/DTOR;
-
-  ca = cos(ecdip.latref*DTOR);
-  sa = sin(ecdip.latref*DTOR);
-  cb = cos(ecdip.lonref*DTOR);
-  sb = sin(ecdip.lonref*DTOR);
-
-  ecdip.g2m[0][0] = sa*cb;
-  ecdip.g2m[0][1] = sa*sb;
-  ecdip.g2m[0][2] =   -ca;
-  ecdip.g2m[1][0] =   -sb;
-  ecdip.g2m[1][1] =    cb;
-  ecdip.g2m[1][2] =    0.;
-  ecdip.g2m[2][0] = cb*ca;
-  ecdip.g2m[2][1] = ca*sb;
-  ecdip.g2m[2][2] =    sa;
+  igrf->ecdip.B02 = igrf->coefs[1]*igrf->coefs[1]/(Slm[1]*Slm[1]) +
+              igrf->coefs[2]*igrf->coefs[2]/(Slm[2]*Slm[2]) +
+              igrf->coefs[3]*igrf->coefs[3]/(Slm[3]*Slm[3]);
+  igrf->ecdip.B0  = sqrt(igrf->ecdip.B02);
+
+  igrf->ecdip.latref = asin(-igrf->coefs[2]/Slm[2]/igrf->ecdip.B0)/DTOR;
+  igrf->ecdip.lonref = 180 + atan2(igrf->coefs[1]/Slm[1],
+                                   igrf->coefs[3]/Slm[3])/DTOR;
+
+  ca = cos(igrf->ecdip.latref*DTOR);
+  sa = sin(igrf->ecdip.latref*DTOR);
+  cb = cos(igrf->ecdip.lonref*DTOR);
+  sb = sin(igrf->ecdip.lonref*DTOR);
+
+  igrf->ecdip.g2m[0][0] = sa*cb;
+  igrf->ecdip.g2m[0][1] = sa*sb;
+  igrf->ecdip.g2m[0][2] =   -ca;
+  igrf->ecdip.g2m[1][0] =   -sb;
+  igrf->ecdip.g2m[1][1] =    cb;
+  igrf->ecdip.g2m[1][2] =    0.;
+  igrf->ecdip.g2m[2][0] = cb*ca;
+  igrf->ecdip.g2m[2][1] = ca*sb;
+  igrf->ecdip.g2m[2][2] =    sa;
 
              /*  2*S10*S20 + sqrt(3)*(S11*S21 + S1-1*S2-1)  */
-  ecdip.L0 = 2 * IGRF_coefs[2]/Slm[2] * IGRF_coefs[6]/Slm[6] +
-             sqrt(3) * (IGRF_coefs[3]/Slm[3] * IGRF_coefs[7]/Slm[7] +
-                        IGRF_coefs[1]/Slm[1] * IGRF_coefs[5]/Slm[5]);
+  igrf->ecdip.L0 = 2 * igrf->coefs[2]/Slm[2] * igrf->coefs[6]/Slm[6] +
+             sqrt(3) * (igrf->coefs[3]/Slm[3] * igrf->coefs[7]/Slm[7] +
+                        igrf->coefs[1]/Slm[1] * igrf->coefs[5]/Slm[5]);
 
             /* -S11*S20 + sqrt(3)*(S10*S21 + S11*S30 + S1-1*S2-2) */
-  ecdip.L1 = - IGRF_coefs[3]/Slm[3] * IGRF_coefs[6]/Slm[6] +
-             sqrt(3) * (IGRF_coefs[2]/Slm[2] * IGRF_coefs[7]/Slm[7] +
-                        IGRF_coefs[3]/Slm[3] * IGRF_coefs[12]/Slm[12] +
-                        IGRF_coefs[1]/Slm[1] * IGRF_coefs[4]/Slm[4]);
+  igrf->ecdip.L1 = - igrf->coefs[3]/Slm[3] * igrf->coefs[6]/Slm[6] +
+             sqrt(3) * (igrf->coefs[2]/Slm[2] * igrf->coefs[7]/Slm[7] +
+                        igrf->coefs[3]/Slm[3] * igrf->coefs[12]/Slm[12] +
+                        igrf->coefs[1]/Slm[1] * igrf->coefs[4]/Slm[4]);
 
             /* -S1-1*S20 + sqrt(3)*(S10*S2-1 - S1-1*S30 + S11*S2-2) */
-  ecdip.L2 = - IGRF_coefs[1]/Slm[1] * IGRF_coefs[6]/Slm[6] +
-             sqrt(3) * (IGRF_coefs[2]/Slm[2] * IGRF_coefs[5]/Slm[5] -
-                        IGRF_coefs[1]/Slm[1] * IGRF_coefs[12]/Slm[12] +
-                        IGRF_coefs[3]/Slm[3] * IGRF_coefs[4]/Slm[4]);
+  igrf->ecdip.L2 = - igrf->coefs[1]/Slm[1] * igrf->coefs[6]/Slm[6] +
+             sqrt(3) * (igrf->coefs[2]/Slm[2] * igrf->coefs[5]/Slm[5] -
+                        igrf->coefs[1]/Slm[1] * igrf->coefs[12]/Slm[12] +
+                        igrf->coefs[3]/Slm[3] * igrf->coefs[4]/Slm[4]);
 
             /* (L0*S10 + L1*S11 + L2*S1-1)/4/B02 */
-  ecdip.E  = (ecdip.L0 * IGRF_coefs[2]/Slm[2] +
-              ecdip.L1 * IGRF_coefs[3]/Slm[3] +
-              ecdip.L2 * IGRF_coefs[1]/Slm[1])/4./ecdip.B02;
+  igrf->ecdip.E  = (igrf->ecdip.L0 * igrf->coefs[2]/Slm[2] +
+              igrf->ecdip.L1 * igrf->coefs[3]/Slm[3] +
+              igrf->ecdip.L2 * igrf->coefs[1]/Slm[1])/4./igrf->ecdip.B02;
 
-  ecdip.pos[0] = RE * (ecdip.L1 - IGRF_coefs[3]/Slm[3]*ecdip.E) /3./ecdip.B02;
-  ecdip.pos[1] = RE * (ecdip.L2 - IGRF_coefs[1]/Slm[1]*ecdip.E) /3./ecdip.B02;
-  ecdip.pos[2] = RE * (ecdip.L0 - IGRF_coefs[2]/Slm[2]*ecdip.E) /3./ecdip.B02;
+  igrf->ecdip.pos[0] = RE * (igrf->ecdip.L1 - igrf->coefs[3]/Slm[3] *
+                             igrf->ecdip.E) /3./igrf->ecdip.B02;
+  igrf->ecdip.pos[1] = RE * (igrf->ecdip.L2 - igrf->coefs[1]/Slm[1] *
+                             igrf->ecdip.E) /3./igrf->ecdip.B02;
+  igrf->ecdip.pos[2] = RE * (igrf->ecdip.L0 - igrf->coefs[2]/Slm[2] *
+                             igrf->ecdip.E) /3./igrf->ecdip.B02;
 
   return (0);
 }
@@ -752,29 +1096,29 @@ int IGRF_SetDateTime(int year, int month, int day,
 {
   int err = 0;
 
-  /* load coefficients if not already loaded */
-  if (igrf_date.year < 0)
+  /* load coefficients if not already loaded or set from memory */
+  if (igrf->date.year < 0 && !igrf->memory)
     err = IGRF_loadcoeffs();
 
   if (err) return (err);
 
-  if (igrf_date.year != year || igrf_date.month != month ||
-      igrf_date.day != day || igrf_date.hour != hour ||
-      igrf_date.minute != minute || igrf_date.second != second) {
+  if (igrf->date.year != year || igrf->date.month != month ||
+      igrf->date.day != day || igrf->date.hour != hour ||
+      igrf->date.minute != minute || igrf->date.second != second) {
 
-    igrf_date.year   = year;
-    igrf_date.month  = month;
-    igrf_date.day    = day;
-    igrf_date.hour   = hour;
-    igrf_date.minute = minute;
-    igrf_date.second = second;
-    igrf_date.dayno  = dayno(year,month,day,&(igrf_date.daysinyear));
+    igrf->date.year   = year;
+    igrf->date.month  = month;
+    igrf->date.day    = day;
+    igrf->date.hour   = hour;
+    igrf->date.minute = minute;
+    igrf->date.second = second;
+    igrf->date.dayno  = dayno(year,month,day,&(igrf->date.daysinyear));
 
     #if DEBUG > 0
     printf("IGRF_SetDateTime\n");
     printf("%03d: %04d%02d%02d %02d%02d:%02d\n",
-          igrf_date.dayno, igrf_date.year, igrf_date.month, igrf_date.day,
-          igrf_date.hour, igrf_date.minute, igrf_date.second);
+          igrf->date.dayno, igrf->date.year, igrf->date.month, igrf->date.day,
+          igrf->date.hour, igrf->date.minute, igrf->date.second);
     #endif
 
     err = IGRF_interpolate_coefs();
@@ -812,13 +1156,13 @@ int IGRF_SetDateTime(int year, int month, int day,
 int IGRF_GetDateTime(int *year, int *month, int *day,
                       int *hour, int *minute, int *second, int *dayno)
 {
-  *year   = igrf_date.year;
-  *month  = igrf_date.month;
-  *day    = igrf_date.day;
-  *hour   = igrf_date.hour;
-  *minute = igrf_date.minute;
-  *second = igrf_date.second;
-  *dayno  = igrf_date.dayno;
+  *year   = igrf->date.year;
+  *month  = igrf->date.month;
+  *day    = igrf->date.day;
+  *hour   = igrf->date.hour;
+  *minute = igrf->date.minute;
+  *second = igrf->date.second;
+  *dayno  = igrf->date.dayno;
 
   return 0;
 }
@@ -848,8 +1192,8 @@ int IGRF_SetNow(void)
   time_t now;
   struct tm *tm_now;
 
-  /* load coefficients if not already loaded */
-  if (igrf_date.year < 0)
+  /* load coefficients if not already loaded or set from memory */
+  if (igrf->date.year < 0 && !igrf->memory)
     err = IGRF_loadcoeffs();
 
   if (err) return (err);
@@ -857,26 +1201,26 @@ int IGRF_SetNow(void)
   now = time(NULL);
   tm_now = gmtime(&now);    /* right now in UT */
 
-  igrf_date.year   = (*tm_now).tm_year + 1900;
-  igrf_date.month  = (*tm_now).tm_mon  + 1;
-  igrf_date.day    = (*tm_now).tm_mday;
-  igrf_date.hour   = (*tm_now).tm_hour;
-  igrf_date.minute = (*tm_now).tm_min;
-  igrf_date.second = (*tm_now).tm_sec;
-  igrf_date.dayno  = (*tm_now).tm_yday + 1;
-  dyno = dayno(igrf_date.year,0,0,&(igrf_date.daysinyear));
+  igrf->date.year   = (*tm_now).tm_year + 1900;
+  igrf->date.month  = (*tm_now).tm_mon  + 1;
+  igrf->date.day    = (*tm_now).tm_mday;
+  igrf->date.hour   = (*tm_now).tm_hour;
+  igrf->date.minute = (*tm_now).tm_min;
+  igrf->date.second = (*tm_now).tm_sec;
+  igrf->date.dayno  = (*tm_now).tm_yday + 1;
+  dyno = dayno(igrf->date.year,0,0,&(igrf->date.daysinyear));
 
   #if DEBUG > 0
   printf("IGRF_SetNow\n");
   printf("%03d: %04d%02d%02d %02d%02d:%02d\n",
-        igrf_date.dayno, igrf_date.year, igrf_date.month, igrf_date.day,
-        igrf_date.hour, igrf_date.minute, igrf_date.second);
+        igrf->date.dayno, igrf->date.year, igrf->date.month, igrf->date.day,
+        igrf->date.hour, igrf->date.minute, igrf->date.second);
   #endif
 
   fprintf(stderr, "\nIGRF: No date/time specified, using current time: ");
   fprintf(stderr, "%04d%02d%02d %02d%02d:%02d\n\n",
-        igrf_date.year, igrf_date.month, igrf_date.day,
-        igrf_date.hour, igrf_date.minute, igrf_date.second);
+        igrf->date.year, igrf->date.month, igrf->date.day,
+        igrf->date.hour, igrf->date.minute, igrf->date.second);
 
   err = IGRF_interpolate_coefs();
 
@@ -938,9 +1282,9 @@ double IGRF_Tilt(int yr, int mo, int dy, int hr, int mt, int sc)
   sgst = sin(gst);
   cgst = cos(gst);
 
-  d1 = geopack.stcl * cgst - geopack.stsl * sgst;
-  d2 = geopack.stcl * sgst + geopack.stsl * cgst;
-  d3 = geopack.ct0;
+  d1 = igrf->geopack.stcl * cgst - igrf->geopack.stsl * sgst;
+  d2 = igrf->geopack.stcl * sgst + igrf->geopack.stsl * cgst;
+  d3 = igrf->geopack.ct0;
 
   sps  = d1*s1 + d2*s2 + d3*s3;
 
@@ -1221,13 +1565,15 @@ int bcarsp(const double xyz[], const double bxyz[], double brtp[]) {
 
 int geo2mag(const double xyzg[], double xyzm[]) {
 
-  xyzm[0] = xyzg[0]*geopack.ctcl + xyzg[1]*geopack.ctsl - xyzg[2]*geopack.st0;
-  xyzm[1] = xyzg[1]*geopack.cl0  - xyzg[0]*geopack.sl0;
-  xyzm[2] = xyzg[0]*geopack.stcl + xyzg[1]*geopack.stsl + xyzg[2]*geopack.ct0;
+  xyzm[0] = xyzg[0]*igrf->geopack.ctcl + xyzg[1]*igrf->geopack.ctsl -
+            xyzg[2]*igrf->geopack.st0;
+  xyzm[1] = xyzg[1]*igrf->geopack.cl0  - xyzg[0]*igrf->geopack.sl0;
+  xyzm[2] = xyzg[0]*igrf->geopack.stcl + xyzg[1]*igrf->geopack.stsl +
+            xyzg[2]*igrf->geopack.ct0;
 /*
-  *xm = xg*geopack.ctcl + yg*geopack.ctsl - zg*geopack.st0;
-  *ym = yg*geopack.cl0  - xg*geopack.sl0;
-  *zm = xg*geopack.stcl + yg*geopack.stsl + zg*geopack.ct0;
+  *xm = xg*igrf->geopack.ctcl + yg*igrf->geopack.ctsl - zg*igrf->geopack.st0;
+  *ym = yg*igrf->geopack.cl0  - xg*igrf->geopack.sl0;
+  *zm = xg*igrf->geopack.stcl + yg*igrf->geopack.stsl + zg*igrf->geopack.ct0;
 */
 
   return (0);
@@ -1235,13 +1581,15 @@ int geo2mag(const double xyzg[], double xyzm[]) {
 
 int mag2geo(const double xyzm[], double xyzg[]) {
 
-  xyzg[0] = xyzm[0]*geopack.ctcl - xyzm[1]*geopack.sl0 + xyzm[2]*geopack.stcl;
-  xyzg[1] = xyzm[0]*geopack.ctsl + xyzm[1]*geopack.cl0 + xyzm[2]*geopack.stsl;
-  xyzg[2] = xyzm[2]*geopack.ct0  - xyzm[0]*geopack.st0;
+  xyzg[0] = xyzm[0]*igrf->geopack.ctcl - xyzm[1]*igrf->geopack.sl0 +
+            xyzm[2]*igrf->geopack.stcl;
+  xyzg[1] = xyzm[0]*igrf->geopack.ctsl + xyzm[1]*igrf->geopack.cl0 +
+            xyzm[2]*igrf->geopack.stsl;
+  xyzg[2] = xyzm[2]*igrf->geopack.ct0  - xyzm[0]*igrf->geopack.st0;
 /*
-  *xg = xm*geopack.ctcl - ym*geopack.sl0 + zm*geopack.stcl;
-  *yg = xm*geopack.ctsl + ym*geopack.cl0 + zm*geopack.stsl;
-  *zg = zm*geopack.ct0  - xm*geopack.st0;
+  *xg = xm*igrf->geopack.ctcl - ym*igrf->geopack.sl0 + zm*igrf->geopack.stcl;
+  *yg = xm*igrf->geopack.ctsl + ym*igrf->geopack.cl0 + zm*igrf->geopack.stsl;
+  *zg = zm*igrf->geopack.ct0  - xm*igrf->geopack.st0;
 */
 
   return (0);
@@ -1285,7 +1633,7 @@ int geod2ecdip(double lat, double lon, double alt, double out[])
   #endif
 
   /* no date/time set so bail */
-  if (igrf_date.year < 0) {
+  if (igrf->date.year < 0) {
     IGRF_msg_notime();
     return -128;
   }
@@ -1293,12 +1641,12 @@ int geod2ecdip(double lat, double lon, double alt, double out[])
   //err = IGRF_GetDateTime(&yr, &mo, &dy, &hr, &mt, &sc, &dyno);
   //lonmag_ref = ecdip_mlt_ref(yr,mo,dy, hr,mt,sc);
 
-  //B0 = ecdip.B0*1e-5;
+  //B0 = igrf->ecdip.B0*1e-5;
   geod2geoc(lat,lon,alt, out);
   out[0] *= RE;
   sph2car(out, xyz);
 
-  for (k=0; k<3; k++) XYZ[k] = xyz[k] - ecdip.pos[k];
+  for (k=0; k<3; k++) XYZ[k] = xyz[k] - igrf->ecdip.pos[k];
 
   r = sqrt(XYZ[0]*XYZ[0] + XYZ[1]*XYZ[1] + XYZ[2]*XYZ[2]);
   for (k=0; k<3; k++) XYZ[k] /= r;
@@ -1306,13 +1654,13 @@ int geod2ecdip(double lat, double lon, double alt, double out[])
   /* coord=vec*g2m'; 1x3 * 3x3 = 1x3 */
   for (k=0; k<3; k++) {
     coord[k] = 0.;
-    for (i=0; i<3; i++) coord[k] += XYZ[i]*ecdip.g2m[k][i];
+    for (i=0; i<3; i++) coord[k] += XYZ[i]*igrf->ecdip.g2m[k][i];
   }
 
   d = coord[0]*coord[0] + coord[1]*coord[1];
   if (d == 0) {
     latmag = SIGN(coord[2])*90;
-    lonmag = ecdip.lonref;
+    lonmag = igrf->ecdip.lonref;
   } else if (d > 0) {
     latmag = asin(coord[2])/DTOR;
     lonmag = atan2(coord[1],coord[0])/DTOR;
@@ -1374,12 +1722,12 @@ int ecdip2geod(double elat, double elon, double r, double out[])
   #endif
 
   /* no date/time set so bail */
-  if (igrf_date.year < 0) {
+  if (igrf->date.year < 0) {
     IGRF_msg_notime();
     return -128;
   }
 
-  //B0 = ecdip.B0*1e-5;
+  //B0 = igrf->ecdip.B0*1e-5;
 
   //rr   = RE/r;
   //cd   = cos(elat*DTOR);
@@ -1396,10 +1744,10 @@ int ecdip2geod(double elat, double elon, double r, double out[])
   /* coord=g2m'*vec; 3x3 * 3x1 = 3x1 */
   for (k=0; k<3; k++) {
     coord[k] = 0.;
-    for (i=0; i<3; i++) coord[k] += ecdip.g2m[i][k]*XYZ[i];
+    for (i=0; i<3; i++) coord[k] += igrf->ecdip.g2m[i][k]*XYZ[i];
   }
 
-  for (k=0; k<3; k++) XYZ[k] = coord[k] + ecdip.pos[k];
+  for (k=0; k<3; k++) XYZ[k] = coord[k] + igrf->ecdip.pos[k];
 
   car2sph(XYZ, rtp);
 
@@ -1895,11 +2243,11 @@ double ecdip_mlt_ref(int yr, int mo, int dy, int hr, int mt, int sc)
   pos[1] = -(-cslp*sgst + sslp*cgst*cob) * RE;
   pos[2] = -( sslp*sob ) * RE;
 
-  for (k=0; k<3; k++) pos[k] -= ecdip.pos[k];
+  for (k=0; k<3; k++) pos[k] -= igrf->ecdip.pos[k];
 
   for (k=0; k<3; k++) {
     coord[k] = 0.;
-    for (i=0; i<3; i++) coord[k] += ecdip.g2m[k][i]*pos[i];
+    for (i=0; i<3; i++) coord[k] += igrf->ecdip.g2m[k][i]*pos[i];
   }
 
   lonmag_ref = MOD(360 + atan2(coord[1],coord[0])/DTOR, 360);
@@ -5,6 +5,7 @@
 #include "aacgmlib_v2.h"
 #include "rtime.h"
 #include "astalg.h"
+#include "mlt_v2.h"
 
 #ifndef NAN
 #define NAN sqrt(-1)
@@ -53,6 +54,20 @@
    Removed *mlson variable since it is only used for doing linear
      interpolation between two periods separated by 10 minutes.
 
+   Cached the reference longitude for MLT_CACHE_SIZE times in each thread,
+     instead of only the most recent time, shared by MLTConvert_v2 and
+     inv_MLTConvert_v2.  The AACGM-v2 date/time is only tested (and set) when
+     the reference longitude is computed, and both directions respect
+     AACGM_v2_Lock(), using the coefficients for the locked date/time.
+     Computations more than 30 days from the locked date/time are counted,
+     and are only used while the same date/time is locked.
+
+   Counted and timed the reference longitude computations, see
+     AACGM_v2_GetStats.
+
+   Cached reference longitudes are not used after the coefficients are set
+     from memory, see AACGM_v2_SetCoefs.
+
 ;
 ; Public Functions:
 ; -----------------
@@ -75,99 +90,195 @@
 ;
 */
 
-double mlon_ref = -1;
-
-struct {
-  int yr;
-  int mo;
-  int dy;
-  int hr;
-  int mt;
-  int sc;
-} mlt_date = {-1,-1,-1,-1,-1,-1};
+/* the reference longitude is cached for MLT_CACHE_SIZE times in each thread,
+   for both directions.  Each time is held in the slot given by a hash of the
+   time, replacing the time previously held there.  Slots computed before
+   the coefficients were last set from memory, or with the coefficients of a
+   locked date/time more than 30 days away, are not used outside it. */
+struct mlt_slot {
+  long long key;    /* packed date and time; 0 if the slot is empty */
+  unsigned long serial;  /* AACGM_v2_CoefsSerial when computed */
+  long long pin;    /* locked date and time when computed, see mlt_pin */
+  double mlon_ref;  /* AACGM-v2 longitude of the subsolar point at 700 km */
+};
+
+static AACGM_TLS struct mlt_slot mlt_cache[MLT_CACHE_SIZE];
+static AACGM_TLS unsigned long mlt_hits = 0;
+static AACGM_TLS unsigned long mlt_misses = 0;
+static AACGM_TLS int mlt_count = 0;
+static AACGM_TLS unsigned long mlt_avoided = 0;
+
+/* Pack a date and time into a cache key */
+static long long mlt_key(int yr, int mo, int dy, int hr, int mt, int sc)
+{
+  return ((((((long long)yr*13 + mo)*32 + dy)*24 + hr)*60 + mt)*60 + sc);
+}
 
 /*
- * Accepts scalars but only recomputes mlon_ref if time has changed from last
- * call so computation is fast(er) for multiple calls at same date/time
+ * Get the key of the locked AACGM-v2 date/time if the date/time passed in is
+ * more than 30 days from it, or 0 otherwise.  Reference longitudes computed
+ * with the locked coefficients at such times are only used while the same
+ * date/time is locked.
  *
- * No options here. Use IDL version for development
+ */
+static long long mlt_pin(int yr, int mo, int dy, int hr, int mt, int sc)
+{
+  int lyr,lmo,ldy,lhr,lmt,lsc;
+  double jd,ljd;
+
+  if (AACGM_v2_GetLockDateTime(&lyr,&lmo,&ldy,&lhr,&lmt,&lsc) != 0)
+    return (0);
+
+  ljd = TimeYMDHMSToJulian(lyr,lmo,ldy,lhr,lmt,lsc);
+  jd  = TimeYMDHMSToJulian(yr,mo,dy,hr,mt,sc);
+  if (abs((int)(jd-ljd)) > 30) return (mlt_key(lyr,lmo,ldy,lhr,lmt,lsc));
+
+  return (0);
+}
+
+/*
+ * Compute the reference longitude for a date/time: the AACGM-v2 longitude of
+ * the subsolar point.  Returns 0 on success, the error of
+ * AACGM_v2_SetDateTime, or -99 if the reference point could not be
+ * converted.
  *
  */
-double MLTConvert_v2(int yr, int mo, int dy, int hr, int mt ,int sc,
-                      double mlon)
+static int mlt_calculate(int yr, int mo, int dy, int hr, int mt, int sc,
+                         double *mlon_ref)
 {
   int err;
   int ayr,amo,ady,ahr,amt,asc,adyn;
+  int lyr,lmo,ldy,lhr,lmt,lsc;
   double dd,jd,eqt,dec,ut,at;
   double slon,mlat,r;
-  double hgt,aacgm_mlt;
+  double hgt;
   double ajd;
 
   err = 0;
   AACGM_v2_GetDateTime(&ayr, &amo, &ady, &ahr, &amt, &asc, &adyn);
-  if (ayr < 0) { 
+  if (AACGM_v2_GetLockDateTime(&lyr,&lmo,&ldy,&lhr,&lmt,&lsc) == 0) {
+    /* While locked, use the coefficients for the locked date/time, which
+     * location conversions at other times may have replaced */
+    if (lyr != ayr || lmo != amo || ldy != ady || lhr != ahr || lmt != amt ||
+        lsc != asc)
+      err = AACGM_v2_SetDateTime(lyr,lmo,ldy,lhr,lmt,lsc);
+    if (err != 0) return (err);
+    if (mlt_pin(yr,mo,dy,hr,mt,sc) != 0) mlt_avoided++;
+  } else if (ayr < 0) {
     /* AACGM date/time not set so set it to the date/time passed in */
     err = AACGM_v2_SetDateTime(yr,mo,dy,hr,mt,sc);
     if (err != 0) return (err);
-  } else if (!AACGM_v2_Locked()) {
+  } else {
     /* If date/time passed into function differs from AACGM data/time by more
      * than 30 days, recompute the AACGM-v2 coefficients */
     ajd = TimeYMDHMSToJulian(ayr,amo,ady,ahr,amt,asc);
     jd =  TimeYMDHMSToJulian(yr,mo,dy,hr,mt,sc);
-    if (abs((int)(jd-ajd)) > 30) {
-      err = AACGM_v2_SetDateTime(yr,mo,dy,hr,mt,sc);
-    }
+    if (abs((int)(jd-ajd)) > 30) err = AACGM_v2_SetDateTime(yr,mo,dy,hr,mt,sc);
     if (err != 0) return (err);
   }
 
+  hgt = 700.;   /* AACGM-v2 coefficients are defined everywhere above this
+                 * altitude. */
+
+  /* compute corrected time */
+  dd  = AstAlg_dday(dy,hr,mt,sc);
+  jd  = AstAlg_jde(yr,mo,dd);
+  eqt = AstAlg_equation_of_time(jd);
+  dec = AstAlg_solar_declination(jd);
+  ut  = hr*3600. + mt*60. + sc;
+  at  = ut + eqt*60.;
+
+  /* compute reference longitude */
+  slon = (43200.-at)*15./3600.;         /* subsolar point  */
+
+  /* compute AACGM-v2 coordinates of reference point */
+  err = AACGM_v2_Convert(dec, slon, hgt, &mlat, mlon_ref, &r, G2A);
+
+  /* check for error: this should NOT happen... */
+  if (err != 0) return (-99);
+
+  return (0);
+}
+
+/*
+ * Get the reference longitude for a date/time, from the cache or by
+ * computing it with mlt_calculate, which is counted and timed.  Returns 0 on
+ * success, or the error of mlt_calculate.
+ *
+ */
+static int mlt_reference(int yr, int mo, int dy, int hr, int mt, int sc,
+                         double *mlon_ref)
+{
+  int err;
+  double t0;
+  long long key,pin;
+  unsigned long serial;
+  struct mlt_slot *slot;
+  AACGM_v2_Stats *stats;
+
+  key  = mlt_key(yr,mo,dy,hr,mt,sc);
+  slot = &mlt_cache[((unsigned long long)key * 0x9E3779B97F4A7C15ULL) >>
+                    (64 - MLT_CACHE_BITS)];
+
+  serial = AACGM_v2_CoefsSerial();
+  pin    = mlt_pin(yr,mo,dy,hr,mt,sc);
+  if (slot->key == key && slot->serial == serial && slot->pin == pin) {
+    mlt_hits++;
+    *mlon_ref = slot->mlon_ref;
+    return (0);
+  }
+  mlt_misses++;
+
+  t0  = AACGM_v2_Clock();
+  err = mlt_calculate(yr,mo,dy,hr,mt,sc, mlon_ref);
+
+  stats = AACGM_v2_ThreadStats();
+  stats->mlon_refs++;
+  stats->mlon_ref_time += AACGM_v2_Clock() - t0;
+  if (err != 0) return (err);
+
+  if (slot->key == 0) mlt_count++;
+  slot->key      = key;
+  slot->serial   = serial;
+  slot->pin      = pin;
+  slot->mlon_ref = *mlon_ref;
+
+  return (0);
+}
+
+/* Get the reference longitude cache counters of the calling thread, and the
+   number of computations that did not reset the locked AACGM-v2 date/time */
+void MLT_v2_GetCacheStats(unsigned long *hits, unsigned long *misses,
+                          int *count, int *size, unsigned long *avoided)
+{
+  *hits    = mlt_hits;
+  *misses  = mlt_misses;
+  *count   = mlt_count;
+  *size    = MLT_CACHE_SIZE;
+  *avoided = mlt_avoided;
+}
+
+/*
+ * Accepts scalars and computes mlon_ref only for times that are not cached,
+ * so computation is fast(er) for multiple calls at the same date/times
+ *
+ * No options here. Use IDL version for development
+ *
+ */
+double MLTConvert_v2(int yr, int mo, int dy, int hr, int mt ,int sc,
+                      double mlon)
+{
+  int err;
+  double mlon_ref,aacgm_mlt;
+
 /* check for bad input, which can come from undefined region, and return NAN */
   if (!isfinite(mlon)) {
     return (NAN);
   }
 
-  hgt = 700.;   /* AACGM-v2 coefficients are defined everywhere above this
-                 * altitude. */
-
-  if (mlt_date.yr != yr || mlt_date.mo != mo || mlt_date.dy != dy ||
-      mlt_date.hr != hr || mlt_date.mt != mt || mlt_date.sc != sc) {
-    /* date/time has changed so recompute */
-    mlt_date.yr = yr;
-    mlt_date.mo = mo;
-    mlt_date.dy = dy;
-    mlt_date.hr = hr;
-    mlt_date.mt = mt;
-    mlt_date.sc = sc;
-
-    /* compute corrected time */
-    dd  = AstAlg_dday(dy,hr,mt,sc);
-    jd  = AstAlg_jde(yr,mo,dd);
-    eqt = AstAlg_equation_of_time(jd);
-    dec = AstAlg_solar_declination(jd);
-    ut  = hr*3600. + mt*60. + sc;
-    at  = ut + eqt*60.;
-
-    /* comparision with IDL version is exact
-    printf("\n\n");
-    printf("dd  = %20.12lf\n", dd);
-    printf("jd  = %20.12lf\n", jd);
-    printf("eqt = %20.12lf\n", eqt);
-    printf("dec = %20.12lf\n", dec);
-    printf("\n\n");
-    */
-
-    /* compute reference longitude */
-    slon = (43200.-at)*15./3600.;         /* subsolar point  */
-
-    /* compute AACGM-v2 coordinates of reference point */
-    err = AACGM_v2_Convert(dec, slon, hgt, &mlat, &mlon_ref, &r, G2A);
-
-    /* check for error: this should NOT happen... */
-    if (err != 0) {
-      err = -99;
-      return (NAN);
-    }
-  }
-/*printf("** %lf\n", mlon_ref);*/
+  err = mlt_reference(yr,mo,dy,hr,mt,sc, &mlon_ref);
+  if (err == -99) return (NAN);
+  if (err != 0) return (err);
 
   aacgm_mlt = 12. + (mlon - mlon_ref)/15.;  /* MLT based on subsolar point */
 
@@ -184,67 +295,16 @@ double inv_MLTConvert_v2(int yr, int mo, int dy, int hr, int mt ,int sc,
                       double mlt)
 {
   int err;
-  int ayr,amo,ady,ahr,amt,asc,adyn;
-  double dd,jd,eqt,dec,ut,at;
-  double slon,mlat,r;
-  double hgt,aacgm_mlon;
-  double ajd;
-
-  err = 0;
-  AACGM_v2_GetDateTime(&ayr, &amo, &ady, &ahr, &amt, &asc, &adyn);
-  if (ayr < 0) {
-    /* AACGM date/time not set so set it to the date/time passed in */
-    err = AACGM_v2_SetDateTime(yr,mo,dy,hr,mt,sc);
-    if (err != 0) return (err);
-  } else {
-    /* If date/time passed into function differs from AACGM data/time by more
-     * than 30 days, recompute the AACGM-v2 coefficients */
-    ajd = TimeYMDHMSToJulian(ayr,amo,ady,ahr,amt,asc);
-    jd =  TimeYMDHMSToJulian(yr,mo,dy,hr,mt,sc);
-    if (abs((int)(jd-ajd)) > 30) {
-      err = AACGM_v2_SetDateTime(yr,mo,dy,hr,mt,sc);
-    }
-    if (err != 0) return (err);
-  }
+  double mlon_ref,aacgm_mlon;
 
 /* check for bad input, which should not happen for MLT, and return NAN */
   if (!isfinite(mlt)) {
     return (NAN);
   }
 
-  hgt = 700.;   /* AACGM-v2 coefficients are defined everywhere above this
-                 * altitude. */
-
-  if (mlt_date.yr != yr || mlt_date.mo != mo || mlt_date.dy != dy ||
-      mlt_date.hr != hr || mlt_date.mt != mt || mlt_date.sc != sc) {
-    /* date/time has changed so recompute */
-    mlt_date.yr = yr;
-    mlt_date.mo = mo;
-    mlt_date.dy = dy;
-    mlt_date.hr = hr;
-    mlt_date.mt = mt;
-    mlt_date.sc = sc;
-
-    /* compute corrected time */
-    dd  = AstAlg_dday(dy,hr,mt,sc);
-    jd  = AstAlg_jde(yr,mo,dd);
-    eqt = AstAlg_equation_of_time(jd);
-    dec = AstAlg_solar_declination(jd);
-    ut  = hr*3600. + mt*60. + sc;
-    at  = ut + eqt*60.;
-
-    /* compute reference longitude */
-    slon = (43200.-at)*15./3600.;         /* subsolar point  */
-
-    /* compute AACGM-v2 coordinates of reference point */
-    err = AACGM_v2_Convert(dec, slon, hgt, &mlat, &mlon_ref, &r, G2A);
-
-    /* check for error: this should NOT happen... */
-    if (err != 0) {
-      err = -99;
-      return (NAN);
-    }
-  }
+  err = mlt_reference(yr,mo,dy,hr,mt,sc, &mlon_ref);
+  if (err == -99) return (NAN);
+  if (err != 0) return (err);
 
   aacgm_mlon = (mlt - 12.)*15. + mlon_ref;  /* mlon based on subsolar point */
 
@@ -1,10 +1,13 @@
 #!/usr/bin/env python
 
+from importlib import util
 import os
 import re
 from os import path
 
 from setuptools import setup, find_packages
+from setuptools.command.build_ext import build_ext
+from setuptools.command.build_py import build_py
 from distutils.core import Extension
 
 
@@ -16,12 +19,60 @@ if 'PY_CCOV' in os.environ.keys():
     os.environ['CFLAGS'] = os.environ['PY_CCOV']
 
 
-setup(packages=find_packages(), ext_modules=[
-    Extension('aacgmv2._aacgmv2',
-              sources=['aacgmv2/aacgmv2module.c',
-                       'c_aacgmv2/src/aacgmlib_v2.c',
-                       'c_aacgmv2/src/astalglib.c',
-                       'c_aacgmv2/src/igrflib.c',
-                       'c_aacgmv2/src/mlt_v2.c',
-                       'c_aacgmv2/src/rtime.c'],
-              include_dirs=['c_aacgmv2/include'])],)
+def build_coeff_store():
+    """Write the binary AACGM-V2 coefficient store from the ASCII files.
+
+    Returns
+    -------
+    store_file : str
+        Coefficient store filename, relative to the source directory
+
+    """
+    # Load the store module directly, as the package needs the C extension
+    spec = util.spec_from_file_location(
+        'coeff_store', path.join('aacgmv2', 'coeff_store.py'))
+    coeff_store = util.module_from_spec(spec)
+    spec.loader.exec_module(coeff_store)
+
+    return coeff_store.write_coeff_store(
+        path.join('aacgmv2', 'aacgm_coeffs', 'aacgm_coeffs-14-'))
+
+
+class BuildPy(build_py):
+    """Build the pure Python modules and the coefficient store."""
+
+    def run(self):
+        """Run the build, including the coefficient store in the output."""
+        store_file = build_coeff_store()
+        super().run()
+        self.copy_file(store_file, path.join(self.build_lib, store_file))
+
+
+class BuildExt(build_ext):
+    """Build the C extension and the coefficient store."""
+
+    def finalize_options(self):
+        """Add the NumPy headers, once NumPy is installed for the build."""
+        super().finalize_options()
+
+        import numpy
+        self.include_dirs.append(numpy.get_include())
+
+    def run(self):
+        """Run the build, updating the coefficient store for in-place use."""
+        build_coeff_store()
+        super().run()
+
+
+setup(packages=find_packages(),
+      cmdclass={'build_py': BuildPy, 'build_ext': BuildExt},
+      ext_modules=[Extension('aacgmv2._aacgmv2',
+                             sources=['aacgmv2/aacgmv2module.c',
+                                      'c_aacgmv2/src/aacgmlib_v2.c',
+                                      'c_aacgmv2/src/astalglib.c',
+                                      'c_aacgmv2/src/igrflib.c',
+                                      'c_aacgmv2/src/mlt_v2.c',
+                                      'c_aacgmv2/src/rtime.c'],
+                             include_dirs=['c_aacgmv2/include'],
+                             define_macros=[('NPY_TARGET_VERSION',
+                                             'NPY_1_23_API_VERSION')])])